@@ -0,0 +1,20 @@
+# Hedera AgriFund Backend - API blueprints
+#
+# One blueprint per area; create_app() registers them in this order.
+from api import analytics, audit, dashboard, events, jobs, loans, prices, tokens, users
+
+BLUEPRINTS = [
+    users.bp,
+    tokens.bp,
+    loans.bp,
+    prices.bp,
+    events.bp,
+    analytics.bp,
+    dashboard.bp,
+    jobs.bp,
+    audit.bp,
+]
+
+# Imported by the routes that use them rather than at startup; a preloading
+# server imports them up front (app.prepare_preload) so its workers share them
+LAZY_MODULES = ['geo', 'imports', 'outbox', 'pricefeeds', 'projections', 'stress', 'traces']
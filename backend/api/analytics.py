@@ -0,0 +1,304 @@
+# Hedera AgriFund Backend - Analytics API
+#
+# The platform summary (cached, summed across shards), roll-ups of the
+# analytics cube, and Monte Carlo stress tests of the funded book, run as
+# background jobs.
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify, request
+
+import candles
+import cube
+from api.common import RequestError, scatter
+from api.jobs import enqueue_job, job_handler
+from api.loans import project_lender_loans
+from extensions import cache, db
+from models import AnalyticsCube, Loan, PriceCandle, RWAToken, User
+from money import UNIT, to_number, unit_array
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('analytics', __name__)
+
+SUMMARY_CACHE_TTL = 30  # seconds
+CUBE_CACHE_TTL = 300  # seconds; writes to the cube start a new generation of roll-ups
+
+
+@bp.route('/api/analytics/summary', methods=['GET'])
+def get_analytics_summary():
+    """Get platform analytics summary"""
+    try:
+        return jsonify(analytics_summary())
+
+    except Exception as e:
+        logger.error(f"Failed to get analytics: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve analytics'}), 500
+
+
+def analytics_summary():
+    """The platform summary, cached for SUMMARY_CACHE_TTL seconds and dropped on writes"""
+    return cache.get_or_set('analytics', 'summary', compute_analytics_summary, ttl=SUMMARY_CACHE_TTL)
+
+
+def compute_analytics_summary():
+    """Aggregate platform-wide loan and collateral figures (summed across shards)"""
+    def shard_totals(engine):
+        loans = db.select(
+            db.func.count(Loan.id),
+            db.func.count(Loan.id).filter(Loan.status == 'funded'),
+            db.func.sum(Loan.amount).filter(Loan.status == 'funded'),
+            db.func.sum(Loan.interest_rate).filter(Loan.status == 'funded'),
+            db.func.count(Loan.id).filter(Loan.status == 'defaulted')
+        )
+        collateral = db.select(db.func.sum(RWAToken.quantity * RWAToken.current_price))
+        users = db.select(User.user_type, db.func.count(User.id)).group_by(User.user_type)
+        with engine.connect() as conn:
+            loan_totals = conn.execute(loans).one()
+            collateral_value = conn.execute(collateral).scalar() or 0
+            user_counts = dict(conn.execute(users).all())
+        return loan_totals, collateral_value, user_counts
+
+    total_loans = funded_loans = defaulted_loans = active_farmers = active_lenders = 0
+    total_funded_amount = total_collateral_value = funded_interest_sum = 0
+    for (loans, funded, funded_amount, interest_sum, defaulted), collateral_value, user_counts in scatter(shard_totals):
+        total_loans += loans
+        funded_loans += funded
+        defaulted_loans += defaulted
+        total_funded_amount += funded_amount or 0
+        funded_interest_sum += interest_sum or 0
+        total_collateral_value += collateral_value
+        active_farmers += user_counts.get('farmer', 0)
+        active_lenders += user_counts.get('lender', 0)
+
+    avg_interest_rate = funded_interest_sum / funded_loans if funded_loans else 0
+    default_rate = (defaulted_loans / max(funded_loans, 1)) * 100
+
+    return {
+        'total_loans': total_loans,
+        'funded_loans': funded_loans,
+        'total_funded_amount': to_number(total_funded_amount),
+        'total_collateral_value': to_number(total_collateral_value),
+        'average_interest_rate': float(avg_interest_rate),
+        'default_rate': float(default_rate),
+        'active_farmers': active_farmers,
+        'active_lenders': active_lenders
+    }
+
+
+# Analytics Cube
+def parse_cube_query():
+    """Read by=, dimension filters (comma-separated values) and from=/to= months (YYYY-MM) from the query string
+
+    Dimensions come back in cube.DIMENSIONS order and filter values sorted, so
+    spellings of the same query share a cached roll-up.
+    """
+    by = {name.strip() for name in request.args.get('by', '').split(',') if name.strip()}
+    unknown = sorted(by.difference(cube.DIMENSIONS))
+    if unknown:
+        raise RequestError(f"Unknown dimensions: {', '.join(unknown)} (available: {', '.join(cube.DIMENSIONS)})")
+    by = [name for name in cube.DIMENSIONS if name in by]
+
+    filters = {}
+    for name in cube.DIMENSIONS:
+        values = sorted({value.strip() for value in request.args.get(name, '').split(',') if value.strip()})
+        if values and name != 'month':  # months are sliced by from=/to=
+            filters[name] = values
+    try:
+        start, end = (datetime.strptime(request.args[name], '%Y-%m').date() if request.args.get(name) else None
+                      for name in ('from', 'to'))
+    except ValueError:
+        raise RequestError('from and to must be months (YYYY-MM)')
+    return by, filters, start, end
+
+
+def cube_cell(by, key, totals):
+    cell = dict(zip(by, key))
+    if 'month' in cell:
+        cell['month'] = cell['month'].isoformat()[:7]
+    loans = totals['loans']
+    cell.update({
+        'tokens': int(totals['tokens']),
+        'token_quantity': int(totals['token_quantity']),
+        'loans': int(loans),
+        'loan_amount': to_number(totals['loan_amount']),
+        'average_ltv': round(float(totals['ltv_sum']) / loans, 2) if loans else None,
+        'average_interest_rate': round(float(totals['interest_rate_sum']) / loans, 2) if loans else None,
+        'funded_loans': int(totals['funded_loans']),
+        'funded_amount': to_number(totals['funded_amount']),
+        'funding_rate': round(totals['funded_loans'] * 100 / loans, 2) if loans else None,
+    })
+    return cell
+
+
+def compute_cube(by, filters, start, end):
+    """Roll the cube up to `by` on every shard and add the shards' cells together"""
+    statement = cube.rollup_statement(AnalyticsCube.__table__, by, filters, start, end)
+
+    def fetch(engine):
+        with engine.connect() as conn:
+            return conn.execute(statement).all()
+
+    cells = cube.merge(scatter(fetch), by)
+    totals = dict.fromkeys(cube.MEASURES, 0)
+    for measures in cells.values():
+        for name in cube.MEASURES:
+            totals[name] += measures[name]
+
+    return {
+        'by': by,
+        'filters': {**filters, **{name: value.strftime('%Y-%m') for name, value in (('from', start), ('to', end)) if value}},
+        'cells': [cube_cell(by, key, cells[key]) for key in sorted(cells)],
+        'total': cube_cell([], (), totals)
+    }
+
+
+def cube_generation():
+    """Tag of the current cached roll-ups; invalidating ('analytics', 'cube') after a cube write starts a new one"""
+    return cache.get_or_set('analytics', 'cube', lambda: uuid.uuid4().hex, ttl=CUBE_CACHE_TTL)
+
+
+def cached_cube(by, filters, start, end):
+    """The roll-up for a parsed query, cached under one key per query and recomputed when the generation moves on
+
+    The generation is stored with the roll-up rather than in its key, so a
+    new generation overwrites the old roll-ups instead of adding keys.
+    """
+    generation = cube_generation()
+    key = json.dumps([by, filters, start and start.isoformat(), end and end.isoformat()], separators=(',', ':'))
+    cached = cache.get('analytics', f"cube:{key}")
+    if cached is None or cached['generation'] != generation:
+        cached = {'generation': generation, 'rollup': compute_cube(by, filters, start, end)}
+        cache.set('analytics', f"cube:{key}", cached, ttl=CUBE_CACHE_TTL)
+    return cached['rollup']
+
+
+@bp.route('/api/analytics/cube', methods=['GET'])
+def get_analytics_cube():
+    """Token and loan figures rolled up by any of crop_type, region, quality_grade and month
+
+    by= lists the dimensions to keep (none: one grand total); crop_type=,
+    region= and quality_grade= slice the cube to the listed values, from= and
+    to= to a range of months. Drill down by adding a dimension to by= and
+    filtering on the cell to expand.
+    """
+    try:
+        by, filters, start, end = parse_cube_query()
+        return jsonify(cached_cube(by, filters, start, end))
+
+    except RequestError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        logger.error(f"Failed to query analytics cube: {str(e)}")
+        return jsonify({'error': 'Failed to query analytics cube'}), 500
+
+
+# Risk
+def fetch_stress_book(horizon_end):
+    """Funded loans with priced collateral, owed amounts projected to the horizon"""
+    import stress
+
+    statement = db.select(
+        Loan.lender_id, Loan.amount, Loan.interest_rate, Loan.duration_months, Loan.funded_at, Loan.due_date,
+        RWAToken.crop_type, RWAToken.quantity, RWAToken.current_price
+    ).join(RWAToken, Loan.collateral_token_id == RWAToken.token_id) \
+     .where(Loan.status == 'funded', Loan.lender_id.isnot(None), RWAToken.quantity > 0, RWAToken.current_price > 0)
+
+    def fetch(engine):
+        with engine.connect() as conn:
+            return conn.execute(statement).all()
+
+    rows = [row for shard_rows in scatter(fetch) for row in shard_rows]
+    owed = project_lender_loans(rows, horizon_end)[-1]['outstanding'] / UNIT
+    return stress.Book(
+        [row.lender_id for row in rows], [row.crop_type for row in rows], owed,
+        unit_array(row.current_price * row.quantity for row in rows) / UNIT
+    )
+
+
+def daily_closes(commodities, lookback_days):
+    """Daily closing prices per commodity from the 1d candles"""
+    start = datetime.utcnow() - timedelta(days=lookback_days)
+    with db.engine.connect() as conn:
+        return {commodity: [(row.bucket_start.date(), row.close) for row in candles.read_candles(
+            conn, PriceCandle.__table__, commodity, '1d', start=start, limit=lookback_days + 1
+        )] for commodity in commodities}
+
+
+def validate_stress(data):
+    """Check stress test parameters; returns them with defaults filled in"""
+    import stress
+
+    params = {
+        'paths': data.get('paths', 10000),
+        'horizon_days': data.get('horizon_days', 30),
+        'lookback_days': data.get('lookback_days', 365),
+        'shocks': data.get('shocks', {}),
+        'confidence': data.get('confidence', list(stress.CONFIDENCE_LEVELS)),
+        'top_lenders': data.get('top_lenders', 100),
+        'seed': data.get('seed'),
+    }
+    limits = {'paths': (100, 100000), 'horizon_days': (1, 365), 'lookback_days': (30, 3650), 'top_lenders': (0, 1000)}
+    for field, (low, high) in limits.items():
+        if not isinstance(params[field], int) or not low <= params[field] <= high:
+            raise RequestError(f'{field} must be an integer between {low} and {high}')
+    if not isinstance(params['shocks'], dict) or not all(
+            isinstance(change, (int, float)) and -1 < change <= 10 for change in params['shocks'].values()):
+        raise RequestError('shocks must map commodities to relative changes above -1 (e.g. {"cocoa": -0.3})')
+    if not isinstance(params['confidence'], list) or not params['confidence'] or not all(
+            isinstance(level, float) and 0 < level < 1 for level in params['confidence']):
+        raise RequestError('confidence must be a list of levels between 0 and 1')
+    if params['seed'] is not None and not isinstance(params['seed'], int):
+        raise RequestError('seed must be an integer')
+    return params
+
+
+def run_stress_test(data):
+    """Simulate the funded book and report platform, commodity and lender losses"""
+    import stress
+
+    params = validate_stress(data)
+    started = time.perf_counter()
+    book = fetch_stress_book(datetime.utcnow() + timedelta(days=params['horizon_days']))
+    model = stress.PriceModel.fit(book.commodities, daily_closes(book.commodities, params['lookback_days']))
+    result = stress.run(
+        book, model, n_paths=params['paths'], horizon_days=params['horizon_days'], shocks=params['shocks'],
+        confidence=params['confidence'], seed=params['seed'], workers=current_app.config['STRESS_WORKERS'],
+        top_lenders=params['top_lenders']
+    )
+
+    lender_ids = [lender['lender_id'] for lender in result['lenders']]
+    def fetch_accounts(engine):
+        with engine.connect() as conn:
+            return conn.execute(db.select(User.id, User.hedera_account_id).where(User.id.in_(lender_ids))).all()
+    accounts = dict(row for shard_rows in scatter(fetch_accounts) for row in shard_rows)
+    for lender in result['lenders']:
+        lender['hedera_account_id'] = accounts.get(lender['lender_id'])
+
+    result['parameters'] = params
+    result['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+    return result
+
+
+@job_handler('stress_test')
+def run_stress_job(payload, job_id):
+    return run_stress_test(payload)
+
+
+@bp.route('/api/risk/stress', methods=['POST'])
+def start_stress_test():
+    """Queue a Monte Carlo stress test of the funded book (poll /api/jobs/<job_id> for the report)"""
+    try:
+        data = request.get_json() or {}
+        validate_stress(data)
+        return enqueue_job('stress_test', data)
+
+    except RequestError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to start stress test: {str(e)}")
+        return jsonify({'error': 'Failed to start stress test'}), 500
@@ -0,0 +1,119 @@
+# Hedera AgriFund Backend - Audit API
+#
+# The audit trail (hot rows, then archived months) and the helper every
+# other blueprint records its events with.
+import json
+import logging
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request
+
+from api.common import parse_timestamp
+from extensions import db
+from models import AuditLog
+from partitions import oldest_hot_month, read_archive
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('audit', __name__)
+
+
+@bp.route('/api/audit/trail', methods=['GET'])
+def get_audit_trail():
+    """Get audit trail for transparency"""
+    try:
+        # Query parameters
+        event_type = request.args.get('event_type')
+        entity_id = request.args.get('entity_id')
+        try:
+            user_id = int(request.args['user_id']) if request.args.get('user_id') else None
+            limit = int(request.args.get('limit', 50))
+        except ValueError:
+            return jsonify({'error': 'user_id and limit must be integers'}), 400
+        try:
+            start = parse_timestamp(request.args['start']) if request.args.get('start') else None
+            end = parse_timestamp(request.args['end']) if request.args.get('end') else None
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO 8601 timestamps'}), 400
+
+        query = AuditLog.query
+
+        if event_type:
+            query = query.filter_by(event_type=event_type)
+        if entity_id:
+            query = query.filter_by(entity_id=entity_id)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        if start:
+            query = query.filter(AuditLog.created_at >= start)
+        if end:
+            query = query.filter(AuditLog.created_at < end)
+
+        logs = query.order_by(AuditLog.created_at.desc()).limit(limit).all()
+
+        audit_trail = []
+        for log in logs:
+            audit_trail.append({
+                'id': log.id,
+                'event_type': log.event_type,
+                'entity_id': log.entity_id,
+                'user_id': log.user_id,
+                'data': log.data,
+                'hedera_tx_id': log.hedera_tx_id,
+                'hcs_timestamp': log.hcs_timestamp,
+                'created_at': log.created_at.isoformat()
+            })
+
+        # Fall through to cold storage when the window reaches into archived months
+        archive_dir = current_app.config['ARCHIVE_DIR']
+        hot_from = oldest_hot_month(archive_dir, AuditLog.__tablename__)
+        if len(audit_trail) < limit and hot_from and (start is None or start < hot_from):
+            filters = {}
+            if event_type:
+                filters['event_type'] = event_type
+            if entity_id:
+                filters['entity_id'] = entity_id
+            if user_id is not None:
+                filters['user_id'] = user_id
+
+            archived = read_archive(
+                archive_dir, AuditLog.__tablename__,
+                start=start, end=min(end, hot_from) if end else hot_from,
+                filters=filters, limit=limit - len(audit_trail)
+            )
+            for row in archived:
+                audit_trail.append({
+                    'id': row['id'],
+                    'event_type': row['event_type'],
+                    'entity_id': row['entity_id'],
+                    'user_id': row['user_id'],
+                    'data': json.loads(row['data']) if row['data'] else None,
+                    'hedera_tx_id': row['hedera_tx_id'],
+                    'hcs_timestamp': row['hcs_timestamp'],
+                    'created_at': row['created_at'].isoformat(),
+                    'archived': True
+                })
+
+        return jsonify({'audit_trail': audit_trail})
+
+    except Exception as e:
+        logger.error(f"Failed to get audit trail: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve audit trail'}), 500
+
+
+def log_audit_event(event_type, entity_id, user_id, data, hedera_tx_id=None):
+    """Log an event to audit trail"""
+    try:
+        log = AuditLog(
+            event_type=event_type,
+            entity_id=entity_id,
+            user_id=user_id,
+            data=data,
+            hedera_tx_id=hedera_tx_id,
+            hcs_timestamp=int(datetime.utcnow().timestamp() * 1000000000)  # nanoseconds
+        )
+        db.session.add(log)
+        db.session.commit()
+
+    except Exception as e:
+        logger.error(f"Failed to log audit event: {str(e)}")
@@ -0,0 +1,193 @@
+# Hedera AgriFund Backend - Helpers shared by the API blueprints
+import math
+from datetime import datetime, timezone
+
+from flask import Response, jsonify, request, stream_with_context
+
+import cube
+from exports import EXPORT_FORMATS, stream_export
+from extensions import db, shard_router
+from models import AnalyticsCube
+
+
+class RequestError(Exception):
+    """Validation failure carrying the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def route_to_account(hedera_account_id):
+    """Send this session's user-owned queries to the account's shard"""
+    if shard_router:
+        db.session.info['shard'] = shard_router.shard_for(hedera_account_id)
+
+
+def shard_engines():
+    return shard_router.engines if shard_router else [db.engine]
+
+
+def all_engines():
+    """The primary database and every shard"""
+    return [db.engine] + (shard_router.engines if shard_router else [])
+
+
+def scatter(fn):
+    """Run fn(engine) on every shard in parallel (just the primary database when unsharded)"""
+    return shard_router.scatter(fn) if shard_router else [fn(db.engine)]
+
+
+def record_cube(*facts):
+    """Add token and loan facts to the analytics cube in the session's transaction (on its shard)
+
+    Invalidate ('analytics', 'cube') after the commit so cached roll-ups are recomputed.
+    """
+    conn = db.session.connection(bind_arguments={'mapper': AnalyticsCube})
+    cube.record(conn, AnalyticsCube.__table__, facts)
+
+
+def parse_timestamp(value):
+    """An ISO 8601 timestamp as naive UTC, like the stored ones (ValueError when malformed)"""
+    timestamp = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith(('Z', 'z')) else value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def positive_int(data, field):
+    """A whole number above zero from a request field (an int or a string of digits)"""
+    value = data[field]
+    try:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(value)
+        number = int(value)
+    except ValueError:
+        raise RequestError(f'{field} must be a whole number')
+    if number <= 0:
+        raise RequestError(f'{field} must be positive')
+    return number
+
+
+def query_int(field, default, maximum, minimum=1):
+    """A whole-number query parameter within [minimum, maximum] (RequestError otherwise)"""
+    try:
+        number = int(request.args.get(field, default))
+    except ValueError:
+        raise RequestError(f'{field} must be a whole number')
+    if not minimum <= number <= maximum:
+        raise RequestError(f'{field} must be between {minimum} and {maximum}')
+    return number
+
+
+def check_coordinates(data):
+    """Reject latitude/longitude fields that are not finite numbers in range"""
+    for field, bound in (('latitude', 90), ('longitude', 180)):
+        if data.get(field) is None:
+            continue
+        try:
+            value = float(data[field])
+        except (TypeError, ValueError):
+            raise RequestError(f'{field} must be a number')
+        if not math.isfinite(value) or abs(value) > bound:
+            raise RequestError(f'{field} must be between -{bound} and {bound}')
+
+
+def locate(data, location):
+    """Coordinates and geocell for a record: explicit latitude/longitude, else the gazetteer"""
+    import geo
+
+    if data.get('latitude') is not None and data.get('longitude') is not None:
+        point = (float(data['latitude']), float(data['longitude']))
+    else:
+        point = geo.geocode(location)
+    if not point:
+        return {}
+    return {'latitude': point[0], 'longitude': point[1], 'geocell': geo.geocell(*point)}
+
+
+def parse_area():
+    """Read a radius (lat/lon or near=<place>, radius_km) or bbox=min_lon,min_lat,max_lon,max_lat query"""
+    import geo
+
+    if 'bbox' in request.args:
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(value) for value in request.args['bbox'].split(','))
+        except ValueError:
+            raise RequestError('bbox must be min_lon,min_lat,max_lon,max_lat')
+        check_coordinates({'latitude': min_lat, 'longitude': min_lon})
+        check_coordinates({'latitude': max_lat, 'longitude': max_lon})
+        if min_lat > max_lat:
+            raise RequestError('bbox min_lat must not be above max_lat')
+        return (min_lat, min_lon, max_lat, max_lon), None, None
+
+    if 'near' in request.args:
+        center = geo.geocode(request.args['near'])
+        if not center:
+            raise RequestError(f"Unknown place: {request.args['near']}", 404)
+    elif 'lat' in request.args and 'lon' in request.args:
+        try:
+            center = (float(request.args['lat']), float(request.args['lon']))
+        except ValueError:
+            raise RequestError('lat and lon must be numbers')
+        check_coordinates({'latitude': center[0], 'longitude': center[1]})
+    else:
+        raise RequestError('Provide lat and lon, near or bbox')
+
+    try:
+        radius_km = float(request.args.get('radius_km', 50))
+    except ValueError:
+        raise RequestError('radius_km must be a number')
+    if not 0 < radius_km <= 2000:
+        raise RequestError('radius_km must be between 0 and 2000')
+    return tuple(float(value) for value in geo.radius_bbox(*center, radius_km)), center, radius_km
+
+
+def spatial_search(model, statement, bbox, center, radius_km, limit):
+    """Run a geocell-range prefiltered SELECT on every shard and keep rows inside the area"""
+    import geo
+
+    ranges = geo.cover(*bbox)
+    statement = statement.add_columns(model.latitude, model.longitude).where(
+        db.or_(*[db.and_(model.geocell >= start, model.geocell < end) for start, end in ranges])
+    )
+
+    def fetch(engine):
+        with engine.connect() as conn:
+            return conn.execute(statement).all()
+
+    rows = [row for shard_rows in scatter(fetch) for row in shard_rows]
+    if not rows:
+        return [], []
+
+    latitudes = [row.latitude for row in rows]
+    longitudes = [row.longitude for row in rows]
+    if center is None:
+        keep = geo.in_bbox(latitudes, longitudes, *bbox).nonzero()[0]
+        return [rows[i] for i in keep[:limit]], [None] * min(len(keep), limit)
+
+    distances = geo.haversine_km(*center, latitudes, longitudes)
+    keep = (distances <= radius_km).nonzero()[0]
+    keep = keep[distances[keep].argsort(kind='stable')][:limit]
+    return [rows[i] for i in keep], [round(float(distances[i]), 3) for i in keep]
+
+
+def area_summary(bbox, center, radius_km):
+    if center is None:
+        return {'bbox': [bbox[1], bbox[0], bbox[3], bbox[2]]}
+    return {'center': {'lat': center[0], 'lon': center[1]}, 'radius_km': radius_km}
+
+
+def export_response(statement, columns, name, transform=None):
+    """Stream a column-only SELECT as a CSV or Parquet download (see exports.stream_export for `transform`)"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+
+    chunks = stream_export(shard_engines(), statement, columns, export_format, transform=transform)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={name}.{export_format}'}
+    )
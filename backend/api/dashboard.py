@@ -0,0 +1,166 @@
+# Hedera AgriFund Backend - Dashboard API
+#
+# One call for everything a farmer or lender dashboard shows: profile, tokens,
+# borrowed and lent loans, per-account totals and the platform summary. The
+# sections are read with a fixed number of queries however many tokens and
+# loans the account has: the user and both profiles in one join, tokens and
+# borrowed loans on the account's shard, lent loans once per shard. Responses
+# are cached per account for a few seconds and dropped when the account writes.
+import logging
+import time
+
+from flask import Blueprint, jsonify, request
+
+from api.analytics import analytics_summary
+from api.common import scatter
+from api.loans import collateral_data
+from api.tokens import TOKEN_FIELDS
+from api.users import fetch_profile, profile_data
+from extensions import cache, db
+from fieldsets import Field, FieldsetError, parse_fields, projection, serialize
+from models import Loan, RWAToken
+from money import to_number
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('dashboard', __name__)
+
+DASHBOARD_CACHE_TTL = 10  # seconds
+
+SECTIONS = {name: None for name in ('profile', 'tokens', 'borrowed', 'lent', 'summary', 'platform')}
+
+
+def optional_isoformat(value):
+    return value.isoformat() if value else None
+
+
+# Fields of the borrowed and lent loan lists; 'collateral' names the join it needs
+LOAN_FIELDS = {
+    'contract_id': Field([Loan.contract_id], lambda row: row.contract_id),
+    'amount': Field([Loan.amount], lambda row: to_number(row.amount)),
+    'interest_rate': Field([Loan.interest_rate], lambda row: float(row.interest_rate)),
+    'duration_months': Field([Loan.duration_months], lambda row: row.duration_months),
+    'purpose': Field([Loan.purpose], lambda row: row.purpose),
+    'status': Field([Loan.status], lambda row: row.status),
+    'ltv_ratio': Field([Loan.ltv_ratio], lambda row: float(row.ltv_ratio) if row.ltv_ratio is not None else None),
+    'collateral_token_id': Field([Loan.collateral_token_id], lambda row: row.collateral_token_id),
+    'collateral': Field([
+        RWAToken.crop_type.label('collateral_crop_type'),
+        RWAToken.quantity.label('collateral_quantity'),
+        RWAToken.quality_grade.label('collateral_quality_grade'),
+        RWAToken.current_price.label('collateral_price'),
+    ], collateral_data, ('collateral',)),
+    'created_at': Field([Loan.created_at], lambda row: row.created_at.isoformat()),
+    'funded_at': Field([Loan.funded_at], lambda row: optional_isoformat(row.funded_at)),
+    'due_date': Field([Loan.due_date], lambda row: optional_isoformat(row.due_date)),
+}
+
+
+def loan_statement(fields, with_totals):
+    """SELECT of the requested loan fields, newest first; amount and status are added for the summary"""
+    always = [Loan.created_at] + ([Loan.amount, Loan.status] if with_totals else [])
+    columns, joins = projection(LOAN_FIELDS, fields, always=always)
+    statement = db.select(*columns).select_from(Loan)
+    if 'collateral' in joins:
+        statement = statement.outerjoin(RWAToken, Loan.collateral_token_id == RWAToken.token_id)
+    return statement
+
+
+def account_summary(tokens, borrowed, lent):
+    """Per-account totals in micro-units, from the rows already fetched"""
+    def principal(loans, status):
+        return sum(row.amount for row in loans if row.status == status)
+
+    return {
+        'token_count': len(tokens),
+        'token_value': to_number(sum(row.current_price * row.quantity for row in tokens)),
+        'pledged_value': to_number(sum(row.current_price * row.quantity for row in tokens if row.is_pledged)),
+        'loans_borrowed': len(borrowed),
+        'borrowed_outstanding': to_number(principal(borrowed, 'funded')),
+        'borrowed_pending': to_number(principal(borrowed, 'pending')),
+        'loans_lent': len(lent),
+        'lent_outstanding': to_number(principal(lent, 'funded')),
+    }
+
+
+def build_dashboard(hedera_account_id, sections, token_fields, loan_fields):
+    """The requested sections for an account, or None if it does not exist"""
+    found = fetch_profile(hedera_account_id)
+    if not found:
+        return None
+    user = found[0]
+    with_totals = 'summary' in sections
+    dashboard = {'hedera_account_id': hedera_account_id}
+
+    if 'profile' in sections:
+        dashboard['profile'] = profile_data(*found)
+
+    tokens = borrowed = lent = []
+    if 'tokens' in sections or with_totals:
+        always = [RWAToken.current_price, RWAToken.quantity, RWAToken.is_pledged] if with_totals else []
+        columns, _ = projection(TOKEN_FIELDS, token_fields, always=always)
+        tokens = db.session.execute(db.select(*columns).where(RWAToken.owner_id == user.id)).all()
+
+    if 'borrowed' in sections or with_totals:
+        # Loans live on their borrower's shard, which the session is routed to
+        statement = loan_statement(loan_fields, with_totals).where(Loan.borrower_id == user.id)
+        borrowed = db.session.execute(statement.order_by(Loan.created_at.desc())).all()
+
+    if 'lent' in sections or with_totals:
+        statement = loan_statement(loan_fields, with_totals).where(Loan.lender_id == user.id)
+
+        def fetch(engine):
+            with engine.connect() as conn:
+                return conn.execute(statement).all()
+
+        lent = [row for shard_rows in scatter(fetch) for row in shard_rows]
+        lent.sort(key=lambda row: row.created_at, reverse=True)
+
+    if 'tokens' in sections:
+        dashboard['tokens'] = [serialize(row, TOKEN_FIELDS, token_fields) for row in tokens]
+    if 'borrowed' in sections:
+        dashboard['borrowed'] = [serialize(row, LOAN_FIELDS, loan_fields) for row in borrowed]
+    if 'lent' in sections:
+        dashboard['lent'] = [serialize(row, LOAN_FIELDS, loan_fields) for row in lent]
+    if with_totals:
+        dashboard['summary'] = account_summary(tokens, borrowed, lent)
+    if 'platform' in sections:
+        dashboard['platform'] = analytics_summary()
+    return dashboard
+
+
+@bp.route('/api/dashboard/<hedera_account_id>', methods=['GET'])
+def get_dashboard(hedera_account_id):
+    """Profile, tokens, loans and totals for an account's dashboard in one response
+
+    ?fields= picks sections (profile, tokens, borrowed, lent, summary, platform);
+    ?token_fields= and ?loan_fields= pick the fields of the token and loan lists.
+    """
+    try:
+        sections = parse_fields(request.args.get('fields'), SECTIONS)
+        token_fields = parse_fields(request.args.get('token_fields'), TOKEN_FIELDS)
+        loan_fields = parse_fields(request.args.get('loan_fields'), LOAN_FIELDS)
+
+        # One cache entry per account holds every field selection, so a write drops them all; each
+        # selection keeps the expiry it was built with, so adding one does not extend the others
+        variant = '|'.join(','.join(names) for names in (sections, token_fields, loan_fields))
+        now = time.time()
+        cached = {name: entry for name, entry in (cache.get('dashboard', hedera_account_id) or {}).items()
+                  if entry.get('expires', 0) > now}
+        if variant in cached:
+            return jsonify(cached[variant]['dashboard'])
+
+        dashboard = build_dashboard(hedera_account_id, sections, token_fields, loan_fields)
+        if dashboard is None:
+            return jsonify({'error': 'User not found'}), 404
+
+        cached[variant] = {'expires': now + DASHBOARD_CACHE_TTL, 'dashboard': dashboard}
+        cache.set('dashboard', hedera_account_id, cached, ttl=DASHBOARD_CACHE_TTL)
+        return jsonify(dashboard)
+
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to build dashboard: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve dashboard'}), 500
@@ -0,0 +1,44 @@
+# Hedera AgriFund Backend - Live updates API
+#
+# Each open stream holds its connection (and, under gthread workers, a
+# thread) for as long as the client stays. MAX_EVENT_STREAMS caps the
+# streams one worker keeps open; past it clients get 503 and retry. Serve
+# /api/events/ from gunicorn_events.conf.py (gevent) to hold thousands.
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from events import account_topic, price_topic
+from extensions import event_hub, services
+
+bp = Blueprint('events', __name__)
+
+STREAMS_FULL_RETRY_SECONDS = 5
+
+
+@bp.route('/api/events/stream', methods=['GET'])
+def stream_events():
+    """Server-sent events for price updates and loan status transitions"""
+    topics = set()
+    for commodity in filter(None, request.args.get('commodity', '').split(',')):
+        topics.add(price_topic(commodity.strip()))
+    for account in filter(None, request.args.get('account', '').split(',')):
+        topics.add(account_topic(account.strip()))
+    if request.args.get('loans', '').lower() == 'true':
+        topics.add('loans')
+
+    if not topics:
+        return jsonify({'error': 'Subscribe to at least one commodity, account or loans'}), 400
+
+    subscriber = event_hub.subscribe(topics, limit=current_app.config['MAX_EVENT_STREAMS'])
+    if subscriber is None:
+        return jsonify({'error': 'Too many open event streams, retry shortly'}), 503, {
+            'Retry-After': str(STREAMS_FULL_RETRY_SECONDS)
+        }
+
+    hub = services()['event_hub']  # the stream outlives the request context
+    response = Response(hub.stream(subscriber), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # A client that disconnects before the first chunk never runs the generator's cleanup
+    response.call_on_close(lambda: hub.unsubscribe(subscriber))
+    return response
@@ -0,0 +1,173 @@
+# Hedera AgriFund Backend - Background job API
+#
+# Requests that opt in (?async=true or Prefer: respond-async) are stored as a
+# Job and answered 202; a Celery worker runs the handler registered for the
+# job's kind and the client polls /api/jobs/<job_id>.
+#
+# A job can be delivered more than once (a retry, or a redelivery after its
+# worker died), so handlers that write get the job id: they commit all their
+# rows in one transaction under an id derived from it, and on a later
+# delivery find those rows and return the same result. Only transient errors
+# (lost connections, locks, timeouts) are retried.
+#
+# A job the broker refuses is failed at once (the client gets 503). One whose
+# message is lost after it was accepted stays queued; requeue_stale_jobs,
+# run by Celery beat, hands such jobs to the workers again.
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy.exc import OperationalError
+
+import jobs
+from api.common import RequestError
+from extensions import db
+from jobs import task
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('jobs', __name__)
+
+JOB_HANDLERS = {}
+
+# Worth another attempt: the database or broker was briefly unreachable or locked
+TRANSIENT_ERRORS = (OperationalError, ConnectionError, TimeoutError)
+
+# Seconds a job may wait in 'queued' or 'retrying' before its message is presumed lost
+STALE_JOB_SECONDS = 600
+
+
+def job_handler(kind):
+    """Register the function that runs jobs of a kind (it receives the job payload and id)"""
+    def decorator(function):
+        JOB_HANDLERS[kind] = function
+        return function
+    return decorator
+
+
+def ledger_id(hex_id):
+    """A stand-in ledger id (0.0.x) from the first 63 bits of a hex id; entity numbers are signed 64-bit"""
+    return f"0.0.{int(hex_id[:16], 16) >> 1}"
+
+
+def new_ledger_id():
+    """A fresh stand-in ledger id (in real implementation, this comes from Hedera)"""
+    return ledger_id(uuid.uuid4().hex)
+
+
+def job_ledger_id(job_id):
+    """The stand-in ledger id of the row a job creates; the same on every delivery"""
+    return ledger_id(job_id)
+
+
+def wants_async():
+    return request.args.get('async', '').lower() == 'true' or 'respond-async' in request.headers.get('Prefer', '')
+
+
+def enqueue_job(kind, payload):
+    """Persist a job, hand it to the workers and answer 202 Accepted"""
+    job = Job(id=uuid.uuid4().hex, kind=kind, payload=payload)
+    db.session.add(job)
+    db.session.commit()
+
+    try:
+        run_job.delay(job.id)
+    except Exception as e:
+        # Nothing will run it: fail the job instead of leaving it queued
+        logger.error(f"Failed to queue job {job.id}: {str(e)}")
+        db.session.rollback()
+        if job.status == 'queued':
+            job.status = 'failed'
+            job.error = 'Job queue unavailable'
+            db.session.commit()
+        return jsonify({'error': 'Job queue unavailable, please retry', 'job_id': job.id}), 503
+
+    return jsonify({
+        'message': 'Request accepted',
+        'job_id': job.id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job.id}'
+    }), 202
+
+
+@task(bind=True, name='agrifund.run_job', max_retries=5)
+def run_job(self, job_id):
+    """Run the heavy steps of an accepted request, retrying transient failures with backoff"""
+    with jobs.flask_app.app_context():
+        job = db.session.get(Job, job_id)
+        if job is None or job.status in ('succeeded', 'failed'):
+            return
+
+        job.status = 'running'
+        job.attempts += 1
+        db.session.commit()
+
+        try:
+            result = JOB_HANDLERS[job.kind](job.payload, job.id)
+            job.result = result
+            job.status = 'succeeded'
+            job.error = None
+            db.session.commit()
+
+        except RequestError as e:
+            # The request became invalid while queued (e.g. collateral pledged meanwhile): do not retry
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = e.message
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            job.error = str(e)[:500]
+            if isinstance(e, TRANSIENT_ERRORS) and self.request.retries < self.max_retries:
+                job.status = 'retrying'
+                db.session.commit()
+                raise self.retry(exc=e, countdown=2 ** self.request.retries)
+            job.status = 'failed'
+            db.session.commit()
+            logger.error(f"Job {job_id} failed: {str(e)}")
+
+
+@task(name='agrifund.requeue_stale_jobs')
+def requeue_stale_jobs(older_than=STALE_JOB_SECONDS):
+    """Queue again the jobs that waited longer than `older_than` seconds; returns how many"""
+    with jobs.flask_app.app_context():
+        now = datetime.utcnow()
+        stale = Job.query.filter(
+            Job.status.in_(('queued', 'retrying')), Job.updated_at < now - timedelta(seconds=older_than)
+        ).all()
+        for job in stale:
+            job.status = 'queued'
+            job.updated_at = now  # restarts the clock, so a slow queue is not flooded with copies
+        db.session.commit()
+
+        for job in stale:
+            logger.warning(f"Requeuing job {job.id} ({job.kind}), queued since {job.created_at.isoformat()}")
+            run_job.delay(job.id)
+        return len(stale)
+
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get the status and result of a background job"""
+    try:
+        job = db.session.get(Job, job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        return jsonify({
+            'job_id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'attempts': job.attempts,
+            'result': job.result,
+            'error': job.error,
+            'created_at': job.created_at.isoformat(),
+            'updated_at': job.updated_at.isoformat() if job.updated_at else None
+        })
+
+    except Exception as e:
+        logger.error(f"Failed to get job status: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve job'}), 500
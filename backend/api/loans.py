@@ -0,0 +1,629 @@
+# Hedera AgriFund Backend - Loan API
+#
+# Loan requests (inline or as a background job), funding, the lender
+# marketplace, lender portfolio projections and bulk export.
+#
+# LenderProfile.portfolio_value (principal plus accrued interest) is stored
+# when the lender funds a loan, when their projections are read and daily by
+# refresh_portfolio_values (Celery beat), so profiles read it without
+# projecting the loans.
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Blueprint, current_app, jsonify, request
+
+from api.audit import log_audit_event
+import cube
+from api.common import (RequestError, export_response, parse_timestamp, positive_int, record_cube, route_to_account,
+                        scatter)
+from api.jobs import enqueue_job, job_handler, job_ledger_id, new_ledger_id, wants_async
+import jobs
+from events import account_topic
+from extensions import cache, db, event_hub, shard_router
+from fieldsets import Field, FieldsetError, parse_fields, projection, serialize
+from jobs import task
+from models import LenderProfile, Loan, OutboxMessage, RWAToken, User
+from money import CENT, percent, round_units, to_number, to_units, unit_array
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('loans', __name__)
+
+
+MAX_LTV = 85  # percent
+# Percent; AgriFundLoanContract.createLoan takes 1 to 5000 basis points
+MIN_INTEREST_RATE = Decimal('0.01')
+MAX_INTEREST_RATE = 50
+
+
+def loan_amount(data):
+    """The requested amount in micro-units, rounded to the cent as stored"""
+    try:
+        return round_units(to_units(data['amount']))
+    except ValueError:
+        raise RequestError('amount must be a number')
+
+
+def validate_loan(data):
+    """Check a loan request; returns (borrower, collateral_token, ltv_ratio, collateral_value)"""
+    required_fields = ['borrower_hedera_id', 'amount', 'interest_rate', 'duration_months', 'collateral_token_id']
+    for field in required_fields:
+        if field not in data:
+            raise RequestError(f'Missing required field: {field}')
+
+    positive_int(data, 'duration_months')
+    try:
+        rate = Decimal(str(data['interest_rate']))
+    except ArithmeticError:
+        raise RequestError('interest_rate must be a number')
+    if not rate.is_finite() or not MIN_INTEREST_RATE <= rate <= MAX_INTEREST_RATE:
+        raise RequestError(f'interest_rate must be a percentage between {MIN_INTEREST_RATE} and {MAX_INTEREST_RATE}')
+
+    # Get borrower
+    route_to_account(data['borrower_hedera_id'])
+    borrower = User.query.filter_by(hedera_account_id=data['borrower_hedera_id']).first()
+    if not borrower:
+        raise RequestError('Borrower not found', 404)
+
+    # Validate collateral token
+    collateral_token = RWAToken.query.filter_by(
+        token_id=data['collateral_token_id'],
+        owner_id=borrower.id
+    ).first()
+    if not collateral_token:
+        raise RequestError('Invalid collateral token')
+
+    if collateral_token.is_pledged:
+        raise RequestError('Token already pledged as collateral')
+
+    if collateral_contract(collateral_token) is None:
+        raise RequestError(f'{collateral_token.crop_type} tokens are not approved as loan collateral')
+
+    # Calculate LTV (exact, in micro-units)
+    amount = loan_amount(data)
+    collateral_value = collateral_token.current_price * collateral_token.quantity
+    if collateral_value <= 0:
+        raise RequestError('Collateral has no value')
+    if amount * 100 > MAX_LTV * collateral_value:
+        raise RequestError('LTV ratio too high. Maximum allowed is 85%')
+    ltv_ratio = percent(amount, collateral_value)
+
+    return borrower, collateral_token, ltv_ratio, collateral_value
+
+
+def collateral_contract(collateral_token):
+    """The approved AgriFundLoanContract collateral ERC-20 holding a token's crop (None if not approved)"""
+    return current_app.config['COLLATERAL_TOKENS'].get(collateral_token.crop_type)
+
+
+def perform_create_loan(borrower, collateral_token, ltv_ratio, collateral_value, data, contract_id=None):
+    """Store a validated loan, pledge its collateral and announce it; returns the response body"""
+    import projections
+
+    if contract_id is None:
+        contract_id = new_ledger_id()
+
+    # Create loan
+    loan = Loan(
+        contract_id=contract_id,
+        borrower_id=borrower.id,
+        amount=loan_amount(data),
+        interest_rate=Decimal(str(data['interest_rate'])),
+        duration_months=int(data['duration_months']),
+        purpose=data.get('purpose'),
+        collateral_token_id=data['collateral_token_id'],
+        ltv_ratio=ltv_ratio
+    )
+
+    # Mark token as pledged
+    collateral_token.is_pledged = True
+
+    db.session.add(loan)
+    # Sent to AgriFundLoanContract.createLoan, signed by the borrower, by the outbox dispatcher once this commits
+    db.session.add(OutboxMessage(aggregate_id=contract_id, method='createLoan', args={
+        'sender': borrower.hedera_account_id,
+        'principal': loan.amount,
+        'interest_rate': int(projections.to_basis_points([loan.interest_rate])[0]),
+        'duration': loan.duration_months * projections.PERIOD_SECONDS,
+        'collateral_token': collateral_contract(collateral_token),
+        'collateral_amount': collateral_token.quantity,  # one ERC-20 token per unit of the crop
+        'auto_liquidation': bool(data.get('auto_liquidation', True))
+    }))
+    db.session.flush()
+    record_cube(cube.loan_created(collateral_token.crop_type, collateral_token.quality_grade, borrower.location,
+                                  loan.created_at, loan.amount, ltv_ratio, loan.interest_rate))
+    db.session.commit()
+    cache.invalidate('dashboard', borrower.hedera_account_id)
+    cache.invalidate('analytics', 'summary', 'cube')
+    event_hub.publish(['loans', account_topic(borrower.hedera_account_id)], 'loan_status', {
+        'contract_id': contract_id,
+        'status': loan.status,
+        'borrower': borrower.hedera_account_id,
+        'amount': to_number(loan.amount),
+        'interest_rate': float(loan.interest_rate),
+        'collateral_token_id': loan.collateral_token_id
+    })
+
+    # Log loan creation
+    log_audit_event('LOAN_CREATED', contract_id, borrower.id, {
+        'amount': to_number(loan.amount),
+        'collateral_token': collateral_token.token_id,
+        'ltv_ratio': float(ltv_ratio)
+    })
+
+    return created_loan_data(contract_id, ltv_ratio, collateral_value)
+
+
+def created_loan_data(contract_id, ltv_ratio, collateral_value):
+    return {
+        'message': 'Loan created successfully',
+        'contract_id': contract_id,
+        'ltv_ratio': float(ltv_ratio),
+        'collateral_value': to_number(collateral_value)
+    }
+
+
+@job_handler('create_loan')
+def run_create_loan_job(payload, job_id):
+    contract_id = job_ledger_id(job_id)
+    borrower_hedera_id = payload.get('borrower_hedera_id')
+    # An earlier delivery of this job committed the loan; its collateral is pledged now, so do not validate again
+    created = None
+    if borrower_hedera_id:
+        route_to_account(borrower_hedera_id)
+        created = Loan.query.join(User, Loan.borrower_id == User.id).filter(
+            Loan.contract_id == contract_id, User.hedera_account_id == borrower_hedera_id
+        ).first()
+    if created:
+        cache.invalidate('dashboard', borrower_hedera_id)
+        cache.invalidate('analytics', 'summary', 'cube')
+        collateral = created.collateral
+        return created_loan_data(contract_id, created.ltv_ratio,
+                                 collateral.current_price * collateral.quantity if collateral else 0)
+    return perform_create_loan(*validate_loan(payload), payload, contract_id=contract_id)
+
+
+@bp.route('/api/loans/create', methods=['POST'])
+def create_loan():
+    """Create a new loan request (?async=true accepts it as a background job)"""
+    try:
+        data = request.get_json()
+        validated = validate_loan(data)
+
+        if wants_async():
+            return enqueue_job('create_loan', data)
+
+        return jsonify(perform_create_loan(*validated, data)), 201
+
+    except RequestError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Loan creation failed: {str(e)}")
+        return jsonify({'error': 'Loan creation failed'}), 500
+
+
+@bp.route('/api/loans/fund', methods=['POST'])
+def fund_loan():
+    """Fund a loan"""
+    try:
+        data = request.get_json()
+
+        # Validate required fields
+        required_fields = ['contract_id', 'lender_hedera_id']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+
+        # Get lender (may live on a different shard than the loan)
+        lender_hedera_id = data['lender_hedera_id']
+        route_to_account(lender_hedera_id)
+        lender = User.query.filter_by(hedera_account_id=lender_hedera_id).first()
+        lender_id = lender.id if lender else None
+
+        # Get loan from the borrower's shard
+        if shard_router:
+            shard = find_loan_shard(data['contract_id'])
+            if shard is None:
+                return jsonify({'error': 'Loan not found'}), 404
+            db.session.info['shard'] = shard
+
+        loan = Loan.query.filter_by(contract_id=data['contract_id']).first()
+        if not loan:
+            return jsonify({'error': 'Loan not found'}), 404
+
+        if loan.status != 'pending':
+            return jsonify({'error': 'Loan is not available for funding'}), 400
+
+        if lender_id is None:
+            return jsonify({'error': 'Lender not found'}), 404
+
+        if loan.borrower.hedera_account_id == lender_hedera_id:
+            return jsonify({'error': 'Borrower cannot fund their own loan'}), 400
+
+        # Update loan
+        loan.lender_id = lender_id
+        loan.status = 'funded'
+        loan.funded_at = datetime.utcnow()
+        loan.due_date = datetime.utcnow() + timedelta(days=loan.duration_months * 30)
+        # Signed by the lender: the contract funds from msg.sender's stablecoin
+        db.session.add(OutboxMessage(aggregate_id=loan.contract_id, method='fundLoan', args={'sender': lender_hedera_id}))
+        collateral = loan.collateral
+        record_cube(cube.loan_funded(collateral.crop_type if collateral else None,
+                                     collateral.quality_grade if collateral else None,
+                                     loan.borrower.location, loan.created_at, loan.amount))
+
+        db.session.commit()
+        # The loan is funded; if this fails, the value is corrected by the next refresh
+        try:
+            store_portfolio_value(lender_hedera_id, lender_id, current_portfolio_value(lender_id))
+        except Exception as e:
+            logger.warning(f"Portfolio value refresh failed for {lender_hedera_id}: {str(e)}")
+        cache.invalidate('dashboard', loan.borrower.hedera_account_id, lender_hedera_id)
+        cache.invalidate('user', lender_hedera_id)  # the profile's portfolio value
+        cache.invalidate('analytics', 'summary', 'cube')
+        event_hub.publish(
+            ['loans', account_topic(loan.borrower.hedera_account_id), account_topic(lender_hedera_id)],
+            'loan_status', {
+                'contract_id': loan.contract_id,
+                'status': loan.status,
+                'borrower': loan.borrower.hedera_account_id,
+                'lender': lender_hedera_id,
+                'amount': to_number(loan.amount),
+                'due_date': loan.due_date.isoformat()
+            }
+        )
+
+        # Log funding event
+        log_audit_event('LOAN_FUNDED', loan.contract_id, lender_id, {
+            'amount': to_number(loan.amount),
+            'borrower': loan.borrower.hedera_account_id
+        })
+
+        due_date = loan.due_date.isoformat()
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Loan funding failed: {str(e)}")
+        return jsonify({'error': 'Loan funding failed'}), 500
+
+    return jsonify({
+        'message': 'Loan funded successfully',
+        'due_date': due_date
+    })
+
+
+def find_loan_shard(contract_id):
+    """Locate the shard holding a loan (loans live with their borrower)"""
+    def holds_loan(engine):
+        with engine.connect() as conn:
+            return conn.execute(db.select(Loan.id).where(Loan.contract_id == contract_id)).first() is not None
+    for shard, found in enumerate(scatter(holds_loan)):
+        if found:
+            return shard
+    return None
+
+
+def collateral_data(row):
+    if row.collateral_quantity is None:
+        return None
+    return {
+        'crop_type': row.collateral_crop_type,
+        'quantity': row.collateral_quantity,
+        'quality_grade': row.collateral_quality_grade,
+        'value': to_number(row.collateral_price * row.collateral_quantity)
+    }
+
+
+# Fields of /api/loans/opportunities; 'borrower' and 'collateral' name the joins they need
+OPPORTUNITY_FIELDS = {
+    'contract_id': Field([Loan.contract_id], lambda row: row.contract_id),
+    'borrower_name': Field([User.name.label('borrower_name')], lambda row: row.borrower_name, ('borrower',)),
+    'borrower_credit_score': Field([User.credit_score.label('borrower_credit_score')],
+                                   lambda row: row.borrower_credit_score, ('borrower',)),
+    'amount': Field([Loan.amount], lambda row: to_number(row.amount)),
+    'interest_rate': Field([Loan.interest_rate], lambda row: float(row.interest_rate)),
+    'duration_months': Field([Loan.duration_months], lambda row: row.duration_months),
+    'purpose': Field([Loan.purpose], lambda row: row.purpose),
+    'ltv_ratio': Field([Loan.ltv_ratio], lambda row: float(row.ltv_ratio)),
+    'collateral': Field([
+        RWAToken.crop_type.label('collateral_crop_type'),
+        RWAToken.quantity.label('collateral_quantity'),
+        RWAToken.quality_grade.label('collateral_quality_grade'),
+        RWAToken.current_price.label('collateral_price'),
+    ], collateral_data, ('collateral',)),
+    'created_at': Field([Loan.created_at], lambda row: row.created_at.isoformat()),
+}
+
+
+@bp.route('/api/loans/opportunities', methods=['GET'])
+def get_loan_opportunities():
+    """Get available loan opportunities for lenders"""
+    try:
+        # Query parameters for filtering
+        crop_type = request.args.get('crop_type')
+        max_ltv = request.args.get('max_ltv', 85)
+        min_interest = request.args.get('min_interest', 0)
+        fields = parse_fields(request.args.get('fields'), OPPORTUNITY_FIELDS)
+
+        # Only the requested columns; created_at is always read for the ordering
+        columns, joins = projection(OPPORTUNITY_FIELDS, fields, always=[Loan.created_at])
+        statement = db.select(*columns).select_from(Loan).where(
+            Loan.status == 'pending',
+            Loan.ltv_ratio <= float(max_ltv),
+            Loan.interest_rate >= float(min_interest)
+        )
+        if 'borrower' in joins:
+            statement = statement.join(User, Loan.borrower_id == User.id)
+        if crop_type:
+            statement = statement.join(RWAToken, Loan.collateral_token_id == RWAToken.token_id) \
+                                 .where(RWAToken.crop_type == crop_type)
+        elif 'collateral' in joins:
+            statement = statement.outerjoin(RWAToken, Loan.collateral_token_id == RWAToken.token_id)
+
+        def fetch(engine):
+            with engine.connect() as conn:
+                return conn.execute(statement).all()
+
+        # Scatter-gather across shards, newest first
+        rows = [row for shard_rows in scatter(fetch) for row in shard_rows]
+        rows.sort(key=lambda row: row.created_at, reverse=True)
+
+        return jsonify({'opportunities': [serialize(row, OPPORTUNITY_FIELDS, fields) for row in rows]})
+
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to get loan opportunities: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve opportunities'}), 500
+
+
+# Lender Portfolio
+def fetch_lender_loans(lender_id):
+    """Funded loans of a lender, gathered from every shard (loans live with their borrower)"""
+    statement = db.select(
+        Loan.contract_id, Loan.amount, Loan.interest_rate, Loan.duration_months,
+        Loan.funded_at, Loan.due_date
+    ).where(Loan.lender_id == lender_id, Loan.status == 'funded')
+
+    def fetch(engine):
+        with engine.connect() as conn:
+            return conn.execute(statement).all()
+
+    rows = [row for shard_rows in scatter(fetch) for row in shard_rows]
+    rows.sort(key=lambda row: row.funded_at)
+    return rows
+
+
+def project_lender_loans(rows, as_of):
+    """Run the projection engine over a lender's loans"""
+    import projections
+
+    due_dates = [row.due_date or row.funded_at + timedelta(days=row.duration_months * 30) for row in rows]
+    principal = unit_array(row.amount for row in rows)
+    rate_bps = projections.to_basis_points([row.interest_rate for row in rows])
+    funded_at = projections.to_epoch_seconds([row.funded_at for row in rows])
+    due_at = projections.to_epoch_seconds(due_dates)
+    as_of_seconds = int(projections.to_epoch_seconds([as_of])[0])
+    return principal, rate_bps, funded_at, due_at, projections.project(principal, rate_bps, funded_at, due_at, as_of_seconds)
+
+
+def portfolio_value_of(outstanding):
+    """Principal plus accrued interest, in micro-units, rounded down to the cent"""
+    return int(outstanding) // CENT * CENT
+
+
+def current_portfolio_value(lender_id):
+    """A lender's portfolio value as of now"""
+    return portfolio_value_of(project_lender_loans(fetch_lender_loans(lender_id), datetime.utcnow())[-1]['outstanding'].sum())
+
+
+def portfolio_value_update():
+    """UPDATE of one lender's portfolio value (lender_id, value) that only matches when it changes"""
+    table = LenderProfile.__table__
+    return table.update().where(
+        table.c.user_id == db.bindparam('lender_id'),
+        db.or_(table.c.portfolio_value.is_(None), table.c.portfolio_value != db.bindparam('value'))
+    ).values(portfolio_value=db.bindparam('value'))
+
+
+def store_portfolio_value(hedera_account_id, lender_id, value):
+    """Persist one lender's portfolio value on their shard and drop their cached profile if it changed"""
+    engine = shard_router.engine_for(hedera_account_id) if shard_router else db.engine
+    with engine.begin() as conn:
+        changed = conn.execute(portfolio_value_update(), {'lender_id': lender_id, 'value': value}).rowcount
+    if changed:
+        cache.invalidate('user', hedera_account_id)
+        cache.invalidate('dashboard', hedera_account_id)
+
+
+def store_portfolio_values(values):
+    """Persist portfolio values ({lender user id: micro-units}) on every shard; returns the ids that changed"""
+    statement = portfolio_value_update()
+
+    def write(engine):
+        # Profiles live on their lender's shard; ids from other shards match nothing
+        changed = []
+        with engine.begin() as conn:
+            for lender_id, value in values.items():
+                if conn.execute(statement, {'lender_id': lender_id, 'value': value}).rowcount:
+                    changed.append(lender_id)
+        return changed
+
+    return {lender_id for shard_changed in scatter(write) for lender_id in shard_changed}
+
+
+@task(name='agrifund.refresh_portfolio_values')
+def refresh_portfolio_values():
+    """Store every lender's portfolio value as of now with one projection of all funded loans"""
+    import numpy as np
+
+    with jobs.flask_app.app_context():
+        statement = db.select(
+            Loan.lender_id, Loan.contract_id, Loan.amount, Loan.interest_rate, Loan.duration_months,
+            Loan.funded_at, Loan.due_date
+        ).where(Loan.status == 'funded')
+
+        def fetch(engine):
+            with engine.connect() as conn:
+                return conn.execute(statement).all(), \
+                    conn.execute(db.select(LenderProfile.user_id, User.hedera_account_id)
+                                 .join(User, LenderProfile.user_id == User.id)).all()
+
+        gathered = scatter(fetch)
+        rows = [row for shard_rows, _ in gathered for row in shard_rows]
+        accounts = dict(account for _, shard_accounts in gathered for account in shard_accounts)
+
+        values = dict.fromkeys(accounts, 0)
+        if rows:
+            outstanding = project_lender_loans(rows, datetime.utcnow())[-1]['outstanding']
+            lender_ids, positions = np.unique(np.array([row.lender_id for row in rows]), return_inverse=True)
+            totals = np.zeros(len(lender_ids), dtype=np.int64)
+            np.add.at(totals, positions, outstanding)
+            values.update((int(lender_id), portfolio_value_of(total)) for lender_id, total in zip(lender_ids, totals))
+
+        changed = [accounts[lender_id] for lender_id in store_portfolio_values(values) if lender_id in accounts]
+        if changed:
+            cache.invalidate('user', *changed)
+            cache.invalidate('dashboard', *changed)
+        logger.info(f"Refreshed portfolio values of {len(values)} lenders ({len(changed)} changed)")
+        return len(changed)
+
+
+@bp.route('/api/lenders/<hedera_account_id>/projections', methods=['GET'])
+def get_lender_projections(hedera_account_id):
+    """Project accrued interest, accrual schedules and expected cash flows for a lender's loans"""
+    import projections
+
+    try:
+        now = datetime.utcnow()
+        try:
+            as_of = parse_timestamp(request.args['as_of']) if 'as_of' in request.args else now
+        except ValueError:
+            return jsonify({'error': 'as_of must be an ISO 8601 timestamp'}), 400
+        include_schedule = request.args.get('schedule', 'true').lower() == 'true'
+
+        route_to_account(hedera_account_id)
+        lender = User.query.filter_by(hedera_account_id=hedera_account_id).first()
+        if not lender or not lender.lender_profile:
+            return jsonify({'error': 'Lender not found'}), 404
+
+        rows = fetch_lender_loans(lender.id)
+        principal, rate_bps, funded_at, due_at, projected = project_lender_loans(rows, as_of)
+        # Always as of now, and stored for the lender's profile
+        current = projected if as_of == now else project_lender_loans(rows, now)[-1]
+        portfolio_value = portfolio_value_of(current['outstanding'].sum())
+        try:
+            store_portfolio_value(hedera_account_id, lender.id, portfolio_value)
+        except Exception as e:
+            logger.warning(f"Portfolio value refresh failed for {hedera_account_id}: {str(e)}")
+        if include_schedule and rows:
+            period_end, period_interest, period_mask = projections.accrual_schedule(principal, rate_bps, funded_at, due_at)
+        months, month_totals = projections.monthly_cash_flows(projected['repayment_at'], projected['expected_repayment'])
+
+        loans = []
+        for i, row in enumerate(rows):
+            loan = {
+                'contract_id': row.contract_id,
+                'principal': to_number(row.amount),
+                'interest_rate': float(row.interest_rate),
+                'funded_at': row.funded_at.isoformat(),
+                'due_date': datetime.utcfromtimestamp(int(due_at[i])).isoformat(),
+                'accrued_interest': to_number(int(projected['accrued_interest'][i])),
+                'outstanding': to_number(int(projected['outstanding'][i])),
+                'interest_at_repayment': to_number(int(projected['interest_at_repayment'][i])),
+                'expected_repayment': to_number(int(projected['expected_repayment'][i])),
+                'expected_repayment_date': datetime.utcfromtimestamp(int(projected['repayment_at'][i])).isoformat()
+            }
+            if include_schedule:
+                valid = period_mask[i]
+                loan['schedule'] = [
+                    {
+                        'period_end': datetime.utcfromtimestamp(int(end)).isoformat(),
+                        'accrued_interest': to_number(int(interest)),
+                        'balance': to_number(row.amount + int(interest))
+                    }
+                    for end, interest in zip(period_end[i][valid], period_interest[i][valid])
+                ]
+            loans.append(loan)
+
+        return jsonify({
+            'lender': hedera_account_id,
+            'as_of': as_of.isoformat(),
+            'portfolio_value': to_number(portfolio_value),
+            'total_principal': to_number(int(principal.sum())),
+            'total_accrued_interest': to_number(int(projected['accrued_interest'].sum())),
+            'total_expected_repayment': to_number(int(projected['expected_repayment'].sum())),
+            'cash_flows': [
+                {'month': month, 'expected_repayment': to_number(int(total))}
+                for month, total in zip(months, month_totals)
+            ],
+            'loans': loans
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to project lender portfolio: {str(e)}")
+        return jsonify({'error': 'Failed to project portfolio'}), 500
+
+
+class LenderAccounts:
+    """Export batch transform: lender_id (third column) to the lender's account, looked up on every shard"""
+
+    def __init__(self):
+        self.accounts = {}
+
+    def __call__(self, rows):
+        missing = {row[2] for row in rows if row[2] is not None and row[2] not in self.accounts}
+        if missing:
+            def fetch(engine):
+                with engine.connect() as conn:
+                    return conn.execute(db.select(User.id, User.hedera_account_id).where(User.id.in_(missing))).all()
+            self.accounts.update(row for shard_rows in scatter(fetch) for row in shard_rows)
+        return [(*row[:2], self.accounts.get(row[2]), *row[3:]) for row in rows]
+
+
+LOAN_EXPORT_COLUMNS = [
+    ('contract_id', 'string'), ('borrower_hedera_id', 'string'), ('lender_hedera_id', 'string'),
+    ('amount', 'money'), ('interest_rate', 'rate'), ('duration_months', 'int'), ('purpose', 'string'),
+    ('status', 'string'), ('ltv_ratio', 'rate'), ('collateral_token_id', 'string'), ('crop_type', 'string'),
+    ('collateral_quantity', 'int'), ('collateral_value', 'money'), ('created_at', 'datetime'),
+    ('funded_at', 'datetime'), ('due_date', 'datetime')
+]
+
+
+@bp.route('/api/export/loans', methods=['GET'])
+def export_loans():
+    """Stream all loans matching the opportunity filters as CSV or Parquet"""
+    try:
+        crop_type = request.args.get('crop_type')
+        status = request.args.get('status')
+        max_ltv = request.args.get('max_ltv')
+        min_interest = request.args.get('min_interest')
+
+        # The lender may live on another shard: export lender_id and swap in the account per batch
+        statement = db.select(
+            Loan.contract_id, User.hedera_account_id, Loan.lender_id,
+            Loan.amount, Loan.interest_rate, Loan.duration_months, Loan.purpose,
+            Loan.status, Loan.ltv_ratio, Loan.collateral_token_id, RWAToken.crop_type,
+            RWAToken.quantity, RWAToken.current_price * RWAToken.quantity,
+            Loan.created_at, Loan.funded_at, Loan.due_date
+        ).join(User, Loan.borrower_id == User.id) \
+         .outerjoin(RWAToken, Loan.collateral_token_id == RWAToken.token_id)
+
+        if crop_type:
+            statement = statement.where(RWAToken.crop_type == crop_type)
+        if status:
+            statement = statement.where(Loan.status == status)
+        if max_ltv is not None:
+            statement = statement.where(Loan.ltv_ratio <= float(max_ltv))
+        if min_interest is not None:
+            statement = statement.where(Loan.interest_rate >= float(min_interest))
+
+        return export_response(statement.order_by(Loan.id), LOAN_EXPORT_COLUMNS, 'loans',
+                               transform=LenderAccounts())
+
+    except Exception as e:
+        logger.error(f"Loan export failed: {str(e)}")
+        return jsonify({'error': 'Loan export failed'}), 500
@@ -0,0 +1,352 @@
+# Hedera AgriFund Backend - Price oracle API
+#
+# Current prices (cache, then the last hour's stored price, then the price
+# sources), batch updates that revalue collateral, and OHLC candles.
+import logging
+import math
+from datetime import datetime, timedelta
+
+from flask import Blueprint, jsonify, request
+
+import candles
+from api.audit import log_audit_event
+from api.common import parse_timestamp, scatter
+from events import price_topic
+from extensions import cache, db, event_hub, price_aggregator, shard_router
+from models import FarmerProfile, PriceCandle, PriceOracle, RWAToken, User
+from money import UNIT, divide, round_units, to_number, to_units
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('prices', __name__)
+
+
+@bp.route('/api/prices/<commodity>', methods=['GET'])
+def get_commodity_price_api(commodity):
+    """Get current price for a commodity"""
+    try:
+        price_data = get_commodity_price(commodity)
+        if price_data:
+            return jsonify(price_data)
+        else:
+            return jsonify({'error': 'Price data not available'}), 404
+
+    except Exception as e:
+        logger.error(f"Failed to get commodity price: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve price'}), 500
+
+
+PRICE_CACHE_TTL = 60  # seconds
+
+# What the price_oracles columns hold: longer names or larger prices fail on PostgreSQL
+MAX_COMMODITY_LENGTH = PriceOracle.commodity.type.length
+PRICE_LIMIT = 10 ** (PriceOracle.price_usd.type.precision - PriceOracle.price_usd.type.scale) * UNIT
+
+
+# Demo prices used when no price sources are configured
+MOCK_PRICES = {
+    'maize': 250.00,
+    'rice': 420.00,
+    'wheat': 300.00,
+    'coffee': 1250.00,
+    'cocoa': 2800.00,
+    'sorghum': 280.00,
+    'millet': 320.00
+}
+
+
+def get_commodity_price(commodity):
+    """Get commodity price from oracle or external API"""
+    try:
+        cached_price = cache.get('price', commodity)
+        if cached_price is not None:
+            return cached_price
+
+        return load_recent_price(commodity) or refresh_prices([commodity]).get(commodity)
+
+    except Exception as e:
+        logger.error(f"Failed to get commodity price: {str(e)}")
+        return None
+
+
+def load_recent_price(commodity):
+    """Cache and return the last stored price if it is under an hour old"""
+    # Bounded by time so only the current partition is scanned
+    recent_price = PriceOracle.query.filter(
+        PriceOracle.commodity == commodity,
+        PriceOracle.timestamp >= datetime.utcnow() - timedelta(hours=1)  # 1 hour cache
+    ).order_by(PriceOracle.timestamp.desc()).first()
+
+    if recent_price is None:
+        return None
+    price_data = price_record_data(recent_price)
+    cache.set('price', commodity, price_data, ttl=PRICE_CACHE_TTL)
+    return price_data
+
+
+def price_record_data(record):
+    return {
+        'commodity': record.commodity,
+        'price': to_number(record.price_usd),
+        'currency': 'USD',
+        'timestamp': record.timestamp.isoformat(),
+        'source': record.source
+    }
+
+
+def refresh_prices(commodities):
+    """Fetch fresh prices for several commodities at once and store them in one batch insert"""
+    now = datetime.utcnow()
+    fetched = price_aggregator.fetch(commodities) if price_aggregator else {}
+
+    rows = []
+    prices = {}
+    for commodity in commodities:
+        result = fetched.get(commodity)
+        if result:
+            price_data = {
+                'commodity': commodity,
+                'price': result['price'],
+                'currency': 'USD',
+                'timestamp': now.isoformat(),
+                'source': f"aggregate:{','.join(result['sources'])}"[:100],
+                'confidence': result['confidence'],
+                'rejected_sources': result['rejected']
+            }
+        elif not price_aggregator:
+            # Mock prices for demo (in production, configure PRICE_SOURCES)
+            price_data = {
+                'commodity': commodity,
+                'price': MOCK_PRICES.get(commodity.lower(), 100.00),
+                'currency': 'USD',
+                'timestamp': now.isoformat(),
+                'source': 'mock_oracle'
+            }
+        else:
+            # No confident aggregate: keep serving the last stored price, however old
+            last_price = PriceOracle.query.filter_by(commodity=commodity).order_by(PriceOracle.timestamp.desc()).first()
+            if last_price:
+                prices[commodity] = {**price_record_data(last_price), 'stale': True}
+            continue
+
+        prices[commodity] = price_data
+        rows.append({
+            'commodity': commodity,
+            'price_usd': to_units(price_data['price']),
+            'source': price_data['source'],
+            'timestamp': now,
+            'hcs_topic_id': '0.0.555555'
+        })
+
+    if rows:
+        conn = db.session.connection(bind_arguments={'mapper': PriceOracle})
+        conn.execute(db.insert(PriceOracle), rows)
+        roll_up_prices(conn, rows)
+        db.session.commit()
+        for row in rows:
+            price_data = prices[row['commodity']]
+            cache.set('price', row['commodity'], price_data, ttl=PRICE_CACHE_TTL)
+            event_hub.publish([price_topic(row['commodity'])], 'price', price_data)
+
+    return prices
+
+
+@bp.route('/api/prices/refresh', methods=['POST'])
+def refresh_prices_api():
+    """Pull fresh prices for the given commodities (default: all known) from every price source"""
+    try:
+        data = request.get_json(silent=True) or {}
+        commodities = data.get('commodities') or list(MOCK_PRICES)
+        return jsonify({'prices': refresh_prices(commodities)})
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Price refresh failed: {str(e)}")
+        return jsonify({'error': 'Price refresh failed'}), 500
+
+
+@bp.route('/api/prices/batch', methods=['POST'])
+def batch_update_prices():
+    """Record several commodity prices at once and revalue the tokens priced on them (mirrors PriceOracle.batchUpdatePrices)"""
+    from pricefeeds import MAX_CONFIDENCE, MIN_CONFIDENCE
+
+    try:
+        data = request.get_json()
+
+        # Validate required fields
+        required_fields = ['commodities', 'prices', 'confidences']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+
+        commodities, prices, confidences = data['commodities'], data['prices'], data['confidences']
+        if not all(isinstance(values, list) for values in (commodities, prices, confidences)):
+            return jsonify({'error': 'commodities, prices and confidences must be arrays'}), 400
+        if not len(commodities) == len(prices) == len(confidences):
+            return jsonify({'error': 'Arrays must have same length'}), 400
+        if any(isinstance(price, bool) or not isinstance(price, (int, float)) or not math.isfinite(price)
+               for price in prices):
+            return jsonify({'error': 'prices must be numbers'}), 400
+
+        # Same per-entry checks as the contract; invalid entries are skipped, not fatal
+        accepted = {}
+        skipped = []
+        for commodity, price, confidence in zip(commodities, prices, confidences):
+            units = round_units(to_units(price))
+            if not isinstance(commodity, str) or not 0 < len(commodity) <= MAX_COMMODITY_LENGTH:
+                skipped.append({'commodity': commodity,
+                                'reason': f'Commodity must be a name of 1 to {MAX_COMMODITY_LENGTH} characters'})
+            elif price <= 0:
+                skipped.append({'commodity': commodity, 'reason': 'Price must be greater than 0'})
+            elif units >= PRICE_LIMIT:
+                skipped.append({'commodity': commodity, 'reason': f'Price must be below {to_number(PRICE_LIMIT):.0f}'})
+            elif isinstance(confidence, bool) or not isinstance(confidence, int) \
+                    or not MIN_CONFIDENCE <= confidence <= MAX_CONFIDENCE:
+                skipped.append({'commodity': commodity, 'reason': 'Confidence out of range'})
+            else:
+                accepted[commodity] = (units, confidence)
+
+        revalued = apply_price_batch(accepted, data.get('source', 'batch_update')) if accepted else {}
+
+        return jsonify({
+            'updated': [
+                {'commodity': commodity, 'price': to_number(price), 'confidence': confidence,
+                 'tokens_revalued': revalued.get(commodity, 0)}
+                for commodity, (price, confidence) in accepted.items()
+            ],
+            'skipped': skipped
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Batch price update failed: {str(e)}")
+        return jsonify({'error': 'Batch price update failed'}), 500
+
+
+def apply_price_batch(prices, source):
+    """Insert the price rows and revalue tokens and farmer collateral; returns tokens revalued per commodity"""
+    now = datetime.utcnow()
+    rows = [
+        {'commodity': commodity, 'price_usd': price, 'source': source[:100], 'timestamp': now, 'hcs_topic_id': '0.0.555555'}
+        for commodity, (price, _) in prices.items()
+    ]
+    new_prices = {commodity: price for commodity, (price, _) in prices.items()}
+
+    if not shard_router:
+        # Price history, token prices and collateral totals commit or roll back together
+        with db.engine.begin() as conn:
+            conn.execute(db.insert(PriceOracle), rows)
+            roll_up_prices(conn, rows)
+            results = [revalue_tokens(conn, new_prices)]
+    else:
+        # Prices live on the default database; each shard revalues in its own transaction
+        with db.engine.begin() as conn:
+            conn.execute(db.insert(PriceOracle), rows)
+            roll_up_prices(conn, rows)
+
+        def revalue_shard(engine):
+            with engine.begin() as conn:
+                return revalue_tokens(conn, new_prices)
+        results = scatter(revalue_shard)
+
+    revalued = {commodity: sum(counts[commodity] for counts, _ in results) for commodity in new_prices}
+    owners = {owner for _, shard_owners in results for owner in shard_owners}
+
+    cache.invalidate('analytics', 'summary')
+    if owners:
+        # Their profiles and dashboards show token prices and collateral totals
+        cache.invalidate('user', *owners)
+        cache.invalidate('dashboard', *owners)
+    for commodity, (price, confidence) in prices.items():
+        price_data = {
+            'commodity': commodity,
+            'price': to_number(price),
+            'currency': 'USD',
+            'timestamp': now.isoformat(),
+            'source': source,
+            'confidence': confidence
+        }
+        cache.set('price', commodity, price_data, ttl=PRICE_CACHE_TTL)
+        event_hub.publish([price_topic(commodity)], 'price', price_data)
+
+    log_audit_event('PRICES_UPDATED', None, None, {
+        'prices': {commodity: to_number(price) for commodity, price in new_prices.items()},
+        'tokens_revalued': revalued
+    })
+    return revalued
+
+
+def revalue_tokens(conn, prices):
+    """Reprice tokens with one set-based UPDATE per commodity, adding the value deltas to farmer totals first
+
+    Returns (tokens revalued per commodity, hedera_account_ids of their owners).
+    """
+    tokens = RWAToken.__table__
+    profiles = FarmerProfile.__table__
+    users = User.__table__
+    price = db.bindparam('price', type_=tokens.c.current_price.type)
+    commodity = db.bindparam('commodity', type_=tokens.c.crop_type.type)
+    old_price = db.func.coalesce(tokens.c.current_price, 0)
+    changed = db.and_(tokens.c.crop_type == commodity, db.or_(tokens.c.current_price.is_(None), tokens.c.current_price != price))
+
+    delta = db.select(db.func.coalesce(db.func.sum(tokens.c.quantity * (price - old_price)), 0)) \
+        .where(tokens.c.owner_id == profiles.c.user_id, changed).scalar_subquery()
+    update_totals = db.update(profiles) \
+        .where(profiles.c.user_id.in_(db.select(tokens.c.owner_id).where(changed))) \
+        .values(total_collateral_value=db.func.coalesce(profiles.c.total_collateral_value, 0) + delta)
+    update_tokens = db.update(tokens).where(changed).values(current_price=price)
+    changed_owners = db.select(users.c.hedera_account_id).distinct() \
+        .where(users.c.id.in_(db.select(tokens.c.owner_id).where(changed)))
+
+    counts = {}
+    owners = set()
+    for name, new_price in prices.items():
+        params = {'commodity': name, 'price': new_price}
+        owners.update(conn.execute(changed_owners, params).scalars())
+        conn.execute(update_totals, params)
+        counts[name] = conn.execute(update_tokens, params).rowcount
+    return counts, owners
+
+
+def roll_up_prices(conn, rows):
+    """Fold newly inserted price_oracles rows into the OHLC candles, on the same connection"""
+    candles.record_prices(conn, PriceCandle.__table__, [(row['commodity'], row['price_usd'], row['timestamp']) for row in rows])
+
+
+@bp.route('/api/prices/<commodity>/candles', methods=['GET'])
+def get_price_candles(commodity):
+    """OHLC candles for a commodity from the precomputed rollups (?interval=1h|1d|1w)"""
+    try:
+        interval = request.args.get('interval', '1d')
+        if interval not in candles.INTERVALS:
+            return jsonify({'error': f"interval must be one of {', '.join(candles.INTERVALS)}"}), 400
+        try:
+            start = parse_timestamp(request.args['start']) if 'start' in request.args else None
+            end = parse_timestamp(request.args['end']) if 'end' in request.args else None
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO 8601 timestamps'}), 400
+        try:
+            limit = max(1, min(int(request.args.get('limit', 200)), 1000))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+
+        with db.engine.connect() as conn:
+            rows = candles.read_candles(conn, PriceCandle.__table__, commodity, interval, start, end, limit)
+
+        return jsonify({
+            'commodity': commodity,
+            'interval': interval,
+            'candles': [{
+                'time': row.bucket_start.isoformat(),
+                'open': to_number(row.open),
+                'high': to_number(row.high),
+                'low': to_number(row.low),
+                'close': to_number(row.close),
+                'average': to_number(round_units(divide(row.price_sum, row.price_count))),
+                'count': row.price_count
+            } for row in rows]
+        })
+
+    except Exception as e:
+        logger.error(f"Failed to get price candles: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve candles'}), 500
@@ -0,0 +1,258 @@
+# Hedera AgriFund Backend - Token API
+#
+# Minting RWA tokens (inline or as a background job), owner listings,
+# location search and bulk export.
+import logging
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+
+from api.audit import log_audit_event
+import cube
+from api.common import (RequestError, area_summary, check_coordinates, export_response, locate, parse_area,
+                        positive_int, query_int, record_cube, route_to_account, spatial_search)
+from api.jobs import enqueue_job, job_handler, job_ledger_id, new_ledger_id, wants_async
+from api.prices import get_commodity_price
+from extensions import cache, db
+from fieldsets import Field, FieldsetError, parse_fields, projection, serialize
+from models import RWAToken, User
+from money import UNIT, to_number, to_units
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('tokens', __name__)
+
+
+def validate_mint(data):
+    """Check a mint request (before it is accepted as a job) and return the owning user"""
+    required_fields = ['owner_hedera_id', 'crop_type', 'quantity', 'warehouse_location']
+    for field in required_fields:
+        if field not in data:
+            raise RequestError(f'Missing required field: {field}')
+
+    positive_int(data, 'quantity')
+    if 'harvest_date' in data:
+        try:
+            datetime.strptime(data['harvest_date'], '%Y-%m-%d')
+        except (TypeError, ValueError):
+            raise RequestError('harvest_date must be a date (YYYY-MM-DD)')
+    if len(str(data.get('quality_grade', 'B'))) > 5:
+        raise RequestError('quality_grade must be at most 5 characters')
+    if not isinstance(data.get('metadata', {}), dict):
+        raise RequestError('metadata must be an object')
+    check_coordinates(data)
+
+    route_to_account(data['owner_hedera_id'])
+    owner = User.query.filter_by(hedera_account_id=data['owner_hedera_id']).first()
+    if not owner:
+        raise RequestError('Owner not found', 404)
+    return owner
+
+
+def perform_mint(owner, data, token_id=None):
+    """Price, store and audit a new RWA token; returns the response body"""
+    if token_id is None:
+        token_id = new_ledger_id()
+
+    # Get current price from oracle
+    price_data = get_commodity_price(data['crop_type'])
+
+    # Create token
+    token = RWAToken(
+        token_id=token_id,
+        owner_id=owner.id,
+        crop_type=data['crop_type'],
+        quantity=int(data['quantity']),
+        quality_grade=data.get('quality_grade', 'B'),
+        warehouse_location=data['warehouse_location'],
+        **locate(data, data['warehouse_location']),
+        harvest_date=datetime.strptime(data.get('harvest_date', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d').date(),
+        current_price=to_units(price_data['price']) if price_data else 100 * UNIT,
+        token_metadata=data.get('metadata', {})
+    )
+
+    db.session.add(token)
+    db.session.flush()
+    record_cube(cube.token_created(token.crop_type, token.quality_grade, owner.location, token.created_at, token.quantity))
+
+    # Update farmer's collateral value in the same transaction as the token
+    if owner.farmer_profile:
+        total_value = db.session.query(db.func.sum(RWAToken.quantity * RWAToken.current_price)).filter_by(owner_id=owner.id).scalar() or 0
+        owner.farmer_profile.total_collateral_value = total_value
+    db.session.commit()
+
+    invalidate_owner(owner)
+
+    # Log minting event
+    log_audit_event('TOKEN_MINTED', token_id, owner.id, {
+        'crop_type': token.crop_type,
+        'quantity': token.quantity,
+        'warehouse': token.warehouse_location
+    })
+
+    return minted_data(token)
+
+
+def invalidate_owner(owner):
+    cache.invalidate('user', owner.hedera_account_id)
+    cache.invalidate('dashboard', owner.hedera_account_id)
+    cache.invalidate('analytics', 'summary', 'cube')
+
+
+def minted_data(token):
+    return {
+        'message': 'Token minted successfully',
+        'token_id': token.token_id,
+        'quantity': token.quantity,
+        'current_value': to_number(token.current_price * token.quantity)
+    }
+
+
+@job_handler('mint_token')
+def run_mint_job(payload, job_id):
+    owner = validate_mint(payload)
+    token_id = job_ledger_id(job_id)
+    # An earlier delivery of this job committed the token (and everything with it) before failing
+    minted = RWAToken.query.filter_by(token_id=token_id, owner_id=owner.id).first()
+    if minted:
+        invalidate_owner(owner)
+        return minted_data(minted)
+    return perform_mint(owner, payload, token_id)
+
+
+@bp.route('/api/tokens/mint', methods=['POST'])
+def mint_rwa_token():
+    """Mint a new RWA token for crop collateral (?async=true accepts it as a background job)"""
+    try:
+        data = request.get_json()
+        owner = validate_mint(data)
+
+        if wants_async():
+            return enqueue_job('mint_token', data)
+
+        return jsonify(perform_mint(owner, data)), 201
+
+    except RequestError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Token minting failed: {str(e)}")
+        return jsonify({'error': 'Token minting failed'}), 500
+
+
+# Fields of /api/tokens/user/<id> and the columns each one is read from
+TOKEN_FIELDS = {
+    'token_id': Field([RWAToken.token_id], lambda row: row.token_id),
+    'crop_type': Field([RWAToken.crop_type], lambda row: row.crop_type),
+    'quantity': Field([RWAToken.quantity], lambda row: row.quantity),
+    'quality_grade': Field([RWAToken.quality_grade], lambda row: row.quality_grade),
+    'warehouse_location': Field([RWAToken.warehouse_location], lambda row: row.warehouse_location),
+    'harvest_date': Field([RWAToken.harvest_date],
+                          lambda row: row.harvest_date.isoformat() if row.harvest_date else None),
+    'current_price': Field([RWAToken.current_price], lambda row: to_number(row.current_price)),
+    'total_value': Field([RWAToken.current_price, RWAToken.quantity],
+                         lambda row: to_number(row.current_price * row.quantity)),
+    'is_pledged': Field([RWAToken.is_pledged], lambda row: row.is_pledged),
+    'created_at': Field([RWAToken.created_at], lambda row: row.created_at.isoformat()),
+}
+
+
+@bp.route('/api/tokens/user/<hedera_account_id>', methods=['GET'])
+def get_user_tokens(hedera_account_id):
+    """Get all tokens owned by a user"""
+    try:
+        fields = parse_fields(request.args.get('fields'), TOKEN_FIELDS)
+        columns, _ = projection(TOKEN_FIELDS, fields)
+
+        route_to_account(hedera_account_id)
+        user_id = db.session.execute(
+            db.select(User.id).where(User.hedera_account_id == hedera_account_id)
+        ).scalar()
+        if user_id is None:
+            return jsonify({'error': 'User not found'}), 404
+
+        rows = db.session.execute(db.select(*columns).where(RWAToken.owner_id == user_id)).all()
+
+        return jsonify({'tokens': [serialize(row, TOKEN_FIELDS, fields) for row in rows]})
+
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to get user tokens: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve tokens'}), 500
+
+
+TOKEN_EXPORT_COLUMNS = [
+    ('token_id', 'string'), ('owner_hedera_id', 'string'), ('crop_type', 'string'), ('quantity', 'int'),
+    ('quality_grade', 'string'), ('warehouse_location', 'string'), ('harvest_date', 'date'),
+    ('current_price', 'price'), ('total_value', 'money'), ('is_pledged', 'bool'), ('created_at', 'datetime')
+]
+
+
+@bp.route('/api/geo/tokens', methods=['GET'])
+def search_tokens_by_location():
+    """Find RWA tokens stored within a radius or bounding box (nearest first for radius queries)"""
+    try:
+        bbox, center, radius_km = parse_area()
+        limit = query_int('limit', 500, 5000)
+
+        statement = db.select(
+            RWAToken.token_id, RWAToken.crop_type, RWAToken.quantity, RWAToken.quality_grade,
+            RWAToken.warehouse_location, RWAToken.current_price, RWAToken.is_pledged, User.hedera_account_id
+        ).join(User, RWAToken.owner_id == User.id)
+        if request.args.get('crop_type'):
+            statement = statement.where(RWAToken.crop_type == request.args['crop_type'])
+        if 'is_pledged' in request.args:
+            statement = statement.where(RWAToken.is_pledged == (request.args['is_pledged'].lower() == 'true'))
+
+        rows, distances = spatial_search(RWAToken, statement, bbox, center, radius_km, limit)
+        tokens = [{
+            'token_id': row.token_id,
+            'owner_hedera_id': row.hedera_account_id,
+            'crop_type': row.crop_type,
+            'quantity': row.quantity,
+            'quality_grade': row.quality_grade,
+            'warehouse_location': row.warehouse_location,
+            'latitude': row.latitude,
+            'longitude': row.longitude,
+            'distance_km': distance,
+            'total_value': to_number(row.current_price * row.quantity),
+            'is_pledged': row.is_pledged
+        } for row, distance in zip(rows, distances)]
+
+        return jsonify({**area_summary(bbox, center, radius_km), 'tokens': tokens})
+
+    except RequestError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        logger.error(f"Token location search failed: {str(e)}")
+        return jsonify({'error': 'Failed to search tokens'}), 500
+
+
+@bp.route('/api/export/tokens', methods=['GET'])
+def export_tokens():
+    """Stream RWA tokens as CSV or Parquet, optionally for one owner or crop"""
+    try:
+        owner_hedera_id = request.args.get('owner_hedera_id')
+        crop_type = request.args.get('crop_type')
+        is_pledged = request.args.get('is_pledged')
+
+        statement = db.select(
+            RWAToken.token_id, User.hedera_account_id, RWAToken.crop_type, RWAToken.quantity,
+            RWAToken.quality_grade, RWAToken.warehouse_location, RWAToken.harvest_date,
+            RWAToken.current_price, RWAToken.current_price * RWAToken.quantity,
+            RWAToken.is_pledged, RWAToken.created_at
+        ).join(User, RWAToken.owner_id == User.id)
+
+        if owner_hedera_id:
+            statement = statement.where(User.hedera_account_id == owner_hedera_id)
+        if crop_type:
+            statement = statement.where(RWAToken.crop_type == crop_type)
+        if is_pledged is not None:
+            statement = statement.where(RWAToken.is_pledged == (is_pledged.lower() == 'true'))
+
+        return export_response(statement.order_by(RWAToken.id), TOKEN_EXPORT_COLUMNS, 'tokens')
+
+    except Exception as e:
+        logger.error(f"Token export failed: {str(e)}")
+        return jsonify({'error': 'Token export failed'}), 500
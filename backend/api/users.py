@@ -0,0 +1,249 @@
+# Hedera AgriFund Backend - User API
+#
+# Registration, bulk farmer imports, profiles and farmer location search.
+import io
+import logging
+
+from flask import Blueprint, Response, jsonify, request
+
+from api.audit import log_audit_event
+from api.common import (RequestError, area_summary, locate, parse_area, query_int, route_to_account, scatter,
+                        shard_engines, spatial_search)
+from extensions import cache, db, shard_router
+from models import FarmerProfile, LenderProfile, User
+from money import to_number, to_units
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('users', __name__)
+
+
+@bp.route('/api/users/register', methods=['POST'])
+def register_user():
+    """Register a new user"""
+    try:
+        data = request.get_json()
+
+        # Validate required fields
+        required_fields = ['hedera_account_id', 'user_type', 'name', 'email']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+
+        investment_capacity = data.get('investment_capacity')
+        if investment_capacity is not None:
+            try:
+                investment_capacity = to_units(investment_capacity)
+            except ValueError:
+                return jsonify({'error': 'investment_capacity must be a number'}), 400
+
+        route_to_account(data['hedera_account_id'])
+
+        # Check if user already exists
+        existing_user = User.query.filter_by(hedera_account_id=data['hedera_account_id']).first()
+        if existing_user:
+            return jsonify({'error': 'User already exists'}), 409
+
+        # Emails are unique per database; the account's shard alone would miss one registered on another
+        def email_taken(engine):
+            with engine.connect() as conn:
+                return conn.execute(db.select(User.id).where(User.email == data['email']).limit(1)).first() is not None
+        if any(scatter(email_taken)):
+            return jsonify({'error': 'Email already registered'}), 409
+
+        # Create user
+        user = User(
+            hedera_account_id=data['hedera_account_id'],
+            user_type=data['user_type'],
+            name=data['name'],
+            email=data['email'],
+            phone=data.get('phone'),
+            location=data.get('location'),
+            **locate(data, data.get('location'))
+        )
+
+        db.session.add(user)
+        db.session.flush()  # Get user ID
+
+        # Create profile based on user type
+        if data['user_type'] == 'farmer':
+            profile = FarmerProfile(
+                user_id=user.id,
+                farm_size=data.get('farm_size'),
+                primary_crops=data.get('primary_crops', []),
+                cooperative=data.get('cooperative'),
+                certifications=data.get('certifications', [])
+            )
+            db.session.add(profile)
+        elif data['user_type'] == 'lender':
+            profile = LenderProfile(
+                user_id=user.id,
+                investment_capacity=investment_capacity,
+                risk_tolerance=data.get('risk_tolerance', 'medium'),
+                preferred_sectors=data.get('preferred_sectors', [])
+            )
+            db.session.add(profile)
+
+        db.session.commit()
+        cache.invalidate('user', user.hedera_account_id)
+        cache.invalidate('analytics', 'summary')
+
+        # Log registration
+        log_audit_event('USER_REGISTERED', str(user.id), user.id, {
+            'user_type': user.user_type,
+            'hedera_account_id': user.hedera_account_id
+        })
+
+        return jsonify({
+            'message': 'User registered successfully',
+            'user_id': user.id,
+            'hedera_account_id': user.hedera_account_id
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"User registration failed: {str(e)}")
+        return jsonify({'error': 'Registration failed'}), 500
+
+
+IMPORT_REPORT_LIMIT = 1000  # rejected rows listed in the JSON response
+
+
+@bp.route('/api/users/import', methods=['POST'])
+def import_farmers():
+    """Bulk register farmers from a CSV or JSONL upload"""
+    from imports import IMPORT_FORMATS, FarmerImporter, detect_format, write_report
+
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            stream, fmt = upload.stream, detect_format(upload.filename, upload.mimetype)
+        else:
+            stream, fmt = request.stream, detect_format(content_type=request.content_type)
+        fmt = request.args.get('format', fmt)
+        if fmt not in IMPORT_FORMATS:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+
+        importer = FarmerImporter(shard_engines(), shard_router.shard_for if shard_router else None)
+        importer.run(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''), fmt)  # a leading BOM is dropped
+
+        if importer.imported:
+            cache.invalidate('analytics', 'summary')
+        log_audit_event('FARMERS_IMPORTED', None, None, {
+            'imported': importer.imported,
+            'rejected': len(importer.rejected)
+        })
+
+        if request.args.get('report') == 'csv':
+            report = io.StringIO()
+            write_report(importer.rejected, report)
+            return Response(report.getvalue(), mimetype='text/csv', headers={
+                'Content-Disposition': 'attachment; filename="rejected.csv"',
+                'X-Imported-Count': str(importer.imported)
+            })
+        return jsonify(importer.summary(IMPORT_REPORT_LIMIT))
+
+    except UnicodeDecodeError:
+        return jsonify({'error': 'Upload must be UTF-8 encoded'}), 400
+    except Exception as e:
+        logger.error(f"Farmer import failed: {str(e)}")
+        return jsonify({'error': 'Import failed'}), 500
+
+
+def fetch_profile(hedera_account_id):
+    """(user, farmer_profile, lender_profile) in one query on the account's shard, or None"""
+    route_to_account(hedera_account_id)
+    return db.session.execute(
+        db.select(User, FarmerProfile, LenderProfile)
+        .outerjoin(FarmerProfile, FarmerProfile.user_id == User.id)
+        .outerjoin(LenderProfile, LenderProfile.user_id == User.id)
+        .where(User.hedera_account_id == hedera_account_id)
+    ).first()
+
+
+def profile_data(user, farmer_profile, lender_profile):
+    data = {
+        'id': user.id,
+        'hedera_account_id': user.hedera_account_id,
+        'user_type': user.user_type,
+        'name': user.name,
+        'email': user.email,
+        'phone': user.phone,
+        'location': user.location,
+        'kyc_status': user.kyc_status,
+        'credit_score': user.credit_score,
+        'created_at': user.created_at.isoformat()
+    }
+
+    if user.user_type == 'farmer' and farmer_profile:
+        data['farmer_profile'] = {
+            'farm_size': float(farmer_profile.farm_size) if farmer_profile.farm_size else None,
+            'primary_crops': farmer_profile.primary_crops,
+            'cooperative': farmer_profile.cooperative,
+            'certifications': farmer_profile.certifications,
+            'total_collateral_value': to_number(farmer_profile.total_collateral_value)
+        }
+    elif user.user_type == 'lender' and lender_profile:
+        data['lender_profile'] = {
+            'investment_capacity': to_number(lender_profile.investment_capacity) if lender_profile.investment_capacity else None,
+            'risk_tolerance': lender_profile.risk_tolerance,
+            'preferred_sectors': lender_profile.preferred_sectors,
+            'portfolio_value': to_number(lender_profile.portfolio_value or 0)
+        }
+    return data
+
+
+@bp.route('/api/users/<hedera_account_id>', methods=['GET'])
+def get_user_profile(hedera_account_id):
+    """Get user profile by Hedera account ID"""
+    try:
+        cached = cache.get('user', hedera_account_id)
+        if cached is not None:
+            return jsonify(cached)
+
+        found = fetch_profile(hedera_account_id)
+        if not found:
+            return jsonify({'error': 'User not found'}), 404
+
+        data = profile_data(*found)
+        cache.set('user', hedera_account_id, data)
+        return jsonify(data)
+
+    except Exception as e:
+        logger.error(f"Failed to get user profile: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve profile'}), 500
+
+
+@bp.route('/api/geo/farmers', methods=['GET'])
+def search_farmers_by_location():
+    """Find farmers located within a radius or bounding box (nearest first for radius queries)"""
+    try:
+        bbox, center, radius_km = parse_area()
+        limit = query_int('limit', 500, 5000)
+
+        statement = db.select(
+            User.hedera_account_id, User.name, User.location, User.credit_score,
+            FarmerProfile.farm_size, FarmerProfile.primary_crops, FarmerProfile.total_collateral_value
+        ).outerjoin(FarmerProfile, FarmerProfile.user_id == User.id).where(User.user_type == 'farmer')
+
+        rows, distances = spatial_search(User, statement, bbox, center, radius_km, limit)
+        farmers = [{
+            'hedera_account_id': row.hedera_account_id,
+            'name': row.name,
+            'location': row.location,
+            'latitude': row.latitude,
+            'longitude': row.longitude,
+            'distance_km': distance,
+            'credit_score': row.credit_score,
+            'farm_size': row.farm_size,
+            'primary_crops': row.primary_crops,
+            'total_collateral_value': to_number(row.total_collateral_value or 0)
+        } for row, distance in zip(rows, distances)]
+
+        return jsonify({**area_summary(bbox, center, radius_km), 'farmers': farmers})
+
+    except RequestError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        logger.error(f"Farmer location search failed: {str(e)}")
+        return jsonify({'error': 'Failed to search farmers'}), 500
@@ -1,687 +1,376 @@
 # Hedera AgriFund Backend - Flask API
-from flask import Flask, request, jsonify
+#
+# create_app() builds an app from the environment (plus optional overrides):
+# extensions, per-app services, admission control and the blueprints in
+# api/. Importing this module builds the default `app` that gunicorn, Celery
+# (`celery -A app.celery`) and `python app.py` serve. Heavy dependencies
+# (numpy, Celery, the price feed and import/export libraries) are imported by
+# the code that needs them, not here; benchmarks/bench_importtime.py keeps it so.
+from flask import Flask, current_app, g, request, jsonify
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
-import hashlib
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+from datetime import datetime
+import importlib
 import json
 import os
-import requests
-from decimal import Decimal
+import time
 import logging
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'postgresql://localhost/hedera_agrifund')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize extensions
-db = SQLAlchemy(app)
-CORS(app)
+from api import BLUEPRINTS, LAZY_MODULES
+from api.common import all_engines, shard_engines
+from api.prices import MOCK_PRICES, load_recent_price
+from cache import make_cache
+from events import EventHub
+from extensions import EXTENSION, db, services
+import jobs
+from models import User, FarmerProfile, LenderProfile, RWAToken, Loan, PriceOracle, PriceCandle, AnalyticsCube, AuditLog, Job, OutboxMessage  # noqa: F401 (re-exported for scripts)
+from partitions import ensure_partitioned
+from ratelimit import AdmissionMetrics, ConcurrencyLimiter, make_rate_limiter
+from sharding import SHARD_LOCAL_TABLES, SHARDED_TABLES, ShardRouter, install as install_sharding, prepare_default, prepare_shard
+from static_assets import MANIFEST_NAME as ASSET_MANIFEST, StaticAssets
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Database Models
-class User(db.Model):
-    __tablename__ = 'users'
-
-    id = db.Column(db.Integer, primary_key=True)
-    hedera_account_id = db.Column(db.String(20), unique=True, nullable=False)
-    user_type = db.Column(db.String(10), nullable=False)  # 'farmer' or 'lender'
-    name = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    phone = db.Column(db.String(20))
-    location = db.Column(db.String(200))
-    kyc_status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
-    credit_score = db.Column(db.Integer, default=700)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    # Relationships
-    farmer_profile = db.relationship('FarmerProfile', backref='user', uselist=False)
-    lender_profile = db.relationship('LenderProfile', backref='user', uselist=False)
-    loans_as_borrower = db.relationship('Loan', foreign_keys='Loan.borrower_id', backref='borrower')
-    loans_as_lender = db.relationship('Loan', foreign_keys='Loan.lender_id', backref='lender')
-
-class FarmerProfile(db.Model):
-    __tablename__ = 'farmer_profiles'
-
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    farm_size = db.Column(db.Float)  # in hectares
-    primary_crops = db.Column(db.JSON)
-    cooperative = db.Column(db.String(200))
-    certifications = db.Column(db.JSON)
-    total_collateral_value = db.Column(db.Numeric(15, 2), default=0)
-
-class LenderProfile(db.Model):
-    __tablename__ = 'lender_profiles'
-
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    investment_capacity = db.Column(db.Numeric(15, 2))
-    risk_tolerance = db.Column(db.String(10))  # low, medium, high
-    preferred_sectors = db.Column(db.JSON)
-    portfolio_value = db.Column(db.Numeric(15, 2), default=0)
-
-class RWAToken(db.Model):
-    __tablename__ = 'rwa_tokens'
-
-    id = db.Column(db.Integer, primary_key=True)
-    token_id = db.Column(db.String(20), unique=True, nullable=False)
-    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    crop_type = db.Column(db.String(50), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    quality_grade = db.Column(db.String(5))
-    warehouse_location = db.Column(db.String(200))
-    harvest_date = db.Column(db.Date)
-    current_price = db.Column(db.Numeric(10, 2))
-    metadata = db.Column(db.JSON)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    is_pledged = db.Column(db.Boolean, default=False)
-
-    # Relationships
-    owner = db.relationship('User', backref='owned_tokens')
-
-class Loan(db.Model):
-    __tablename__ = 'loans'
-
-    id = db.Column(db.Integer, primary_key=True)
-    contract_id = db.Column(db.String(20), unique=True, nullable=False)
-    borrower_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    lender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
-    amount = db.Column(db.Numeric(15, 2), nullable=False)
-    interest_rate = db.Column(db.Numeric(5, 2), nullable=False)
-    duration_months = db.Column(db.Integer, nullable=False)
-    purpose = db.Column(db.String(200))
-    status = db.Column(db.String(20), default='pending')  # pending, funded, repaid, defaulted, liquidated
-    collateral_token_id = db.Column(db.String(20), db.ForeignKey('rwa_tokens.token_id'))
-    ltv_ratio = db.Column(db.Numeric(5, 2))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    funded_at = db.Column(db.DateTime)
-    due_date = db.Column(db.DateTime)
-
-    # Relationships
-    collateral = db.relationship('RWAToken', backref='loans')
-
-class PriceOracle(db.Model):
-    __tablename__ = 'price_oracles'
-
-    id = db.Column(db.Integer, primary_key=True)
-    commodity = db.Column(db.String(50), nullable=False)
-    price_usd = db.Column(db.Numeric(10, 2), nullable=False)
-    source = db.Column(db.String(100))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    hcs_topic_id = db.Column(db.String(20))
-
-class AuditLog(db.Model):
-    __tablename__ = 'audit_logs'
-
-    id = db.Column(db.Integer, primary_key=True)
-    event_type = db.Column(db.String(50), nullable=False)
-    entity_id = db.Column(db.String(50))
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    data = db.Column(db.JSON)
-    hedera_tx_id = db.Column(db.String(100))
-    hcs_timestamp = db.Column(db.BigInteger)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-# API Routes
-
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
-
-# User Management
-@app.route('/api/users/register', methods=['POST'])
-def register_user():
-    """Register a new user"""
-    try:
-        data = request.get_json()
-
-        # Validate required fields
-        required_fields = ['hedera_account_id', 'user_type', 'name', 'email']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-
-        # Check if user already exists
-        existing_user = User.query.filter_by(hedera_account_id=data['hedera_account_id']).first()
-        if existing_user:
-            return jsonify({'error': 'User already exists'}), 409
-
-        # Create user
-        user = User(
-            hedera_account_id=data['hedera_account_id'],
-            user_type=data['user_type'],
-            name=data['name'],
-            email=data['email'],
-            phone=data.get('phone'),
-            location=data.get('location')
+# Configuration
+def load_config():
+    """Application settings read from the environment"""
+    return {
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production'),
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL', 'postgresql://localhost/hedera_agrifund'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'ARCHIVE_DIR': os.environ.get('ARCHIVE_DIR', os.path.join(os.path.dirname(__file__), 'archive')),
+        'HOT_RETENTION_MONTHS': int(os.environ.get('HOT_RETENTION_MONTHS', 6)),
+        'CACHE_REDIS_URL': os.environ.get('CACHE_REDIS_URL', os.environ.get('REDIS_URL')),
+        'CACHE_LOCAL_TTL': int(os.environ.get('CACHE_LOCAL_TTL', 5)),
+        'RATE_LIMIT_REDIS_URL': os.environ.get('RATE_LIMIT_REDIS_URL', os.environ.get('REDIS_URL')),
+        'CELERY_BROKER_URL': os.environ.get('CELERY_BROKER_URL', os.environ.get('REDIS_URL')),  # see jobs.resolve_broker_url
+        'CELERY_TASK_ALWAYS_EAGER': os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true',
+        'SHARD_DATABASE_URLS': [url for url in os.environ.get('SHARD_DATABASE_URLS', '').split(',') if url],
+        'PRICE_SOURCES': os.environ.get('PRICE_SOURCES'),  # JSON list, see pricefeeds.py
+        'COLLATERAL_TOKENS': json.loads(os.environ.get('COLLATERAL_TOKENS') or '{}'),  # crop type -> approved collateral ERC-20
+        'PRICE_FETCH_DEADLINE': float(os.environ.get('PRICE_FETCH_DEADLINE', 1.5)),
+        'STRESS_WORKERS': int(os.environ.get('STRESS_WORKERS', 0)) or None,  # default: one per CPU
+        'MAX_IN_FLIGHT': int(os.environ.get('MAX_IN_FLIGHT', 15)),  # SQLAlchemy pool_size + max_overflow
+        'WARM_CONNECTIONS': int(os.environ.get('WARM_CONNECTIONS', 4)),  # pooled connections opened per worker at startup
+        'EVENT_BUFFER_SIZE': int(os.environ.get('EVENT_BUFFER_SIZE', 100)),
+        'MAX_EVENT_STREAMS': int(os.environ.get('MAX_EVENT_STREAMS', 4)),  # per worker; each holds a gthread thread, see gunicorn_events.conf.py
+        'TRACE_LOG': os.environ.get('TRACE_LOG'),  # opt-in request trace recording, see traces.py
+        'TRACE_SAMPLE_RATE': float(os.environ.get('TRACE_SAMPLE_RATE', 1.0)),
+        'STATEMENT_COUNT_HEADER': os.environ.get('STATEMENT_COUNT_HEADER', 'false').lower() == 'true',
+        'FRONTEND_DIST': os.environ.get('FRONTEND_DIST') or os.path.join(os.path.dirname(__file__), '..', 'frontend', 'dist'),  # built by static_assets.py
+    }
+
+# Application Factory
+def create_app(config=None):
+    """Build an app from the environment, with `config` overriding individual settings"""
+    app = Flask(__name__)
+    app.config.update(load_config())
+    app.config.update(config or {})
+
+    db.init_app(app)
+    CORS(app)
+    app.extensions[EXTENSION] = build_services(app)
+    jobs.configure_celery(app)
+
+    # Request tracing is installed before admission control so throttled and shed requests are traced too
+    if app.config['TRACE_LOG'] or app.config['STATEMENT_COUNT_HEADER']:
+        import traces
+
+        traces.install(
+            app,
+            services(app)['trace_recorder'],
+            expose_counts=app.config['STATEMENT_COUNT_HEADER'],
+            skip=STREAMING_ROUTES,
         )
+    app.before_request(admit_request)
+    app.teardown_request(release_request)
+
+    app.add_url_rule('/api/health', 'health_check', health_check, methods=['GET'])
+    app.add_url_rule('/api/metrics', 'get_metrics', get_metrics, methods=['GET'])
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
+
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(500, internal_error)
+    app.before_request(create_tables)
+
+    if os.path.exists(os.path.join(app.config['FRONTEND_DIST'], ASSET_MANIFEST)):
+        app.wsgi_app = StaticAssets(app.wsgi_app, app.config['FRONTEND_DIST'])
+    return app
+
+def build_services(app):
+    """The cache, limiters, shard router, price aggregator and event hub of one app"""
+    config = app.config
+    shard_router = ShardRouter(config['SHARD_DATABASE_URLS']) if config['SHARD_DATABASE_URLS'] else None
+    if shard_router:
+        with app.app_context():
+            install_sharding(shard_router, db.session)
+
+    price_aggregator = None
+    if config['PRICE_SOURCES']:
+        from pricefeeds import PriceAggregator, load_sources
+
+        price_aggregator = PriceAggregator(load_sources(config['PRICE_SOURCES']), deadline=config['PRICE_FETCH_DEADLINE'])
+
+    trace_recorder = None
+    if config['TRACE_LOG']:
+        import traces
+
+        trace_recorder = traces.TraceRecorder(config['TRACE_LOG'], config['TRACE_SAMPLE_RATE'])
+
+    cache = make_cache(config['CACHE_REDIS_URL'], local_ttl=config['CACHE_LOCAL_TTL'])
+    return {
+        'cache': cache,
+        'rate_limiter': make_rate_limiter(config['RATE_LIMIT_REDIS_URL']),
+        'concurrency_limiter': ConcurrencyLimiter(config['MAX_IN_FLIGHT']),
+        'admission_metrics': AdmissionMetrics(),
+        'shard_router': shard_router,
+        'price_aggregator': price_aggregator,
+        'event_hub': EventHub(buffer_size=config['EVENT_BUFFER_SIZE'], bus=cache.backend),
+        'trace_recorder': trace_recorder,
+        'schema_ready': False,
+    }
+
+# Admission Control
+# (tokens per second, burst) per endpoint and account
+RATE_LIMITS = {
+    'tokens.mint_rwa_token': (2, 10),
+    'loans.create_loan': (1, 5),
+    'loans.fund_loan': (1, 5),
+    'loans.get_loan_opportunities': (5, 20),
+}
+DEFAULT_RATE_LIMIT = (10, 50)
+ACCOUNT_RATE_LIMIT = (20, 100)  # across all routes
+ADDRESS_RATE_LIMIT = (100, 500)  # per client address across all routes; the account is whatever the client says
+ADMISSION_EXEMPT = {'health_check', 'get_metrics', 'static'}
+STREAMING_ROUTES = {'events.stream_events'}  # long-lived, hold no DB connection
+ACCOUNT_FIELDS = ('owner_hedera_id', 'borrower_hedera_id', 'lender_hedera_id', 'hedera_account_id')
+
+def request_account():
+    """Identify the calling account for rate limiting, falling back to the client address"""
+    account = request.headers.get('X-Hedera-Account-Id')
+    if account:
+        return account
+    if request.view_args and request.view_args.get('hedera_account_id'):
+        return request.view_args['hedera_account_id']
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            for field in ACCOUNT_FIELDS:
+                if data.get(field):
+                    return str(data[field])
+    return request.remote_addr or 'anonymous'
+
+def reject(status, message, retry_after):
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+def admit_request():
+    """Apply token-bucket limits and the concurrency cap before any DB work"""
+    route = request.endpoint
+    if route is None or route in ADMISSION_EXEMPT:
+        return None
 
-        db.session.add(user)
-        db.session.flush()  # Get user ID
-
-        # Create profile based on user type
-        if data['user_type'] == 'farmer':
-            profile = FarmerProfile(
-                user_id=user.id,
-                farm_size=data.get('farm_size'),
-                primary_crops=data.get('primary_crops', []),
-                cooperative=data.get('cooperative'),
-                certifications=data.get('certifications', [])
-            )
-            db.session.add(profile)
-        elif data['user_type'] == 'lender':
-            profile = LenderProfile(
-                user_id=user.id,
-                investment_capacity=data.get('investment_capacity'),
-                risk_tolerance=data.get('risk_tolerance', 'medium'),
-                preferred_sectors=data.get('preferred_sectors', [])
-            )
-            db.session.add(profile)
-
-        db.session.commit()
-
-        # Log registration
-        log_audit_event('USER_REGISTERED', str(user.id), user.id, {
-            'user_type': user.user_type,
-            'hedera_account_id': user.hedera_account_id
-        })
-
-        return jsonify({
-            'message': 'User registered successfully',
-            'user_id': user.id,
-            'hedera_account_id': user.hedera_account_id
-        }), 201
-
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"User registration failed: {str(e)}")
-        return jsonify({'error': 'Registration failed'}), 500
-
-@app.route('/api/users/<hedera_account_id>', methods=['GET'])
-def get_user_profile(hedera_account_id):
-    """Get user profile by Hedera account ID"""
-    try:
-        user = User.query.filter_by(hedera_account_id=hedera_account_id).first()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
-        profile_data = {
-            'id': user.id,
-            'hedera_account_id': user.hedera_account_id,
-            'user_type': user.user_type,
-            'name': user.name,
-            'email': user.email,
-            'phone': user.phone,
-            'location': user.location,
-            'kyc_status': user.kyc_status,
-            'credit_score': user.credit_score,
-            'created_at': user.created_at.isoformat()
-        }
-
-        if user.user_type == 'farmer' and user.farmer_profile:
-            profile_data['farmer_profile'] = {
-                'farm_size': float(user.farmer_profile.farm_size) if user.farmer_profile.farm_size else None,
-                'primary_crops': user.farmer_profile.primary_crops,
-                'cooperative': user.farmer_profile.cooperative,
-                'certifications': user.farmer_profile.certifications,
-                'total_collateral_value': float(user.farmer_profile.total_collateral_value)
-            }
-        elif user.user_type == 'lender' and user.lender_profile:
-            profile_data['lender_profile'] = {
-                'investment_capacity': float(user.lender_profile.investment_capacity) if user.lender_profile.investment_capacity else None,
-                'risk_tolerance': user.lender_profile.risk_tolerance,
-                'preferred_sectors': user.lender_profile.preferred_sectors,
-                'portfolio_value': float(user.lender_profile.portfolio_value)
-            }
-
-        return jsonify(profile_data)
-
-    except Exception as e:
-        logger.error(f"Failed to get user profile: {str(e)}")
-        return jsonify({'error': 'Failed to retrieve profile'}), 500
-
-# Token Management
-@app.route('/api/tokens/mint', methods=['POST'])
-def mint_rwa_token():
-    """Mint a new RWA token for crop collateral"""
-    try:
-        data = request.get_json()
-
-        # Validate required fields
-        required_fields = ['owner_hedera_id', 'crop_type', 'quantity', 'warehouse_location']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-
-        # Get owner
-        owner = User.query.filter_by(hedera_account_id=data['owner_hedera_id']).first()
-        if not owner:
-            return jsonify({'error': 'Owner not found'}), 404
-
-        # Generate token ID (in real implementation, this comes from Hedera)
-        token_id = f"0.0.{hash(f'{data["crop_type"]}{data["quantity"]}{datetime.utcnow()}') % 1000000}"
-
-        # Get current price from oracle
-        price_data = get_commodity_price(data['crop_type'])
-
-        # Create token
-        token = RWAToken(
-            token_id=token_id,
-            owner_id=owner.id,
-            crop_type=data['crop_type'],
-            quantity=data['quantity'],
-            quality_grade=data.get('quality_grade', 'B'),
-            warehouse_location=data['warehouse_location'],
-            harvest_date=datetime.strptime(data.get('harvest_date', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d').date(),
-            current_price=price_data['price'] if price_data else 100.0,
-            metadata=data.get('metadata', {})
-        )
+    # Finding the account may parse the JSON body; Flask keeps it for the handler, so it is timed apart
+    identify_started = time.perf_counter_ns()
+    account = request_account()
+    started = time.perf_counter_ns()
+    identify_ns = started - identify_started
+    registry = services()
+    rate_limiter = registry['rate_limiter']
+    admission_metrics = registry['admission_metrics']
+
+    allowed, retry_after = rate_limiter.allow(f"address:{request.remote_addr or 'anonymous'}", *ADDRESS_RATE_LIMIT)
+    if allowed:
+        allowed, retry_after = rate_limiter.allow(f'account:{account}', *ACCOUNT_RATE_LIMIT)
+    if allowed:
+        allowed, retry_after = rate_limiter.allow(f'{route}:{account}', *RATE_LIMITS.get(route, DEFAULT_RATE_LIMIT))
+    if not allowed:
+        admission_metrics.record(route, 'rate_limited', time.perf_counter_ns() - started, identify_ns)
+        return reject(429, 'Rate limit exceeded', retry_after)
+
+    if route in STREAMING_ROUTES:
+        admission_metrics.record(route, 'admitted', time.perf_counter_ns() - started, identify_ns)
+        return None
 
-        db.session.add(token)
-        db.session.commit()
-
-        # Update farmer's collateral value
-        if owner.farmer_profile:
-            total_value = db.session.query(db.func.sum(RWAToken.quantity * RWAToken.current_price)).filter_by(owner_id=owner.id).scalar() or 0
-            owner.farmer_profile.total_collateral_value = total_value
-            db.session.commit()
-
-        # Log minting event
-        log_audit_event('TOKEN_MINTED', token_id, owner.id, {
-            'crop_type': token.crop_type,
-            'quantity': token.quantity,
-            'warehouse': token.warehouse_location
-        })
-
-        return jsonify({
-            'message': 'Token minted successfully',
-            'token_id': token_id,
-            'quantity': token.quantity,
-            'current_value': float(token.current_price * token.quantity)
-        }), 201
-
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Token minting failed: {str(e)}")
-        return jsonify({'error': 'Token minting failed'}), 500
-
-@app.route('/api/tokens/user/<hedera_account_id>', methods=['GET'])
-def get_user_tokens(hedera_account_id):
-    """Get all tokens owned by a user"""
-    try:
-        user = User.query.filter_by(hedera_account_id=hedera_account_id).first()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-
-        tokens = RWAToken.query.filter_by(owner_id=user.id).all()
-
-        token_list = []
-        for token in tokens:
-            token_list.append({
-                'token_id': token.token_id,
-                'crop_type': token.crop_type,
-                'quantity': token.quantity,
-                'quality_grade': token.quality_grade,
-                'warehouse_location': token.warehouse_location,
-                'harvest_date': token.harvest_date.isoformat() if token.harvest_date else None,
-                'current_price': float(token.current_price),
-                'total_value': float(token.current_price * token.quantity),
-                'is_pledged': token.is_pledged,
-                'created_at': token.created_at.isoformat()
-            })
-
-        return jsonify({'tokens': token_list})
-
-    except Exception as e:
-        logger.error(f"Failed to get user tokens: {str(e)}")
-        return jsonify({'error': 'Failed to retrieve tokens'}), 500
-
-# Loan Management
-@app.route('/api/loans/create', methods=['POST'])
-def create_loan():
-    """Create a new loan request"""
-    try:
-        data = request.get_json()
-
-        # Validate required fields
-        required_fields = ['borrower_hedera_id', 'amount', 'interest_rate', 'duration_months', 'collateral_token_id']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-
-        # Get borrower
-        borrower = User.query.filter_by(hedera_account_id=data['borrower_hedera_id']).first()
-        if not borrower:
-            return jsonify({'error': 'Borrower not found'}), 404
-
-        # Validate collateral token
-        collateral_token = RWAToken.query.filter_by(
-            token_id=data['collateral_token_id'],
-            owner_id=borrower.id
-        ).first()
-        if not collateral_token:
-            return jsonify({'error': 'Invalid collateral token'}), 400
-
-        if collateral_token.is_pledged:
-            return jsonify({'error': 'Token already pledged as collateral'}), 400
-
-        # Calculate LTV
-        collateral_value = float(collateral_token.current_price * collateral_token.quantity)
-        ltv_ratio = (float(data['amount']) / collateral_value) * 100
-
-        if ltv_ratio > 85:  # Maximum LTV threshold
-            return jsonify({'error': 'LTV ratio too high. Maximum allowed is 85%'}), 400
-
-        # Generate contract ID (in real implementation, this comes from Hedera smart contract)
-        contract_id = f"0.0.{hash(f'{borrower.id}{data["amount"]}{datetime.utcnow()}') % 1000000}"
-
-        # Create loan
-        loan = Loan(
-            contract_id=contract_id,
-            borrower_id=borrower.id,
-            amount=Decimal(str(data['amount'])),
-            interest_rate=Decimal(str(data['interest_rate'])),
-            duration_months=data['duration_months'],
-            purpose=data.get('purpose'),
-            collateral_token_id=data['collateral_token_id'],
-            ltv_ratio=Decimal(str(ltv_ratio))
-        )
+    if not registry['concurrency_limiter'].try_acquire():
+        admission_metrics.record(route, 'shed', time.perf_counter_ns() - started, identify_ns)
+        return reject(503, 'Server busy, please retry', 1)
 
-        # Mark token as pledged
-        collateral_token.is_pledged = True
-
-        db.session.add(loan)
-        db.session.commit()
-
-        # Log loan creation
-        log_audit_event('LOAN_CREATED', contract_id, borrower.id, {
-            'amount': float(loan.amount),
-            'collateral_token': collateral_token.token_id,
-            'ltv_ratio': float(ltv_ratio)
-        })
-
-        return jsonify({
-            'message': 'Loan created successfully',
-            'contract_id': contract_id,
-            'ltv_ratio': float(ltv_ratio),
-            'collateral_value': collateral_value
-        }), 201
-
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Loan creation failed: {str(e)}")
-        return jsonify({'error': 'Loan creation failed'}), 500
-
-@app.route('/api/loans/fund', methods=['POST'])
-def fund_loan():
-    """Fund a loan"""
-    try:
-        data = request.get_json()
-
-        # Validate required fields
-        required_fields = ['contract_id', 'lender_hedera_id']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-
-        # Get loan
-        loan = Loan.query.filter_by(contract_id=data['contract_id']).first()
-        if not loan:
-            return jsonify({'error': 'Loan not found'}), 404
-
-        if loan.status != 'pending':
-            return jsonify({'error': 'Loan is not available for funding'}), 400
-
-        # Get lender
-        lender = User.query.filter_by(hedera_account_id=data['lender_hedera_id']).first()
-        if not lender:
-            return jsonify({'error': 'Lender not found'}), 404
-
-        # Update loan
-        loan.lender_id = lender.id
-        loan.status = 'funded'
-        loan.funded_at = datetime.utcnow()
-        loan.due_date = datetime.utcnow() + timedelta(days=loan.duration_months * 30)
-
-        db.session.commit()
-
-        # Log funding event
-        log_audit_event('LOAN_FUNDED', loan.contract_id, lender.id, {
-            'amount': float(loan.amount),
-            'borrower': loan.borrower.hedera_account_id
-        })
-
-        return jsonify({
-            'message': 'Loan funded successfully',
-            'due_date': loan.due_date.isoformat()
-        })
-
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Loan funding failed: {str(e)}")
-        return jsonify({'error': 'Loan funding failed'}), 500
-
-@app.route('/api/loans/opportunities', methods=['GET'])
-def get_loan_opportunities():
-    """Get available loan opportunities for lenders"""
-    try:
-        # Query parameters for filtering
-        crop_type = request.args.get('crop_type')
-        max_ltv = request.args.get('max_ltv', 85)
-        min_interest = request.args.get('min_interest', 0)
-
-        query = db.session.query(Loan).filter_by(status='pending')
-
-        if crop_type:
-            query = query.join(RWAToken).filter(RWAToken.crop_type == crop_type)
-
-        query = query.filter(
-            Loan.ltv_ratio <= float(max_ltv),
-            Loan.interest_rate >= float(min_interest)
-        )
+    g.admitted = True
+    admission_metrics.record(route, 'admitted', time.perf_counter_ns() - started, identify_ns)
+    return None
 
-        loans = query.all()
-
-        opportunities = []
-        for loan in loans:
-            collateral_value = float(loan.collateral.current_price * loan.collateral.quantity) if loan.collateral else 0
-
-            opportunities.append({
-                'contract_id': loan.contract_id,
-                'borrower_name': loan.borrower.name,
-                'borrower_credit_score': loan.borrower.credit_score,
-                'amount': float(loan.amount),
-                'interest_rate': float(loan.interest_rate),
-                'duration_months': loan.duration_months,
-                'purpose': loan.purpose,
-                'ltv_ratio': float(loan.ltv_ratio),
-                'collateral': {
-                    'crop_type': loan.collateral.crop_type,
-                    'quantity': loan.collateral.quantity,
-                    'quality_grade': loan.collateral.quality_grade,
-                    'value': collateral_value
-                } if loan.collateral else None,
-                'created_at': loan.created_at.isoformat()
-            })
-
-        return jsonify({'opportunities': opportunities})
-
-    except Exception as e:
-        logger.error(f"Failed to get loan opportunities: {str(e)}")
-        return jsonify({'error': 'Failed to retrieve opportunities'}), 500
-
-# Price Oracle
-@app.route('/api/prices/<commodity>', methods=['GET'])
-def get_commodity_price_api(commodity):
-    """Get current price for a commodity"""
-    try:
-        price_data = get_commodity_price(commodity)
-        if price_data:
-            return jsonify(price_data)
-        else:
-            return jsonify({'error': 'Price data not available'}), 404
-
-    except Exception as e:
-        logger.error(f"Failed to get commodity price: {str(e)}")
-        return jsonify({'error': 'Failed to retrieve price'}), 500
-
-def get_commodity_price(commodity):
-    """Get commodity price from oracle or external API"""
-    try:
-        # Check recent price from database
-        recent_price = PriceOracle.query.filter_by(commodity=commodity).order_by(PriceOracle.timestamp.desc()).first()
-
-        if recent_price and (datetime.utcnow() - recent_price.timestamp).seconds < 3600:  # 1 hour cache
-            return {
-                'commodity': commodity,
-                'price': float(recent_price.price_usd),
-                'currency': 'USD',
-                'timestamp': recent_price.timestamp.isoformat(),
-                'source': recent_price.source
-            }
-
-        # Mock prices for demo (in production, integrate with real price APIs)
-        mock_prices = {
-            'maize': 250.00,
-            'rice': 420.00,
-            'wheat': 300.00,
-            'coffee': 1250.00,
-            'cocoa': 2800.00,
-            'sorghum': 280.00,
-            'millet': 320.00
-        }
-
-        price = mock_prices.get(commodity.lower(), 100.00)
-
-        # Save to database
-        price_record = PriceOracle(
-            commodity=commodity,
-            price_usd=Decimal(str(price)),
-            source='mock_oracle',
-            hcs_topic_id='0.0.555555'
-        )
-        db.session.add(price_record)
-        db.session.commit()
-
-        return {
-            'commodity': commodity,
-            'price': price,
-            'currency': 'USD',
-            'timestamp': datetime.utcnow().isoformat(),
-            'source': 'mock_oracle'
-        }
-
-    except Exception as e:
-        logger.error(f"Failed to get commodity price: {str(e)}")
-        return None
+def release_request(error=None):
+    if g.pop('admitted', False):
+        services()['concurrency_limiter'].release()
 
-# Audit and Analytics
-@app.route('/api/audit/trail', methods=['GET'])
-def get_audit_trail():
-    """Get audit trail for transparency"""
-    try:
-        # Query parameters
-        event_type = request.args.get('event_type')
-        entity_id = request.args.get('entity_id')
-        user_id = request.args.get('user_id')
-        limit = int(request.args.get('limit', 50))
-
-        query = AuditLog.query
-
-        if event_type:
-            query = query.filter_by(event_type=event_type)
-        if entity_id:
-            query = query.filter_by(entity_id=entity_id)
-        if user_id:
-            query = query.filter_by(user_id=user_id)
-
-        logs = query.order_by(AuditLog.created_at.desc()).limit(limit).all()
-
-        audit_trail = []
-        for log in logs:
-            audit_trail.append({
-                'id': log.id,
-                'event_type': log.event_type,
-                'entity_id': log.entity_id,
-                'user_id': log.user_id,
-                'data': log.data,
-                'hedera_tx_id': log.hedera_tx_id,
-                'hcs_timestamp': log.hcs_timestamp,
-                'created_at': log.created_at.isoformat()
-            })
-
-        return jsonify({'audit_trail': audit_trail})
-
-    except Exception as e:
-        logger.error(f"Failed to get audit trail: {str(e)}")
-        return jsonify({'error': 'Failed to retrieve audit trail'}), 500
-
-def log_audit_event(event_type, entity_id, user_id, data, hedera_tx_id=None):
-    """Log an event to audit trail"""
-    try:
-        log = AuditLog(
-            event_type=event_type,
-            entity_id=entity_id,
-            user_id=user_id,
-            data=data,
-            hedera_tx_id=hedera_tx_id,
-            hcs_timestamp=int(datetime.utcnow().timestamp() * 1000000000)  # nanoseconds
-        )
-        db.session.add(log)
-        db.session.commit()
-
-    except Exception as e:
-        logger.error(f"Failed to log audit event: {str(e)}")
-
-# Analytics Dashboard
-@app.route('/api/analytics/summary', methods=['GET'])
-def get_analytics_summary():
-    """Get platform analytics summary"""
-    try:
-        total_loans = Loan.query.count()
-        funded_loans = Loan.query.filter_by(status='funded').count()
-        total_funded_amount = db.session.query(db.func.sum(Loan.amount)).filter_by(status='funded').scalar() or 0
-        total_collateral_value = db.session.query(db.func.sum(RWAToken.quantity * RWAToken.current_price)).scalar() or 0
-
-        avg_interest_rate = db.session.query(db.func.avg(Loan.interest_rate)).filter_by(status='funded').scalar() or 0
-        default_rate = (Loan.query.filter_by(status='defaulted').count() / max(funded_loans, 1)) * 100
-
-        return jsonify({
-            'total_loans': total_loans,
-            'funded_loans': funded_loans,
-            'total_funded_amount': float(total_funded_amount),
-            'total_collateral_value': float(total_collateral_value),
-            'average_interest_rate': float(avg_interest_rate),
-            'default_rate': float(default_rate),
-            'active_farmers': User.query.filter_by(user_type='farmer').count(),
-            'active_lenders': User.query.filter_by(user_type='lender').count()
-        })
-
-    except Exception as e:
-        logger.error(f"Failed to get analytics: {str(e)}")
-        return jsonify({'error': 'Failed to retrieve analytics'}), 500
+# Health and Metrics
+def health_check():
+    """Health check endpoint"""
+    return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
+
+def get_metrics():
+    """Admission control, cache, price source and startup metrics for this worker, plus the chain outbox backlog"""
+    from outbox import outbox_metrics
+
+    registry = services()
+    concurrency_limiter = registry['concurrency_limiter']
+    event_hub = registry['event_hub']
+    price_aggregator = registry['price_aggregator']
+    return jsonify({
+        'admission': dict(registry['admission_metrics'].export(), in_flight=concurrency_limiter.in_flight,
+                          max_in_flight=concurrency_limiter.max_in_flight,
+                          rate_limit_fallback=registry['rate_limiter'].degraded),
+        'cache': registry['cache'].stats(),
+        'events': {
+            'subscribers': event_hub.subscriber_count(),
+            'published': event_hub.published,
+            'delivered': event_hub.delivered,
+            'relayed': event_hub.relayed,
+            'max_streams': current_app.config['MAX_EVENT_STREAMS']
+        },
+        'price_sources': dict(price_aggregator.stats, breakers=price_aggregator.breaker_states()) if price_aggregator else None,
+        'outbox': outbox_metrics(shard_engines(), OutboxMessage.__table__),
+        'startup': startup_metrics
+    })
 
 # Error Handlers
-@app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
-@app.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return jsonify({'error': 'Internal server error'}), 500
 
-# Initialize database
-@app.before_first_request
-def create_tables():
+# Initialize database (before_first_request was removed in Flask 2.3)
+def ensure_indexes(engine):
+    """Create model indexes that were added after their tables already existed"""
+    for index in RWAToken.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+# Stand-in ledger ids grew from 0.0.<6 digits> to 0.0.<63-bit number>
+LEDGER_ID_COLUMNS = (('rwa_tokens', 'token_id'), ('loans', 'contract_id'), ('loans', 'collateral_token_id'),
+                     ('chain_outbox', 'aggregate_id'))
+
+def widen_ledger_ids(engine):
+    """Widen ledger id columns created before the longer ids (SQLite does not enforce lengths)"""
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.begin() as conn:
+        for table, column in LEDGER_ID_COLUMNS:
+            length = db.metadata.tables[table].c[column].type.length
+            current = conn.execute(text(
+                "SELECT character_maximum_length FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column"
+            ), {'table': table, 'column': column}).scalar()
+            if current is not None and current < length:
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE varchar({length})"))
+
+def ensure_schema():
+    """Create missing tables, partitions and indexes on the current app's database and every shard"""
+    import geo
+
+    registry = services()
+    shard_router = registry['shard_router']
     db.create_all()
+    ensure_partitioned(db.engine)
+    geo.ensure_geo_columns(db.engine)
+    ensure_indexes(db.engine)
+    widen_ledger_ids(db.engine)
+    if shard_router:
+        sharded_tables = [db.metadata.tables[name] for name in SHARDED_TABLES + SHARD_LOCAL_TABLES]
+        for index, engine in enumerate(shard_router.engines):
+            db.metadata.create_all(engine, tables=sharded_tables)
+            geo.ensure_geo_columns(engine)
+            ensure_indexes(engine)
+            widen_ledger_ids(engine)
+            prepare_shard(engine, index)
+        prepare_default(db.engine)
+    registry['schema_ready'] = True
+
+def create_tables():
+    # Under gunicorn.conf.py the schema is ready before the first worker forks; this covers `python app.py`
+    if not services()['schema_ready']:
+        ensure_schema()
+
+# Default Application
+app = create_app()
+
+def __getattr__(name):
+    # `celery -A app.celery` and the benchmarks resolve the Celery app here; importing it is deferred until then
+    if name == 'celery':
+        return jobs.get_celery()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Serving Lifecycle
+# gunicorn.conf.py imports this module once in the master (preload_app), calls prepare_preload() before
+# forking, then after_fork() and warm_worker() in every worker before it accepts connections.
+startup_metrics = {'pid': os.getpid()}
+
+def warm_caches():
+    """Load prices stored in the last hour into the cache; price sources are not called"""
+    cache = services()['cache']
+    for commodity in MOCK_PRICES:
+        if cache.get('price', commodity) is None:
+            load_recent_price(commodity)
+
+def prepare_preload():
+    """Work done once in the master and inherited by every worker"""
+    started = time.perf_counter()
+    # Modules the app imports on first use are loaded here instead, so every worker shares them
+    for module in LAZY_MODULES:
+        importlib.import_module(module)
+    jobs.get_celery()
+    configure_mappers()
+    app.url_map.update()
+    with app.app_context():
+        ensure_schema()
+        warm_caches()  # also compiles the price query into the engine's statement cache
+        db.session.remove()
+        # No socket may be shared across fork(); the thread pools (shards, price feeds) are still unstarted
+        for engine in all_engines():
+            engine.dispose()
+    startup_metrics['preload_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+def after_fork():
+    """Drop per-process state copied from the master"""
+    with app.app_context():
+        for engine in all_engines():
+            engine.dispose(close=False)  # forget inherited connections without closing the master's
+        services()['cache'].after_fork()
+        services()['event_hub'].after_fork()
+    startup_metrics['pid'] = os.getpid()
+
+def warm_worker():
+    """Open pooled connections and prime the price cache before the worker takes traffic"""
+    started = time.perf_counter()
+    with app.app_context():
+        if not services()['schema_ready']:
+            ensure_schema()  # not preloaded: the first worker to get here creates the schema
+        for engine in all_engines():
+            size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+            connections = [engine.connect() for _ in range(min(app.config['WARM_CONNECTIONS'], size))]
+            for connection in connections:
+                connection.close()
+        warm_caches()
+        db.session.remove()
+    startup_metrics['warmup_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+def shutdown_worker():
+    """Flush buffered traces and close pooled connections when a worker exits or is recycled"""
+    trace_recorder = services(app)['trace_recorder']
+    if trace_recorder is not None:
+        trace_recorder.flush()
+    with app.app_context():
+        for engine in all_engines():
+            engine.dispose()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
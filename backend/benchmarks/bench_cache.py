@@ -0,0 +1,100 @@
+# Harness: shared cache hit rate and staleness under multi-worker load
+#
+# Each simulated worker owns a SharedCache (its own local tier) over a common
+# backend, reads hot keys through get_or_set and occasionally writes, bumping
+# the key's version in the "database" and broadcasting an invalidation.
+# A read is stale when it returns an older version than the database holds.
+#
+# Usage: python backend/benchmarks/bench_cache.py [--workers 16] [--redis-url redis://localhost:6379/0]
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from cache import MemoryBackend, RedisBackend, SharedCache
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(args):
+    shared_backend = MemoryBackend() if not args.redis_url else None
+    database = {key: 0 for key in range(args.keys)}
+    changed_at = {key: {0: time.monotonic()} for key in range(args.keys)}
+    lock = threading.Lock()
+    results = {'reads': 0, 'stale': 0, 'staleness': []}
+    caches = []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        backend = shared_backend or RedisBackend(args.redis_url)
+        cache = SharedCache(backend, namespace='bench', local_ttl=args.local_ttl, default_ttl=args.ttl)
+        caches.append(cache)
+        reads = stale = 0
+        staleness = []
+        deadline = time.monotonic() + args.duration
+
+        while time.monotonic() < deadline:
+            # Skewed key popularity, like a few busy dashboards
+            key = min(int(rng.paretovariate(1.2)) - 1, args.keys - 1)
+
+            if rng.random() < args.write_ratio:
+                with lock:
+                    database[key] += 1
+                    changed_at[key][database[key]] = time.monotonic()
+                cache.invalidate('user', key)
+                continue
+
+            value = cache.get_or_set('user', key, lambda: {'version': database[key]})
+            reads += 1
+            current = database[key]
+            if value['version'] < current:
+                stale += 1
+                staleness.append(time.monotonic() - changed_at[key][value['version'] + 1])
+
+        with lock:
+            results['reads'] += reads
+            results['stale'] += stale
+            results['staleness'].extend(staleness)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(args.workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    totals = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+    for cache in caches:
+        for name in totals:
+            totals[name] += cache.stats()[name]
+    lookups = sum(totals.values()) or 1
+
+    print(f"workers={args.workers} keys={args.keys} write_ratio={args.write_ratio} "
+          f"backend={'redis' if args.redis_url else 'memory'}")
+    print(f"reads:           {results['reads']:,} ({results['reads'] / args.duration:,.0f}/s)")
+    print(f"hit rate:        {(totals['local_hits'] + totals['shared_hits']) / lookups:.1%} "
+          f"(local {totals['local_hits'] / lookups:.1%}, shared {totals['shared_hits'] / lookups:.1%})")
+    print(f"stale reads:     {results['stale']:,} ({results['stale'] / max(results['reads'], 1):.3%})")
+    print(f"staleness p50:   {percentile(results['staleness'], 0.5) * 1000:.2f} ms")
+    print(f"staleness p99:   {percentile(results['staleness'], 0.99) * 1000:.2f} ms")
+    print(f"staleness max:   {max(results['staleness'], default=0) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--write-ratio', type=float, default=0.01)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--local-ttl', type=float, default=5.0)
+    parser.add_argument('--ttl', type=float, default=60.0)
+    parser.add_argument('--redis-url')
+    run(parser.parse_args())
@@ -0,0 +1,87 @@
+# Benchmark: candles from rollups vs computed from raw prices on request
+#
+# Grows one commodity's price history (one price a minute) in steps and, at
+# each size, times /api/prices/<commodity>/candles for 1h/1d/1w against
+# folding the raw price_oracles rows on request. Rollups are maintained by
+# the same incremental path the API uses, and both ways must agree.
+#
+# Usage: python backend/benchmarks/bench_candles.py [--sizes 10000,100000,1000000]
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'candles.db')}")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+
+    import app as agrifund
+    import candles
+    from money import to_number, to_units
+
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    client = agrifund.app.test_client()
+    client.get('/api/health')  # creates the tables
+
+    prices_table = agrifund.PriceOracle.__table__
+    candle_table = agrifund.PriceCandle.__table__
+    rng = np.random.default_rng(11)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    start = datetime(2022, 1, 3)
+    loaded = 0
+
+    for size in sizes:
+        # Append prices up to `size`, folding each batch into the rollups as the API does
+        started = time.perf_counter()
+        batch = 20000
+        with agrifund.app.app_context():
+            while loaded < size:
+                count = min(batch, size - loaded)
+                walk = 250 + np.cumsum(rng.normal(0, 0.5, count))
+                rows = [{
+                    'commodity': 'maize', 'price_usd': to_units(round(float(price), 2)),
+                    'timestamp': start + timedelta(minutes=loaded + i), 'source': 'bench'
+                } for i, price in enumerate(walk)]
+                with agrifund.db.engine.begin() as conn:
+                    conn.execute(prices_table.insert(), rows)
+                    candles.record_prices(conn, candle_table, [(r['commodity'], r['price_usd'], r['timestamp']) for r in rows])
+                loaded += count
+        load_elapsed = time.perf_counter() - started
+
+        print(f"history={size:>9,} prices (appended + rolled up in {load_elapsed:.1f}s)")
+        for interval in candles.INTERVALS:
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                served = client.get(f'/api/prices/maize/candles?interval={interval}&limit=200').get_json()['candles']
+            rollup_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+            # On request: read the raw history and fold it
+            started = time.perf_counter()
+            with agrifund.app.app_context(), agrifund.db.engine.connect() as conn:
+                raw = conn.execute(
+                    agrifund.db.select(prices_table.c.commodity, prices_table.c.price_usd, prices_table.c.timestamp)
+                    .where(prices_table.c.commodity == 'maize').order_by(prices_table.c.timestamp)
+                ).all()
+            computed = sorted((c for c in candles.fold(raw) if c['interval'] == interval), key=lambda c: c['bucket_start'])[-200:]
+            raw_ms = (time.perf_counter() - started) * 1000
+
+            assert [c['time'] for c in served] == [c['bucket_start'].isoformat() for c in computed]
+            assert all(abs(s['close'] - to_number(c['close'])) < 0.005 and s['count'] == c['price_count']
+                       for s, c in zip(served, computed))
+            print(f"  {interval}: rollups {rollup_ms:7.2f} ms   raw fold {raw_ms:9.1f} ms   ({len(served)} candles)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# Benchmark: analytics cube roll-ups vs ad hoc GROUP BYs over loans and tokens
+#
+# Grows the loan book (each loan with its own collateral token, borrowers
+# spread over the gazetteer's places) in steps, folding every batch into the
+# cube the way the API does. At each size it times /api/analytics/cube for a
+# few roll-ups and drill-downs, uncached and from the response cache, against
+# the GROUP BY over loans joined to rwa_tokens and users that answers the same
+# question, and checks both agree.
+#
+# Usage: python backend/benchmarks/bench_cube.py [--sizes 10000,100000,1000000] [--farmers 5000]
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+QUERIES = [
+    'by=crop_type',
+    'by=region,month',
+    'by=quality_grade,month&crop_type=maize',
+    'by=region&crop_type=cocoa&from=2024-01&to=2024-06',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--farmers', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cube.db')}")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+
+    import app as agrifund
+    import cube
+    import geo
+    from extensions import services
+    from money import UNIT, to_number
+
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    client = agrifund.app.test_client()
+    cache = services(agrifund.app)['cache']
+    client.get('/api/health')  # creates the tables
+
+    users = agrifund.User.__table__
+    tokens = agrifund.RWAToken.__table__
+    loans = agrifund.Loan.__table__
+    cube_table = agrifund.AnalyticsCube.__table__
+    places = sorted(geo.GAZETTEER)
+    crops = ['maize', 'rice', 'coffee', 'cocoa', 'wheat']
+    grades = ['A', 'B', 'C']
+    locations = [f'{places[i % len(places)].title()}, farm {i}' for i in range(args.farmers)]
+    rng = np.random.default_rng(5)
+    start = datetime(2023, 1, 1)
+
+    with agrifund.app.app_context(), agrifund.db.engine.begin() as conn:
+        conn.execute(users.insert(), [{
+            'id': i + 1, 'hedera_account_id': f'0.0.{i + 1}', 'user_type': 'farmer', 'name': f'Farmer {i}',
+            'email': f'farmer{i}@example.com', 'location': locations[i]
+        } for i in range(args.farmers)])
+
+    def adhoc(conn, query):
+        """The same roll-up computed from the base tables"""
+        params = dict(part.split('=') for part in query.split('&'))
+        by = params['by'].split(',')
+        month = agrifund.db.func.strftime('%Y-%m', loans.c.created_at) if conn.dialect.name == 'sqlite' \
+            else agrifund.db.func.to_char(loans.c.created_at, 'YYYY-MM')
+        columns = {'crop_type': tokens.c.crop_type, 'region': users.c.location,
+                   'quality_grade': tokens.c.quality_grade, 'month': month}
+        group = [columns[name].label(name) for name in by]
+        statement = agrifund.db.select(*group, agrifund.db.func.count(loans.c.id).label('loans'),
+                                       agrifund.db.func.sum(loans.c.amount).label('loan_amount')) \
+            .select_from(loans.join(users, loans.c.borrower_id == users.c.id)
+                         .join(tokens, loans.c.collateral_token_id == tokens.c.token_id)).group_by(*group)
+        if 'crop_type' in params:
+            statement = statement.where(tokens.c.crop_type == params['crop_type'])
+        if 'from' in params:
+            statement = statement.where(month >= params['from'], month <= params['to'])
+        totals = {}
+        for row in conn.execute(statement):
+            key = tuple(cube.region_of(row.region) if name == 'region' else getattr(row, name) for name in by)
+            count, amount = totals.get(key, (0, 0))
+            totals[key] = (count + row.loans, amount + row.loan_amount)
+        return {key: (count, to_number(amount)) for key, (count, amount) in totals.items()}
+
+    loaded = 0
+    for size in [int(size) for size in args.sizes.split(',')]:
+        # Append loans (and their tokens) up to `size`, folding each batch into the cube as the API does
+        started = time.perf_counter()
+        while loaded < size:
+            count = min(20000, size - loaded)
+            ids = np.arange(loaded, loaded + count)
+            owners = rng.integers(0, args.farmers, count)
+            created = [start + timedelta(minutes=int(m)) for m in rng.integers(0, 3 * 365 * 24 * 60, count)]
+            token_rows = [{
+                'id': int(i) + 1, 'token_id': f'0.0.{int(i)}', 'owner_id': int(owner) + 1,
+                'crop_type': crops[int(i) % len(crops)], 'quantity': 100 + int(i) % 900,
+                'quality_grade': grades[int(i) % len(grades)], 'warehouse_location': 'Store',
+                'current_price': 250 * UNIT, 'is_pledged': True, 'created_at': at
+            } for i, owner, at in zip(ids, owners, created)]
+            loan_rows = [{
+                'id': int(i) + 1, 'contract_id': f'0.0.{int(i)}', 'borrower_id': int(owner) + 1,
+                'collateral_token_id': f'0.0.{int(i)}', 'amount': (1000 + int(i) % 5000) * UNIT,
+                'interest_rate': 8 + int(i) % 10, 'duration_months': 6, 'ltv_ratio': 40, 'status': 'pending',
+                'created_at': at
+            } for i, owner, at in zip(ids, owners, created)]
+            facts = [cube.token_created(t['crop_type'], t['quality_grade'], locations[t['owner_id'] - 1],
+                                        t['created_at'], t['quantity']) for t in token_rows]
+            facts += [cube.loan_created(t['crop_type'], t['quality_grade'], locations[t['owner_id'] - 1],
+                                        row['created_at'], row['amount'], row['ltv_ratio'], row['interest_rate'])
+                      for t, row in zip(token_rows, loan_rows)]
+            with agrifund.app.app_context(), agrifund.db.engine.begin() as conn:
+                conn.execute(tokens.insert(), token_rows)
+                conn.execute(loans.insert(), loan_rows)
+                cube.record(conn, cube_table, facts)
+            loaded += count
+        with agrifund.app.app_context(), agrifund.db.engine.connect() as conn:
+            cells = conn.execute(agrifund.db.select(agrifund.db.func.count()).select_from(cube_table)).scalar()
+        print(f"loans={size:>9,} ({cells:,} cube cells, appended + folded in {time.perf_counter() - started:.1f}s)")
+
+        for query in QUERIES:
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                cache.invalidate('analytics', 'cube')
+                response = client.get(f'/api/analytics/cube?{query}')
+            cold_ms = (time.perf_counter() - started) * 1000 / args.repeat
+            assert response.status_code == 200, response.get_json()
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                client.get(f'/api/analytics/cube?{query}')
+            cached_ms = (time.perf_counter() - started) * 1000 / args.repeat
+            body = response.get_json()
+
+            started = time.perf_counter()
+            with agrifund.app.app_context(), agrifund.db.engine.connect() as conn:
+                expected = adhoc(conn, query)
+            adhoc_ms = (time.perf_counter() - started) * 1000
+
+            served = {tuple(cell[name] for name in body['by']): (cell['loans'], cell['loan_amount'])
+                      for cell in body['cells'] if cell['loans']}
+            assert served == expected, f"{query}: cube and GROUP BY disagree"
+            print(f"  {query:<50} cube {cold_ms:6.2f} ms (cached {cached_ms:5.2f} ms)   "
+                  f"GROUP BY {adhoc_ms:8.1f} ms   ({len(served)} cells)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# Benchmark: one dashboard call vs the fan-out of calls it replaces
+#
+# Loads farmers with tokens and loans (half of them funded by a few lenders),
+# then times what a farmer's and a lender's dashboard fetch: the separate
+# profile, tokens or projections, opportunities and summary calls against
+# /api/dashboard/<id>. Caches are dropped before every cold call. Reports
+# latency and SQL statements per page load.
+#
+# Usage: python backend/benchmarks/bench_dashboard.py [--farmers 2000] [--tokens 20] [--loans 5] [--repeat 20]
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--farmers', type=int, default=2000)
+    parser.add_argument('--lenders', type=int, default=20)
+    parser.add_argument('--tokens', type=int, default=20, help='tokens per farmer')
+    parser.add_argument('--loans', type=int, default=5, help='loans per farmer')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'dashboard.db')}")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+
+    import app as agrifund
+    from extensions import services
+    from money import UNIT
+    from sqlalchemy import event
+
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    for name in agrifund.RATE_LIMITS:
+        agrifund.RATE_LIMITS[name] = (1e9, 1e9)
+    client = agrifund.app.test_client()
+    cache = services(agrifund.app)['cache']
+    client.get('/api/health')  # creates the tables
+
+    created = datetime(2024, 1, 1)
+    crops = ['maize', 'rice', 'coffee', 'cocoa']
+    farmers, lenders = range(1, args.farmers + 1), range(args.farmers + 1, args.farmers + args.lenders + 1)
+    with agrifund.app.app_context(), agrifund.db.engine.begin() as conn:
+        conn.execute(agrifund.User.__table__.insert(), [{
+            'id': i, 'hedera_account_id': f'0.0.{i}', 'user_type': 'farmer' if i in farmers else 'lender',
+            'name': f'User {i}', 'email': f'user{i}@example.com', 'created_at': created
+        } for i in [*farmers, *lenders]])
+        conn.execute(agrifund.FarmerProfile.__table__.insert(), [
+            {'user_id': i, 'primary_crops': ['maize'], 'certifications': [], 'total_collateral_value': 0} for i in farmers
+        ])
+        conn.execute(agrifund.LenderProfile.__table__.insert(), [
+            {'user_id': i, 'investment_capacity': 10 ** 6 * UNIT, 'risk_tolerance': 'medium', 'preferred_sectors': [],
+             'portfolio_value': 0} for i in lenders
+        ])
+        conn.execute(agrifund.RWAToken.__table__.insert(), [{
+            'token_id': f'0.0.{i}.{n}', 'owner_id': i, 'crop_type': crops[n % 4], 'quantity': 100 + n,
+            'quality_grade': 'A', 'warehouse_location': 'Nairobi Central Store', 'current_price': 250 * UNIT,
+            'is_pledged': n < args.loans, 'harvest_date': created, 'created_at': created
+        } for i in farmers for n in range(args.tokens)])
+        conn.execute(agrifund.Loan.__table__.insert(), [{
+            'contract_id': f'0.0.{i}.{n}', 'borrower_id': i, 'collateral_token_id': f'0.0.{i}.{n}',
+            'amount': 5000 * UNIT, 'interest_rate': 9, 'duration_months': 6, 'ltv_ratio': 20,
+            'status': 'funded' if n % 2 else 'pending', 'lender_id': lenders[i % args.lenders] if n % 2 else None,
+            'created_at': created + timedelta(minutes=n),
+            'funded_at': created + timedelta(days=1) if n % 2 else None,
+            'due_date': created + timedelta(days=181) if n % 2 else None
+        } for i in farmers for n in range(args.loans)])
+
+    statements = [0]
+    with agrifund.app.app_context():
+        event.listen(agrifund.db.engine, 'before_cursor_execute', lambda *_: statements.__setitem__(0, statements[0] + 1))
+
+    def page_load(account, urls, cold):
+        if cold:
+            cache.invalidate('user', account)
+            cache.invalidate('dashboard', account)
+            cache.invalidate('analytics', 'summary')
+        for url in urls:
+            response = client.get(url)
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+    def measure(accounts, urls_for, cold):
+        page_load(accounts[0], urls_for(accounts[0]), cold)  # warm up
+        statements[0] = 0
+        started = time.perf_counter()
+        for n in range(args.repeat):
+            account = accounts[n % len(accounts)]
+            page_load(account, urls_for(account), cold)
+        return (time.perf_counter() - started) * 1000 / args.repeat, statements[0] / args.repeat
+
+    cases = [
+        ('farmer', [f'0.0.{i}' for i in farmers[:args.repeat]], lambda account: [
+            f'/api/users/{account}', f'/api/tokens/user/{account}',
+            '/api/loans/opportunities', '/api/analytics/summary'
+        ]),
+        ('lender', [f'0.0.{i}' for i in lenders], lambda account: [
+            f'/api/users/{account}', f'/api/lenders/{account}/projections?schedule=false',
+            '/api/loans/opportunities', '/api/analytics/summary'
+        ]),
+    ]
+    print(f"farmers={args.farmers} lenders={args.lenders} tokens/farmer={args.tokens} loans/farmer={args.loans}\n")
+    print(f"{'page load':<30} {'cold ms':>9} {'statements':>11} {'warm ms':>9} {'statements':>11}")
+    for kind, accounts, fan_out in cases:
+        for label, urls_for in ((f'{kind}: {len(fan_out(accounts[0]))} calls', fan_out),
+                                (f'{kind}: /api/dashboard', lambda account: [f'/api/dashboard/{account}'])):
+            cold_ms, cold_statements = measure(accounts, urls_for, cold=True)
+            warm_ms, warm_statements = measure(accounts, urls_for, cold=False)
+            print(f"{label:<30} {cold_ms:>9.1f} {cold_statements:>11.1f} {warm_ms:>9.1f} {warm_statements:>11.1f}")
+
+    # The dashboard's lists agree with the endpoints they replace
+    account = f'0.0.{farmers[0]}'
+    dashboard = client.get(f'/api/dashboard/{account}').get_json()
+    assert dashboard['profile'] == client.get(f'/api/users/{account}').get_json()
+    assert sorted(t['token_id'] for t in dashboard['tokens']) == \
+        sorted(t['token_id'] for t in client.get(f'/api/tokens/user/{account}').get_json()['tokens'])
+    assert len(dashboard['borrowed']) == args.loans
+
+
+if __name__ == '__main__':
+    main()
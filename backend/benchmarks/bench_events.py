@@ -0,0 +1,87 @@
+# Benchmark: event hub fan-out with many simulated SSE subscribers
+#
+# Subscribes N clients spread over commodities and accounts, publishes a
+# burst of price and loan events, and checks delivery counts, publish
+# latency and that slow (never-draining) clients stay within their buffer.
+#
+# Usage: python backend/benchmarks/bench_events.py [--subscribers 10000]
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from events import EventHub, account_topic, price_topic
+
+COMMODITIES = ['maize', 'rice', 'wheat', 'coffee', 'cocoa', 'sorghum', 'millet']
+
+
+def run(args):
+    hub = EventHub(buffer_size=args.buffer_size)
+    subscribers = []
+    for i in range(args.subscribers):
+        topics = {price_topic(COMMODITIES[i % len(COMMODITIES)]), account_topic(f'0.0.{i % args.accounts}')}
+        if i % 10 == 0:
+            topics.add('loans')
+        subscribers.append(hub.subscribe(topics))
+
+    # A fraction of clients drain continuously; the rest are stalled
+    active = subscribers[:int(len(subscribers) * args.active_fraction)]
+    received = [0]
+    stop = threading.Event()
+
+    def consume(group):
+        while not stop.is_set():
+            for subscriber in group:
+                received[0] += len(subscriber.drain(timeout=0))
+            time.sleep(0.001)
+
+    consumers = [threading.Thread(target=consume, args=(active[i::4],)) for i in range(4)]
+    for consumer in consumers:
+        consumer.start()
+
+    latencies = []
+    expected = 0
+    started = time.perf_counter()
+    for i in range(args.events):
+        if i % 5 == 0:
+            topics = ['loans', account_topic(f'0.0.{i % args.accounts}')]
+            payload = {'contract_id': f'0.0.{i}', 'status': 'funded'}
+            event_type = 'loan_status'
+        else:
+            topics = [price_topic(COMMODITIES[i % len(COMMODITIES)])]
+            payload = {'commodity': COMMODITIES[i % len(COMMODITIES)], 'price': 250.0 + i}
+            event_type = 'price'
+        t0 = time.perf_counter()
+        expected += hub.publish(topics, event_type, payload)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    time.sleep(0.2)
+    stop.set()
+    for consumer in consumers:
+        consumer.join()
+
+    stalled = subscribers[len(active):]
+    max_buffer = max((len(s.buffer) for s in stalled), default=0)
+    dropped = sum(s.dropped for s in subscribers)
+    latencies.sort()
+
+    print(f"subscribers={args.subscribers} events={args.events} buffer={args.buffer_size}")
+    print(f"deliveries:        {expected:,} ({expected / elapsed:,.0f}/s)")
+    print(f"publish p50/p99:   {latencies[len(latencies) // 2] * 1e3:.3f} / {latencies[int(len(latencies) * 0.99)] * 1e3:.3f} ms")
+    print(f"drained by active: {received[0]:,}")
+    print(f"stalled max queue: {max_buffer} (bound {args.buffer_size}), dropped {dropped:,}")
+    assert max_buffer <= args.buffer_size
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subscribers', type=int, default=10000)
+    parser.add_argument('--accounts', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--buffer-size', type=int, default=100)
+    parser.add_argument('--active-fraction', type=float, default=0.8)
+    run(parser.parse_args())
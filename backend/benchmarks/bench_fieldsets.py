@@ -0,0 +1,97 @@
+# Benchmark: sparse fieldsets on the list endpoints
+#
+# Loads pending loans (each with a borrower and a collateral token) and one
+# farmer with many tokens, then times /api/loans/opportunities and
+# /api/tokens/user/<id> with every field against a few requested fields,
+# reporting latency and payload size. Sparse rows must match the full ones
+# on the fields they carry.
+#
+# Usage: python backend/benchmarks/bench_fieldsets.py [--loans 50000] [--tokens 50000]
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+CASES = [
+    ('opportunities', '/api/loans/opportunities', 'contract_id,amount,interest_rate'),
+    ('opportunities', '/api/loans/opportunities', 'contract_id,borrower_name,amount'),
+    ('opportunities', '/api/loans/opportunities', 'contract_id,amount,collateral'),
+    ('tokens', '/api/tokens/user/0.0.900000', 'token_id,total_value'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--loans', type=int, default=50000)
+    parser.add_argument('--tokens', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'fieldsets.db')}")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+
+    import app as agrifund
+    from money import UNIT
+
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    for name in agrifund.RATE_LIMITS:
+        agrifund.RATE_LIMITS[name] = (1e9, 1e9)
+    client = agrifund.app.test_client()
+    client.get('/api/health')  # creates the tables
+
+    users = agrifund.User.__table__
+    tokens = agrifund.RWAToken.__table__
+    loans = agrifund.Loan.__table__
+    crops = ['maize', 'rice', 'coffee', 'cocoa']
+    created = datetime(2024, 1, 1)
+    with agrifund.app.app_context(), agrifund.db.engine.begin() as conn:
+        conn.execute(users.insert(), [{
+            'id': i, 'hedera_account_id': f'0.0.{900000 + i}', 'user_type': 'farmer',
+            'name': f'Farmer {i}', 'email': f'farmer{i}@example.com', 'credit_score': 600 + i % 200
+        } for i in range(args.loans + 1)])
+        conn.execute(tokens.insert(), [{
+            'token_id': f'0.0.{i}', 'owner_id': 0 if i < args.tokens else i - args.tokens + 1,
+            'crop_type': crops[i % 4], 'quantity': 10 + i % 90, 'quality_grade': 'A',
+            'warehouse_location': 'Nairobi Central Store', 'current_price': 250 * UNIT, 'is_pledged': i >= args.tokens,
+            'harvest_date': created, 'created_at': created
+        } for i in range(args.tokens + args.loans)])
+        conn.execute(loans.insert(), [{
+            'contract_id': f'0.0.{5000000 + i}', 'borrower_id': i + 1, 'collateral_token_id': f'0.0.{args.tokens + i}',
+            'amount': (1000 + i % 5000) * UNIT, 'interest_rate': 8 + i % 10, 'duration_months': 6 + i % 18,
+            'purpose': 'Seeds and fertilizer for the coming season', 'ltv_ratio': 60, 'status': 'pending',
+            'created_at': created + timedelta(minutes=i)
+        } for i in range(args.loans)])
+    print(f"loans={args.loans} tokens for one farmer={args.tokens}")
+
+    def timed(url):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            response = client.get(url)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return (time.perf_counter() - started) * 1000 / args.repeat, response
+
+    full = {}
+    for key, url, fields in CASES:
+        if url not in full:
+            full[url] = timed(url)
+            elapsed, response = full[url]
+            print(f"{url}: all fields  {elapsed:8.1f} ms  {len(response.data) / 1e6:7.2f} MB")
+        full_ms, full_response = full[url]
+        elapsed, response = timed(f'{url}?fields={fields}')
+        requested = fields.split(',')
+        sparse_rows = response.get_json()[key]
+        full_rows = full_response.get_json()[key]
+        assert len(sparse_rows) == len(full_rows)
+        assert all(row == {name: whole[name] for name in requested} for row, whole in zip(sparse_rows, full_rows))
+        print(f"  fields={fields:<36} {elapsed:8.1f} ms  {len(response.data) / 1e6:7.2f} MB  "
+              f"({full_ms / elapsed:.1f}x faster, {len(full_response.data) / len(response.data):.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# Benchmark: geocell-indexed radius/bbox queries vs a full scan
+#
+# Loads a synthetic set of tokens spread over the gazetteer's towns, then
+# times /api/geo/tokens (geocell ranges on the B-tree index + exact
+# haversine filter) against scanning every token's coordinates, and checks
+# that both return the same tokens.
+#
+# Usage: python backend/benchmarks/bench_geo.py [--tokens 1000000] [--database-url sqlite:///...]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, default=1000000)
+    parser.add_argument('--owners', type=int, default=1000)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--radius-km', type=float, default=10)
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'geo.db')}")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+
+    import app as agrifund
+    from money import UNIT
+    import geo
+
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    client = agrifund.app.test_client()
+    client.get('/api/health')  # creates the tables
+
+    # Tokens scattered up to ~100 km around random gazetteer towns
+    rng = np.random.default_rng(42)
+    towns = list(geo.GAZETTEER.items())
+    picks = rng.integers(0, len(towns), args.tokens)
+    latitudes = np.array([towns[i][1][0] for i in picks]) + rng.normal(0, 0.4, args.tokens)
+    longitudes = np.array([towns[i][1][1] for i in picks]) + rng.normal(0, 0.4, args.tokens)
+    cells = geo.encode(latitudes, longitudes)
+
+    started = time.perf_counter()
+    users = agrifund.User.__table__
+    tokens = agrifund.RWAToken.__table__
+    with agrifund.app.app_context(), agrifund.db.engine.begin() as conn:
+        conn.execute(users.insert(), [{
+            'id': i + 1, 'hedera_account_id': f'0.0.{10000 + i}', 'user_type': 'farmer',
+            'name': f'Farmer {i}', 'email': f'farmer{i}@example.com'
+        } for i in range(args.owners)])
+        batch = 50000
+        for offset in range(0, args.tokens, batch):
+            conn.execute(tokens.insert(), [{
+                'token_id': f'0.0.{i}', 'owner_id': i % args.owners + 1, 'crop_type': 'maize',
+                'quantity': 100, 'warehouse_location': towns[picks[i]][0], 'current_price': 250 * UNIT,
+                'latitude': float(latitudes[i]), 'longitude': float(longitudes[i]), 'geocell': int(cells[i]),
+                'is_pledged': False
+            } for i in range(offset, min(offset + batch, args.tokens))])
+    print(f"tokens={args.tokens} loaded in {time.perf_counter() - started:.1f}s ({args.database_url.split(':')[0]})")
+
+    centers = [towns[i][1] for i in rng.integers(0, len(towns), args.queries)]
+
+    # Indexed path through the API
+    indexed = []
+    started = time.perf_counter()
+    for lat, lon in centers:
+        body = client.get(f'/api/geo/tokens?lat={lat}&lon={lon}&radius_km={args.radius_km}&limit=5000').get_json()
+        indexed.append({token['token_id'] for token in body['tokens']})
+    indexed_elapsed = (time.perf_counter() - started) / args.queries
+
+    # Full scan: read every coordinate and filter client-side
+    scanned = []
+    started = time.perf_counter()
+    with agrifund.app.app_context(), agrifund.db.engine.connect() as conn:
+        for lat, lon in centers:
+            rows = conn.execute(agrifund.db.select(tokens.c.token_id, tokens.c.latitude, tokens.c.longitude)).all()
+            ids, lats, lons = zip(*rows)
+            distances = geo.haversine_km(lat, lon, lats, lons)
+            scanned.append({ids[i] for i in (distances <= args.radius_km).nonzero()[0][:5000]})
+    scan_elapsed = (time.perf_counter() - started) / args.queries
+
+    matches = sum(len(found) for found in indexed)
+    print(f"radius {args.radius_km:g} km, {args.queries} queries, {matches / args.queries:.0f} tokens/query on average")
+    print(f"geocell index (API): {indexed_elapsed * 1000:9.1f} ms/query")
+    print(f"full scan:           {scan_elapsed * 1000:9.1f} ms/query  ({scan_elapsed / indexed_elapsed:.0f}x slower)")
+    assert all(a == b for a, b in zip(indexed, scanned) if len(a) < 5000), 'indexed and scanned results differ'
+
+
+if __name__ == '__main__':
+    main()
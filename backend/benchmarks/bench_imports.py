@@ -0,0 +1,96 @@
+# Benchmark: bulk farmer import vs one registration request per farmer
+#
+# Generates a cooperative roster (CSV, with a share of bad and duplicate
+# rows), times POST /api/users/register on a sample and extrapolates, then
+# imports the whole file through POST /api/users/import and checks the
+# imported and rejected counts. Pass --shards N to load onto N SQLite shards.
+#
+# Usage: python backend/benchmarks/bench_imports.py [--farmers 200000] [--shards 0]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+LOCATIONS = ['Nakuru, Kenya', 'Eldoret', 'Kumasi, Ghana', 'Tamale', 'Mbale, Uganda', 'Unknown village']
+CROPS = ['maize', 'beans', 'coffee', 'cocoa', 'rice']
+
+
+def roster(count, rng):
+    """CSV of `count` farmers; ~1% bad accounts, ~1% repeated emails. Returns (bytes, expected good rows)"""
+    lines = ['hedera_account_id,name,email,phone,location,primary_crops,farm_size,cooperative']
+    bad = rng.random(count) < 0.01
+    repeat = rng.random(count) < 0.01
+    emails = set()
+    for i in range(count):
+        account = f'0.0.x{i}' if bad[i] else f'0.0.{2000000 + i}'
+        email = f'farmer{i - 1 if repeat[i] and i else i}@coop.example'
+        if not bad[i] and email not in emails:
+            emails.add(email)
+        crops = ';'.join(rng.choice(CROPS, 2, replace=False))
+        lines.append(f'{account},Farmer {i},{email},+2547{i:08d},"{LOCATIONS[i % len(LOCATIONS)]}",'
+                     f'{crops},{rng.uniform(0.5, 20):.2f},Coop {i % 50}')
+    return ('\n'.join(lines) + '\n').encode(), len(emails)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--farmers', type=int, default=200000)
+    parser.add_argument('--register-sample', type=int, default=500)
+    parser.add_argument('--shards', type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'import.db')}"
+    if args.shards:
+        os.environ['SHARD_DATABASE_URLS'] = ','.join(
+            f"sqlite:///{os.path.join(directory, f'shard{i}.db')}" for i in range(args.shards)
+        )
+
+    import app as agrifund
+    import logging
+
+    logging.getLogger('imports').setLevel(logging.WARNING)
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    for name in agrifund.RATE_LIMITS:
+        agrifund.RATE_LIMITS[name] = (1e9, 1e9)
+    client = agrifund.app.test_client()
+    client.get('/api/health')  # creates the tables
+
+    # One request per farmer, as the frontend registers them today
+    started = time.perf_counter()
+    for i in range(args.register_sample):
+        response = client.post('/api/users/register', json={
+            'hedera_account_id': f'0.0.{9000000 + i}', 'user_type': 'farmer', 'name': f'Sample {i}',
+            'email': f'sample{i}@coop.example', 'location': 'Nakuru, Kenya', 'primary_crops': ['maize'], 'farm_size': 2
+        })
+        assert response.status_code == 201
+    per_minute = args.register_sample / (time.perf_counter() - started) * 60
+    print(f"register one by one: {per_minute:10,.0f} farmers/min -> ~{args.farmers / per_minute:.1f} min for {args.farmers}")
+
+    body, expected = roster(args.farmers, np.random.default_rng(5))
+    started = time.perf_counter()
+    response = client.post('/api/users/import', data=body, content_type='text/csv')
+    elapsed = time.perf_counter() - started
+    summary = response.get_json()
+    print(f"bulk import:         {summary['imported'] / elapsed * 60:10,.0f} farmers/min "
+          f"({summary['imported']} imported, {summary['rejected_count']} rejected in {elapsed:.1f}s, "
+          f"{len(body) / 1e6:.1f} MB, shards={args.shards or 'none'})")
+    assert summary['imported'] == expected
+    assert summary['imported'] + summary['rejected_count'] == args.farmers
+
+    # Re-importing the same file loads nothing new
+    response = client.post('/api/users/import', data=body, content_type='text/csv')
+    assert response.get_json()['imported'] == 0
+    profile = client.get('/api/users/0.0.2000002').get_json()
+    assert profile['farmer_profile']['cooperative'] == 'Coop 2'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Benchmark: import cost of the API module, with a budget
+#
+# Runs `python -X importtime -c "import app"` in fresh interpreters and reports
+# the median cumulative time of `app` and of its heaviest imports. It fails
+# (exit 1) when that time is over --budget-ms, or when a dependency that should
+# only be imported on first use (numpy, Celery, requests, pyarrow, ...) is
+# imported at startup. Run it after adding an import to app.py, api/ or a module
+# they import at the top.
+#
+# Usage: python backend/benchmarks/bench_importtime.py [--runs 7] [--budget-ms 650] [--module app]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, BACKEND)
+
+# Imported by the routes, jobs and CLIs that use them; never by `import app`
+DEFERRED = ['numpy', 'celery', 'kombu', 'requests', 'pyarrow', 'redis', 'web3', 'brotli',
+            'geo', 'imports', 'outbox', 'pricefeeds', 'projections', 'stress', 'traces']
+
+
+def parse_importtime(stderr):
+    """(module, depth, self_us, cumulative_us) per line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module, env):
+    """Cumulative time of `module` and of each module it imports directly, in ms"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=BACKEND, env=env,
+                            check=True, capture_output=True, text=True).stderr
+    rows = parse_importtime(stderr)
+    # Children are printed before their parent, one level deeper
+    top = next(i for i, row in enumerate(rows) if row[0] == module and row[1] == 0)
+    start = max((i for i in range(top) if rows[i][1] == 0), default=-1) + 1
+    children = {name: cumulative / 1000 for name, depth, _, cumulative in rows[start:top] if depth == 1}
+    imported = {name for name, *_ in rows[start:top]}
+    return rows[top][3] / 1000, children, imported
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget-ms', type=float, default=650)
+    parser.add_argument('--top', type=int, default=12)
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'importtime.db')}")
+    env.pop('PRICE_SOURCES', None)
+    env.pop('TRACE_LOG', None)
+    measure(args.module, env)  # compile .pyc files first
+
+    totals = []
+    children = defaultdict(list)
+    imported = set()
+    for _ in range(args.runs):
+        total, direct, modules = measure(args.module, env)
+        totals.append(total)
+        for name, ms in direct.items():
+            children[name].append(ms)
+        imported |= modules
+
+    total = statistics.median(totals)
+    print(f"import {args.module}: median {total:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}), budget {args.budget_ms:.0f} ms\n")
+    print(f"{'imported by ' + args.module:<32} {'cumulative ms':>14}")
+    ranked = sorted(children.items(), key=lambda item: -statistics.median(item[1]))
+    for name, values in ranked[:args.top]:
+        print(f"{name:<32} {statistics.median(values):>14.1f}")
+
+    failures = []
+    if total > args.budget_ms:
+        failures.append(f"import {args.module} took {total:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    eager = sorted(name for name in DEFERRED if name in imported)
+    if eager:
+        failures.append(f"imported at startup, should be imported on first use: {', '.join(eager)}")
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Benchmark: synchronous mint vs accept-then-process mint
+#
+# Drives /api/tokens/mint through the Flask test client. The synchronous
+# path does everything inline; the async path only validates and enqueues,
+# and an in-process Celery worker on the in-memory broker drains the queue.
+#
+# Usage: python backend/benchmarks/bench_jobs.py [--requests 500] [--database-url sqlite:///...]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--farmers', type=int, default=50)
+    parser.add_argument('--worker-concurrency', type=int, default=1)  # >1 needs a DB that allows concurrent writers
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['CELERY_BROKER_URL'] = 'memory://'
+
+    import app as agrifund
+    from celery.contrib.testing.worker import start_worker
+
+    # Admission limits would otherwise throttle the benchmark itself
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    agrifund.RATE_LIMITS['tokens.mint_rwa_token'] = (1e9, 1e9)
+
+    client = agrifund.app.test_client()
+    for i in range(args.farmers):
+        client.post('/api/users/register', json={
+            'hedera_account_id': f'0.0.{1000 + i}', 'user_type': 'farmer',
+            'name': f'Farmer {i}', 'email': f'farmer{i}@example.com'
+        })
+
+    def mint_body(i):
+        return {
+            'owner_hedera_id': f'0.0.{1000 + i % args.farmers}', 'crop_type': 'maize',
+            'quantity': 100 + i, 'warehouse_location': 'Bamenda'
+        }
+
+    # Synchronous path
+    latencies = []
+    started = time.perf_counter()
+    for i in range(args.requests):
+        t0 = time.perf_counter()
+        assert client.post('/api/tokens/mint', json=mint_body(i)).status_code == 201
+        latencies.append(time.perf_counter() - t0)
+    sync_elapsed = time.perf_counter() - started
+    sync_p50 = sorted(latencies)[len(latencies) // 2]
+
+    # Accept-then-process path
+    latencies = []
+    job_ids = []
+    started = time.perf_counter()
+    for i in range(args.requests):
+        t0 = time.perf_counter()
+        response = client.post('/api/tokens/mint?async=true', json=mint_body(i))
+        assert response.status_code == 202
+        job_ids.append(response.get_json()['job_id'])
+        latencies.append(time.perf_counter() - t0)
+    accept_elapsed = time.perf_counter() - started
+    accept_p50 = sorted(latencies)[len(latencies) // 2]
+
+    started = time.perf_counter()
+    with start_worker(agrifund.celery, pool='threads', concurrency=args.worker_concurrency, perform_ping_check=False):
+        with agrifund.app.app_context():
+            while agrifund.Job.query.filter(agrifund.Job.status.in_(['succeeded', 'failed'])).count() < len(job_ids):
+                time.sleep(0.05)
+                agrifund.db.session.remove()
+            failed = agrifund.Job.query.filter_by(status='failed').count()
+    drain_elapsed = time.perf_counter() - started
+
+    print(f"requests={args.requests} database={args.database_url.split(':')[0]}")
+    print(f"sync mint:     {args.requests / sync_elapsed:8.1f} req/s   p50 {sync_p50 * 1000:6.2f} ms")
+    print(f"async accept:  {args.requests / accept_elapsed:8.1f} req/s   p50 {accept_p50 * 1000:6.2f} ms")
+    print(f"worker drain:  {args.requests / drain_elapsed:8.1f} jobs/s  ({failed} failed, concurrency {args.worker_concurrency})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# Benchmark: per-row cost of Decimal money vs integer micro-units
+#
+# Loads the same token rows through a NUMERIC(asdecimal=True) table (the old
+# Decimal columns) and through Money columns, then times the per-row work the
+# handlers do on them: serializing price and value, computing an LTV, summing a
+# book and building a NumPy array for the stress test. Both representations
+# must produce the same numbers.
+#
+# Usage: python backend/benchmarks/bench_money.py [--rows 200000] [--repeat 5]
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, Numeric, Table, create_engine, insert, select
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from money import UNIT, Money, percent, to_number, unit_array  # noqa: E402
+
+
+def build_tables(engine, rows):
+    metadata = MetaData()
+    decimal_tokens = Table('decimal_tokens', metadata, Column('id', Integer, primary_key=True),
+                           Column('quantity', Integer), Column('current_price', Numeric(10, 2)))
+    money_tokens = Table('money_tokens', metadata, Column('id', Integer, primary_key=True),
+                         Column('quantity', Integer), Column('current_price', Money(10, 2)))
+    metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        for offset in range(0, rows, 20000):
+            batch = range(offset, min(offset + 20000, rows))
+            conn.execute(insert(decimal_tokens), [
+                {'quantity': 10 + i % 900, 'current_price': Decimal(25000 + i % 9973).scaleb(-2)} for i in batch
+            ])
+            conn.execute(insert(money_tokens), [
+                {'quantity': 10 + i % 900, 'current_price': (25000 + i % 9973) * UNIT // 100} for i in batch
+            ])
+    return decimal_tokens, money_tokens
+
+
+def timed(repeat, fn):
+    """Best of `repeat` runs, in seconds, and the last result"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    decimal_tokens, money_tokens = build_tables(engine, args.rows)
+
+    def load(table):
+        with engine.connect() as conn:
+            return conn.execute(select(table.c.current_price, table.c.quantity,
+                                       table.c.current_price * table.c.quantity).order_by(table.c.id)).all()
+
+    results = []
+
+    def compare(step, before, after, same=lambda old, new: old == new):
+        (old_s, old), (new_s, new) = before, after
+        assert same(old, new), f"{step}: {str(old)[:80]} != {str(new)[:80]}"
+        results.append((step, old_s, new_s))
+
+    load_decimal = timed(args.repeat, lambda: load(decimal_tokens))
+    load_money = timed(args.repeat, lambda: load(money_tokens))
+    decimal_rows, money_rows = load_decimal[1], load_money[1]
+    results.append(('load rows', load_decimal[0], load_money[0]))
+
+    compare('serialize price, value',
+            timed(args.repeat, lambda: [(float(price), float(value)) for price, _, value in decimal_rows]),
+            timed(args.repeat, lambda: [(to_number(price), to_number(value)) for price, _, value in money_rows]))
+
+    # A loan of 1,000 against each token, as validate_loan computed it before and does now; the
+    # float ratio was rounded to the cent only when NUMERIC(5, 2) stored it
+    compare('LTV ratio',
+            timed(args.repeat, lambda: [Decimal(str(1000.0 / float(value) * 100)) for _, _, value in decimal_rows]),
+            timed(args.repeat, lambda: [percent(1000 * UNIT, value) for _, _, value in money_rows]),
+            same=lambda old, new: all(abs(a - b) <= Decimal('0.005') for a, b in zip(old, new)))
+
+    compare('sum collateral',
+            timed(args.repeat, lambda: sum(value for _, _, value in decimal_rows)),
+            timed(args.repeat, lambda: Decimal(sum(value for _, _, value in money_rows)).scaleb(-6)))
+
+    compare('to NumPy array',
+            timed(args.repeat, lambda: np.array([float(value) for _, _, value in decimal_rows]).tolist()),
+            timed(args.repeat, lambda: (unit_array(value for _, _, value in money_rows) / UNIT).tolist()))
+
+    print(f"{args.rows:,} token rows, best of {args.repeat}\n")
+    print(f"{'step':<24} {'Decimal ns/row':>15} {'micro-units ns/row':>19} {'speedup':>8}")
+    for step, old_s, new_s in results:
+        print(f"{step:<24} {old_s * 1e9 / args.rows:>15.0f} {new_s * 1e9 / args.rows:>19.0f} {old_s / new_s:>7.1f}x")
+    total_old = sum(old_s for _, old_s, _ in results)
+    total_new = sum(new_s for _, _, new_s in results)
+    print(f"{'total':<24} {total_old * 1e9 / args.rows:>15.0f} {total_new * 1e9 / args.rows:>19.0f} "
+          f"{total_old / total_new:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Benchmark: outbox dispatcher vs inline contract calls
+#
+# Creates loans (and funds some) through the API, which queues createLoan /
+# fundLoan calls in chain_outbox inside the loan transactions, then drains
+# the outbox into StubChain (fixed confirmation latency, injected RPC
+# failures) with the pipelined dispatcher. Compared with submitting and
+# waiting for each call inline, as the request handlers would. Checks that
+# every call landed exactly once, in order per loan, with gap-free nonces
+# per signing account.
+#
+# Usage: python backend/benchmarks/bench_outbox.py [--loans 2000] [--latency 0.05] [--failure-rate 0.02]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+MAIZE_TOKEN = '0x' + '11' * 20  # the approved collateral ERC-20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--loans', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.05, help='stub confirmation latency (s)')
+    parser.add_argument('--failure-rate', type=float, default=0.02)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--inline-sample', type=int, default=40)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'outbox.db')}"
+    os.environ['COLLATERAL_TOKENS'] = json.dumps({'maize': MAIZE_TOKEN})
+
+    import app as agrifund
+    from money import UNIT
+    from outbox import Dispatcher, StubChain, outbox_metrics
+
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    for name in agrifund.RATE_LIMITS:
+        agrifund.RATE_LIMITS[name] = (1e9, 1e9)
+    client = agrifund.app.test_client()
+    client.get('/api/health')  # creates the tables
+
+    with agrifund.app.app_context(), agrifund.db.engine.begin() as conn:
+        conn.execute(agrifund.User.__table__.insert(), [
+            {'id': 1, 'hedera_account_id': '0.0.1001', 'user_type': 'farmer', 'name': 'Farmer', 'email': 'f@coop.example'},
+            {'id': 2, 'hedera_account_id': '0.0.2002', 'user_type': 'lender', 'name': 'Lender', 'email': 'l@bank.example'},
+        ])
+        conn.execute(agrifund.RWAToken.__table__.insert(), [{
+            'token_id': f'0.0.{700000 + i}', 'owner_id': 1, 'crop_type': 'maize', 'quantity': 100,
+            'current_price': 250 * UNIT, 'is_pledged': False
+        } for i in range(args.loans)])
+
+    started = time.perf_counter()
+    contract_ids = []
+    for i in range(args.loans):
+        for _ in range(5):  # contract ids are 6-digit hashes; retry the occasional collision
+            response = client.post('/api/loans/create', json={
+                'borrower_hedera_id': '0.0.1001', 'amount': 10000 + i, 'interest_rate': 8.5,
+                'duration_months': 6, 'collateral_token_id': f'0.0.{700000 + i}'
+            })
+            if response.status_code == 201:
+                break
+        assert response.status_code == 201, response.get_json()
+        contract_ids.append(response.get_json()['contract_id'])
+    funded = contract_ids[::2]
+    for contract_id in funded:
+        assert client.post('/api/loans/fund', json={'contract_id': contract_id, 'lender_hedera_id': '0.0.2002'}).status_code == 200
+    calls = len(contract_ids) + len(funded)
+    print(f"{len(contract_ids)} loans created, {len(funded)} funded through the API in {time.perf_counter() - started:.1f}s "
+          f"-> {calls} queued contract calls")
+
+    with agrifund.app.app_context():
+        engines = [agrifund.db.engine]
+        table = agrifund.OutboxMessage.__table__
+        assert outbox_metrics(engines, table)['pending'] == calls
+
+        # Inline: each request submits and waits for its receipt
+        inline_chain = StubChain(confirm_latency=args.latency, approved_collateral=[MAIZE_TOKEN])
+        started = time.perf_counter()
+        for nonce in range(args.inline_sample):
+            tx_hash = inline_chain.submit('0.0.1001', 'createLoan', {
+                'principal': 1, 'interest_rate': 850, 'duration': 86400 * 180,
+                'collateral_token': MAIZE_TOKEN, 'collateral_amount': 1}, nonce)
+            inline_chain.wait(tx_hash)
+        inline_rate = args.inline_sample / (time.perf_counter() - started)
+        print(f"inline:     {inline_rate:8.1f} calls/s -> ~{calls / inline_rate:.0f}s for the backlog")
+
+        chain = StubChain(confirm_latency=args.latency, failure_rate=args.failure_rate, seed=1,
+                          approved_collateral=[MAIZE_TOKEN])
+        dispatcher = Dispatcher(engines, chain, batch_size=args.batch_size, backoff_base=0.01)
+        started = time.perf_counter()
+        while True:
+            if not dispatcher.dispatch_once():
+                metrics = outbox_metrics(engines, table)
+                if metrics['pending'] == 0 and metrics['in_flight'] == 0:
+                    break
+                time.sleep(0.01)  # rows waiting out their backoff
+        elapsed = time.perf_counter() - started
+        metrics = outbox_metrics(engines, table)
+        print(f"dispatcher: {calls / elapsed:8.1f} calls/s ({elapsed:.1f}s, batch {args.batch_size}, "
+              f"{args.failure_rate:.0%} RPC failures) stats={dispatcher.stats}")
+        print(f"metrics: {metrics}")
+
+        assert metrics['sent'] == calls and metrics['failed'] == 0
+        assert len(chain.loans) == len(contract_ids)
+        assert sum(loan['status'] == 'funded' for loan in chain.loans.values()) == len(funded)
+        with agrifund.db.engine.connect() as conn:
+            rows = conn.execute(agrifund.db.select(table.c.args, table.c.nonce)).all()
+        for sender, count in chain.nonces.items():
+            nonces = sorted(nonce for args, nonce in rows if args['sender'] == sender)
+            assert nonces == list(range(count)), f'nonce gap or reuse for {sender}'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# Harness: price aggregation against local HTTP stub feeds
+#
+# Starts stub feeds on localhost with injected latency, wrong quotes, hangs
+# and failures, then checks that the aggregator fetches them concurrently
+# within its deadline, rejects the outlier, opens the circuit breaker of the
+# hanging feed and still produces a confident price, and that
+# POST /api/prices/refresh stores every commodity in one batch.
+#
+# Usage: python backend/benchmarks/bench_pricefeeds.py [--feeds 5] [--latency-ms 150]
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pricefeeds import PriceAggregator, PriceSource
+
+TRUE_PRICES = {'maize': 250.0, 'cocoa': 2800.0, 'coffee': 1250.0, 'rice': 420.0}
+
+# Per-feed behaviour, keyed by feed name; changed by the scenarios below
+FEEDS = {}
+
+
+class StubFeed(BaseHTTPRequestHandler):
+    def do_GET(self):
+        name, commodity = self.path.strip('/').split('/')
+        feed = FEEDS[name]
+        time.sleep(feed.get('latency', 0))
+        if random.random() < feed.get('failure_rate', 0):
+            self.send_response(503)
+            self.end_headers()
+            return
+        price = TRUE_PRICES[commodity] * feed.get('bias', 1.0) * (1 + random.uniform(-0.005, 0.005))
+        body = json.dumps({'price': round(price, 2), 'confidence': feed.get('confidence', 9000)}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--feeds', type=int, default=5)
+    parser.add_argument('--latency-ms', type=float, default=150)
+    parser.add_argument('--deadline', type=float, default=0.5)
+    args = parser.parse_args()
+
+    logging.getLogger('pricefeeds').setLevel(logging.ERROR)  # injected failures are expected
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubFeed)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    names = [f'feed{i}' for i in range(args.feeds)]
+    for name in names:
+        FEEDS[name] = {'latency': args.latency_ms / 1000 * random.uniform(0.5, 1.0)}
+    sources = [PriceSource(name, f'{base}/{name}/{{commodity}}', timeout=args.deadline) for name in names]
+    aggregator = PriceAggregator(sources, deadline=args.deadline)
+    commodities = list(TRUE_PRICES)
+
+    # 1. Serial vs concurrent fetch
+    def serial():
+        return [source.fetch(requests, commodity) for commodity in commodities for source in sources]
+    _, serial_ms = timed(serial)
+    prices, concurrent_ms = timed(lambda: aggregator.fetch(commodities))
+    print(f"{len(sources)} feeds x {len(commodities)} commodities: serial {serial_ms:7.1f} ms, concurrent {concurrent_ms:7.1f} ms")
+    for commodity, result in prices.items():
+        assert abs(result['price'] - TRUE_PRICES[commodity]) / TRUE_PRICES[commodity] < 0.01, result
+
+    # 2. One feed quotes 3x the market: rejected as an outlier
+    FEEDS['feed0']['bias'] = 3.0
+    result = aggregator.fetch(['cocoa'])['cocoa']
+    print(f"outlier feed:   price {result['price']:8.2f}  confidence {result['confidence']}  rejected {result['rejected']}")
+    assert result['rejected'] == ['feed0'] and abs(result['price'] - 2800) < 30
+
+    # 3. One feed hangs: fetch bounded by the deadline, then its breaker opens
+    FEEDS['feed0']['bias'] = 1.0
+    FEEDS['feed1']['latency'] = 5.0
+    for attempt in range(4):
+        result, elapsed = timed(lambda: aggregator.fetch(['maize'])['maize'])
+        print(f"hanging feed #{attempt + 1}: {elapsed:7.1f} ms  sources {len(result['sources'])}  feed1 breaker {aggregator.breaker_states()['feed1']}")
+        assert elapsed < args.deadline * 1000 + 100
+    assert aggregator.breaker_states()['feed1'] == 'open'
+
+    # 4. Flaky feeds: aggregate survives, or is withheld when too few agree
+    for name in names:
+        FEEDS[name].update(latency=0.01, failure_rate=0.5)
+    outcomes = [aggregator.fetch(['rice'])['rice'] for _ in range(20)]
+    confident = [outcome for outcome in outcomes if outcome]
+    print(f"50% failures:   {len(confident)}/20 confident aggregates, stats {aggregator.stats}")
+
+    # 5. End to end: one batch insert per refresh
+    for name in names:
+        FEEDS[name].update(latency=0.02, failure_rate=0.0)
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'prices.db')}"
+    os.environ['PRICE_SOURCES'] = json.dumps([{'name': name, 'url': f'{base}/{name}/{{commodity}}'} for name in names])
+    import app as agrifund
+
+    client = agrifund.app.test_client()
+    body, elapsed = timed(lambda: client.post('/api/prices/refresh', json={'commodities': commodities}).get_json())
+    with agrifund.app.app_context():
+        stored = agrifund.PriceOracle.query.count()
+    print(f"refresh {len(commodities)} commodities: {elapsed:7.1f} ms, {stored} rows stored")
+    assert stored == len(commodities) and all(price['confidence'] >= 7000 for price in body['prices'].values())
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Benchmark: admission decision latency and lease fairness under the real limits
+#
+# Times RateLimiter decisions (client address bucket, account bucket, then the
+# route's bucket, then the concurrency cap) with the app's RATE_LIMITS,
+# ADDRESS_RATE_LIMIT, ACCOUNT_RATE_LIMIT and DEFAULT_RATE_LIMIT, for every
+# route in turn, each account calling from its own address. Then checks what leasing costs
+# a second worker: two limiters share one store with make_rate_limiter's
+# lease size, one worker serves a request, and the other spends what is left
+# of the account's burst on each route.
+#
+# Usage: python backend/benchmarks/bench_ratelimit.py [--redis-url redis://localhost:6379/0]
+import argparse
+import inspect
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def measure(limiter, concurrency, limits, address_limit, account_limit, accounts, decisions):
+    routes = list(limits.items())
+    samples = []
+    for i in range(decisions):
+        account = f'0.0.{i % accounts}'
+        route, route_limit = routes[i % len(routes)]
+        started = time.perf_counter_ns()
+        allowed, _ = limiter.allow(f'address:10.0.{i % accounts // 256}.{i % 256}', *address_limit)
+        if allowed:
+            allowed, _ = limiter.allow(f'account:{account}', *account_limit)
+        if allowed:
+            allowed, _ = limiter.allow(f'{route}:{account}', *route_limit)
+        if allowed and concurrency.try_acquire():
+            concurrency.release()
+        samples.append(time.perf_counter_ns() - started)
+
+    samples.sort()
+    return (sum(samples) / len(samples) / 1000, samples[len(samples) // 2] / 1000,
+            samples[int(len(samples) * 0.99)] / 1000, samples[-1] / 1000)
+
+
+def second_worker_share(make_store, lease_size, limits, account_limit):
+    """Requests a second worker admits for one account after the first worker served one, per route"""
+    from ratelimit import RateLimiter
+
+    shares = {}
+    for index, (route, (rate, burst)) in enumerate(limits.items()):
+        store = make_store()
+        first, second = RateLimiter(store, lease_size=lease_size), RateLimiter(store, lease_size=lease_size)
+        account = f'0.0.share{index}.{time.time_ns()}'
+        first.allow(f'account:{account}', *account_limit)
+        first.allow(f'{route}:{account}', rate, burst)
+        admitted = 0
+        for _ in range(int(burst)):
+            allowed, _ = second.allow(f'account:{account}', *account_limit)
+            if allowed and second.allow(f'{route}:{account}', rate, burst)[0]:
+                admitted += 1
+        shares[route] = (admitted, int(burst))
+    return shares
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--decisions', type=int, default=200000)
+    parser.add_argument('--accounts', type=int, default=10000)
+    parser.add_argument('--redis-url')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'ratelimit.db')}")
+    import app as agrifund
+    from ratelimit import ConcurrencyLimiter, MemoryBucketStore, RateLimiter, RedisBucketStore, make_rate_limiter
+
+    limits = dict(agrifund.RATE_LIMITS, **{'other': agrifund.DEFAULT_RATE_LIMIT})
+    lease_size = inspect.signature(make_rate_limiter).parameters['lease_size'].default
+    if args.redis_url:
+        make_store = lambda: RedisBucketStore(args.redis_url)
+        limiter = RateLimiter(make_store(), lease_size=lease_size)
+    else:
+        make_store = MemoryBucketStore
+        limiter = RateLimiter(make_store())
+
+    avg, p50, p99, worst = measure(limiter, ConcurrencyLimiter(15), limits, agrifund.ADDRESS_RATE_LIMIT,
+                                   agrifund.ACCOUNT_RATE_LIMIT, args.accounts, args.decisions)
+    print(f"admission decision: avg {avg:.2f} us, p50 {p50:.2f} us, p99 {p99:.2f} us, max {worst:.1f} us "
+          f"({args.decisions:,} decisions, {'redis' if args.redis_url else 'memory'} store)")
+
+    print(f"second worker after one request elsewhere (lease size {lease_size}):")
+    for route, (admitted, burst) in second_worker_share(make_store, lease_size, limits,
+                                                        agrifund.ACCOUNT_RATE_LIMIT).items():
+        print(f"  {route:<32} {admitted} of burst {burst} admitted")
@@ -0,0 +1,106 @@
+# Benchmark: batch price update with set-based token revaluation
+#
+# Loads millions of tokens across thousands of farmers, then times
+# POST /api/prices/batch (bulk price insert, one UPDATE per commodity for
+# tokens and one for farmer totals, all in one transaction) against the
+# per-row ORM loop it replaces, measured on a sample and extrapolated.
+# Farmer collateral totals are checked against a full recomputation.
+#
+# Usage: python backend/benchmarks/bench_revaluation.py [--tokens 2000000] [--database-url sqlite:///...]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+COMMODITIES = ['maize', 'rice', 'wheat', 'coffee', 'cocoa', 'sorghum', 'millet']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, default=2000000)
+    parser.add_argument('--farmers', type=int, default=20000)
+    parser.add_argument('--orm-sample', type=int, default=20000)
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'revalue.db')}")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+
+    import app as agrifund
+    from money import UNIT
+
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    client = agrifund.app.test_client()
+    client.get('/api/health')  # creates the tables
+
+    rng = np.random.default_rng(3)
+    crops = rng.integers(0, len(COMMODITIES), args.tokens)
+    quantities = rng.integers(1, 500, args.tokens)
+    owners = rng.integers(1, args.farmers + 1, args.tokens)
+    start_prices = {name: 100 + 50 * i for i, name in enumerate(COMMODITIES)}
+
+    users = agrifund.User.__table__
+    profiles = agrifund.FarmerProfile.__table__
+    tokens = agrifund.RWAToken.__table__
+    started = time.perf_counter()
+    with agrifund.app.app_context(), agrifund.db.engine.begin() as conn:
+        conn.execute(users.insert(), [{
+            'id': i, 'hedera_account_id': f'0.0.{100000 + i}', 'user_type': 'farmer',
+            'name': f'Farmer {i}', 'email': f'farmer{i}@example.com'
+        } for i in range(1, args.farmers + 1)])
+        totals = np.zeros(args.farmers + 1, dtype=np.int64)
+        np.add.at(totals, owners, quantities * np.array([start_prices[COMMODITIES[c]] for c in crops]))
+        conn.execute(profiles.insert(), [
+            {'id': i, 'user_id': i, 'total_collateral_value': int(totals[i]) * UNIT} for i in range(1, args.farmers + 1)
+        ])
+        batch = 50000
+        for offset in range(0, args.tokens, batch):
+            conn.execute(tokens.insert(), [{
+                'token_id': f'0.0.{i}', 'owner_id': int(owners[i]), 'crop_type': COMMODITIES[crops[i]],
+                'quantity': int(quantities[i]), 'current_price': start_prices[COMMODITIES[crops[i]]] * UNIT, 'is_pledged': False
+            } for i in range(offset, min(offset + batch, args.tokens))])
+    print(f"tokens={args.tokens} farmers={args.farmers} loaded in {time.perf_counter() - started:.1f}s "
+          f"({args.database_url.split(':')[0]})")
+
+    # Per-row ORM loop on a sample of one commodity (what a naive revaluation does)
+    with agrifund.app.app_context():
+        sample = agrifund.RWAToken.query.filter_by(crop_type='millet').limit(args.orm_sample).all()
+        started = time.perf_counter()
+        for token in sample:
+            delta = token.quantity * (999 * UNIT - token.current_price)
+            token.owner.farmer_profile.total_collateral_value += delta
+            token.current_price = 999 * UNIT
+        agrifund.db.session.rollback()
+        orm_per_token = (time.perf_counter() - started) / len(sample)
+    print(f"orm loop:  {orm_per_token * 1e6:8.1f} us/token -> ~{orm_per_token * args.tokens:.0f}s for all tokens (flush not included)")
+
+    new_prices = [start_prices[name] * 1.1 for name in COMMODITIES]
+    started = time.perf_counter()
+    response = client.post('/api/prices/batch', json={
+        'commodities': COMMODITIES, 'prices': new_prices, 'confidences': [9000] * len(COMMODITIES)
+    })
+    elapsed = time.perf_counter() - started
+    revalued = sum(entry['tokens_revalued'] for entry in response.get_json()['updated'])
+    print(f"batch API: {elapsed:8.2f} s for {revalued} tokens ({revalued / elapsed:,.0f} tokens/s)")
+    assert revalued == args.tokens
+
+    # Farmer totals must equal a full recomputation
+    with agrifund.app.app_context(), agrifund.db.engine.connect() as conn:
+        recomputed = dict(conn.execute(
+            agrifund.db.select(tokens.c.owner_id, agrifund.db.func.sum(tokens.c.quantity * tokens.c.current_price))
+            .group_by(tokens.c.owner_id)
+        ).all())
+        stored = dict(conn.execute(agrifund.db.select(profiles.c.user_id, profiles.c.total_collateral_value)).all())
+    drift = max(abs(stored[owner] - total) for owner, total in recomputed.items()) / UNIT
+    print(f"max farmer total drift vs recomputation: {drift:.2f}")
+    assert drift < 0.01 * args.tokens / args.farmers
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# Harness: hash sharding over N local databases, scatter-gather and resharding
+#
+# Spins up N SQLite shards (or uses the PostgreSQL URLs given), drives the API
+# through the Flask test client, times the scatter-gather endpoints, then
+# reshards to N+1 databases and checks that nothing was lost and only about
+# 1/(N+1) of the users moved.
+#
+# Usage: python backend/benchmarks/bench_sharding.py [--shards 4] [--users 400]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+def count_rows(urls):
+    from sqlalchemy import create_engine, text
+
+    totals = {}
+    user_ids = []
+    for url in urls:
+        with create_engine(url).connect() as conn:
+            for table in ('users', 'rwa_tokens', 'loans'):
+                totals[table] = totals.get(table, 0) + conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+            user_ids.extend(conn.execute(text("SELECT id FROM users")).scalars())
+    assert len(user_ids) == len(set(user_ids)), 'user ids collide across shards'
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--users', type=int, default=400)
+    parser.add_argument('--shard-urls', help='comma-separated PostgreSQL URLs (N+1 of them; the last is the reshard target)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    if args.shard_urls:
+        all_urls = args.shard_urls.split(',')
+    else:
+        all_urls = [f"sqlite:///{os.path.join(workdir, f'shard{i}.db')}" for i in range(args.shards + 1)]
+    shard_urls, grown_urls = all_urls[:-1], all_urls
+
+    os.environ['COLLATERAL_TOKENS'] = json.dumps({crop: f'0x{i + 1:040x}' for i, crop in enumerate(['maize', 'cocoa'])})
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'primary.db')}"
+    os.environ['SHARD_DATABASE_URLS'] = ','.join(shard_urls)
+
+    import app as agrifund
+    from api.analytics import compute_analytics_summary
+    from sharding import reshard, shard_sizes
+
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    for route in ('tokens.mint_rwa_token', 'loans.create_loan', 'loans.fund_loan', 'loans.get_loan_opportunities'):
+        agrifund.RATE_LIMITS[route] = (1e9, 1e9)
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+
+    client = agrifund.app.test_client()
+    farmers = [f'0.0.{2000 + i}' for i in range(args.users // 2)]
+    lenders = [f'0.0.{9000 + i}' for i in range(args.users // 2)]
+
+    started = time.perf_counter()
+    for user_type, accounts in (('farmer', farmers), ('lender', lenders)):
+        for account in accounts:
+            assert client.post('/api/users/register', json={
+                'hedera_account_id': account, 'user_type': user_type,
+                'name': account, 'email': f'{account}@example.com'
+            }).status_code == 201
+
+    contracts = []
+    for i, account in enumerate(farmers):
+        token = client.post('/api/tokens/mint', json={
+            'owner_hedera_id': account, 'crop_type': ['maize', 'cocoa'][i % 2],
+            'quantity': 100, 'warehouse_location': 'Kumba'
+        }).get_json()['token_id']
+        response = client.post('/api/loans/create', json={
+            'borrower_hedera_id': account, 'amount': 1000, 'interest_rate': 8 + i % 5,
+            'duration_months': 6, 'collateral_token_id': token
+        })
+        assert response.status_code == 201, response.get_json()
+        contracts.append(response.get_json()['contract_id'])
+
+    for i, contract_id in enumerate(contracts[::2]):
+        assert client.post('/api/loans/fund', json={
+            'contract_id': contract_id, 'lender_hedera_id': lenders[i % len(lenders)]
+        }).status_code == 200
+    load_elapsed = time.perf_counter() - started
+
+    print(f"shards={len(shard_urls)} users={args.users} loaded in {load_elapsed:.1f}s")
+    print(f"users per shard:         {shard_sizes(shard_urls)}")
+
+    for path in ('/api/loans/opportunities', '/api/loans/opportunities?crop_type=cocoa'):
+        t0 = time.perf_counter()
+        body = client.get(path).get_json()
+        print(f"{path:42s} {len(body['opportunities']):5d} rows  {(time.perf_counter() - t0) * 1000:7.2f} ms")
+
+    t0 = time.perf_counter()
+    with agrifund.app.app_context():
+        summary = compute_analytics_summary()
+    print(f"{'analytics summary (scatter)':42s} {(time.perf_counter() - t0) * 1000:13.2f} ms")
+    assert summary['total_loans'] == len(contracts)
+    assert summary['funded_loans'] == len(contracts[::2])
+    assert summary['active_farmers'] + summary['active_lenders'] == args.users
+
+    before = count_rows(shard_urls)
+    t0 = time.perf_counter()
+    moved = reshard(shard_urls, grown_urls)
+    after = count_rows(grown_urls)
+    print(f"reshard {len(shard_urls)} -> {len(grown_urls)}: moved {moved} users "
+          f"({moved / args.users:.1%}, ideal {1 / len(grown_urls):.1%}) in {time.perf_counter() - t0:.2f}s")
+    print(f"users per shard:         {shard_sizes(grown_urls)}")
+    assert before == after, (before, after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# Benchmark: worker cold start and first-request latency, lazy vs preloaded
+#
+# Lazy is what `python app.py` and a plain pre-fork server without preload do.
+# Each worker process imports app.py, and its first request creates the
+# schema, opens a connection and loads the price from the database.
+# Preloaded follows the lifecycle in gunicorn.conf.py. One process imports
+# app.py and runs prepare_preload(); each forked worker runs after_fork() and
+# warm_worker(). It is timed from fork() until it could accept connections,
+# then through its first request. Both modes serve the same request mix
+# against a database that already holds the schema and an hour-old price
+# history, like a restart in production.
+#
+# Usage: python backend/benchmarks/bench_startup.py [--workers 4]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, BACKEND)
+
+FIRST_REQUESTS = ['/api/prices/maize', '/api/users/0.0.9999', '/api/health']
+
+LAZY_WORKER = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+latencies = []
+for url in json.loads(sys.argv[1]):
+    request_started = time.perf_counter()
+    client.get(url)
+    latencies.append((time.perf_counter() - request_started) * 1000)
+print(json.dumps({'ready_ms': (imported - started) * 1000, 'latencies': latencies}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    os.environ.setdefault('CELERY_BROKER_URL', 'memory://')  # preloading builds Celery; no job is queued
+    subprocess.run([sys.executable, '-c', "import app; app.app.test_client().post('/api/prices/refresh')"],
+                   cwd=BACKEND, check=True)
+
+    lazy = []
+    for _ in range(args.workers):
+        output = subprocess.run([sys.executable, '-c', LAZY_WORKER, json.dumps(FIRST_REQUESTS)], cwd=BACKEND,
+                                check=True, capture_output=True, text=True).stdout
+        lazy.append(json.loads(output.strip().splitlines()[-1]))
+
+    started = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+    app.prepare_preload()
+    master_ms = (time.perf_counter() - started) * 1000
+    print(f"preloaded master: import {(imported - started) * 1000:.0f} ms + "
+          f"prepare_preload {app.startup_metrics['preload_ms']:.0f} ms, once for all workers")
+
+    preloaded = []
+    for _ in range(args.workers):
+        read_end, write_end = os.pipe()
+        forked = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            app.after_fork()
+            app.warm_worker()
+            ready_ms = (time.perf_counter() - forked) * 1000
+            client = app.app.test_client()
+            latencies = []
+            for url in FIRST_REQUESTS:
+                request_started = time.perf_counter()
+                client.get(url)
+                latencies.append((time.perf_counter() - request_started) * 1000)
+            os.write(write_end, json.dumps({'ready_ms': ready_ms, 'latencies': latencies}).encode())
+            os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as pipe:
+            preloaded.append(json.loads(pipe.read()))
+        os.waitpid(pid, 0)
+
+    def row(label, results):
+        ready = statistics.median(result['ready_ms'] for result in results)
+        first = [statistics.median(result['latencies'][i] for result in results) for i in range(len(FIRST_REQUESTS))]
+        total = statistics.median(sum(result['latencies']) for result in results)
+        print(f"{label:<12} {ready:>14.1f} " + ' '.join(f'{value:>22.2f}' for value in first) + f' {total:>8.2f}')
+        return ready, first, total
+
+    print(f"\nmedian over {args.workers} workers (ms)")
+    print(f"{'':<12} {'worker ready':>14} " + ' '.join(f'{url:>22}' for url in FIRST_REQUESTS) + f" {'total':>8}")
+    lazy_ready, lazy_first, lazy_total = row('lazy', lazy)
+    warm_ready, warm_first, warm_total = row('preloaded', preloaded)
+    print(f"\nfirst request: {lazy_first[0]:.1f} ms -> {warm_first[0]:.1f} ms; first {len(FIRST_REQUESTS)} requests: "
+          f"{lazy_total:.1f} ms -> {warm_total:.1f} ms; worker ready: {lazy_ready:.0f} ms -> {warm_ready:.0f} ms "
+          f"after a {master_ms:.0f} ms master start")
+
+
+if __name__ == '__main__':
+    main()
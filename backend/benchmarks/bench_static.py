@@ -0,0 +1,105 @@
+# Benchmark: fingerprinted, precompressed frontend serving
+#
+# Builds frontend/ with static_assets.build. It reports what a first visit
+# downloads (index.html and everything it references), uncompressed and with
+# the best precompressed variant. A repeat visit revalidates index.html and
+# manifest.json (304) and takes every fingerprinted asset from the browser
+# cache. Then it times requests for js/app.js through the StaticAssets
+# middleware against the same file sent by a Flask route with
+# send_from_directory, which goes through routing and the admission hooks.
+#
+# Usage: python backend/benchmarks/bench_static.py [--requests 5000]
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+FRONTEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'frontend'))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'static.db')}")
+    args = parser.parse_args()
+
+    dist = os.path.join(tempfile.mkdtemp(), 'dist')
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['FRONTEND_DIST'] = dist
+
+    import static_assets
+    started = time.perf_counter()
+    manifest = static_assets.build(FRONTEND, dist)
+    print(f"build: {len(manifest['assets'])} assets in {time.perf_counter() - started:.2f} s")
+
+    from flask import send_from_directory
+
+    import app as agrifund
+
+    agrifund.ACCOUNT_RATE_LIMIT = (1e9, 1e9)
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)
+    agrifund.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    for name in agrifund.RATE_LIMITS:
+        agrifund.RATE_LIMITS[name] = (1e9, 1e9)
+
+    @agrifund.app.route('/plain/<path:filename>')
+    def plain_static(filename):
+        return send_from_directory(FRONTEND, filename)
+
+    client = agrifund.app.test_client()
+    compressed = {'Accept-Encoding': 'br, gzip'}
+
+    # First visit: the page and everything it links to
+    page = client.get('/', headers=compressed)
+    assert page.status_code == 200 and page.headers['Cache-Control'] == 'no-cache'
+    html = client.get('/').get_data(as_text=True)
+    urls = ['/' + path for path in re.findall(r'''(?:src|href)="(?!//)([^"#:]+)"''', html) if path.strip('/')]
+    plain_bytes = len(html.encode())
+    wire_bytes = len(page.data)
+    for url in urls:
+        response = client.get(url, headers=compressed)
+        assert response.status_code == 200, url
+        stable = url.lstrip('/') in static_assets.STABLE_FILES
+        assert response.headers['Cache-Control'] == ('no-cache' if stable else static_assets.IMMUTABLE), url
+        wire_bytes += len(response.data)
+        plain_bytes += manifest['files'][url.lstrip('/')]['size']
+    print(f"first visit: {len(urls) + 1} requests, {plain_bytes / 1024:.1f} KiB uncompressed, "
+          f"{wire_bytes / 1024:.1f} KiB on the wire ({plain_bytes / wire_bytes:.1f}x smaller)")
+
+    # Repeat visit: only the unhashed files are revalidated
+    revalidate = ['/'] + [url for url in urls if url.lstrip('/') in static_assets.STABLE_FILES]
+    for url in revalidate:
+        etag = client.get(url, headers=compressed).headers['ETag']
+        revalidated = client.get(url, headers={**compressed, 'If-None-Match': etag})
+        assert revalidated.status_code == 304 and not revalidated.data
+    print(f"repeat visit: {len(revalidate)} requests (304, no body), {len(urls) + 1 - len(revalidate)} assets from cache")
+
+    hashed = '/' + manifest['assets']['js/app.js']
+    original = open(os.path.join(FRONTEND, 'js', 'app.js'), 'rb').read()
+    assert client.get('/plain/js/app.js').data == original
+    assert client.get(hashed, headers={'Accept-Encoding': 'identity'}).data == original
+
+    def timed(url, headers):
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            response = client.get(url, headers=headers)
+            response.close()
+        assert response.status_code == 200
+        return args.requests / (time.perf_counter() - started)
+
+    plain = timed('/plain/js/app.js', {})
+    middleware = timed(hashed, {})
+    middleware_gzip = timed(hashed, {'Accept-Encoding': 'gzip'})
+    print(f"Flask send_from_directory:       {plain:8.0f} req/s")
+    print(f"StaticAssets middleware:         {middleware:8.0f} req/s ({middleware / plain:.1f}x)")
+    print(f"StaticAssets, gzip variant:      {middleware_gzip:8.0f} req/s "
+          f"({manifest['files'][hashed.lstrip('/')]['encodings'].get('gzip', 0) / 1024:.1f} KiB instead of "
+          f"{len(original) / 1024:.1f} KiB)")
+
+
+if __name__ == '__main__':
+    main()
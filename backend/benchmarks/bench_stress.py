@@ -0,0 +1,110 @@
+# Benchmark: Monte Carlo stress engine on a large synthetic book
+#
+# Builds a book of funded loans (lenders, commodities, owed amounts and
+# collateral values with LTVs up to the 85% origination limit) and fits the
+# price model to a year of correlated synthetic daily closes. Then times
+# stress.run for the requested paths with a cocoa shock. A sample of paths is
+# checked against a direct per-loan, per-day liquidation loop, which also
+# gives the naive cost. With --compare-workers it checks the pooled run
+# matches the single-process one.
+#
+# Usage: python backend/benchmarks/bench_stress.py [--loans 1000000] [--paths 10000] [--workers N]
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import stress  # noqa: E402
+
+COMMODITIES = ['cocoa', 'coffee', 'maize', 'millet', 'rice', 'sorghum', 'wheat']
+
+
+def synthetic_closes(rng, days=365):
+    """Daily closes with a common factor (correlation ~0.4) and per-commodity volatility"""
+    volatility = np.linspace(0.2, 0.45, len(COMMODITIES)) / np.sqrt(365)
+    common = rng.standard_normal(days)
+    noise = rng.standard_normal((days, len(COMMODITIES)))
+    returns = (0.63 * common[:, None] + 0.77 * noise) * volatility
+    prices = 200 * np.exp(np.cumsum(returns, axis=0))
+    start = date(2025, 1, 1)
+    return {c: [(start + timedelta(days=d), prices[d, i]) for d in range(days)] for i, c in enumerate(COMMODITIES)}
+
+
+def naive_losses(book_arrays, relative, threshold, recovery):
+    """Per-loan, per-day liquidation check for one path (what the engine replaces)"""
+    lenders, commodity_index, owed, value = book_arrays
+    loss = 0.0
+    for i in range(len(owed)):
+        path = relative[:, commodity_index[i]]
+        for price in path:
+            if owed[i] >= threshold * value[i] * price:
+                loss += max(0.0, owed[i] - recovery * value[i] * price)
+                break
+    return loss
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--loans', type=int, default=1000000)
+    parser.add_argument('--lenders', type=int, default=2000)
+    parser.add_argument('--paths', type=int, default=10000)
+    parser.add_argument('--horizon-days', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--check-paths', type=int, default=3)
+    parser.add_argument('--compare-workers', action='store_true')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    lenders = rng.integers(1, args.lenders + 1, args.loans)
+    commodity_index = rng.integers(0, len(COMMODITIES), args.loans)
+    value = rng.uniform(500, 20000, args.loans)
+    owed = value * rng.uniform(0.3, 0.85, args.loans) * 1.04  # LTV at origination plus interest to the horizon
+
+    started = time.perf_counter()
+    book = stress.Book(lenders, np.array(COMMODITIES)[commodity_index], owed, value)
+    model = stress.PriceModel.fit(book.commodities, synthetic_closes(rng))
+    print(f"book: {args.loans:,} loans, {len(book.lenders)} lenders, {len(book.commodities)} commodities "
+          f"(built and model fitted in {time.perf_counter() - started:.1f}s)")
+
+    shocks = {'cocoa': -0.30}
+    started = time.perf_counter()
+    result = stress.run(book, model, n_paths=args.paths, horizon_days=args.horizon_days, shocks=shocks,
+                        seed=7, workers=args.workers, top_lenders=5)
+    elapsed = time.perf_counter() - started
+    platform = result['platform']
+    print(f"engine: {args.paths:,} paths x {args.horizon_days} days in {elapsed:.1f}s with {args.workers} worker(s) "
+          f"({args.loans * args.paths / elapsed / 1e6:,.0f}M loan-paths/s)")
+    print(f"  exposure {platform['exposure']:,.0f}  expected loss {platform['expected_loss']:,.0f}  "
+          f"VaR99 {platform['var_0.99']:,.0f}  ES99 {platform['expected_shortfall_0.99']:,.0f}  "
+          f"expected liquidations {platform['expected_liquidations']:,.0f}")
+    print(f"  cocoa: {result['commodities']['cocoa']}")
+    print(f"  worst lender: {result['lenders'][0]}")
+
+    # Direct check of the liquidation model on a few paths and a slice of the book
+    sample = slice(0, 20000)
+    small = stress.Book(lenders[sample], np.array(COMMODITIES)[commodity_index[sample]], owed[sample], value[sample])
+    paths = stress.simulate_paths(np.random.default_rng(1), model, args.check_paths, args.horizon_days,
+                                  np.array([1 + shocks.get(c, 0.0) for c in model.commodities]))
+    started = time.perf_counter()
+    expected = [naive_losses((lenders[sample], commodity_index[sample], owed[sample], value[sample]), path,
+                             stress.LIQUIDATION_THRESHOLD, stress.RECOVERY_RATE) for path in paths]
+    naive_per_loan_path = (time.perf_counter() - started) / (args.check_paths * len(owed[sample]))
+    computed = [stress.path_losses(small, path)[1].sum() for path in paths]
+    assert np.allclose(expected, computed), (expected, computed)
+    print(f"naive loop: {naive_per_loan_path * 1e6:.1f} us per loan-path -> "
+          f"~{naive_per_loan_path * args.loans * args.paths / 3600:,.0f} h for the full run (matches on {args.check_paths} paths)")
+
+    if args.compare_workers and args.workers > 1:
+        single = stress.run(book, model, n_paths=args.paths, horizon_days=args.horizon_days, shocks=shocks,
+                            seed=7, workers=1, top_lenders=5)
+        assert single == result
+        print("single-process run gives identical results")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# Benchmark: request trace recording and replay
+#
+# Records a mixed workload with TRACE_LOG set: farmer sign-ups, mint bursts,
+# dashboard polling, loan requests, opportunity listings and audit queries.
+# It reports the trace size and what recording adds to a request. Then it
+# starts `python app.py` on a fresh database with STATEMENT_COUNT_HEADER=true
+# and replays the trace against it at --speed, printing the per-route report
+# that `python traces.py replay` gives.
+#
+# Usage: python backend/benchmarks/bench_traces.py [--farmers 40] [--speed 5] [--concurrency 8]
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import requests
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, BACKEND)
+
+
+def record_workload(client, farmers, rng):
+    lender = {'hedera_account_id': '0.0.7000', 'user_type': 'lender', 'name': 'Lender One', 'email': 'lender@example.com'}
+    client.post('/api/users/register', json=lender)
+    tokens = {}
+    for i in range(farmers):
+        account = f'0.0.{8000 + i}'
+        client.post('/api/users/register', json={
+            'hedera_account_id': account, 'user_type': 'farmer', 'name': f'Farmer Number {i}',
+            'email': f'farmer{i}@example.com', 'phone': f'07{12345678 + i}', 'location': 'Nakuru, Kenya'})
+        # A mint burst right after sign-up
+        for _ in range(rng.randint(2, 6)):
+            response = client.post('/api/tokens/mint', json={
+                'owner_hedera_id': account, 'crop_type': rng.choice(['maize', 'coffee', 'rice']),
+                'quantity': rng.randint(50, 500), 'quality_grade': 'A', 'warehouse_location': 'Nakuru Store 4'})
+            if response.status_code == 201:
+                tokens.setdefault(account, []).append(response.get_json()['token_id'])
+        # Dashboard polling
+        for _ in range(rng.randint(3, 8)):
+            client.get(f'/api/users/{account}')
+            client.get(f'/api/tokens/user/{account}')
+        if tokens.get(account) and rng.random() < 0.5:
+            client.post('/api/loans/create', json={
+                'borrower_hedera_id': account, 'collateral_token_id': tokens[account][0], 'amount': 500,
+                'interest_rate': 12, 'duration_months': 6, 'purpose': 'Fertilizer for the long rains'})
+        if i % 5 == 0:
+            client.get('/api/loans/opportunities')
+            client.get('/api/audit/trail', query_string={'limit': 50})
+            client.get('/api/analytics/summary')
+        time.sleep(rng.uniform(0, 0.02))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--farmers', type=int, default=40)
+    parser.add_argument('--speed', type=float, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    trace_path = os.path.join(workdir, 'trace.jsonl')
+    os.environ['COLLATERAL_TOKENS'] = json.dumps({crop: f'0x{i + 1:040x}' for i, crop in enumerate(['maize', 'coffee', 'rice'])})
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'recorded.db')}"
+    os.environ['TRACE_LOG'] = trace_path
+
+    import app as agrifund
+    import traces
+    from extensions import services
+
+    agrifund.ADDRESS_RATE_LIMIT = (1e9, 1e9)  # the recorded farmers all call from the test client's address
+    trace_recorder = services(agrifund.app)['trace_recorder']
+    client = agrifund.app.test_client()
+    client.get('/api/health')  # creates the tables
+    record_workload(client, args.farmers, random.Random(7))
+    trace_recorder.flush()
+
+    entries = traces.load_trace(trace_path)
+    size = os.path.getsize(trace_path)
+    print(f"recorded {len(entries)} requests over {entries[-1]['t'] - entries[0]['t']:.1f} s: "
+          f"{size / 1024:.1f} KiB ({size / len(entries):.0f} bytes/request)")
+    leaked = [field for field in ('Farmer Number', 'example.com', '0712345678', 'Nakuru', 'Fertilizer')
+              if field in open(trace_path).read()]
+    assert not leaked, f"trace contains personal data: {leaked}"
+
+    # Cost of building and writing one entry, measured on the recorded requests
+    sample = entries[-1]
+    started = time.perf_counter()
+    for _ in range(10000):
+        trace_recorder.record(sample)
+    print(f"recording cost: {(time.perf_counter() - started) / 10000 * 1e6:.1f} us/request")
+
+    server_env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'replay.db')}",
+                      PORT=str(args.port), STATEMENT_COUNT_HEADER='true')
+    server_env.pop('TRACE_LOG')
+    server = subprocess.Popen([sys.executable, 'app.py'], cwd=BACKEND, env=server_env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{args.port}'
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f'{base_url}/api/health', timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        started = time.perf_counter()
+        results = traces.replay(entries, base_url, speed=args.speed, concurrency=args.concurrency)
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"replayed {len(results)} requests in {elapsed:.1f} s at {args.speed:g}x, concurrency {args.concurrency}")
+    report = traces.summarize(results)
+    print(traces.format_report(report))
+
+    # Where the replay diverged from the recording (fresh database, rate limits)
+    recorded = Counter((f"{entry['m']} {entry['r']}", entry['s']) for entry in entries)
+    replayed = Counter((result['route'], result.get('status')) for result in results)
+    for route, status in sorted(set(recorded) | set(replayed), key=str):
+        if recorded[route, status] != replayed[route, status]:
+            print(f"  {route} {status}: recorded {recorded[route, status]}, replayed {replayed[route, status]}")
+    with open(os.path.join(workdir, 'report.json'), 'w') as f:
+        json.dump(report, f)
+
+
+if __name__ == '__main__':
+    main()
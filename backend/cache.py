@@ -0,0 +1,225 @@
+# Hedera AgriFund Backend - Shared cross-worker cache
+#
+# Two tiers: a small per-process dict in front of a shared Redis-protocol
+# store. Writes delete the shared entry and broadcast an invalidation message
+# on a pub/sub channel so every worker drops its local copy. MemoryBackend is
+# an in-process stand-in (shared dict + synchronous pub/sub) for tests and
+# single-process development. Both dicts drop their expired entries every
+# `sweep_interval` seconds, so they hold only what was cached recently.
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'agrifund:cache:invalidate'
+
+
+def unexpired(entries, now):
+    """The (expires, value) entries that have not expired yet"""
+    return {key: entry for key, entry in entries.items() if entry[0] > now}
+
+
+class MemoryBackend:
+    """In-process stand-in for Redis: shared dict plus synchronous pub/sub"""
+
+    def __init__(self, sweep_interval=60.0):
+        self._data = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._data = unexpired(self._data, now)
+                self._next_sweep = now + self.sweep_interval
+            self._data[key] = (now + ttl, value)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._data.pop(key, None)
+
+    def publish(self, channel, message):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, []))
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+    def after_fork(self):
+        pass  # each forked worker keeps its own copy, as with any process-local store
+
+
+class RedisBackend:
+    """Shared store and invalidation bus on any Redis-protocol server"""
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self._pubsub = None
+        self._listener = None
+        self._channels = {}
+
+    def get(self, key):
+        value = self.client.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def publish(self, channel, message):
+        self.client.publish(channel, message)
+
+    def subscribe(self, channel, callback):
+        if self._pubsub is None:
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._channels[channel] = callback
+        self._pubsub.subscribe(**{channel: lambda message: callback(message['data'].decode())})
+        if self._listener is None:
+            # One listener thread serves every channel (cache invalidations, relayed events)
+            self._listener = self._pubsub.run_in_thread(sleep_time=0.01, daemon=True)
+
+    def after_fork(self):
+        """The listener thread does not survive fork(): subscribe again on a connection of our own"""
+        self.client.connection_pool.reset()
+        channels, self._pubsub, self._listener, self._channels = self._channels, None, None, {}
+        for channel, callback in channels.items():
+            self.subscribe(channel, callback)
+
+
+class SharedCache:
+    """Two-tier JSON cache with broadcast invalidation"""
+
+    def __init__(self, backend, namespace='agrifund', local_ttl=5, default_ttl=60, sweep_interval=60.0):
+        self.backend = backend
+        self.namespace = namespace
+        self.local_ttl = local_ttl
+        self.default_ttl = default_ttl
+        self.instance_id = uuid.uuid4().hex
+        self._local = {}
+        self._lock = threading.Lock()
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations_received': 0}
+        backend.subscribe(INVALIDATION_CHANNEL, self._on_invalidate)
+
+    def _key(self, kind, key):
+        return f"{self.namespace}:{kind}:{key}"
+
+    def get(self, kind, key):
+        """Return a cached value or None"""
+        full_key = self._key(kind, key)
+
+        entry = self._local.get(full_key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._stats['local_hits'] += 1
+            return entry[1]
+
+        try:
+            raw = self.backend.get(full_key)
+        except Exception as e:
+            logger.warning(f"Shared cache read failed: {str(e)}")
+            raw = None
+
+        if raw is None:
+            self._stats['misses'] += 1
+            return None
+
+        value = json.loads(raw)
+        self._remember(full_key, value, self.local_ttl)
+        self._stats['shared_hits'] += 1
+        return value
+
+    def set(self, kind, key, value, ttl=None):
+        full_key = self._key(kind, key)
+        ttl = ttl or self.default_ttl
+        self._remember(full_key, value, min(ttl, self.local_ttl))
+        try:
+            self.backend.set(full_key, json.dumps(value), ttl)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed: {str(e)}")
+
+    def _remember(self, full_key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._local = unexpired(self._local, now)
+                self._next_sweep = now + self.sweep_interval
+            self._local[full_key] = (now + ttl, value)
+
+    def get_or_set(self, kind, key, loader, ttl=None):
+        """Return the cached value, computing and storing it on a miss (None results are not cached)"""
+        value = self.get(kind, key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(kind, key, value, ttl)
+        return value
+
+    def invalidate(self, kind, *keys):
+        """Drop entries everywhere: locally, in the shared store and in every other worker"""
+        full_keys = [self._key(kind, key) for key in keys]
+        with self._lock:
+            for full_key in full_keys:
+                self._local.pop(full_key, None)
+        try:
+            self.backend.delete(*full_keys)
+            self.backend.publish(INVALIDATION_CHANNEL, json.dumps({'origin': self.instance_id, 'keys': full_keys}))
+        except Exception as e:
+            logger.warning(f"Cache invalidation broadcast failed: {str(e)}")
+
+    def _on_invalidate(self, message):
+        payload = json.loads(message)
+        if payload.get('origin') == self.instance_id:
+            return
+        with self._lock:
+            for full_key in payload.get('keys', []):
+                self._local.pop(full_key, None)
+        self._stats['invalidations_received'] += 1
+
+    def after_fork(self):
+        """Call in a worker forked from a process that already built the cache (gunicorn --preload)"""
+        # A new origin id, or every worker would ignore the others' invalidations as its own
+        self.instance_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._local = {}
+        self._stats = dict.fromkeys(self._stats, 0)
+        self.backend.after_fork()
+
+    def stats(self):
+        lookups = self._stats['local_hits'] + self._stats['shared_hits'] + self._stats['misses']
+        hits = self._stats['local_hits'] + self._stats['shared_hits']
+        return dict(self._stats, hit_rate=hits / lookups if lookups else 0.0)
+
+
+def make_cache(url=None, **kwargs):
+    """Build a cache on Redis when a URL is configured, otherwise in-process"""
+    if url:
+        try:
+            return SharedCache(RedisBackend(url), **kwargs)
+        except Exception as e:
+            logger.warning(f"Redis cache unavailable, falling back to in-process cache: {str(e)}")
+    return SharedCache(MemoryBackend(), **kwargs)
@@ -0,0 +1,169 @@
+# Hedera AgriFund Backend - OHLC candle rollups
+#
+# Every price written to price_oracles is also folded into 1h, 1d and 1w
+# candles (open, high, low, close, count and sum for the average) in
+# price_candles, in the same transaction. The fold is an upsert (or, on
+# databases without ON CONFLICT, an update-then-insert) that merges with
+# whatever the bucket already holds, so prices can arrive in any order
+# or in batches, and reading candles costs one primary-key range scan no
+# matter how long the raw history is (or whether it has been archived).
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import MetaData, Table, case, create_engine, delete, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# Bucket start for a timestamp, per interval (weeks start on Monday, UTC)
+INTERVALS = {
+    '1h': lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    '1d': lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+    '1w': lambda ts: (ts - timedelta(days=ts.weekday())).replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+
+def fold(prices):
+    """Merge (commodity, price, timestamp) tuples into one partial candle per bucket"""
+    candles = {}
+    for commodity, price, timestamp in prices:
+        for interval, bucket_of in INTERVALS.items():
+            key = (commodity, interval, bucket_of(timestamp))
+            candle = candles.get(key)
+            if candle is None:
+                candles[key] = {
+                    'commodity': commodity, 'interval': interval, 'bucket_start': key[2],
+                    'open': price, 'open_at': timestamp, 'high': price, 'low': price,
+                    'close': price, 'close_at': timestamp, 'price_count': 1, 'price_sum': price,
+                }
+                continue
+            if timestamp < candle['open_at']:
+                candle['open'], candle['open_at'] = price, timestamp
+            if timestamp >= candle['close_at']:
+                candle['close'], candle['close_at'] = price, timestamp
+            candle['high'] = max(candle['high'], price)
+            candle['low'] = min(candle['low'], price)
+            candle['price_count'] += 1
+            candle['price_sum'] += price
+    return list(candles.values())
+
+
+def _merged(table, new, greatest, least):
+    """Column values merging a partial candle (`new`, columns or values by name) into the stored one"""
+    return {
+        'open': case((new['open_at'] < table.c.open_at, new['open']), else_=table.c.open),
+        'open_at': least(table.c.open_at, new['open_at']),
+        'high': greatest(table.c.high, new['high']),
+        'low': least(table.c.low, new['low']),
+        'close': case((new['close_at'] >= table.c.close_at, new['close']), else_=table.c.close),
+        'close_at': greatest(table.c.close_at, new['close_at']),
+        'price_count': table.c.price_count + new['price_count'],
+        'price_sum': table.c.price_sum + new['price_sum'],
+    }
+
+
+def _upsert(conn, table):
+    """INSERT ... ON CONFLICT DO UPDATE merging a partial candle into the stored one (None where unsupported)"""
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        greatest, least = func.greatest, func.least
+    elif conn.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        greatest, least = func.max, func.min
+    else:
+        return None
+
+    statement = dialect_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=['commodity', 'interval', 'bucket_start'],
+        set_=_merged(table, statement.excluded, greatest, least)
+    )
+
+
+def _merge_candle(conn, table, candle):
+    """Merge one partial candle by UPDATE, inserting the bucket when it does not exist yet"""
+    new = {name: literal(value, table.c[name].type) for name, value in candle.items()}
+    merge = update(table).where(
+        table.c.commodity == candle['commodity'], table.c.interval == candle['interval'],
+        table.c.bucket_start == candle['bucket_start']
+    ).values(_merged(table, new, lambda a, b: case((b > a, b), else_=a), lambda a, b: case((b < a, b), else_=a)))
+    if conn.execute(merge).rowcount:
+        return
+    try:
+        with conn.begin_nested():
+            conn.execute(insert(table).values(candle))
+    except IntegrityError:
+        conn.execute(merge)  # another transaction inserted the bucket first
+
+
+def record_prices(conn, table, prices):
+    """Fold new (commodity, price, timestamp) tuples into the candle table on this connection"""
+    candles = fold(prices)
+    upsert = _upsert(conn, table)
+    if upsert is None:
+        for candle in candles:
+            _merge_candle(conn, table, candle)
+    elif candles:
+        conn.execute(upsert, candles)
+    return len(candles)
+
+
+def read_candles(conn, table, commodity, interval, start=None, end=None, limit=200):
+    """The most recent `limit` candles in [start, end), oldest first"""
+    statement = select(table).where(table.c.commodity == commodity, table.c.interval == interval)
+    if start:
+        statement = statement.where(table.c.bucket_start >= start)
+    if end:
+        statement = statement.where(table.c.bucket_start < end)
+    rows = conn.execute(statement.order_by(table.c.bucket_start.desc()).limit(limit)).all()
+    return rows[::-1]
+
+
+def rebuild(engine, since=None, batch_size=50000):
+    """Recompute candles from the price_oracles rows still in the database
+
+    Only buckets from the first week boundary at or after `since` (default: the
+    oldest stored price) are replaced, so candles of archived months survive.
+    Returns (rebuilt_from, prices_folded).
+    """
+    metadata = MetaData()
+    prices = Table('price_oracles', metadata, autoload_with=engine)
+    candles = Table('price_candles', metadata, autoload_with=engine)
+
+    with engine.connect() as conn:
+        since = since or conn.execute(select(func.min(prices.c.timestamp))).scalar()
+    if since is None:
+        return None, 0
+    week_start = INTERVALS['1w'](since)
+    rebuilt_from = week_start if week_start == since else week_start + timedelta(weeks=1)
+
+    statement = select(prices.c.commodity, prices.c.price_usd, prices.c.timestamp) \
+        .where(prices.c.timestamp >= rebuilt_from).order_by(prices.c.commodity, prices.c.timestamp)
+
+    folded = 0
+    with engine.connect() as reader, engine.begin() as writer:
+        writer.execute(delete(candles).where(candles.c.bucket_start >= rebuilt_from))
+        result = reader.execution_options(stream_results=True, max_row_buffer=batch_size).execute(statement)
+        while True:
+            batch = result.fetchmany(batch_size)
+            if not batch:
+                break
+            record_prices(writer, candles, batch)
+            folded += len(batch)
+    logger.info(f"Rebuilt candles from {rebuilt_from:%Y-%m-%d} using {folded} prices")
+    return rebuilt_from, folded
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Maintain OHLC price candles')
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'postgresql://localhost/hedera_agrifund'))
+    parser.add_argument('--since', type=datetime.fromisoformat, help='rebuild buckets from this date (default: oldest stored price)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    rebuilt_from, folded = rebuild(create_engine(args.database_url), since=args.since)
+    print(f"Folded {folded} prices into candles" + (f" from {rebuilt_from:%Y-%m-%d}" if rebuilt_from else ''))
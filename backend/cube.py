@@ -0,0 +1,211 @@
+# Hedera AgriFund Backend - Analytics cube
+#
+# Token and loan figures pre-aggregated by crop, farmer region, quality grade
+# and creation month in analytics_cube. Minting a token, creating a loan and
+# funding it each upsert their additive deltas (counts, amounts, LTV and rate
+# sums) into one cell in the same transaction, on the same shard, as the write
+# itself. Queries roll cells up to any subset of the dimensions with a GROUP
+# BY over the cube, whose size depends on how many crops, regions, grades and
+# months there are, not on how many loans and tokens. Shards keep their own
+# cells; readers add them up.
+#
+# PostgreSQL and SQLite fold a batch with one INSERT ... ON CONFLICT; other
+# databases update each cell and insert the ones that do not exist yet.
+import functools
+import logging
+import os
+from datetime import date
+
+from sqlalchemy import MetaData, Table, create_engine, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('crop_type', 'region', 'quality_grade', 'month')
+MEASURES = ('tokens', 'token_quantity', 'loans', 'loan_amount', 'ltv_sum', 'interest_rate_sum',
+            'funded_loans', 'funded_amount')
+UNKNOWN = 'unknown'
+
+
+def month_of(timestamp):
+    return date(timestamp.year, timestamp.month, 1)
+
+
+@functools.lru_cache(maxsize=4096)
+def region_of(location):
+    """The gazetteer place a farmer's free-text location resolves to"""
+    import geo
+
+    return geo.place(location) or UNKNOWN
+
+
+def fact(crop_type, quality_grade, location, created_at, **measures):
+    """One cell's deltas: the four dimension values and every measure (0 unless given)"""
+    cell = {
+        'crop_type': crop_type or UNKNOWN,
+        'region': region_of(location),
+        'quality_grade': quality_grade or UNKNOWN,
+        'month': month_of(created_at),
+    }
+    cell.update(dict.fromkeys(MEASURES, 0))
+    cell.update(measures)
+    return cell
+
+
+def token_created(crop_type, quality_grade, owner_location, created_at, quantity):
+    return fact(crop_type, quality_grade, owner_location, created_at, tokens=1, token_quantity=quantity)
+
+
+def loan_created(crop_type, quality_grade, borrower_location, created_at, amount, ltv_ratio, interest_rate):
+    """A new loan, in the cell of its collateral token and origination month"""
+    return fact(crop_type, quality_grade, borrower_location, created_at, loans=1, loan_amount=amount,
+                ltv_sum=ltv_ratio or 0, interest_rate_sum=interest_rate)
+
+
+def loan_funded(crop_type, quality_grade, borrower_location, created_at, amount):
+    """A funded loan, counted in its origination month"""
+    return fact(crop_type, quality_grade, borrower_location, created_at, funded_loans=1, funded_amount=amount)
+
+
+def fold(facts):
+    """Sum facts that fall into the same cell"""
+    cells = {}
+    for cell in facts:
+        key = tuple(cell[name] for name in DIMENSIONS)
+        if key in cells:
+            for name in MEASURES:
+                cells[key][name] += cell[name]
+        else:
+            cells[key] = dict(cell)
+    return list(cells.values())
+
+
+def _upsert(conn, table):
+    """INSERT ... ON CONFLICT DO UPDATE adding the deltas to the stored cell (None where unsupported)"""
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif conn.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+
+    statement = dialect_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=list(DIMENSIONS),
+        set_={name: table.c[name] + statement.excluded[name] for name in MEASURES}
+    )
+
+
+def _add_cell(conn, table, cell):
+    """Add one cell's deltas by UPDATE, inserting the cell when it does not exist yet"""
+    key = [table.c[name] == cell[name] for name in DIMENSIONS]
+    add = update(table).where(*key).values({name: table.c[name] + cell[name] for name in MEASURES})
+    if conn.execute(add).rowcount:
+        return
+    try:
+        with conn.begin_nested():
+            conn.execute(insert(table).values(cell))
+    except IntegrityError:
+        conn.execute(add)  # another transaction inserted the cell first
+
+
+def record(conn, table, facts):
+    """Add facts to the cube on this connection; returns the number of cells touched"""
+    cells = fold(facts)
+    upsert = _upsert(conn, table)
+    if upsert is None:
+        for cell in cells:
+            _add_cell(conn, table, cell)
+    elif cells:
+        conn.execute(upsert, cells)
+    return len(cells)
+
+
+def rollup_statement(table, by, filters=None, start=None, end=None):
+    """Measures summed over the cells matching filters ({dimension: [values]}) and months in [start, end], grouped by `by`"""
+    dimensions = [table.c[name] for name in by]
+    statement = select(*dimensions, *[func.sum(table.c[name]).label(name) for name in MEASURES])
+    for name, values in (filters or {}).items():
+        statement = statement.where(table.c[name].in_(values))
+    if start:
+        statement = statement.where(table.c.month >= start)
+    if end:
+        statement = statement.where(table.c.month <= end)
+    return statement.group_by(*dimensions)
+
+
+def merge(results, by):
+    """Add up the rolled-up rows of several shards: {dimension values: {measure: total}}"""
+    # Rows are the `by` dimensions followed by MEASURES (rollup_statement's column order)
+    width = len(by)
+    totals = {}
+    for rows in results:
+        for row in rows:
+            measures = row[width:]
+            if measures[0] is None:
+                continue  # the grand total of an empty cube
+            key = tuple(row[:width])
+            total = totals.get(key)
+            if total is None:
+                totals[key] = list(measures)
+            else:
+                for index, value in enumerate(measures):
+                    total[index] += value
+    return {key: dict(zip(MEASURES, total)) for key, total in totals.items()}
+
+
+def rebuild(engine, batch_size=50000):
+    """Recompute this database's cube from its tokens and loans; returns (tokens, loans) folded
+
+    Needed once for data written before the cube existed, and after loading
+    rows that bypassed the API.
+    """
+    metadata = MetaData()
+    users = Table('users', metadata, autoload_with=engine)
+    tokens = Table('rwa_tokens', metadata, autoload_with=engine)
+    loans = Table('loans', metadata, autoload_with=engine)
+    cube = Table('analytics_cube', metadata, autoload_with=engine)
+
+    token_rows = select(tokens.c.crop_type, tokens.c.quality_grade, users.c.location, tokens.c.created_at,
+                        tokens.c.quantity).select_from(tokens.join(users, tokens.c.owner_id == users.c.id))
+    loan_rows = select(
+        tokens.c.crop_type, tokens.c.quality_grade, users.c.location, loans.c.created_at, loans.c.amount,
+        loans.c.ltv_ratio, loans.c.interest_rate, loans.c.funded_at
+    ).select_from(loans.join(users, loans.c.borrower_id == users.c.id)
+                  .outerjoin(tokens, loans.c.collateral_token_id == tokens.c.token_id))
+
+    counts = []
+    with engine.connect() as reader, engine.begin() as writer:
+        writer.execute(delete(cube))
+        for statement, to_facts in (
+            (token_rows, lambda row: [token_created(*row)]),
+            (loan_rows, lambda row: [loan_created(*row[:7])] + ([loan_funded(*row[:5])] if row.funded_at else [])),
+        ):
+            folded = 0
+            result = reader.execution_options(stream_results=True, max_row_buffer=batch_size).execute(statement)
+            while True:
+                batch = result.fetchmany(batch_size)
+                if not batch:
+                    break
+                record(writer, cube, [cell for row in batch for cell in to_facts(row)])
+                folded += len(batch)
+            counts.append(folded)
+    logger.info(f"Rebuilt the analytics cube from {counts[0]} tokens and {counts[1]} loans")
+    return tuple(counts)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Maintain the analytics cube')
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'postgresql://localhost/hedera_agrifund'))
+    parser.add_argument('--shard-urls', default=os.environ.get('SHARD_DATABASE_URLS'),
+                        help='comma-separated shard URLs; each shard keeps its own cube')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    urls = args.shard_urls.split(',') if args.shard_urls else [args.database_url]
+    for index, url in enumerate(urls):
+        token_count, loan_count = rebuild(create_engine(url))
+        print(f"Database {index}: folded {token_count} tokens and {loan_count} loans into the cube")
@@ -0,0 +1,159 @@
+# Hedera AgriFund Backend - Server-sent event fan-out hub
+#
+# One hub per process. Publishers push price updates and loan status
+# transitions to topics ('price:<commodity>', 'account:<hedera_account_id>',
+# 'loans'); each connected client holds a bounded buffer and is subscribed to
+# the topics it asked for. A slow client never blocks publishers: when its
+# buffer is full the oldest events are dropped and counted.
+#
+# Given a bus (the cache backend's pub/sub), the hub also relays every event
+# it publishes on EVENTS_CHANNEL and delivers the events other processes
+# relay, so a client connected to one gunicorn worker (or the events server)
+# sees prices and loan updates published by any worker or Celery job.
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 100
+HEARTBEAT_SECONDS = 15
+EVENTS_CHANNEL = 'agrifund:events'
+
+
+class Subscriber:
+    """A connected client: a bounded event buffer plus a wake-up signal"""
+
+    def __init__(self, topics, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.topics = frozenset(topics)
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.connected = True
+        self._ready = threading.Event()
+
+    def push(self, event):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(event)
+        self._ready.set()
+
+    def drain(self, timeout=None):
+        """Wait for events and return everything buffered so far"""
+        if not self.buffer:
+            self._ready.wait(timeout)
+        self._ready.clear()
+        events = []
+        while self.buffer:
+            events.append(self.buffer.popleft())
+        return events
+
+
+class EventHub:
+    """Topic fan-out to bounded per-client buffers, relayed between processes over an optional bus"""
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, bus=None):
+        self.buffer_size = buffer_size
+        self.bus = bus
+        self.instance_id = uuid.uuid4().hex
+        self._topics = {}
+        self._connected = 0
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.relayed = 0
+        if bus is not None:
+            bus.subscribe(EVENTS_CHANNEL, self._on_relay)
+
+    def subscribe(self, topics, limit=None):
+        """Register a client for the topics; None when `limit` clients are already connected"""
+        subscriber = Subscriber(topics, self.buffer_size)
+        with self._lock:
+            if limit and self._connected >= limit:
+                return None
+            self._connected += 1
+            for topic in subscriber.topics:
+                self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if not subscriber.connected:
+                return
+            subscriber.connected = False
+            self._connected -= 1
+            for topic in subscriber.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def publish(self, topics, event_type, data):
+        """Deliver an event once to every local subscriber of any of the topics and relay it to other processes"""
+        payload = json.dumps(data)
+        delivered = self._deliver(topics, (event_type, payload))
+        self.published += 1
+        if self.bus is not None:
+            try:
+                self.bus.publish(EVENTS_CHANNEL, json.dumps({
+                    'origin': self.instance_id, 'topics': list(topics), 'type': event_type, 'data': payload
+                }))
+            except Exception as e:
+                logger.warning(f"Event relay failed: {str(e)}")
+        return delivered
+
+    def _deliver(self, topics, event):
+        with self._lock:
+            targets = set()
+            for topic in topics:
+                targets.update(self._topics.get(topic, ()))
+        for subscriber in targets:
+            subscriber.push(event)
+        self.delivered += len(targets)
+        return len(targets)
+
+    def _on_relay(self, message):
+        relayed = json.loads(message)
+        if relayed.get('origin') == self.instance_id:
+            return
+        self._deliver(relayed['topics'], (relayed['type'], relayed['data']))
+        self.relayed += 1
+
+    def after_fork(self):
+        """Call in a worker forked from a process that already built the hub (the bus re-subscribes itself)"""
+        # A new origin id, or every worker would drop the others' events as its own
+        self.instance_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._topics = {}
+        self._connected = 0
+        self.published = self.delivered = self.relayed = 0
+
+    def subscriber_count(self):
+        return self._connected
+
+    def stream(self, subscriber, heartbeat=HEARTBEAT_SECONDS):
+        """Yield SSE-formatted chunks until the client disconnects"""
+        try:
+            yield 'retry: 5000\n\n'
+            last_sent = time.monotonic()
+            while True:
+                events = subscriber.drain(timeout=heartbeat)
+                if events:
+                    yield ''.join(f'event: {event_type}\ndata: {payload}\n\n' for event_type, payload in events)
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= heartbeat:
+                    yield ': keepalive\n\n'
+                    last_sent = time.monotonic()
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def price_topic(commodity):
+    return f'price:{commodity.lower()}'
+
+
+def account_topic(hedera_account_id):
+    return f'account:{hedera_account_id}'
@@ -0,0 +1,154 @@
+# Hedera AgriFund Backend - Streaming bulk exports
+#
+# Rows are read from a server-side cursor in fixed-size batches and encoded
+# batch by batch, so memory stays bounded by EXPORT_BATCH_SIZE regardless of
+# how many loans or tokens are exported. Money columns arrive as micro-units
+# and are written as 2-place decimals, as stored: per value for CSV, as one
+# vectorized Arrow cast per column for Parquet.
+import csv
+import io
+
+from money import CENT, round_units, to_decimal
+
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def iter_batches(engines, statement, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of row tuples from a server-side cursor on each engine (shard) in turn"""
+    for engine in engines:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(statement)
+            while True:
+                batch = result.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+
+
+def stream_csv(batches, columns):
+    """Encode row batches as CSV chunks, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in columns)
+
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_parquet(batches, columns):
+    """Encode row batches as a Parquet file, one row group per batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        'string': pa.string(),
+        'int': pa.int64(),
+        'bool': pa.bool_(),
+        'money': pa.decimal128(15, 2),
+        'price': pa.decimal128(10, 2),
+        'rate': pa.decimal128(5, 2),
+        'date': pa.date32(),
+        'datetime': pa.timestamp('us'),
+    }
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+
+    kinds = [kind for _, kind in columns]
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for batch in batches:
+            arrays = [
+                money_array(values, field.type) if kind in ('money', 'price') else pa.array(values, type=field.type)
+                for values, field, kind in zip(zip(*batch), schema, kinds)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+
+    yield sink.drain()
+
+
+def money_array(units, decimal_type):
+    """Micro-units (ints or None) to an Arrow decimal array of 2-place values, without per-value Decimals"""
+    from decimal import Decimal
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    units = pa.array(units, type=pa.int64())
+    nulls = units.is_null().to_numpy(zero_copy_only=False)
+    cents = round_units(units.fill_null(0).to_numpy()) // CENT
+    # int64 -> decimal(19, 0) is exact; times 0.01 moves the point without rounding
+    exact = pc.multiply(pc.cast(pa.array(cents, mask=nulls), pa.decimal128(19, 0)),
+                        pa.scalar(Decimal('0.01'), pa.decimal128(2, 2)))
+    return pc.cast(exact, decimal_type)
+
+
+def decimal_batches(batches, columns):
+    """Turn the micro-unit ints of 'money' and 'price' columns into 2-place Decimals"""
+    money_columns = [i for i, (_, kind) in enumerate(columns) if kind in ('money', 'price')]
+    for batch in batches:
+        if not money_columns:
+            yield batch
+            continue
+        rows = []
+        for row in batch:
+            row = list(row)
+            for i in money_columns:
+                if row[i] is not None:
+                    row[i] = to_decimal(row[i], 2)
+            rows.append(row)
+        yield rows
+
+
+def stream_export(engines, statement, columns, export_format='csv', batch_size=EXPORT_BATCH_SIZE, transform=None):
+    """Stream a SELECT (run on every engine given) as CSV or Parquet chunks
+
+    `transform`, if given, maps each batch of rows to the rows to write (e.g. to
+    fill in values that live on another shard).
+    """
+    batches = iter_batches(engines, statement, batch_size)
+    if transform is not None:
+        batches = map(transform, batches)
+    if export_format == 'parquet':
+        return stream_parquet(batches, columns)
+    return stream_csv(decimal_batches(batches, columns), columns)
@@ -0,0 +1,34 @@
+# Hedera AgriFund Backend - Extensions and per-app services
+#
+# `db` is bound to an app by create_app(). The other services (cache, rate
+# limiter, shard router, price aggregator, event hub, ...) are built by
+# create_app() from that app's configuration and kept in
+# app.extensions['agrifund']. The names below are proxies to the current
+# app's instances, so blueprints import them once and use them like module
+# globals. Optional services (shard_router, price_aggregator,
+# trace_recorder) proxy None when they are not configured: test them for
+# truth, not with `is None`.
+from flask import current_app
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
+
+from sharding import ShardedSession
+
+EXTENSION = 'agrifund'
+
+db = SQLAlchemy(session_options={'class_': ShardedSession})
+
+
+def services(app=None):
+    """The service registry of an app (default: the current one)"""
+    return (app or current_app).extensions[EXTENSION]
+
+
+def _service(name):
+    return LocalProxy(lambda: current_app.extensions[EXTENSION][name])
+
+
+cache = _service('cache')
+event_hub = _service('event_hub')
+shard_router = _service('shard_router')
+price_aggregator = _service('price_aggregator')
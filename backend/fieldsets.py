@@ -0,0 +1,42 @@
+# Hedera AgriFund Backend - Sparse fieldsets
+#
+# List endpoints accept ?fields=a,b,c. Each endpoint declares a schema that
+# maps every public field to the SQL columns it is computed from, the joins
+# those columns need and how to serialize it, so only the requested columns
+# are selected and joins nobody asked for are left out of the query.
+from collections import namedtuple
+
+# columns: labelled SQL expressions; joins: names of the joins they need
+Field = namedtuple('Field', ['columns', 'serialize', 'joins'], defaults=[()])
+
+
+class FieldsetError(ValueError):
+    pass
+
+
+def parse_fields(value, schema):
+    """Requested field names in order (every field when the parameter is absent)"""
+    if value is None or not value.strip():
+        return list(schema)
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in schema]
+    if unknown:
+        raise FieldsetError(f"Unknown fields: {', '.join(unknown)} (available: {', '.join(schema)})")
+    return fields
+
+
+def projection(schema, fields, always=()):
+    """Columns to SELECT and joins to make for the requested fields (plus `always` columns)"""
+    columns = {}
+    joins = set()
+    for name in fields:
+        for column in schema[name].columns:
+            columns.setdefault(column.key, column)
+        joins.update(schema[name].joins)
+    for column in always:
+        columns.setdefault(column.key, column)
+    return list(columns.values()), joins
+
+
+def serialize(row, schema, fields):
+    return {name: schema[name].serialize(row) for name in fields}
@@ -0,0 +1,241 @@
+# Hedera AgriFund Backend - Geocoding and spatial index
+#
+# Warehouse and farm locations are free text. They are geocoded against an
+# offline gazetteer (a stand-in for a real geocoding service) and stored as
+# latitude/longitude plus a 52-bit geocell: the geohash bit string (longitude
+# and latitude bits interleaved, 26 each) as an integer. Every geohash prefix
+# is a contiguous geocell range, so radius and bounding-box queries become a
+# handful of range predicates on one B-tree index, followed by an exact
+# haversine filter over the candidates.
+import logging
+import os
+import re
+
+import numpy as np
+from sqlalchemy import create_engine, inspect, text
+
+logger = logging.getLogger(__name__)
+
+GEOCELL_BITS = 52  # 26 longitude + 26 latitude bits, ~0.6 m cells
+MAX_COVER_CELLS = 32  # cells per query cover; coarser levels are used above this
+EARTH_RADIUS_KM = 6371.0088
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Tables carrying geocoded locations and the free-text column they are geocoded from
+GEO_TABLES = {
+    'users': 'location',
+    'rwa_tokens': 'warehouse_location',
+}
+
+# Offline gazetteer: normalized place name -> (latitude, longitude)
+GAZETTEER = {
+    # Cameroon
+    'bamenda': (5.9631, 10.1591), 'kumba': (4.6363, 9.4469), 'buea': (4.1527, 9.2410),
+    'douala': (4.0511, 9.7679), 'yaounde': (3.8480, 11.5021), 'bafoussam': (5.4781, 10.4176),
+    'limbe': (4.0225, 9.1953), 'garoua': (9.3014, 13.3977), 'ebolowa': (2.9000, 11.1500),
+    'cameroon': (5.6919, 12.7369),
+    # Kenya
+    'nairobi': (-1.2921, 36.8219), 'nakuru': (-0.3031, 36.0800), 'eldoret': (0.5143, 35.2698),
+    'kisumu': (-0.0917, 34.7680), 'nyeri': (-0.4201, 36.9476), 'meru': (0.0470, 37.6490),
+    'kericho': (-0.3689, 35.2863), 'kitale': (1.0157, 35.0062), 'mombasa': (-4.0435, 39.6682),
+    'kenya': (0.1769, 37.9083),
+    # Ghana
+    'accra': (5.6037, -0.1870), 'kumasi': (6.6885, -1.6244), 'tamale': (9.4034, -0.8424),
+    'takoradi': (4.8845, -1.7554), 'ho': (6.6008, 0.4713), 'sunyani': (7.3349, -2.3123),
+    'ghana': (7.9465, -1.0232),
+    # Cote d'Ivoire
+    'abidjan': (5.3600, -4.0083), 'san pedro': (4.7485, -6.6363), 'daloa': (6.8774, -6.4502),
+    'yamoussoukro': (6.8276, -5.2893), 'cote divoire': (7.5400, -5.5471),
+    # Nigeria
+    'lagos': (6.5244, 3.3792), 'abuja': (9.0765, 7.3986), 'kano': (12.0022, 8.5920),
+    'ibadan': (7.3775, 3.9470), 'kaduna': (10.5105, 7.4165), 'nigeria': (9.0820, 8.6753),
+    # East Africa
+    'kampala': (0.3476, 32.5825), 'mbale': (1.0827, 34.1750), 'uganda': (1.3733, 32.2903),
+    'arusha': (-3.3869, 36.6830), 'moshi': (-3.3349, 37.3404), 'mbeya': (-8.9094, 33.4608),
+    'dar es salaam': (-6.7924, 39.2083), 'tanzania': (-6.3690, 34.8888),
+    'kigali': (-1.9441, 30.0619), 'rwanda': (-1.9403, 29.8739),
+    'addis ababa': (9.0054, 38.7636), 'jimma': (7.6734, 36.8344), 'ethiopia': (9.1450, 40.4897),
+    # Southern Africa
+    'lusaka': (-15.3875, 28.3228), 'lilongwe': (-13.9626, 33.7741), 'harare': (-17.8252, 31.0335),
+}
+
+
+def normalize(name):
+    return re.sub(r'[^a-z ]', '', name.lower().replace('-', ' ')).strip()
+
+
+def place(location):
+    """The gazetteer name free text ("Nakuru, Kenya", "Kumba warehouse 3") resolves to, or None"""
+    if not location:
+        return None
+    parts = [normalize(part) for part in location.split(',')]
+    for part in [normalize(location)] + parts:
+        if part in GAZETTEER:
+            return part
+    # Fall back to the longest gazetteer name contained in any part
+    for part in parts:
+        words = f' {part} '
+        matches = [name for name in GAZETTEER if f' {name} ' in words]
+        if matches:
+            return max(matches, key=len)
+    return None
+
+
+def geocode(location):
+    """Resolve free text to (latitude, longitude), or None"""
+    name = place(location)
+    return GAZETTEER[name] if name else None
+
+
+# Geocells
+def _cell_indices(latitudes, longitudes, bits):
+    """Integer grid indices of points on a 2**bits x 2**bits grid"""
+    scale = float(1 << bits)
+    lat = np.floor((np.asarray(latitudes, dtype=np.float64) + 90.0) / 180.0 * scale).astype(np.int64)
+    lon = np.floor((np.asarray(longitudes, dtype=np.float64) + 180.0) / 360.0 * scale).astype(np.int64)
+    return np.clip(lat, 0, (1 << bits) - 1), np.clip(lon, 0, (1 << bits) - 1)
+
+
+def _interleave(lat_index, lon_index, bits):
+    """Morton code with the longitude bit first, as geohash does"""
+    code = np.zeros(np.shape(lat_index), dtype=np.int64)
+    for bit in range(bits - 1, -1, -1):
+        code = (code << 2) | (((lon_index >> bit) & 1) << 1) | ((lat_index >> bit) & 1)
+    return code
+
+
+def encode(latitudes, longitudes):
+    """Geocells (52-bit ints) for arrays of coordinates"""
+    half = GEOCELL_BITS // 2
+    return _interleave(*_cell_indices(latitudes, longitudes, half), half)
+
+
+def geocell(latitude, longitude):
+    return int(encode([latitude], [longitude])[0])
+
+
+def to_geohash(cell, precision=9):
+    """Render a geocell as a standard base32 geohash string (up to 10 characters)"""
+    bits = 5 * precision
+    value = int(cell) >> (GEOCELL_BITS - bits)
+    return ''.join(BASE32[(value >> shift) & 31] for shift in range(bits - 5, -1, -5))
+
+
+def cover(min_lat, min_lon, max_lat, max_lon):
+    """Geocell ranges [start, end) covering a bounding box, at the finest level with few cells"""
+    if not min_lat <= max_lat:
+        raise ValueError('min_lat must not be above max_lat')
+    half = GEOCELL_BITS // 2
+    for level in range(half, 0, -1):
+        lat_lo, lon_lo = _cell_indices(min_lat, min_lon, level)
+        lat_hi, lon_hi = _cell_indices(max_lat, max_lon, level)
+        lon_span = (int(lon_hi) - int(lon_lo)) % (1 << level) + 1  # wraps across the antimeridian
+        if min_lon > max_lon and lon_hi == lon_lo:
+            lon_span = 1 << level  # a wrap starting and ending in one cell goes all the way round
+        if (int(lat_hi) - int(lat_lo) + 1) * lon_span <= MAX_COVER_CELLS or level == 1:
+            break
+
+    lats = np.arange(int(lat_lo), int(lat_hi) + 1, dtype=np.int64)
+    lons = (int(lon_lo) + np.arange(lon_span, dtype=np.int64)) % (1 << level)
+    grid_lat, grid_lon = np.meshgrid(lats, lons)
+    codes = np.unique(_interleave(grid_lat.ravel(), grid_lon.ravel(), level))
+
+    shift = GEOCELL_BITS - 2 * level
+    ranges = []
+    for code in codes.tolist():
+        start, end = code << shift, (code + 1) << shift
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end  # merge cells that are adjacent in Z-order
+        else:
+            ranges.append([start, end])
+    return [tuple(r) for r in ranges]
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) of a circle"""
+    dlat = np.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    if min_lat == -90.0 or max_lat == 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+    dlon = np.degrees(radius_km / (EARTH_RADIUS_KM * np.cos(np.radians(max(abs(min_lat), abs(max_lat))))))
+    if dlon >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    west, east = longitude - dlon, longitude + dlon
+    return min_lat, (west + 540.0) % 360.0 - 180.0, max_lat, (east + 540.0) % 360.0 - 180.0
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances from one point to arrays of points"""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(np.asarray(latitudes, dtype=np.float64)), np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def in_bbox(latitudes, longitudes, min_lat, min_lon, max_lat, max_lon):
+    latitudes, longitudes = np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64)
+    inside_lat = (latitudes >= min_lat) & (latitudes <= max_lat)
+    if min_lon <= max_lon:
+        return inside_lat & (longitudes >= min_lon) & (longitudes <= max_lon)
+    return inside_lat & ((longitudes >= min_lon) | (longitudes <= max_lon))
+
+
+# Schema and backfill
+def ensure_geo_columns(engine):
+    """Add latitude/longitude/geocell columns and the geocell index to existing tables"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in GEO_TABLES:
+            if table not in existing_tables:
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table)}
+            for name, kind in (('latitude', 'FLOAT'), ('longitude', 'FLOAT'), ('geocell', 'BIGINT')):
+                if name not in columns:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {kind}"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_geocell ON {table} (geocell)"))
+
+
+def backfill(engine, batch_size=5000):
+    """Geocode rows that have a location but no coordinates yet; returns rows updated per table"""
+    updated = {}
+    existing_tables = set(inspect(engine).get_table_names())
+    for table, column in GEO_TABLES.items():
+        if table not in existing_tables:
+            continue
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                f"SELECT id, {column} FROM {table} WHERE geocell IS NULL AND {column} IS NOT NULL"
+            )).all()
+
+        resolved = [(row_id, geocode(location)) for row_id, location in rows]
+        resolved = [(row_id, point) for row_id, point in resolved if point]
+        for offset in range(0, len(resolved), batch_size):
+            batch = resolved[offset:offset + batch_size]
+            cells = encode([point[0] for _, point in batch], [point[1] for _, point in batch])
+            with engine.begin() as conn:
+                conn.execute(
+                    text(f"UPDATE {table} SET latitude = :lat, longitude = :lon, geocell = :cell WHERE id = :id"),
+                    [{'id': row_id, 'lat': point[0], 'lon': point[1], 'cell': int(cell)}
+                     for (row_id, point), cell in zip(batch, cells)]
+                )
+        updated[table] = len(resolved)
+        logger.info(f"{table}: geocoded {len(resolved)} of {len(rows)} rows")
+    return updated
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Geocode stored locations into the spatial index')
+    parser.add_argument('command', choices=['backfill'])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'postgresql://localhost/hedera_agrifund'))
+    parser.add_argument('--shard-urls', default=os.environ.get('SHARD_DATABASE_URLS', ''))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    urls = [url for url in args.shard_urls.split(',') if url] or [args.database_url]
+    for url in urls:
+        engine = create_engine(url)
+        ensure_geo_columns(engine)
+        print(f"{url.rsplit('@', 1)[-1]}: {backfill(engine)}")
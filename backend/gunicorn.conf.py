@@ -0,0 +1,88 @@
+# Hedera AgriFund Backend - Production server configuration
+#
+#   cd backend && gunicorn -c gunicorn.conf.py
+#
+# The master imports app.py once (preload_app) and runs app.prepare_preload():
+# ORM mappers, the URL map, schema creation and the statement cache are done
+# before the first fork and shared copy-on-write by every worker. Each worker
+# then drops the inherited connections and cache subscriptions
+# (app.after_fork), opens its pool and primes the price cache
+# (app.warm_worker). Only after that does gunicorn let it accept connections.
+#
+# Workers are recycled after GUNICORN_MAX_REQUESTS requests, with jitter so
+# they do not all restart together. A recycled or HUP'd worker stops
+# accepting and finishes its in-flight requests within graceful_timeout. The
+# master's cold start, each worker's ready time and its first request latency
+# are logged and reported under "startup" in GET /api/metrics.
+import multiprocessing
+import os
+import sys
+import time
+
+CONFIG_LOADED = time.perf_counter()
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'app:app'
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads rather than sync workers: event streams hold a connection open, and admission control
+# (MAX_IN_FLIGHT) decides how many requests reach the database at once
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', int(os.environ.get('MAX_IN_FLIGHT', 15)) + 1))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # e.g. "-" for stdout
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def _elapsed_ms(since):
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+def on_starting(server):
+    if server.cfg.preload_app:
+        import app  # already imported by the preload; this is the same module
+        app.startup_metrics['master_import_ms'] = _elapsed_ms(CONFIG_LOADED)
+        app.prepare_preload()
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        sys.modules['app'].startup_metrics['master_ready_ms'] = _elapsed_ms(CONFIG_LOADED)
+    server.log.info(f"Master ready in {_elapsed_ms(CONFIG_LOADED):.0f} ms (preload: {server.cfg.preload_app})")
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+    worker.first_request_started = None
+    if 'app' in sys.modules:
+        sys.modules['app'].after_fork()
+
+
+def post_worker_init(worker):
+    import app
+    app.warm_worker()
+    app.startup_metrics['worker_ready_ms'] = _elapsed_ms(worker.forked_at)
+    worker.log.info(f"Worker {worker.pid} ready in {app.startup_metrics['worker_ready_ms']:.0f} ms "
+                    f"(warmup {app.startup_metrics['warmup_ms']:.0f} ms)")
+
+
+def pre_request(worker, req):
+    if worker.first_request_started is None:
+        worker.first_request_started = time.perf_counter()
+
+
+def post_request(worker, req, environ, resp):
+    metrics = sys.modules['app'].startup_metrics
+    if 'first_request_ms' not in metrics:
+        metrics['first_request_ms'] = _elapsed_ms(worker.first_request_started)
+        worker.log.info(f"Worker {worker.pid} first request {req.path} in {metrics['first_request_ms']:.1f} ms")
+
+
+def worker_exit(server, worker):
+    if 'app' in sys.modules:
+        sys.modules['app'].shutdown_worker()
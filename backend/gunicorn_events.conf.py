@@ -0,0 +1,33 @@
+# Hedera AgriFund Backend - Event stream server configuration
+#
+#   cd backend && gunicorn -c gunicorn_events.conf.py
+#
+# Serves GET /api/events/stream next to the main server (gunicorn.conf.py);
+# the reverse proxy routes /api/events/ here and everything else there. Each
+# open stream is a greenlet rather than a thread, so one gevent worker holds
+# EVENT_WORKER_CONNECTIONS clients. Events published by the main workers and
+# by Celery jobs arrive over the cache's Redis pub/sub (CACHE_REDIS_URL), so
+# both servers must share it.
+#
+# gevent patches the standard library when the worker starts; the app is
+# imported after that (no preload), so its locks, sockets and the Redis
+# listener run on greenlets.
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = 'app:app'
+bind = os.environ.get('EVENTS_BIND', f"0.0.0.0:{os.environ.get('EVENTS_PORT', 5001)}")
+workers = int(os.environ.get('EVENTS_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('EVENT_WORKER_CONNECTIONS', 1000))
+preload_app = False
+# Streams send a keepalive every HEARTBEAT_SECONDS; a worker is only restarted if it stops answering
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+# Workers inherit the environment; leave a few connections for anything else the proxy sends
+os.environ.setdefault('MAX_EVENT_STREAMS', str(max(1, worker_connections - 10)))
@@ -0,0 +1,348 @@
+# Hedera AgriFund Backend - Bulk farmer onboarding
+#
+# Cooperatives hand over thousands of farmers at once as CSV or JSONL. Rows
+# are parsed and validated as they stream in and loaded in batches: each
+# batch is checked against existing hedera_account_id/email values with one
+# query per shard, ids are reserved in one step (sequence or shard-aware
+# max(id)), and users plus farmer_profiles are written with COPY on
+# PostgreSQL (psycopg2) or multi-row INSERTs elsewhere. Rows that cannot be
+# loaded end up in a rejected-rows report instead of failing the import,
+# including rows that still conflict after a batch is checked again.
+import csv
+import io
+import json
+import logging
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import MetaData, Table, create_engine, func, insert, or_, select, text
+from sqlalchemy.exc import IntegrityError
+
+import geo
+from sharding import MAX_SHARDS, ShardRouter
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+ACCOUNT_PATTERN = re.compile(r'^\d+\.\d+\.\d+$')
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+LIMITS = {'hedera_account_id': 20, 'name': 100, 'email': 120, 'phone': 20, 'location': 200, 'cooperative': 200}
+
+USER_COLUMNS = ['id', 'hedera_account_id', 'user_type', 'name', 'email', 'phone', 'location',
+                'latitude', 'longitude', 'geocell', 'kyc_status', 'credit_score', 'created_at']
+PROFILE_COLUMNS = ['id', 'user_id', 'farm_size', 'primary_crops', 'cooperative', 'certifications',
+                   'total_collateral_value']
+REPORT_COLUMNS = ['line', 'hedera_account_id', 'email', 'reason']
+
+
+class RejectedRow(ValueError):
+    """A row that cannot be imported; the message is the reason in the report"""
+
+
+def detect_format(filename=None, content_type=None):
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if content_type and ('ndjson' in content_type or 'jsonl' in content_type):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_records(stream, fmt):
+    """Yield (line number, record dict or None, error) from a text stream without reading it all"""
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, None, 'Invalid JSON'
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, 'Expected a JSON object'
+                continue
+            yield line_number, record, None
+    else:
+        reader = csv.DictReader(stream)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None, 'Too many columns'
+                continue
+            yield reader.line_num, record, None
+
+
+def _list(value):
+    """Crop and certification lists: JSON arrays, or ';'-separated in CSV"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return [item.strip() for item in str(value).split(';') if item.strip()]
+
+
+def _float(record, field):
+    value = record.get(field)
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise RejectedRow(f'{field} must be a number')
+
+
+def validate(record, geocode=geo.geocode):
+    """Normalize one farmer record into (user, profile) column dicts, or raise RejectedRow"""
+    values = {field: (str(record[field]).strip() if record.get(field) is not None else None)
+              for field in ('hedera_account_id', 'user_type', 'name', 'email', 'phone', 'location', 'cooperative')}
+    for field in ('hedera_account_id', 'name', 'email'):
+        if not values[field]:
+            raise RejectedRow(f'Missing required field: {field}')
+    if values['user_type'] not in (None, '', 'farmer'):
+        raise RejectedRow('Only farmers can be imported')
+    if not ACCOUNT_PATTERN.match(values['hedera_account_id']):
+        raise RejectedRow('hedera_account_id must look like 0.0.12345')
+    if not EMAIL_PATTERN.match(values['email']):
+        raise RejectedRow('Invalid email')
+    for field, limit in LIMITS.items():
+        if values[field] and len(values[field]) > limit:
+            raise RejectedRow(f'{field} longer than {limit} characters')
+
+    farm_size = _float(record, 'farm_size')
+    if farm_size is not None and farm_size < 0:
+        raise RejectedRow('farm_size must not be negative')
+    latitude, longitude = _float(record, 'latitude'), _float(record, 'longitude')
+    if latitude is not None and longitude is not None:
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise RejectedRow('latitude/longitude out of range')
+        point = (latitude, longitude)
+    else:
+        point = geocode(values['location'])
+
+    user = {
+        'hedera_account_id': values['hedera_account_id'], 'user_type': 'farmer',
+        'name': values['name'], 'email': values['email'],
+        'phone': values['phone'] or None, 'location': values['location'] or None,
+        'latitude': point[0] if point else None, 'longitude': point[1] if point else None,
+        'geocell': geo.geocell(*point) if point else None,
+        'kyc_status': 'pending', 'credit_score': 700, 'created_at': datetime.utcnow(),
+    }
+    profile = {
+        'farm_size': farm_size, 'primary_crops': _list(record.get('primary_crops')),
+        'cooperative': values['cooperative'] or None, 'certifications': _list(record.get('certifications')),
+        'total_collateral_value': 0,
+    }
+    return user, profile
+
+
+def allocate_ids(conn, table, count, shard=None):
+    """Reserve `count` ids, shard-unique when sharded (see sharding.py)"""
+    if conn.dialect.name == 'postgresql':
+        # Sequences already step by MAX_SHARDS on shard databases
+        return list(conn.execute(
+            text(f"SELECT nextval('{table.name}_id_seq') FROM generate_series(1, :count)"), {'count': count}
+        ).scalars())
+    current = conn.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+    if shard is None:
+        return list(range(current + 1, current + count + 1))
+    first = (current // MAX_SHARDS + 1) * MAX_SHARDS + shard + 1
+    return list(range(first, first + count * MAX_SHARDS, MAX_SHARDS))
+
+
+def _copy(conn, table, columns, rows):
+    """COPY rows into a table through psycopg2 (NULL is an unquoted empty field)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            json.dumps(row[column]) if isinstance(row[column], list) else row[column] for column in columns
+        )
+    buffer.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def write_rows(conn, table, columns, rows):
+    if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2':
+        _copy(conn, table, columns, rows)
+    else:
+        conn.execute(insert(table), rows)
+
+
+class FarmerImporter:
+    """Validate, deduplicate and load farmer records into one database or a set of shards"""
+
+    def __init__(self, engines, shard_for=None, batch_size=IMPORT_BATCH_SIZE):
+        self.engines = list(engines)
+        self.shard_for = shard_for
+        self.batch_size = batch_size
+        self.tables = [
+            (Table('users', MetaData(), autoload_with=engine), Table('farmer_profiles', MetaData(), autoload_with=engine))
+            for engine in self.engines
+        ]
+        self.seen_accounts = set()
+        self.seen_emails = set()
+        self.imported = 0
+        self.rejected = []
+        self._geocoded = {}
+
+    def reject(self, line, record, reason):
+        record = record or {}
+        self.rejected.append({
+            'line': line, 'hedera_account_id': record.get('hedera_account_id'),
+            'email': record.get('email'), 'reason': reason,
+        })
+
+    def _geocode(self, location):
+        # Cooperatives share a handful of locations; resolve each once
+        if location not in self._geocoded:
+            self._geocoded[location] = geo.geocode(location)
+        return self._geocoded[location]
+
+    def run(self, stream, fmt):
+        """Import every record from a text stream; returns self for the summary"""
+        batch = []
+        for line, record, error in read_records(stream, fmt):
+            if error:
+                self.reject(line, record, error)
+                continue
+            try:
+                user, profile = validate(record, geocode=self._geocode)
+            except RejectedRow as e:
+                self.reject(line, record, str(e))
+                continue
+            if user['hedera_account_id'] in self.seen_accounts:
+                self.reject(line, user, 'Duplicate hedera_account_id in file')
+                continue
+            if user['email'] in self.seen_emails:
+                self.reject(line, user, 'Duplicate email in file')
+                continue
+            self.seen_accounts.add(user['hedera_account_id'])
+            self.seen_emails.add(user['email'])
+            batch.append((line, user, profile))
+            if len(batch) >= self.batch_size:
+                self.load(batch)
+                batch = []
+        if batch:
+            self.load(batch)
+        self.rejected.sort(key=lambda row: row['line'])
+        return self
+
+    def _existing(self, batch):
+        """Accounts and emails of the batch already present on any database"""
+        accounts = [user['hedera_account_id'] for _, user, _ in batch]
+        emails = [user['email'] for _, user, _ in batch]
+        taken_accounts, taken_emails = set(), set()
+        for engine, (users, _) in zip(self.engines, self.tables):
+            with engine.connect() as conn:
+                for account, email in conn.execute(
+                    select(users.c.hedera_account_id, users.c.email)
+                    .where(or_(users.c.hedera_account_id.in_(accounts), users.c.email.in_(emails)))
+                ):
+                    taken_accounts.add(account)
+                    taken_emails.add(email)
+        return taken_accounts, taken_emails
+
+    def load(self, batch, retry=True):
+        """Insert a validated batch, one transaction per database"""
+        taken_accounts, taken_emails = self._existing(batch)
+        by_shard = {}
+        for line, user, profile in batch:
+            if user['hedera_account_id'] in taken_accounts:
+                self.reject(line, user, 'User already exists')
+            elif user['email'] in taken_emails:
+                self.reject(line, user, 'Email already registered')
+            else:
+                shard = self.shard_for(user['hedera_account_id']) if self.shard_for else 0
+                by_shard.setdefault(shard, []).append((line, user, profile))
+
+        for shard, rows in by_shard.items():
+            try:
+                self._insert(shard, rows)
+            except IntegrityError:
+                if retry:
+                    # Someone registered one of these farmers since the check; check again
+                    self.load(rows, retry=False)
+                else:
+                    self._insert_each(shard, rows)
+                continue
+            self.imported += len(rows)
+        logger.info(f"Imported {self.imported} farmers so far ({len(self.rejected)} rejected)")
+
+    def _insert(self, shard, rows):
+        users_table, profiles_table = self.tables[shard]
+        shard_index = shard if self.shard_for else None
+        with self.engines[shard].begin() as conn:
+            user_ids = allocate_ids(conn, users_table, len(rows), shard_index)
+            profile_ids = allocate_ids(conn, profiles_table, len(rows), shard_index)
+            users, profiles = [], []
+            for (_, user, profile), user_id, profile_id in zip(rows, user_ids, profile_ids):
+                users.append({**user, 'id': user_id})
+                profiles.append({**profile, 'id': profile_id, 'user_id': user_id})
+            write_rows(conn, users_table, USER_COLUMNS, users)
+            write_rows(conn, profiles_table, PROFILE_COLUMNS, profiles)
+
+    def _insert_each(self, shard, rows):
+        """Insert rows one transaction at a time, rejecting those that still conflict"""
+        for line, user, profile in rows:
+            try:
+                self._insert(shard, [(line, user, profile)])
+            except IntegrityError:
+                self.reject(line, user, 'Conflicts with an existing user')
+                continue
+            self.imported += 1
+
+    def summary(self, max_rejected=None):
+        rejected = self.rejected if max_rejected is None else self.rejected[:max_rejected]
+        return {'imported': self.imported, 'rejected_count': len(self.rejected), 'rejected': rejected}
+
+
+def write_report(rejected, stream):
+    """Rejected rows as CSV (line, hedera_account_id, email, reason)"""
+    writer = csv.DictWriter(stream, fieldnames=REPORT_COLUMNS)
+    writer.writeheader()
+    writer.writerows(rejected)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description='Bulk import farmers from CSV or JSONL')
+    parser.add_argument('path', help="input file ('-' for stdin)")
+    parser.add_argument('--format', choices=IMPORT_FORMATS, help='default: from the file extension')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'postgresql://localhost/hedera_agrifund'))
+    parser.add_argument('--shard-urls', default=os.environ.get('SHARD_DATABASE_URLS', ''),
+                        help='comma-separated shard URLs (users are loaded onto their shards)')
+    parser.add_argument('--rejected', default='rejected.csv', help='where to write the rejected-rows report')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    shard_urls = [url for url in args.shard_urls.split(',') if url]
+    if shard_urls:
+        router = ShardRouter(shard_urls)
+        importer = FarmerImporter(router.engines, router.shard_for, batch_size=args.batch_size)
+    else:
+        importer = FarmerImporter([create_engine(args.database_url)], batch_size=args.batch_size)
+
+    fmt = args.format or detect_format(args.path)
+    started = time.perf_counter()
+    if args.path == '-':
+        importer.run(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline=''), fmt)
+    else:
+        # utf-8-sig: spreadsheet exports often start with a byte order mark
+        with open(args.path, newline='', encoding='utf-8-sig') as stream:
+            importer.run(stream, fmt)
+    elapsed = time.perf_counter() - started
+
+    with open(args.rejected, 'w', newline='', encoding='utf-8') as report:
+        write_report(importer.rejected, report)
+    print(f"Imported {importer.imported} farmers in {elapsed:.1f}s "
+          f"({importer.imported / elapsed * 60:,.0f}/min); {len(importer.rejected)} rejected -> {args.rejected}")
@@ -0,0 +1,116 @@
+# Hedera AgriFund Backend - Background job queue
+#
+# Celery application shared by the API (which enqueues) and the workers
+# (which run the heavy steps). Start workers with:
+#     celery -A app.celery worker --concurrency 8
+# The broker is CELERY_BROKER_URL (or REDIS_URL). Without one, Celery cannot
+# be built unless tasks run inline (CELERY_TASK_ALWAYS_EAGER=true) or the app
+# is under test, where the in-memory transport ('memory://') is used: its
+# queue lives in one process, so jobs accepted by other processes would
+# never run.
+#
+# Importing Celery costs ~50 ms, so it is only built on first use (the first
+# enqueue, or a worker resolving app.celery). Tasks are declared with
+# @task(...) and registered with Celery when it is built.
+#
+# Periodic maintenance runs from one beat process next to the workers:
+#     celery -A app.celery beat
+import threading
+
+celery = None
+flask_app = None
+
+_tasks = []
+_lock = threading.Lock()
+
+# Periodic tasks: name -> seconds between runs
+BEAT_SCHEDULE = {
+    'agrifund.maintain_partitions': 24 * 3600,  # partitions.py: upcoming months and archival
+    'agrifund.requeue_stale_jobs': 300,  # api/jobs.py: jobs whose message was lost
+    'agrifund.refresh_portfolio_values': 24 * 3600,  # api/loans.py: interest accrued since the last refresh
+}
+
+
+def configure_celery(app):
+    """Point the shared Celery app at the Flask configuration"""
+    global flask_app
+    flask_app = app
+    if celery is not None:
+        _apply_config(celery, app)
+
+
+def get_celery():
+    """The shared Celery app, built on first use"""
+    global celery
+    if celery is None:
+        with _lock:
+            if celery is None:
+                from celery import Celery
+
+                instance = Celery('agrifund')
+                if flask_app is not None:
+                    _apply_config(instance, flask_app)
+                for lazy_task in _tasks:
+                    lazy_task.bind(instance)
+                celery = instance
+    return celery
+
+
+def resolve_broker_url(app):
+    """The configured broker; the in-memory transport only for inline tasks or tests"""
+    url = app.config['CELERY_BROKER_URL']
+    if url:
+        return url
+    if app.config['CELERY_TASK_ALWAYS_EAGER'] or app.testing:
+        return 'memory://'
+    raise RuntimeError('No Celery broker configured: set CELERY_BROKER_URL or REDIS_URL '
+                       '(or CELERY_TASK_ALWAYS_EAGER=true to run jobs inline)')
+
+
+def _apply_config(instance, app):
+    broker_url = resolve_broker_url(app)
+    instance.conf.update(
+        broker_url=broker_url,
+        # Job state lives in the jobs table; Celery results are not needed
+        task_ignore_result=True,
+        result_backend=None,
+        task_always_eager=app.config['CELERY_TASK_ALWAYS_EAGER'],
+        # Redeliver a job if its worker dies mid-way; handlers that write detect an earlier delivery by job id
+        task_acks_late=True,
+        task_reject_on_worker_lost=True,
+        worker_prefetch_multiplier=4,
+        broker_connection_retry_on_startup=True,
+        beat_schedule={name: {'task': name, 'schedule': seconds} for name, seconds in BEAT_SCHEDULE.items()},
+    )
+    if broker_url.startswith('memory://'):
+        # The in-memory transport is polled and the worker only tops up its prefetch window
+        # between 2 s drain timeouts, so poll fast and prefetch deep to keep workers busy
+        instance.conf.broker_transport_options = {'polling_interval': 0.01}
+        instance.conf.worker_prefetch_multiplier = 1000
+
+
+class LazyTask:
+    """A task declared before Celery is imported; registered when it is built"""
+
+    def __init__(self, function, options):
+        self.function = function
+        self.options = options
+        self.task = None
+
+    def bind(self, instance):
+        self.task = instance.task(**self.options)(self.function)
+
+    def delay(self, *args, **kwargs):
+        get_celery()
+        return self.task.delay(*args, **kwargs)
+
+
+def task(**options):
+    """Declare a Celery task without importing Celery"""
+    def decorator(function):
+        lazy_task = LazyTask(function, options)
+        _tasks.append(lazy_task)
+        if celery is not None:
+            lazy_task.bind(celery)
+        return lazy_task
+    return decorator
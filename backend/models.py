@@ -0,0 +1,197 @@
+# Hedera AgriFund Backend - Database models
+#
+# Amount and price columns are Money: integer micro-units in Python, NUMERIC
+# in the database (see money.py).
+from datetime import datetime
+
+from extensions import db
+from money import Money
+
+
+class User(db.Model):
+    __tablename__ = 'users'
+
+    id = db.Column(db.Integer, primary_key=True)
+    hedera_account_id = db.Column(db.String(20), unique=True, nullable=False)
+    user_type = db.Column(db.String(10), nullable=False)  # 'farmer' or 'lender'
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    phone = db.Column(db.String(20))
+    location = db.Column(db.String(200))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geocell = db.Column(db.BigInteger, index=True)  # geohash bits as an integer (see geo.py)
+    kyc_status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
+    credit_score = db.Column(db.Integer, default=700)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relationships
+    farmer_profile = db.relationship('FarmerProfile', backref='user', uselist=False)
+    lender_profile = db.relationship('LenderProfile', backref='user', uselist=False)
+    loans_as_borrower = db.relationship('Loan', foreign_keys='Loan.borrower_id', backref='borrower')
+    loans_as_lender = db.relationship('Loan', foreign_keys='Loan.lender_id', backref='lender')
+
+
+class FarmerProfile(db.Model):
+    __tablename__ = 'farmer_profiles'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    farm_size = db.Column(db.Float)  # in hectares
+    primary_crops = db.Column(db.JSON)
+    cooperative = db.Column(db.String(200))
+    certifications = db.Column(db.JSON)
+    total_collateral_value = db.Column(Money(15, 2), default=0)
+
+
+class LenderProfile(db.Model):
+    __tablename__ = 'lender_profiles'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    investment_capacity = db.Column(Money(15, 2))
+    risk_tolerance = db.Column(db.String(10))  # low, medium, high
+    preferred_sectors = db.Column(db.JSON)
+    portfolio_value = db.Column(Money(15, 2), default=0)  # principal plus accrued interest, see api/loans.py
+
+
+class RWAToken(db.Model):
+    __tablename__ = 'rwa_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    token_id = db.Column(db.String(24), unique=True, nullable=False)
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    crop_type = db.Column(db.String(50), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    quality_grade = db.Column(db.String(5))
+    warehouse_location = db.Column(db.String(200))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geocell = db.Column(db.BigInteger, index=True)
+    harvest_date = db.Column(db.Date)
+    current_price = db.Column(Money(10, 2))
+    token_metadata = db.Column('metadata', db.JSON)  # 'metadata' is reserved on declarative models
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_pledged = db.Column(db.Boolean, default=False)
+
+    # Revaluation by commodity, and per-owner collateral totals
+    __table_args__ = (db.Index('ix_rwa_tokens_crop_type_owner_id', 'crop_type', 'owner_id'),)
+
+    # Relationships
+    owner = db.relationship('User', backref='owned_tokens')
+
+
+class Loan(db.Model):
+    __tablename__ = 'loans'
+
+    id = db.Column(db.Integer, primary_key=True)
+    contract_id = db.Column(db.String(24), unique=True, nullable=False)
+    borrower_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    lender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    amount = db.Column(Money(15, 2), nullable=False)
+    interest_rate = db.Column(db.Numeric(5, 2), nullable=False)
+    duration_months = db.Column(db.Integer, nullable=False)
+    purpose = db.Column(db.String(200))
+    status = db.Column(db.String(20), default='pending')  # pending, funded, repaid, defaulted, liquidated
+    collateral_token_id = db.Column(db.String(24), db.ForeignKey('rwa_tokens.token_id'))
+    ltv_ratio = db.Column(db.Numeric(5, 2))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    funded_at = db.Column(db.DateTime)
+    due_date = db.Column(db.DateTime)
+
+    # Relationships
+    collateral = db.relationship('RWAToken', backref='loans')
+
+
+class PriceOracle(db.Model):
+    __tablename__ = 'price_oracles'
+
+    id = db.Column(db.Integer, primary_key=True)
+    commodity = db.Column(db.String(50), nullable=False)
+    price_usd = db.Column(Money(10, 2), nullable=False)
+    source = db.Column(db.String(100))
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    hcs_topic_id = db.Column(db.String(20))
+
+
+class PriceCandle(db.Model):
+    __tablename__ = 'price_candles'
+
+    commodity = db.Column(db.String(50), primary_key=True)
+    interval = db.Column(db.String(3), primary_key=True)  # 1h, 1d, 1w
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    open = db.Column(Money(10, 2), nullable=False)
+    high = db.Column(Money(10, 2), nullable=False)
+    low = db.Column(Money(10, 2), nullable=False)
+    close = db.Column(Money(10, 2), nullable=False)
+    open_at = db.Column(db.DateTime, nullable=False)
+    close_at = db.Column(db.DateTime, nullable=False)
+    price_count = db.Column(db.Integer, nullable=False)
+    price_sum = db.Column(Money(18, 2), nullable=False)
+
+
+class AnalyticsCube(db.Model):
+    __tablename__ = 'analytics_cube'
+
+    # Dimensions (see cube.py); missing values are stored as 'unknown'
+    crop_type = db.Column(db.String(50), primary_key=True)
+    region = db.Column(db.String(50), primary_key=True)  # gazetteer place of the farmer's location
+    quality_grade = db.Column(db.String(10), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # first day of the token's or loan's creation month
+    # Additive measures
+    tokens = db.Column(db.Integer, nullable=False, default=0)
+    token_quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    loans = db.Column(db.Integer, nullable=False, default=0)
+    loan_amount = db.Column(Money(18, 2), nullable=False, default=0)
+    ltv_sum = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    interest_rate_sum = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    funded_loans = db.Column(db.Integer, nullable=False, default=0)
+    funded_amount = db.Column(Money(18, 2), nullable=False, default=0)
+
+
+class AuditLog(db.Model):
+    __tablename__ = 'audit_logs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.String(50))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    data = db.Column(db.JSON)
+    hedera_tx_id = db.Column(db.String(100))
+    hcs_timestamp = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # mint_token, create_loan, stress_test
+    status = db.Column(db.String(20), default='queued')  # queued, running, retrying, succeeded, failed
+    payload = db.Column(db.JSON)
+    result = db.Column(db.JSON)
+    error = db.Column(db.String(500))
+    attempts = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'chain_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    aggregate_id = db.Column(db.String(24), nullable=False, index=True)  # loan contract_id
+    method = db.Column(db.String(30), nullable=False)  # createLoan, fundLoan
+    args = db.Column(db.JSON)
+    status = db.Column(db.String(20), default='pending')  # pending, in_flight, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    nonce = db.Column(db.BigInteger)
+    tx_hash = db.Column(db.String(100))
+    result = db.Column(db.JSON)
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_chain_outbox_status_id', 'status', 'id'),)
@@ -0,0 +1,107 @@
+# Hedera AgriFund Backend - Fixed-point money
+#
+# Amounts and prices are held as integer micro-units (6 decimals), the
+# stablecoin base unit the contracts and projections.py already use. Money
+# columns load NUMERIC values straight into ints and store ints exactly, so
+# handlers multiply, sum and compare with integer arithmetic. Serialization
+# converts to a JSON number once (to_number), and bulk work uses int64 arrays
+# (unit_array).
+#
+# Columns keep their NUMERIC(p, 2) schema. Values are rounded half up to the
+# cent when stored, so a stored amount always reads back unchanged.
+import numbers
+from decimal import ROUND_HALF_EVEN, Decimal
+
+from sqlalchemy.types import Numeric, TypeDecorator
+
+UNIT_DECIMALS = 6
+UNIT = 10 ** UNIT_DECIMALS
+CENT = UNIT // 100
+
+
+def to_units(amount):
+    """A dollar amount (int, str, Decimal or float) to integer micro-units
+
+    Floats are taken at their shortest repr, so 0.29 is 290000 and not
+    289999. Raises ValueError for anything that is not a finite number.
+    """
+    if isinstance(amount, bool):
+        raise ValueError(f'Not an amount: {amount!r}')
+    if isinstance(amount, int):
+        return amount * UNIT
+    try:
+        value = Decimal(repr(amount) if isinstance(amount, float) else amount)
+    except (ArithmeticError, TypeError, ValueError):
+        raise ValueError(f'Not an amount: {amount!r}')
+    if not value.is_finite():
+        raise ValueError(f'Not an amount: {amount!r}')
+    return int(value.scaleb(UNIT_DECIMALS).to_integral_value(ROUND_HALF_EVEN))
+
+
+def to_decimal(units, decimals=UNIT_DECIMALS):
+    """Micro-units to a Decimal with `decimals` places (exact at the default 6)"""
+    step = 10 ** (UNIT_DECIMALS - decimals)
+    return Decimal(round_units(units, decimals) // step).scaleb(-decimals)
+
+
+def to_number(units):
+    """Micro-units to a JSON number
+
+    int / int division is correctly rounded, so the float's repr is the exact
+    decimal amount for anything up to 15 significant digits (all NUMERIC(15, 2)
+    values).
+    """
+    return units / UNIT
+
+
+def round_units(units, decimals=2):
+    """Round micro-units half up to `decimals` places (cents by default)"""
+    step = 10 ** (UNIT_DECIMALS - decimals)
+    return (units + step // 2) // step * step
+
+
+def divide(units, divisor):
+    """units / divisor rounded half up to whole micro-units"""
+    return (2 * units + divisor) // (2 * divisor)
+
+
+def percent(part, whole, decimals=2):
+    """part / whole as a percentage, rounded half up to `decimals` places, as a Decimal"""
+    scale = 10 ** decimals
+    return Decimal(divide(part * 100 * scale, whole)).scaleb(-decimals)
+
+
+def unit_array(units):
+    """An iterable of micro-units (None counts as 0) as an int64 array"""
+    import numpy as np
+
+    return np.fromiter((value or 0 for value in units), dtype=np.int64)
+
+
+class Money(TypeDecorator):
+    """NUMERIC(precision, scale) column whose Python values are integer micro-units"""
+
+    impl = Numeric
+    cache_ok = True
+
+    def __init__(self, precision=15, scale=2):
+        # asdecimal=False: drivers hand back floats (or Decimals) without a per-row Decimal conversion
+        super().__init__(precision, scale, asdecimal=False)
+        self.decimals = scale
+        self.step = 10 ** (UNIT_DECIMALS - scale)
+        self.places = 10 ** scale
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, numbers.Integral) or isinstance(value, bool):
+            raise TypeError(f'Money columns take integer micro-units, got {type(value).__name__}')
+        return to_decimal(int(value), self.decimals)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, Decimal):
+            return int(value.scaleb(UNIT_DECIMALS).to_integral_value(ROUND_HALF_EVEN))
+        # Stored values have `scale` decimals; rounding at that scale absorbs the float error
+        return round(value * self.places) * self.step
@@ -0,0 +1,507 @@
+# Hedera AgriFund Backend - Transactional outbox for on-chain submissions
+#
+# The API never calls AgriFundLoanContract inline. create_loan and fund_loan
+# add a chain_outbox row in the same transaction (and on the same shard) as
+# the loan change, so the database and the chain cannot diverge: either the
+# loan and its pending contract call are both stored or neither is.
+#
+# The dispatcher drains the outbox of every database. Each cycle it claims a
+# batch of due rows (calls for one loan stay in order: fundLoan waits for its
+# createLoan), assigns nonces locally, submits the whole batch without
+# waiting, then collects the receipts concurrently, so a batch costs about
+# one confirmation time instead of one per call. Failures are retried with
+# exponential backoff and jitter; a rejected nonce resynchronizes that
+# account's nonce counter from the chain.
+#
+# The contract takes the borrower and lender from msg.sender, so every call
+# is signed by the account it acts for: createLoan by the borrower, fundLoan
+# by the lender (the `sender` argument of each row), each with its own nonce
+# sequence. StubChain is an in-process loan contract with the same require()
+# checks for tests and benchmarks; Web3Chain talks JSON-RPC (Hedera relay or
+# a local hardhat node) with the accounts' custodial keys and needs the
+# optional web3 package.
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import MetaData, Table, bindparam, create_engine, func, select, update
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_TABLE = 'chain_outbox'
+DISPATCH_BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 2.0  # seconds before the first retry, doubled per attempt
+BACKOFF_MAX = 300.0
+LEASE_SECONDS = 300  # in_flight rows older than this belonged to a dispatcher that died
+RECEIPT_TIMEOUT = 60.0
+
+# Contract methods and their argument order (each row's args also name the signing `sender`)
+CONTRACT_CALLS = {
+    'createLoan': ['principal', 'interest_rate', 'duration', 'collateral_token', 'collateral_amount', 'auto_liquidation'],
+    'fundLoan': ['loan_id'],
+}
+
+# AgriFundLoanContract.getCollateralValue: a flat demo price per collateral token (18 decimals)
+COLLATERAL_TOKEN_VALUE = 100 * 10 ** 18
+
+
+class ChainError(Exception):
+    """Submission failed without using the nonce (RPC down, rate limited, ...)"""
+
+
+class NonceError(ChainError):
+    """The node rejected the nonce; the local counter must be resynchronized"""
+
+
+def load_account_keys(path):
+    """Custodial signing keys: a JSON object of Hedera account id -> EVM private key"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def backoff_delay(attempts, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    """Seconds before retry number `attempts`: exponential, jittered down to half"""
+    delay = min(maximum, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class NonceManager:
+    """Hands out consecutive nonces per signing account, each fetched from the chain once"""
+
+    def __init__(self, chain):
+        self.chain = chain
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def take(self, sender):
+        with self._lock:
+            if sender not in self._next:
+                self._next[sender] = self.chain.pending_nonce(sender)
+            nonce = self._next[sender]
+            self._next[sender] += 1
+            return nonce
+
+    def reset(self, sender):
+        with self._lock:
+            self._next.pop(sender, None)
+
+
+# Chains
+class StubChain:
+    """In-process AgriFundLoanContract with confirmation latency, per-account nonces and injectable faults
+
+    Calls are checked with the contract's require()s, in its order, and a
+    failed check gives a reverted receipt carrying the revert message.
+    Accounts are their Hedera ids; any account can sign.
+    """
+
+    def __init__(self, confirm_latency=0.05, submit_latency=0.0, failure_rate=0.0, seed=None,
+                 approved_collateral=(), max_ltv=8500):
+        self.confirm_latency = confirm_latency
+        self.submit_latency = submit_latency
+        self.failure_rate = failure_rate
+        self.approved_collateral = {address.lower() for address in approved_collateral}
+        self.max_ltv = max_ltv
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.nonces = {}
+        self.next_loan_id = 1
+        self.loans = {}  # loan id -> {'borrower', 'lender', 'status'}
+        self.transactions = {}
+
+    def signs_for(self, sender):
+        return True
+
+    def pending_nonce(self, sender):
+        with self._lock:
+            return self.nonces.get(sender, 0)
+
+    def submit(self, sender, method, args, nonce):
+        if self.submit_latency:
+            time.sleep(self.submit_latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise ChainError('RPC unavailable')
+            expected = self.nonces.get(sender, 0)
+            if nonce != expected:
+                raise NonceError(f'nonce {nonce} of {sender}, expected {expected}')
+            self.nonces[sender] = expected + 1
+            tx_hash = '0x' + hashlib.sha256(f'{sender}:{nonce}'.encode()).hexdigest()
+            self.transactions[tx_hash] = dict(self._execute(sender, method, args),
+                                              ready_at=time.monotonic() + self.confirm_latency)
+            return tx_hash
+
+    def _execute(self, sender, method, args):
+        if method == 'createLoan':
+            collateral_value = args['collateral_amount'] * COLLATERAL_TOKEN_VALUE
+            error = self._require([
+                (args['principal'] > 0, 'Principal must be greater than 0'),
+                (0 < args['interest_rate'] <= 5000, 'Interest rate must be between 0.01% and 50%'),
+                (args['duration'] >= 86400, 'Duration must be at least 1 day'),
+                (str(args['collateral_token']).lower() in self.approved_collateral, 'Collateral token not approved'),
+                (args['collateral_amount'] > 0, 'Collateral amount must be greater than 0'),
+                (lambda: args['principal'] * 10000 // collateral_value <= self.max_ltv, 'LTV ratio exceeds maximum allowed'),
+            ])
+            if error:
+                return error
+            loan_id = self.next_loan_id
+            self.next_loan_id += 1
+            self.loans[loan_id] = {'borrower': sender, 'lender': None, 'status': 'pending'}
+            return {'status': 1, 'loan_id': loan_id}
+        if method == 'fundLoan':
+            loan = self.loans.get(args['loan_id'])
+            error = self._require([
+                (loan is not None, 'Loan does not exist'),
+                (lambda: loan['status'] == 'pending', 'Invalid loan status for this operation'),
+                (lambda: sender != loan['borrower'], 'Borrower cannot fund their own loan'),
+            ])
+            if error:
+                return error
+            loan.update(lender=sender, status='funded')
+            return {'status': 1, 'loan_id': args['loan_id']}
+        return {'status': 0, 'error': f'Unknown method {method}'}
+
+    @staticmethod
+    def _require(checks):
+        """The reverted receipt of the first failing check (callables are only evaluated once reached)"""
+        for check, message in checks:
+            if not (check() if callable(check) else check):
+                return {'status': 0, 'error': message}
+        return None
+
+    def wait(self, tx_hash, timeout=RECEIPT_TIMEOUT):
+        with self._lock:
+            receipt = self.transactions.get(tx_hash)
+        if receipt is None:
+            raise ChainError(f'Unknown transaction {tx_hash}')
+        delay = receipt['ready_at'] - time.monotonic()
+        if delay > timeout:
+            raise TimeoutError(f'{tx_hash} not confirmed after {timeout}s')
+        if delay > 0:
+            time.sleep(delay)
+        return {key: value for key, value in receipt.items() if key != 'ready_at'}
+
+
+LOAN_CONTRACT_ABI = [
+    {'type': 'function', 'name': 'createLoan', 'stateMutability': 'nonpayable', 'inputs': [
+        {'name': '_principal', 'type': 'uint256'}, {'name': '_interestRate', 'type': 'uint256'},
+        {'name': '_duration', 'type': 'uint256'}, {'name': '_collateralToken', 'type': 'address'},
+        {'name': '_collateralAmount', 'type': 'uint256'}, {'name': '_autoLiquidation', 'type': 'bool'}],
+     'outputs': [{'name': '', 'type': 'uint256'}]},
+    {'type': 'function', 'name': 'fundLoan', 'stateMutability': 'nonpayable',
+     'inputs': [{'name': '_loanId', 'type': 'uint256'}], 'outputs': []},
+    {'type': 'event', 'name': 'LoanCreated', 'anonymous': False, 'inputs': [
+        {'name': 'loanId', 'type': 'uint256', 'indexed': True}, {'name': 'borrower', 'type': 'address', 'indexed': True},
+        {'name': 'principal', 'type': 'uint256', 'indexed': False},
+        {'name': 'collateralToken', 'type': 'address', 'indexed': False},
+        {'name': 'collateralAmount', 'type': 'uint256', 'indexed': False}]},
+]
+
+
+class Web3Chain:
+    """AgriFundLoanContract over JSON-RPC, signing each call with its sender's key (requires web3)"""
+
+    def __init__(self, rpc_url, contract_address, account_keys, gas=800000):
+        from web3 import Web3
+
+        self.web3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.accounts = {sender: self.web3.eth.account.from_key(key) for sender, key in account_keys.items()}
+        self.contract = self.web3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=LOAN_CONTRACT_ABI)
+        self.chain_id = self.web3.eth.chain_id
+        self.gas = gas
+
+    def signs_for(self, sender):
+        return sender in self.accounts
+
+    def pending_nonce(self, sender):
+        return self.web3.eth.get_transaction_count(self.accounts[sender].address, 'pending')
+
+    def submit(self, sender, method, args, nonce):
+        account = self.accounts[sender]
+        values = [args[name] for name in CONTRACT_CALLS[method]]
+        if method == 'createLoan':
+            values[3] = self.web3.to_checksum_address(values[3])
+        transaction = getattr(self.contract.functions, method)(*values).build_transaction({
+            'from': account.address, 'nonce': nonce, 'gas': self.gas,
+            'gasPrice': self.web3.eth.gas_price, 'chainId': self.chain_id,
+        })
+        signed = account.sign_transaction(transaction)
+        try:
+            return self.web3.eth.send_raw_transaction(signed.rawTransaction).hex()
+        except ValueError as e:
+            if 'nonce' in str(e).lower():
+                raise NonceError(str(e))
+            raise ChainError(str(e))
+
+    def wait(self, tx_hash, timeout=RECEIPT_TIMEOUT):
+        from web3.exceptions import TimeExhausted, TransactionNotFound
+
+        try:
+            receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        except TransactionNotFound:
+            raise ChainError(f'Unknown transaction {tx_hash}')
+        except TimeExhausted:
+            raise TimeoutError(f'{tx_hash} not confirmed after {timeout}s')
+        result = {'status': receipt.status}
+        if receipt.status != 1:
+            result['error'] = 'reverted'
+        for event in self.contract.events.LoanCreated().process_receipt(receipt):
+            result['loan_id'] = event.args.loanId
+        return result
+
+
+# Dispatcher
+class Dispatcher:
+    """Drains chain_outbox on one or more databases into a chain"""
+
+    def __init__(self, engines, chain, batch_size=DISPATCH_BATCH_SIZE, max_attempts=MAX_ATTEMPTS,
+                 backoff_base=BACKOFF_BASE, receipt_timeout=RECEIPT_TIMEOUT):
+        self.engines = list(engines)
+        self.tables = [Table(OUTBOX_TABLE, MetaData(), autoload_with=engine) for engine in self.engines]
+        self.chain = chain
+        self.nonces = NonceManager(chain)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.receipt_timeout = receipt_timeout
+        self._executor = ThreadPoolExecutor(max_workers=min(batch_size, 64), thread_name_prefix='receipts')
+        self._sent_times = deque()
+        self.stats = {'cycles': 0, 'submitted': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'nonce_resyncs': 0}
+
+    def claim(self, shard):
+        """Mark up to batch_size due rows in_flight, at most one per loan, oldest first"""
+        engine, table = self.engines[shard], self.tables[shard]
+        now = datetime.utcnow()
+        with engine.begin() as conn:
+            conn.execute(update(table).where(
+                table.c.status == 'in_flight', table.c.claimed_at < now - timedelta(seconds=LEASE_SECONDS)
+            ).values(status='pending'))
+            statement = select(table).where(table.c.status.in_(('pending', 'in_flight'))) \
+                .order_by(table.c.id).limit(self.batch_size * 4)
+            if engine.dialect.name == 'postgresql':
+                statement = statement.with_for_update(skip_locked=True)
+
+            claimed, seen = [], set()
+            for row in conn.execute(statement):
+                if row.aggregate_id in seen:
+                    continue  # an earlier call for this loan is still unsent
+                seen.add(row.aggregate_id)
+                if row.status == 'pending' and row.next_attempt_at <= now:
+                    claimed.append(row)
+                    if len(claimed) == self.batch_size:
+                        break
+            if claimed:
+                conn.execute(update(table).where(table.c.id.in_([row.id for row in claimed]))
+                             .values(status='in_flight', claimed_at=now))
+        return claimed
+
+    def resolve_loan_ids(self, contract_ids):
+        """On-chain loan ids from confirmed createLoan rows (on any database: loans can be resharded)"""
+        found = {}
+        for engine, table in zip(self.engines, self.tables):
+            if not contract_ids:
+                break
+            with engine.connect() as conn:
+                created = conn.execute(select(table.c.aggregate_id, table.c.result).where(
+                    table.c.aggregate_id.in_(contract_ids), table.c.method == 'createLoan', table.c.status == 'sent'
+                )).all()
+            found.update((contract_id, result['loan_id']) for contract_id, result in created if result)
+        return found
+
+    def _submit(self, row, sender, args):
+        try:
+            nonce = self.nonces.take(sender)
+        except Exception as e:
+            return None, None, f'Nonce lookup failed: {e}'
+        try:
+            return nonce, self.chain.submit(sender, row.method, args, nonce), None
+        except NonceError as e:
+            self.stats['nonce_resyncs'] += 1
+            self.nonces.reset(sender)
+            return None, None, str(e)
+        except Exception as e:
+            # The nonce was not used; the sender's later submissions must not leave a gap
+            self.nonces.reset(sender)
+            return None, None, str(e) or type(e).__name__
+
+    def _wait(self, tx_hash):
+        try:
+            return self.chain.wait(tx_hash, timeout=self.receipt_timeout), None
+        except Exception as e:
+            return None, str(e) or type(e).__name__
+
+    def dispatch_once(self):
+        """One claim/submit/confirm cycle over every database; returns the number of rows handled"""
+        claimed = [(shard, row) for shard in range(len(self.engines)) for row in self.claim(shard)]
+        if not claimed:
+            return 0
+        loan_ids = self.resolve_loan_ids([row.aggregate_id for _, row in claimed if row.method == 'fundLoan'])
+
+        outcomes = []  # (shard, row, values)
+        waiting = []  # (shard, row, nonce, tx_hash)
+        for shard, row in claimed:
+            if row.tx_hash:
+                # Submitted before but never confirmed: look for the receipt before sending again
+                try:
+                    outcomes.append((shard, row, self._confirmed(row, self.chain.wait(row.tx_hash, self.receipt_timeout))))
+                    continue
+                except TimeoutError as e:
+                    outcomes.append((shard, row, self._failed(row, str(e), tx_hash=row.tx_hash)))
+                    continue
+                except Exception:
+                    pass  # dropped by the network: send it again
+            args = dict(row.args)
+            sender = args.get('sender')
+            if not self.chain.signs_for(sender):
+                outcomes.append((shard, row, self._failed(row, f'No signing key for {sender}', final=True)))
+                continue
+            if row.method == 'fundLoan':
+                if row.aggregate_id not in loan_ids:
+                    outcomes.append((shard, row, self._failed(row, 'createLoan not confirmed yet')))
+                    continue
+                args['loan_id'] = loan_ids[row.aggregate_id]
+            nonce, tx_hash, error = self._submit(row, sender, args)
+            if error:
+                outcomes.append((shard, row, self._failed(row, error)))
+            else:
+                waiting.append((shard, row, nonce, tx_hash))
+        self.stats['submitted'] += len(waiting)
+
+        # Remember the hashes first so a crash while waiting does not resend
+        self._write([(shard, row, {'nonce': nonce, 'tx_hash': tx_hash}) for shard, row, nonce, tx_hash in waiting])
+
+        receipts = self._executor.map(self._wait, [tx_hash for _, _, _, tx_hash in waiting])
+        for (shard, row, nonce, tx_hash), (receipt, error) in zip(waiting, receipts):
+            if receipt is None:
+                outcomes.append((shard, row, self._failed(row, error, tx_hash=tx_hash)))
+            else:
+                outcomes.append((shard, row, self._confirmed(row, receipt)))
+        self._write(outcomes)
+        self.stats['cycles'] += 1
+        return len(claimed)
+
+    def _confirmed(self, row, receipt):
+        if receipt['status'] != 1:
+            return self._failed(row, receipt.get('error', 'reverted'), tx_hash=None)
+        self.stats['sent'] += 1
+        self._sent_times.append(time.monotonic())
+        return {'status': 'sent', 'sent_at': datetime.utcnow(), 'error': None,
+                'result': {'loan_id': receipt.get('loan_id')}, 'attempts': row.attempts + 1}
+
+    def _failed(self, row, error, tx_hash=None, final=False):
+        attempts = row.attempts + 1
+        values = {'error': (error or 'failed')[:500], 'attempts': attempts, 'tx_hash': tx_hash}
+        if final or attempts >= self.max_attempts:
+            self.stats['failed'] += 1
+            logger.error(f"Outbox message {row.id} ({row.method} {row.aggregate_id}) failed: {error}")
+            return dict(values, status='failed')
+        self.stats['retried'] += 1
+        retry_at = datetime.utcnow() + timedelta(seconds=backoff_delay(attempts, self.backoff_base))
+        return dict(values, status='pending', next_attempt_at=retry_at)
+
+    def _write(self, outcomes):
+        """Apply per-row column updates, one executemany per shard and column set"""
+        groups = {}
+        for shard, row, values in outcomes:
+            groups.setdefault((shard, tuple(sorted(values))), []).append(dict(values, _id=row.id))
+        for (shard, columns), params in groups.items():
+            table = self.tables[shard]
+            statement = update(table).where(table.c.id == bindparam('_id')) \
+                .values({column: bindparam(column) for column in columns})
+            with self.engines[shard].begin() as conn:
+                conn.execute(statement, params)
+
+    def throughput(self, window=60.0):
+        """Confirmed calls per second over the last `window` seconds"""
+        cutoff = time.monotonic() - window
+        while self._sent_times and self._sent_times[0] < cutoff:
+            self._sent_times.popleft()
+        return len(self._sent_times) / window
+
+    def run(self, interval=0.5, stop=None):
+        """Dispatch until `stop` (a threading.Event) is set, sleeping when the outbox is empty"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                handled = self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {str(e)}")
+                handled = 0
+            if not handled:
+                stop.wait(interval)
+
+
+def outbox_metrics(engines, table, now=None):
+    """Backlog, lag of the oldest unsent call and recent throughput across databases"""
+    now = now or datetime.utcnow()
+    counts = {'pending': 0, 'in_flight': 0, 'sent': 0, 'failed': 0}
+    oldest = None
+    sent_last_minute = 0
+    for engine in engines:
+        with engine.connect() as conn:
+            for status, count in conn.execute(select(table.c.status, func.count()).group_by(table.c.status)):
+                counts[status] = counts.get(status, 0) + count
+            unsent = conn.execute(select(func.min(table.c.created_at))
+                                  .where(table.c.status.in_(('pending', 'in_flight')))).scalar()
+            if unsent is not None and (oldest is None or unsent < oldest):
+                oldest = unsent
+            sent_last_minute += conn.execute(select(func.count()).where(
+                table.c.status == 'sent', table.c.sent_at >= now - timedelta(minutes=1)
+            )).scalar()
+    return dict(counts, lag_seconds=(now - oldest).total_seconds() if oldest else 0.0,
+                throughput_per_second=sent_last_minute / 60)
+
+
+def make_chain(args):
+    if args.stub:
+        return StubChain(confirm_latency=args.stub_latency, approved_collateral=json.loads(args.collateral_tokens).values())
+    if not (args.rpc_url and args.contract_address and args.account_keys):
+        raise SystemExit('Set CHAIN_RPC_URL, LOAN_CONTRACT_ADDRESS and CHAIN_ACCOUNT_KEYS, or use --stub')
+    return Web3Chain(args.rpc_url, args.contract_address, load_account_keys(args.account_keys))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from sharding import ShardRouter
+
+    parser = argparse.ArgumentParser(description='Submit queued contract calls from the outbox')
+    parser.add_argument('command', choices=['dispatch', 'status'])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'postgresql://localhost/hedera_agrifund'))
+    parser.add_argument('--shard-urls', default=os.environ.get('SHARD_DATABASE_URLS', ''),
+                        help='comma-separated shard URLs (the outbox lives with the loans)')
+    parser.add_argument('--rpc-url', default=os.environ.get('CHAIN_RPC_URL'))
+    parser.add_argument('--contract-address', default=os.environ.get('LOAN_CONTRACT_ADDRESS'))
+    parser.add_argument('--account-keys', default=os.environ.get('CHAIN_ACCOUNT_KEYS'),
+                        help='JSON file of Hedera account id -> private key for the borrowers and lenders')
+    parser.add_argument('--stub', action='store_true', help='submit to an in-process chain stub')
+    parser.add_argument('--collateral-tokens', default=os.environ.get('COLLATERAL_TOKENS') or '{}',
+                        help='collateral ERC-20s the stub approves (JSON crop type -> address, as for the API)')
+    parser.add_argument('--stub-latency', type=float, default=0.05)
+    parser.add_argument('--batch-size', type=int, default=DISPATCH_BATCH_SIZE)
+    parser.add_argument('--once', action='store_true', help='run until the outbox is drained, then exit')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    shard_urls = [url for url in args.shard_urls.split(',') if url]
+    engines = ShardRouter(shard_urls).engines if shard_urls else [create_engine(args.database_url)]
+
+    if args.command == 'status':
+        table = Table(OUTBOX_TABLE, MetaData(), autoload_with=engines[0])
+        print(outbox_metrics(engines, table))
+    else:
+        dispatcher = Dispatcher(engines, make_chain(args), batch_size=args.batch_size)
+        if args.once:
+            while dispatcher.dispatch_once():
+                pass
+            print(dispatcher.stats)
+        else:
+            dispatcher.run()
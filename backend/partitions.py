@@ -0,0 +1,436 @@
+# Hedera AgriFund Backend - Time partitioning and cold archival
+#
+# audit_logs and price_oracles are append-only. On PostgreSQL they are turned
+# into monthly RANGE-partitioned tables; closed months older than the hot
+# retention window are exported to zstd-compressed Parquet files and dropped
+# from the database. On other engines (SQLite in development) the same
+# archiver works as a rolling scheme: rows of a closed month are exported and
+# deleted by range.
+#
+# Partitions are kept a few months ahead by maintain_partitions, which Celery
+# beat runs daily (see jobs.py) together with the archiver. Rows that landed
+# in the default partition meanwhile are moved into their month's partition
+# when it is created, and archived like any other row.
+import json
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+
+import jobs
+from jobs import task
+
+logger = logging.getLogger(__name__)
+
+# Partitioned tables and the timestamp column they are ranged on
+PARTITIONED_TABLES = {
+    'audit_logs': 'created_at',
+    'price_oracles': 'timestamp',
+}
+
+# Column DDL for the partitioned parents (mirrors AuditLog and PriceOracle in models.py)
+TABLE_DDL = {
+    'audit_logs': """
+        id SERIAL,
+        event_type VARCHAR(50) NOT NULL,
+        entity_id VARCHAR(50),
+        user_id INTEGER REFERENCES users(id),
+        data JSON,
+        hedera_tx_id VARCHAR(100),
+        hcs_timestamp BIGINT,
+        created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+        PRIMARY KEY (id, created_at)
+    """,
+    'price_oracles': """
+        id SERIAL,
+        commodity VARCHAR(50) NOT NULL,
+        price_usd NUMERIC(10, 2) NOT NULL,
+        source VARCHAR(100),
+        timestamp TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+        hcs_topic_id VARCHAR(20),
+        PRIMARY KEY (id, timestamp)
+    """,
+}
+
+TABLE_INDEXES = {
+    'audit_logs': [
+        'CREATE INDEX IF NOT EXISTS ix_audit_logs_created_at ON audit_logs (created_at DESC)',
+        'CREATE INDEX IF NOT EXISTS ix_audit_logs_event_type ON audit_logs (event_type, created_at DESC)',
+        'CREATE INDEX IF NOT EXISTS ix_audit_logs_entity_id ON audit_logs (entity_id)',
+        'CREATE INDEX IF NOT EXISTS ix_audit_logs_user_id ON audit_logs (user_id)',
+    ],
+    'price_oracles': [
+        'CREATE INDEX IF NOT EXISTS ix_price_oracles_commodity_ts ON price_oracles (commodity, timestamp DESC)',
+    ],
+}
+
+# Parquet schema per table: (column, arrow type name)
+ARCHIVE_COLUMNS = {
+    'audit_logs': [
+        ('id', 'int64'), ('event_type', 'string'), ('entity_id', 'string'),
+        ('user_id', 'int64'), ('data', 'string'), ('hedera_tx_id', 'string'),
+        ('hcs_timestamp', 'int64'), ('created_at', 'timestamp'),
+    ],
+    'price_oracles': [
+        ('id', 'int64'), ('commodity', 'string'), ('price_usd', 'float64'),
+        ('source', 'string'), ('timestamp', 'timestamp'), ('hcs_topic_id', 'string'),
+    ],
+}
+
+EXPORT_BATCH_SIZE = 10000
+
+
+# Month arithmetic
+def month_start(dt):
+    """Truncate a datetime to the first instant of its month"""
+    return datetime(dt.year, dt.month, 1)
+
+
+def add_months(dt, months):
+    """Shift a month-start datetime by a number of months"""
+    index = dt.year * 12 + dt.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def default_partition(table):
+    return f"{table}_default"
+
+
+def is_postgres(bind):
+    return bind.dialect.name == 'postgresql'
+
+
+def _table_exists(conn, name):
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+
+
+# Partition management (PostgreSQL)
+def ensure_partitioned(engine, months_ahead=3):
+    """Convert the append-only tables to monthly partitions and pre-create upcoming months"""
+    if not is_postgres(engine):
+        return
+
+    with engine.begin() as conn:
+        for table, ts_column in PARTITIONED_TABLES.items():
+            relkind = conn.execute(text(
+                "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relname = :table AND n.nspname = current_schema()"
+            ), {'table': table}).scalar()
+
+            if relkind == 'p':
+                first_month = month_start(datetime.utcnow())
+                # Months whose rows went to the default partition get their own partition too
+                if _table_exists(conn, default_partition(table)):
+                    oldest = conn.execute(text(f"SELECT min({ts_column}) FROM {default_partition(table)}")).scalar()
+                    if oldest and oldest < first_month:
+                        first_month = month_start(oldest)
+            else:
+                first_month = _migrate_to_partitioned(conn, table, ts_column, relkind)
+
+            last_month = add_months(month_start(datetime.utcnow()), months_ahead)
+            month = first_month
+            while month <= last_month:
+                _create_partition(conn, table, month)
+                month = add_months(month, 1)
+
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default_partition(table)} PARTITION OF {table} DEFAULT"))
+            for statement in TABLE_INDEXES[table]:
+                conn.execute(text(statement))
+
+
+def _migrate_to_partitioned(conn, table, ts_column, relkind):
+    """Swap a plain table for a partitioned parent, copying existing rows across"""
+    legacy = f"{table}_unpartitioned"
+    first_month = month_start(datetime.utcnow())
+
+    if relkind == 'r':
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+        oldest = conn.execute(text(f"SELECT min({ts_column}) FROM {legacy}")).scalar()
+        if oldest:
+            first_month = month_start(oldest)
+
+    conn.execute(text(f"CREATE TABLE {table} ({TABLE_DDL[table]}) PARTITION BY RANGE ({ts_column})"))
+
+    if relkind == 'r':
+        month = first_month
+        while month <= month_start(datetime.utcnow()):
+            _create_partition(conn, table, month)
+            month = add_months(month, 1)
+
+        columns = ', '.join(name for name, _ in ARCHIVE_COLUMNS[table])
+        conn.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}"))
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"
+        ))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+        logger.info(f"Migrated {table} to monthly partitions starting {first_month:%Y-%m}")
+
+    return first_month
+
+
+def _create_partition(conn, table, month):
+    """Create a month's partition, moving rows of that month out of the default partition first
+
+    PostgreSQL refuses a new partition while the default partition holds
+    rows in its range, so those are copied into a detached table that is
+    then attached, all in the caller's transaction.
+    """
+    name = partition_name(table, month)
+    bounds = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    if _table_exists(conn, name):
+        return
+    if not _table_exists(conn, default_partition(table)):
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {bounds}"))
+        return
+
+    ts_column = PARTITIONED_TABLES[table]
+    columns = ', '.join(column for column, _ in ARCHIVE_COLUMNS[table])
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {default_partition(table)} "
+        f"WHERE {ts_column} >= :start AND {ts_column} < :end RETURNING {columns}) "
+        f"INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+    ), {'start': month, 'end': add_months(month, 1)}).rowcount
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {bounds}"))
+    if moved:
+        logger.info(f"Moved {moved} rows of {table} for {month:%Y-%m} out of the default partition")
+
+
+def _closed_months(conn, table, ts_column, cutoff):
+    """Months strictly before the cutoff that still hold rows in the hot database"""
+    if is_postgres(conn):
+        names = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table"
+        ), {'table': table}).scalars()
+        prefix = f"{table}_p"
+        months = set()
+        for name in names:
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and suffix.isdigit():
+                month = datetime(int(suffix[:4]), int(suffix[4:]), 1)
+                if month < cutoff:
+                    months.add(month)
+            elif name == default_partition(table):
+                months.update(conn.execute(text(
+                    f"SELECT DISTINCT date_trunc('month', {ts_column}) FROM {name} WHERE {ts_column} < :cutoff"
+                ), {'cutoff': cutoff}).scalars())
+        return sorted(months)
+
+    oldest = conn.execute(text(f"SELECT min({ts_column}) FROM {table}")).scalar()
+    if oldest is None:
+        return []
+    if isinstance(oldest, str):
+        oldest = datetime.fromisoformat(oldest)
+
+    months = []
+    month = month_start(oldest)
+    while month < cutoff:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+# Archival
+def archive_path(archive_dir, table, month):
+    return os.path.join(archive_dir, table, f"{month.year:04d}-{month.month:02d}.parquet")
+
+
+def archived_months(archive_dir, table):
+    """List the months of a table that have been exported to cold storage"""
+    table_dir = os.path.join(archive_dir, table)
+    if not os.path.isdir(table_dir):
+        return []
+
+    months = []
+    for filename in os.listdir(table_dir):
+        stem, ext = os.path.splitext(filename)
+        if ext == '.parquet' and len(stem) == 7 and stem[4] == '-':
+            months.append(datetime(int(stem[:4]), int(stem[5:]), 1))
+    return sorted(months)
+
+
+def archive_closed_partitions(engine, archive_dir, retain_months=6):
+    """Export closed months older than the hot window to Parquet and drop them from the database"""
+    cutoff = add_months(month_start(datetime.utcnow()), -retain_months)
+    archived = []
+
+    for table, ts_column in PARTITIONED_TABLES.items():
+        with engine.connect() as conn:
+            months = _closed_months(conn, table, ts_column, cutoff)
+
+        for month in months:
+            rows = _export_month(engine, archive_dir, table, ts_column, month)
+            if rows == 0 and not is_postgres(engine):
+                continue
+
+            with engine.begin() as conn:
+                if is_postgres(conn):
+                    name = partition_name(table, month)
+                    if _table_exists(conn, name):
+                        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                        conn.execute(text(f"DROP TABLE {name}"))
+                    if _table_exists(conn, default_partition(table)):
+                        conn.execute(text(
+                            f"DELETE FROM {default_partition(table)} WHERE {ts_column} >= :start AND {ts_column} < :end"
+                        ), {'start': month, 'end': add_months(month, 1)})
+                else:
+                    conn.execute(text(
+                        f"DELETE FROM {table} WHERE {ts_column} >= :start AND {ts_column} < :end"
+                    ), {'start': month, 'end': add_months(month, 1)})
+
+            logger.info(f"Archived {rows} rows of {table} for {month:%Y-%m}")
+            archived.append((table, month, rows))
+
+    return archived
+
+
+def _export_month(engine, archive_dir, table, ts_column, month):
+    """Stream one month of rows into a Parquet file with a server-side cursor
+
+    Rows already in the month's file (late arrivals archived earlier, or a
+    run that crashed between writing the file and dropping the partition)
+    are kept once: exported ids replace the archived ones.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, table)
+    path = archive_path(archive_dir, table, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    columns = [name for name, _ in ARCHIVE_COLUMNS[table]]
+    query = text(
+        f"SELECT {', '.join(columns)} FROM {table} "
+        f"WHERE {ts_column} >= :start AND {ts_column} < :end ORDER BY {ts_column}"
+    )
+
+    rows = 0
+    exported_ids = []
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(
+                query, {'start': month, 'end': add_months(month, 1)}
+            )
+            while True:
+                batch = result.fetchmany(EXPORT_BATCH_SIZE)
+                if not batch:
+                    break
+                arrays = [
+                    pa.array([_archive_value(row[i], kind) for row in batch], type=schema.field(i).type)
+                    for i, (_, kind) in enumerate(ARCHIVE_COLUMNS[table])
+                ]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                exported_ids.append(arrays[0])  # id is the first archive column
+                rows += len(batch)
+
+        if rows and os.path.exists(path):
+            exported = pa.chunked_array(exported_ids, type=pa.int64()).combine_chunks()
+            existing = pq.read_table(path, schema=schema)
+            writer.write_table(existing.filter(pc.invert(pc.is_in(existing['id'], value_set=exported))))
+
+    if rows == 0:
+        # Nothing in this month (e.g. gaps on the rolling fallback): leave any earlier archive as it is
+        os.remove(tmp_path)
+        return 0
+
+    os.replace(tmp_path, path)
+    return rows
+
+
+def _arrow_schema(pa, table):
+    types = {
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'timestamp': pa.timestamp('us'),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in ARCHIVE_COLUMNS[table]])
+
+
+def _archive_value(value, kind):
+    if value is None:
+        return None
+    if kind == 'float64':
+        return float(value)
+    if kind == 'timestamp' and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if kind == 'string' and not isinstance(value, str):
+        return json.dumps(value)
+    return value
+
+
+def read_archive(archive_dir, table, start=None, end=None, filters=None, limit=None):
+    """Read archived rows newest first, opening only the months the window overlaps"""
+    import pyarrow.parquet as pq
+
+    ts_column = PARTITIONED_TABLES[table]
+    rows = []
+
+    for month in reversed(archived_months(archive_dir, table)):
+        if start and add_months(month, 1) <= start:
+            break
+        if end and month >= end:
+            continue
+
+        predicates = [(column, '=', value) for column, value in (filters or {}).items()]
+        if start:
+            predicates.append((ts_column, '>=', start))
+        if end:
+            predicates.append((ts_column, '<', end))
+
+        table_data = pq.read_table(archive_path(archive_dir, table, month), filters=predicates or None)
+        month_rows = table_data.sort_by([(ts_column, 'descending')]).to_pylist()
+        rows.extend(month_rows)
+
+        if limit and len(rows) >= limit:
+            return rows[:limit]
+
+    return rows
+
+
+def oldest_hot_month(archive_dir, table):
+    """First month still served from the database (None if nothing has been archived)"""
+    months = archived_months(archive_dir, table)
+    return add_months(months[-1], 1) if months else None
+
+
+@task(name='agrifund.maintain_partitions')
+def maintain_partitions():
+    """Pre-create upcoming partitions and archive closed months (scheduled daily by Celery beat)"""
+    from extensions import db
+
+    app = jobs.flask_app
+    with app.app_context():
+        ensure_partitioned(db.engine)
+        archive_closed_partitions(db.engine, app.config['ARCHIVE_DIR'], app.config['HOT_RETENTION_MONTHS'])
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage audit/price partitions and cold archives')
+    parser.add_argument('command', choices=['partition', 'archive'])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'postgresql://localhost/hedera_agrifund'))
+    parser.add_argument('--archive-dir', default=os.environ.get('ARCHIVE_DIR', 'archive'))
+    parser.add_argument('--retain-months', type=int, default=int(os.environ.get('HOT_RETENTION_MONTHS', 6)))
+    parser.add_argument('--months-ahead', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = create_engine(args.database_url)
+
+    if args.command == 'partition':
+        ensure_partitioned(engine, months_ahead=args.months_ahead)
+    else:
+        ensure_partitioned(engine, months_ahead=args.months_ahead)
+        for table, month, rows in archive_closed_partitions(engine, args.archive_dir, args.retain_months):
+            print(f"{table} {month:%Y-%m}: {rows} rows archived")
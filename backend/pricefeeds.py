@@ -0,0 +1,207 @@
+# Hedera AgriFund Backend - Multi-source commodity price aggregation
+#
+# Every configured feed is queried concurrently with its own timeout, and the
+# whole fetch is bounded by one deadline, so the slowest feed never sets the
+# latency of a mint. Feeds that keep failing are skipped by a per-source
+# circuit breaker until a cool-down has passed. Quotes are combined with a
+# confidence-weighted median after rejecting outliers (median absolute
+# deviation), and the result carries a confidence on PriceOracle.sol's
+# 0-10000 scale; aggregates below minimumConfidence (7000) are discarded.
+#
+# A feed answers GET <url with {commodity} filled in> with JSON
+#     {"price": 251.5, "confidence": 9500}
+# where confidence is optional (the source's configured confidence is used).
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+MIN_CONFIDENCE = 7000  # PriceOracle.minimumConfidence
+MAX_CONFIDENCE = 10000
+MAD_SCALE = 1.4826  # MAD -> standard deviation for normally distributed quotes
+OUTLIER_CUTOFF = 3.5  # robust z-score above which a quote is rejected
+MIN_RELATIVE_SPREAD = 0.02  # quotes within 2 % of the median are never outliers
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures; half-open (one trial call) after a cool-down"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def release(self):
+        """An allowed call was never made (cancelled while still queued); the next call may be the trial"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class PriceSource:
+    """One HTTP price feed"""
+
+    def __init__(self, name, url, confidence=9000, weight=1.0, timeout=1.0):
+        self.name = name
+        self.url = url
+        self.confidence = confidence
+        self.weight = weight
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+
+    def fetch(self, session, commodity):
+        response = session.get(self.url.format(commodity=commodity), timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        price = float(body['price'])
+        confidence = int(body.get('confidence', self.confidence))
+        if not price > 0 or not 0 < confidence <= MAX_CONFIDENCE:
+            raise ValueError(f'invalid quote {body!r}')
+        return price, confidence
+
+
+def weighted_median(values, weights):
+    """Smallest value at which the cumulative weight reaches half of the total"""
+    order = np.argsort(values, kind='stable')
+    values, weights = np.asarray(values, dtype=np.float64)[order], np.asarray(weights, dtype=np.float64)[order]
+    cumulative = np.cumsum(weights)
+    return float(values[np.searchsorted(cumulative, cumulative[-1] / 2.0)])
+
+
+def aggregate(quotes, min_confidence=MIN_CONFIDENCE):
+    """Combine [(source, price, confidence, weight)] into one price, or None if confidence is too low
+
+    Returns a dict with price, confidence (0-10000), the sources used and those rejected as outliers.
+    """
+    if not quotes:
+        return None
+    names = [quote[0] for quote in quotes]
+    prices = np.array([quote[1] for quote in quotes], dtype=np.float64)
+    confidences = np.array([quote[2] for quote in quotes], dtype=np.float64)
+    weights = confidences * np.array([quote[3] for quote in quotes], dtype=np.float64)
+
+    median = weighted_median(prices, weights)
+    deviation = np.abs(prices - median)
+    spread = max(MAD_SCALE * float(np.median(deviation)), MIN_RELATIVE_SPREAD * median)
+    inliers = deviation / spread <= OUTLIER_CUTOFF
+
+    price = weighted_median(prices[inliers], weights[inliers])
+    # Confidence: the inliers' own confidence, scaled by the share of weight that agreed
+    agreement = weights[inliers].sum() / weights.sum()
+    confidence = int(np.average(confidences[inliers], weights=weights[inliers]) * agreement)
+    if confidence < min_confidence:
+        return None
+
+    return {
+        'price': round(price, 2),
+        'confidence': confidence,
+        'sources': [name for name, keep in zip(names, inliers) if keep],
+        'rejected': [name for name, keep in zip(names, inliers) if not keep],
+    }
+
+
+class PriceAggregator:
+    """Fetches every source concurrently and aggregates the quotes per commodity"""
+
+    def __init__(self, sources, deadline=1.5, min_confidence=MIN_CONFIDENCE, max_workers=16):
+        self.sources = list(sources)
+        self.deadline = deadline
+        self.min_confidence = min_confidence
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max(len(self.sources), 1), pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pricefeed')
+        self.stats = {'requests': 0, 'failures': 0, 'timeouts': 0, 'short_circuited': 0}
+        self._stats_lock = threading.Lock()  # _call runs on the executor's threads
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _call(self, source, commodity):
+        try:
+            quote = source.fetch(self.session, commodity)
+        except Exception as e:
+            source.breaker.record_failure()
+            self._count('failures')
+            logger.warning(f"Price source {source.name} failed for {commodity}: {e}")
+            return None
+        source.breaker.record_success()
+        return quote
+
+    def fetch(self, commodities):
+        """Aggregated price per commodity ({commodity: result or None}) within one deadline"""
+        futures = {}
+        for commodity in commodities:
+            for source in self.sources:
+                if not source.breaker.allow():
+                    self._count('short_circuited')
+                    continue
+                self._count('requests')
+                futures[self._executor.submit(self._call, source, commodity)] = (commodity, source)
+
+        done, not_done = wait(futures, timeout=self.deadline)
+        for future in not_done:
+            # Still running past the deadline, the request's own timeout will end it; still queued, it never runs
+            self._count('timeouts')
+            if future.cancel():
+                futures[future][1].breaker.release()
+
+        quotes = {commodity: [] for commodity in commodities}
+        for future in done:
+            commodity, source = futures[future]
+            quote = future.result()
+            if quote is not None:
+                quotes[commodity].append((source.name, quote[0], quote[1], source.weight))
+
+        return {commodity: aggregate(quotes[commodity], self.min_confidence) for commodity in commodities}
+
+    def breaker_states(self):
+        return {source.name: source.breaker.state for source in self.sources}
+
+
+def load_sources(config):
+    """Sources from PRICE_SOURCES: a JSON list of {name, url, confidence, weight, timeout}"""
+    if not config:
+        return []
+    return [PriceSource(**entry) for entry in json.loads(config)]
@@ -0,0 +1,96 @@
+# Hedera AgriFund Backend - Interest accrual and cash flow projections
+#
+# Mirrors AgriFundLoanContract.calculateInterest for whole portfolios at once:
+#     yearly   = principal * interestRate / 10000        (integer division)
+#     interest = yearly * timeElapsed / 365 days          (integer division)
+# with principal in stablecoin base units (micro-units, 6 decimals), the rate
+# in basis points and time in whole seconds. Loans are bullet loans: principal
+# plus accrued interest is repaid in one payment, and interest keeps accruing
+# after the due date until the loan is repaid or liquidated.
+#
+# All arithmetic is exact int64; products are split with divmod so that
+# intermediates never overflow for any principal/interest that fits in int64.
+import numpy as np
+
+BASIS_POINTS = 10000
+SECONDS_PER_YEAR = 365 * 24 * 3600
+PERIOD_SECONDS = 30 * 24 * 3600  # the API sets due_date = funded_at + duration_months * 30 days
+
+
+def to_basis_points(rates):
+    """Percent rates (8.5 for 8.5 %) to int64 basis points, as stored on-chain"""
+    return np.rint(np.asarray(rates, dtype=np.float64) * 100).astype(np.int64)
+
+
+def to_epoch_seconds(timestamps):
+    """Naive UTC datetimes to int64 epoch seconds (None becomes 0)"""
+    values = [ts if ts is not None else np.datetime64(0, 's') for ts in timestamps]
+    return np.array(values, dtype='datetime64[s]').astype(np.int64)
+
+
+def mul_div(a, b, divisor):
+    """Exact floor(a * b / divisor) for non-negative int64 arrays without forming a * b"""
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    quotient, remainder = np.divmod(a, divisor)
+    return quotient * b + (remainder * b) // divisor
+
+
+def accrued_interest(principal, rate_bps, elapsed):
+    """calculateInterest for arrays of loans (broadcasts, e.g. elapsed[:, None] for schedules)"""
+    yearly = mul_div(principal, rate_bps, BASIS_POINTS)
+    return mul_div(yearly, np.maximum(elapsed, 0), SECONDS_PER_YEAR)
+
+
+def project(principal, rate_bps, funded_at, due_at, as_of, funded=None):
+    """Accrued interest today and at maturity, outstanding balance and expected repayment per loan
+
+    Arrays are aligned per loan; principal in micro-units, rate in basis points,
+    times in epoch seconds. Loans that are not funded accrue nothing, as on-chain.
+    """
+    principal = np.asarray(principal, dtype=np.int64)
+    funded = np.ones(principal.shape, dtype=bool) if funded is None else np.asarray(funded, dtype=bool)
+    funded_at = np.asarray(funded_at, dtype=np.int64)
+    due_at = np.asarray(due_at, dtype=np.int64)
+
+    accrued = np.where(funded, accrued_interest(principal, rate_bps, as_of - funded_at), 0)
+    # Overdue loans are projected as repaid now, with interest accrued to date
+    repaid_at = np.maximum(due_at, as_of)
+    at_repayment = np.where(funded, accrued_interest(principal, rate_bps, repaid_at - funded_at), 0)
+
+    return {
+        'accrued_interest': accrued,
+        'outstanding': np.where(funded, principal + accrued, 0),
+        'interest_at_repayment': at_repayment,
+        'expected_repayment': np.where(funded, principal + at_repayment, 0),
+        'repayment_at': repaid_at,
+    }
+
+
+def accrual_schedule(principal, rate_bps, funded_at, due_at):
+    """Period-end accrued interest for every loan, one 30-day period per column
+
+    Returns (period_end, interest, mask): (loans, periods) arrays where the last
+    valid column of each row is the due date and mask marks valid periods.
+    """
+    funded_at = np.asarray(funded_at, dtype=np.int64)
+    term = np.maximum(np.asarray(due_at, dtype=np.int64) - funded_at, 0)
+    periods = np.maximum(-(-term // PERIOD_SECONDS), 1)
+
+    steps = np.arange(1, int(periods.max(initial=1)) + 1, dtype=np.int64)
+    elapsed = np.minimum(steps[None, :] * PERIOD_SECONDS, term[:, None])
+    mask = steps[None, :] <= periods[:, None]
+    interest = accrued_interest(np.asarray(principal, dtype=np.int64)[:, None],
+                                np.asarray(rate_bps, dtype=np.int64)[:, None], elapsed)
+    return funded_at[:, None] + elapsed, np.where(mask, interest, 0), mask
+
+
+def monthly_cash_flows(repayment_at, amounts):
+    """Sum amounts by calendar month of repayment; returns (['YYYY-MM', ...], totals)"""
+    if len(amounts) == 0:
+        return [], np.zeros(0, dtype=np.int64)
+    months = np.asarray(repayment_at, dtype='datetime64[s]').astype('datetime64[M]')
+    keys, inverse = np.unique(months, return_inverse=True)
+    totals = np.zeros(len(keys), dtype=np.int64)
+    np.add.at(totals, inverse, np.asarray(amounts, dtype=np.int64))
+    return [str(key) for key in keys], totals
@@ -0,0 +1,221 @@
+# Hedera AgriFund Backend - Admission control and load shedding
+#
+# Token buckets per account and per (route, account) decide whether a request
+# may proceed; a per-process concurrency limiter sheds load before a request
+# can take a database connection. Bucket state lives in a shared store
+# (Redis, via an atomic Lua script) or in process memory. To keep decisions in
+# the microsecond range with Redis, each process leases a small batch of
+# tokens at a time and spends them locally. A lease is at most a tenth of the
+# bucket's burst, so one worker cannot hold an account's whole allowance and
+# tokens left unspent when a lease expires cost little; small buckets (burst
+# under 20) are not leased at all. If Redis stops answering, buckets fall
+# back to process memory until it is back rather than failing requests.
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local want = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local granted = math.min(want, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+local retry_after = 0
+if granted == 0 then retry_after = (1 - tokens) / rate end
+return {granted, tostring(retry_after)}
+"""
+
+
+class MemoryBucketStore:
+    """Token buckets held in process memory
+
+    A bucket that has refilled to its burst is the same as no bucket, so
+    every `sweep_interval` seconds full buckets are dropped; memory stays
+    proportional to the accounts active in the last few seconds.
+    """
+
+    def __init__(self, sweep_interval=60.0):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def take(self, key, rate, burst, want=1):
+        """Take up to `want` tokens; returns (granted, retry_after_seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tokens, last, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            granted = min(want, int(tokens))
+            tokens -= granted
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        if granted:
+            return granted, 0.0
+        return 0, (1 - tokens) / rate
+
+    def _sweep(self, now):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._next_sweep = now + self.sweep_interval
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RedisBucketStore:
+    """Token buckets shared by every worker through a Redis-protocol server"""
+
+    def __init__(self, url, prefix='agrifund:ratelimit'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, rate, burst, want=1):
+        granted, retry_after = self._script(keys=[f"{self.prefix}:{key}"], args=[rate, burst, time.time(), want])
+        return int(granted), float(retry_after)
+
+
+class RateLimiter:
+    """Token-bucket decisions over a store, spending leased tokens locally
+
+    With a `fallback` store, errors from the primary store (a Redis outage)
+    are logged once and decisions move to the fallback until the primary
+    answers again, retried every `retry_interval` seconds.
+    """
+
+    def __init__(self, store, lease_size=1, lease_ttl=1.0, fallback=None, retry_interval=5.0, lease_fraction=0.1):
+        self.store = store
+        self.lease_size = lease_size
+        self.lease_fraction = lease_fraction
+        self.lease_ttl = lease_ttl
+        self.fallback = fallback
+        self.retry_interval = retry_interval
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + lease_ttl
+        self._degraded_until = 0.0
+
+    def allow(self, key, rate, burst):
+        """Return (allowed, retry_after_seconds) for one request against a bucket"""
+        now = time.monotonic()
+        if self.lease_size > 1:
+            # gthread workers share the leases: checking and spending a token is one step
+            with self._lock:
+                lease = self._leases.get(key)
+                if lease and lease[0] > 0 and lease[1] > now:
+                    lease[0] -= 1
+                    return True, 0.0
+
+        want = max(1, min(self.lease_size, int(burst * self.lease_fraction)))
+        granted, retry_after = self._take(key, rate, burst, want, now)
+        if not granted:
+            return False, retry_after
+        if granted > 1:
+            with self._lock:
+                if now >= self._next_sweep:
+                    # Expired leases are never spent again
+                    self._leases = {k: lease for k, lease in self._leases.items() if lease[1] > now}
+                    self._next_sweep = now + self.lease_ttl
+                self._leases[key] = [granted - 1, now + self.lease_ttl]
+        return True, 0.0
+
+    def _take(self, key, rate, burst, want, now):
+        if self.fallback is None:
+            return self.store.take(key, rate, burst, want)
+        if now < self._degraded_until:
+            return self.fallback.take(key, rate, burst, want)
+        try:
+            result = self.store.take(key, rate, burst, want)
+        except Exception as e:
+            if not self._degraded_until:
+                logger.warning(f"Rate limit store failed, using in-process buckets: {str(e)}")
+            self._degraded_until = now + self.retry_interval
+            return self.fallback.take(key, rate, burst, want)
+        if self._degraded_until:
+            logger.info('Rate limit store recovered')
+            self._degraded_until = 0.0
+        return result
+
+    @property
+    def degraded(self):
+        return bool(self._degraded_until)
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight requests per process so excess load is shed before it queues on the DB pool"""
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        self._in_flight = 0
+
+    def try_acquire(self, timeout=0):
+        acquired = self._semaphore.acquire(timeout=timeout) if timeout else self._semaphore.acquire(blocking=False)
+        if acquired:
+            self._in_flight += 1
+        return acquired
+
+    def release(self):
+        self._in_flight -= 1
+        self._semaphore.release()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+
+class AdmissionMetrics:
+    """Counters for admission decisions, exported as JSON"""
+
+    def __init__(self):
+        self.outcomes = {}
+        self.decisions = 0
+        self.decision_ns_total = 0
+        self.decision_ns_max = 0
+        self.identify_ns_total = 0
+
+    def record(self, route, outcome, elapsed_ns, identify_ns=0):
+        """Count a decision; `identify_ns` is the time spent finding the calling account (kept apart)"""
+        key = (route, outcome)
+        self.outcomes[key] = self.outcomes.get(key, 0) + 1
+        self.decisions += 1
+        self.decision_ns_total += elapsed_ns
+        self.identify_ns_total += identify_ns
+        if elapsed_ns > self.decision_ns_max:
+            self.decision_ns_max = elapsed_ns
+
+    def export(self):
+        routes = {}
+        for (route, outcome), count in self.outcomes.items():
+            routes.setdefault(route, {})[outcome] = count
+        return {
+            'routes': routes,
+            'decisions': self.decisions,
+            'decision_avg_us': self.decision_ns_total / self.decisions / 1000 if self.decisions else 0.0,
+            'decision_max_us': self.decision_ns_max / 1000,
+            'identify_avg_us': self.identify_ns_total / self.decisions / 1000 if self.decisions else 0.0,
+        }
+
+
+def make_rate_limiter(url=None, lease_size=5):
+    """Rate limiter on Redis when a URL is configured, otherwise in process memory"""
+    if url:
+        try:
+            store = RedisBucketStore(url)
+            store.client.ping()
+            return RateLimiter(store, lease_size=lease_size, fallback=MemoryBucketStore())
+        except Exception as e:
+            logger.warning(f"Redis rate limit store unavailable, using in-process buckets: {str(e)}")
+    return RateLimiter(MemoryBucketStore())
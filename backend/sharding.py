@@ -0,0 +1,255 @@
+# Hedera AgriFund Backend - Hash sharding of user-owned data
+#
+# A user, their profiles, their tokens and the loans they borrow live together
+# on one of N databases chosen by jump consistent hashing of
+# hedera_account_id (growing N moves only ~1/N of the users). Platform tables
+# (price_oracles, audit_logs, jobs) stay on the default database.
+#
+# Row ids of sharded tables are unique across shards: shard i only hands out
+# ids congruent to i + 1 modulo MAX_SHARDS (PostgreSQL sequences are set to
+# INCREMENT BY MAX_SHARDS; other engines get a block of ids assigned at each
+# flush, inside the flush's transaction). Ids are
+# therefore stable when the resharding tool moves a user, and loans can refer
+# to a lender living on another shard.
+import contextvars
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import MetaData, create_engine, delete, event, insert, inspect, select, text
+from sqlalchemy.sql import visitors
+
+logger = logging.getLogger(__name__)
+
+MAX_SHARDS = 64
+
+# Parent tables first: copy order when moving a user, reversed for deletes
+SHARDED_TABLES = ['users', 'farmer_profiles', 'lender_profiles', 'rwa_tokens', 'loans']
+# Written in the same transaction as sharded rows but never moved by resharding
+SHARD_LOCAL_TABLES = ['chain_outbox', 'analytics_cube']
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping & Veach) of a 64-bit key into [0, buckets)"""
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+
+def account_key(hedera_account_id):
+    return int.from_bytes(hashlib.sha1(hedera_account_id.encode()).digest()[:8], 'big')
+
+
+class ShardRouter:
+    """Maps accounts to shard engines and fans queries out across them"""
+
+    def __init__(self, urls, **engine_options):
+        if not 0 < len(urls) <= MAX_SHARDS:
+            raise ValueError(f'Between 1 and {MAX_SHARDS} shards are supported')
+        self.urls = list(urls)
+        self.engines = [create_engine(url, **engine_options) for url in self.urls]
+        self._executor = ThreadPoolExecutor(max_workers=len(self.engines), thread_name_prefix='shard')
+
+    def __len__(self):
+        return len(self.engines)
+
+    def shard_for(self, hedera_account_id):
+        return jump_hash(account_key(hedera_account_id), len(self.engines))
+
+    def engine_for(self, hedera_account_id):
+        return self.engines[self.shard_for(hedera_account_id)]
+
+    def scatter(self, fn):
+        """Run fn(engine) on every shard in parallel and return the results in shard order"""
+        if len(self.engines) == 1:
+            return [fn(self.engines[0])]
+        # Each shard thread sees the caller's context variables (e.g. the request's statement counter)
+        contexts = [contextvars.copy_context() for _ in self.engines]
+        return list(self._executor.map(lambda context, engine: context.run(fn, engine), contexts, self.engines))
+
+
+def _tables(mapper, clause):
+    if mapper is not None:
+        return {mapper.local_table.name}
+    if clause is None:
+        return set()
+    return {node.name for node in visitors.iterate(clause) if getattr(node, '__visit_name__', None) == 'table'}
+
+
+class ShardedSession(Session):
+    """Flask-SQLAlchemy session that sends user-owned tables to the shard selected for the request"""
+
+    router = None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        shard = self.info.get('shard')
+        if bind is None and self.router is not None and shard is not None:
+            if mapper is not None:
+                mapper = inspect(mapper)
+            if _tables(mapper, clause) & set(SHARDED_TABLES + SHARD_LOCAL_TABLES):
+                return self.router.engines[shard]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def install(router, session_factory):
+    """Route db.session through the router and assign shard-unique ids on flush"""
+    ShardedSession.router = router
+
+    @event.listens_for(session_factory, 'before_flush')
+    def assign_shard_ids(session, flush_context, instances):
+        shard = session.info.get('shard')
+        if shard is None:
+            return
+        engine = router.engines[shard]
+        if engine.dialect.name == 'postgresql':
+            return  # interleaved sequences (see prepare_shard)
+        pending = {}
+        for obj in session.new:
+            if obj.__table__.name in SHARDED_TABLES and getattr(obj, 'id', None) is None:
+                pending.setdefault(obj.__table__.name, []).append(obj)
+        for table, objs in pending.items():
+            conn = session.connection(bind_arguments={'mapper': type(objs[0])})
+            for obj, id_ in zip(objs, allocate_shard_ids(conn, table, shard, len(objs))):
+                obj.id = id_
+
+
+_allocation_lock = threading.Lock()
+_allocated = {}  # (database url, table) -> highest id this process handed out
+
+
+def allocate_shard_ids(conn, table, shard, count):
+    """`count` new ids congruent to shard + 1 modulo MAX_SHARDS (engines without sequences)
+
+    max(id) is read in the flush's transaction, so rows the session has not
+    committed yet count, and ids handed out to other sessions of this process
+    are never reused. Across processes, SQLite's single writer turns a clash
+    into an error rather than a duplicate.
+    """
+    current = conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar()
+    key = (str(conn.engine.url), table)
+    with _allocation_lock:
+        first = (max(current, _allocated.get(key, 0)) // MAX_SHARDS + 1) * MAX_SHARDS + shard + 1
+        ids = [first + index * MAX_SHARDS for index in range(count)]
+        _allocated[key] = ids[-1]
+    return ids
+
+
+def prepare_shard(engine, shard):
+    """Interleave sequences and drop the cross-shard lender foreign key on a shard database"""
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.begin() as conn:
+        for table in SHARDED_TABLES:
+            current = conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar()
+            start = (current // MAX_SHARDS + 1) * MAX_SHARDS + shard + 1
+            conn.execute(text(
+                f"ALTER SEQUENCE {table}_id_seq INCREMENT BY {MAX_SHARDS} RESTART WITH {start}"
+            ))
+        conn.execute(text("ALTER TABLE loans DROP CONSTRAINT IF EXISTS loans_lender_id_fkey"))
+
+
+def prepare_default(engine):
+    """Drop foreign keys from platform tables into users, which now live on the shards"""
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE audit_logs DROP CONSTRAINT IF EXISTS audit_logs_user_id_fkey"))
+
+
+# Resharding
+def reshard(source_urls, target_urls, dry_run=False):
+    """Move every user (with profiles, tokens and borrowed loans) to its shard under the new layout"""
+    source = ShardRouter(source_urls)
+    target = ShardRouter(target_urls)
+    target_index = {url: index for index, url in enumerate(target.urls)}
+    moved = 0
+
+    metadata = MetaData()
+    metadata.reflect(source.engines[0], only=SHARDED_TABLES)
+    tables = metadata.tables
+    if not dry_run:
+        for index, engine in enumerate(target.engines):
+            metadata.create_all(engine)
+            prepare_shard(engine, index)
+
+    for source_index, engine in enumerate(source.engines):
+        with engine.connect() as conn:
+            accounts = conn.execute(select(tables['users'].c.id, tables['users'].c.hedera_account_id)).all()
+
+        for user_id, hedera_account_id in accounts:
+            destination = target.shard_for(hedera_account_id)
+            if target_index.get(source.urls[source_index]) == destination:
+                continue
+            if not dry_run:
+                _move_user(engine, target.engines[destination], tables, user_id)
+            moved += 1
+
+        logger.info(f"Shard {source_index}: {len(accounts)} users scanned, {moved} moved so far")
+
+    return moved
+
+
+def _user_rows(conn, tables, user_id):
+    """All rows owned by a user, keyed by table, in copy order"""
+    filters = {
+        'users': tables['users'].c.id == user_id,
+        'farmer_profiles': tables['farmer_profiles'].c.user_id == user_id,
+        'lender_profiles': tables['lender_profiles'].c.user_id == user_id,
+        'rwa_tokens': tables['rwa_tokens'].c.owner_id == user_id,
+        'loans': tables['loans'].c.borrower_id == user_id,
+    }
+    return {
+        name: (filters[name], [dict(row._mapping) for row in conn.execute(select(tables[name]).where(filters[name]))])
+        for name in SHARDED_TABLES
+    }
+
+
+def _move_user(source_engine, target_engine, tables, user_id):
+    """Copy a user's rows (ids preserved) to the target, then delete them from the source"""
+    with source_engine.connect() as conn:
+        rows = _user_rows(conn, tables, user_id)
+
+    with target_engine.begin() as conn:
+        # Idempotent: clear leftovers from an interrupted earlier move first
+        for name in reversed(SHARDED_TABLES):
+            ids = [row['id'] for row in rows[name][1]]
+            if ids:
+                conn.execute(delete(tables[name]).where(tables[name].c.id.in_(ids)))
+        for name in SHARDED_TABLES:
+            if rows[name][1]:
+                conn.execute(insert(tables[name]), rows[name][1])
+
+    with source_engine.begin() as conn:
+        for name in reversed(SHARDED_TABLES):
+            conn.execute(delete(tables[name]).where(rows[name][0]))
+
+
+def shard_sizes(urls):
+    """Count users per shard"""
+    def count_users(engine):
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT count(*) FROM users")).scalar()
+    return ShardRouter(urls).scatter(count_users)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Move users between shard layouts')
+    parser.add_argument('--from', dest='source', required=True, help='comma-separated current shard URLs')
+    parser.add_argument('--to', dest='target', required=True, help='comma-separated new shard URLs (existing ones first)')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    source_urls = args.source.split(',')
+    target_urls = args.target.split(',')
+    moved = reshard(source_urls, target_urls, dry_run=args.dry_run)
+    print(f"{'Would move' if args.dry_run else 'Moved'} {moved} users")
+    if not args.dry_run:
+        print(f"Users per shard: {shard_sizes(target_urls)}")
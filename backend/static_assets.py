@@ -0,0 +1,302 @@
+# Hedera AgriFund Backend - Fingerprinted, precompressed frontend assets
+#
+# build() copies frontend/ into a dist directory. Every JS, CSS, shader, image
+# and font file gets the first hex digits of its content hash in its name
+# (app.js -> app.3f9c0d12ab.js). References to those files are rewritten:
+# src/href in index.html, url() and @import in CSS, and relative string
+# literals in JS, sw.js and manifest.json. A file's hash therefore covers the
+# hashes of everything it points to. Compressible files get .gz (and .br when
+# the optional Brotli package is installed) siblings at maximum compression,
+# computed once at build time. asset-manifest.json records every URL with its
+# file, type and variants.
+#
+# StaticAssets is WSGI middleware placed in front of the Flask app. It answers
+# the URLs listed in the manifest straight from a precomputed table, without
+# routing, before_request hooks or a response object:
+# - it negotiates the encoding from Accept-Encoding;
+# - it answers If-None-Match with 304;
+# - it sends the file through wsgi.file_wrapper (sendfile() under gunicorn).
+# Fingerprinted URLs are immutable for a year. index.html, sw.js,
+# manifest.json and the original unhashed paths (still reachable from dynamic
+# imports) are revalidated on every use. Every other path goes to Flask.
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'asset-manifest.json'
+HASH_LENGTH = 10
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+ASSET_EXTENSIONS = {'.js', '.mjs', '.css', '.json', '.html', '.svg', '.png', '.jpg', '.jpeg', '.webp', '.gif',
+                    '.ico', '.woff', '.woff2', '.ttf', '.frag', '.vert', '.glsl', '.txt', '.webmanifest'}
+REWRITTEN_EXTENSIONS = {'.js', '.mjs', '.css', '.json', '.html', '.webmanifest'}
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/manifest+json',
+                      'image/svg+xml')
+# Served under their own names: the page itself, the service worker (its URL is its scope) and the PWA manifest
+STABLE_FILES = {'index.html', 'sw.js', 'manifest.json'}
+SKIPPED_DIRS = {'node_modules', 'dist', 'benchmarks', '__pycache__'}
+SKIPPED_FILES = {'package.json', 'package-lock.json', MANIFEST_NAME}
+MIN_COMPRESS_SIZE = 256
+MIN_COMPRESS_GAIN = 0.9  # keep a variant only if it is under 90% of the original
+
+CONTENT_TYPES = {'.js': 'application/javascript', '.mjs': 'application/javascript', '.frag': 'text/plain',
+                 '.vert': 'text/plain', '.glsl': 'text/plain', '.webmanifest': 'application/manifest+json',
+                 '.woff2': 'font/woff2'}
+
+HTML_REFERENCE = re.compile(r'''(\b(?:src|href)\s*=\s*["'])([^"'#?:]+)''')
+CSS_REFERENCE = re.compile(r'''(url\(\s*["']?|@import\s+["'])([^"')#?:]+)''')
+# Relative paths in string literals: ./x.js, ../x.css, /js/app.js or dir/x.png
+LITERAL_REFERENCE = re.compile(r'''(["'`])((?:\.{1,2}/|/)?[\w@.-]+(?:/[\w@.-]+)*\.(?:%s))(?=\1)'''
+                               % '|'.join(ext[1:] for ext in sorted(ASSET_EXTENSIONS)))
+
+
+def content_type(path):
+    extension = os.path.splitext(path)[1].lower()
+    mime = CONTENT_TYPES.get(extension) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if mime.startswith('text/') or mime in ('application/javascript', 'application/json', 'image/svg+xml',
+                                            'application/manifest+json'):
+        mime += '; charset=utf-8'
+    return mime
+
+
+def fingerprint(path, digest):
+    root, extension = posixpath.splitext(path)
+    return f'{root}.{digest[:HASH_LENGTH]}{extension}'
+
+
+def find_sources(source_dir):
+    """Asset paths relative to source_dir, with forward slashes"""
+    sources = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS and not d.startswith('.'))
+        for name in sorted(files):
+            if name.startswith('.') or name in SKIPPED_FILES:
+                continue
+            if os.path.splitext(name)[1].lower() in ASSET_EXTENSIONS:
+                sources.append(os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, '/'))
+    return sources
+
+
+def compress(data):
+    """Precompressed variants worth serving, by Content-Encoding"""
+    variants = {}
+    if len(data) < MIN_COMPRESS_SIZE:
+        return variants
+    variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data) * MIN_COMPRESS_GAIN}
+
+
+class Builder:
+    """Fingerprints one frontend tree; each file is emitted after the files it references"""
+
+    def __init__(self, source_dir, output_dir):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.sources = set(find_sources(source_dir))
+        self.emitted = {}  # source path -> output path
+        self.visiting = set()
+        self.files = {}
+
+    def resolve(self, reference, referrer):
+        """Source path a reference points at (relative to the referring file, then the site root)"""
+        if reference.startswith('/'):
+            candidates = [reference.lstrip('/')]
+        else:
+            candidates = [posixpath.join(posixpath.dirname(referrer), reference), reference]
+        for candidate in candidates:
+            path = posixpath.normpath(candidate)
+            if path in self.sources and path != referrer:
+                return path
+        return None
+
+    def rewrite_reference(self, match, referrer):
+        prefix, reference = match.group(1), match.group(2)
+        target = self.resolve(reference, referrer)
+        # Cycles keep the unhashed name, which is still served
+        if target is None or target in self.visiting:
+            return match.group(0)
+        output = self.emit(target)
+        return prefix + posixpath.join(posixpath.dirname(reference), posixpath.basename(output))
+
+    def rewrite(self, path, text):
+        extension = posixpath.splitext(path)[1].lower()
+        patterns = {'.html': [HTML_REFERENCE], '.css': [CSS_REFERENCE]}.get(extension, [LITERAL_REFERENCE])
+        for pattern in patterns:
+            text = pattern.sub(lambda match: self.rewrite_reference(match, path), text)
+        return text
+
+    def emit(self, path):
+        if path in self.emitted:
+            return self.emitted[path]
+        self.visiting.add(path)
+        with open(os.path.join(self.source_dir, path), 'rb') as f:
+            data = f.read()
+        if posixpath.splitext(path)[1].lower() in REWRITTEN_EXTENSIONS:
+            data = self.rewrite(path, data.decode('utf-8')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        output = path if path in STABLE_FILES else fingerprint(path, digest)
+        self.write(output, data, digest)
+        self.visiting.discard(path)
+        self.emitted[path] = output
+        return output
+
+    def write(self, output, data, digest):
+        target = os.path.join(self.output_dir, output)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        mime = content_type(output)
+        variants = compress(data) if mime.startswith(COMPRESSIBLE_TYPES) else {}
+        for encoding, body in variants.items():
+            with open(f"{target}.{'gz' if encoding == 'gzip' else encoding}", 'wb') as f:
+                f.write(body)
+        self.files[output] = {
+            'type': mime, 'digest': digest[:HASH_LENGTH], 'size': len(data),
+            'encodings': {encoding: len(body) for encoding, body in variants.items()}
+        }
+
+    def run(self):
+        for path in sorted(self.sources):
+            self.emit(path)
+        return {'assets': dict(sorted(self.emitted.items())), 'files': dict(sorted(self.files.items()))}
+
+
+def build(source_dir, output_dir):
+    """Build the fingerprinted tree in a scratch directory, then swap it into place"""
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix='.dist-', dir=parent)
+    try:
+        manifest = Builder(source_dir, scratch).run()
+        with open(os.path.join(scratch, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=1)
+        if os.path.isdir(output_dir):
+            shutil.rmtree(output_dir)
+        os.rename(scratch, output_dir)
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+    return manifest
+
+
+def accepted_encodings(header):
+    """Content codings the client accepts (q=0 excluded)"""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAssets:
+    """WSGI middleware answering built frontend URLs before the request reaches Flask"""
+
+    ENCODING_PREFERENCE = ('br', 'gzip')
+
+    def __init__(self, app, build_dir):
+        self.app = app
+        self.build_dir = build_dir
+        with open(os.path.join(build_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        # url -> variants, with every header precomputed
+        self.routes = {}
+        for source, output in manifest['assets'].items():
+            info = manifest['files'][output]
+            self.routes['/' + output] = self.variants(output, info, output != source)
+            if output != source:
+                self.routes['/' + source] = self.variants(output, info, False)
+        if '/index.html' in self.routes:
+            self.routes['/'] = self.routes['/index.html']
+        logger.info(f"Serving {len(manifest['assets'])} frontend assets from {build_dir}")
+
+    def variants(self, output, info, immutable):
+        """{encoding: (file, ETag, 200 headers, 304 headers)} with None for the identity encoding"""
+        path = os.path.join(self.build_dir, output)
+        cache = [('Cache-Control', IMMUTABLE if immutable else REVALIDATE)]
+        if info['encodings']:
+            cache.append(('Vary', 'Accept-Encoding'))
+        representations = [(None, path, info['size'], info['digest'])]
+        for encoding, size in info['encodings'].items():
+            suffix = 'gz' if encoding == 'gzip' else encoding
+            representations.append((encoding, f'{path}.{suffix}', size, f"{info['digest']}-{suffix}"))
+        variants = {}
+        for encoding, file_path, size, tag in representations:
+            etag = f'"{tag}"'
+            headers = [('Content-Type', info['type']), ('Content-Length', str(size)), ('ETag', etag)] + cache
+            if encoding:
+                headers.append(('Content-Encoding', encoding))
+            variants[encoding] = (file_path, etag, headers, [('ETag', etag)] + cache)
+        return variants
+
+    def choose(self, variants, environ):
+        if len(variants) > 1:
+            accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+            for encoding in self.ENCODING_PREFERENCE:
+                if encoding in variants and encoding in accepted:
+                    return variants[encoding]
+        return variants[None]
+
+    def __call__(self, environ, start_response):
+        variants = self.routes.get(environ.get('PATH_INFO', ''))
+        method = environ.get('REQUEST_METHOD')
+        if variants is None or method not in ('GET', 'HEAD'):
+            return self.app(environ, start_response)
+
+        path, etag, headers, not_modified_headers = self.choose(variants, environ)
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and (if_none_match.strip() == '*' or etag in
+                              (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))):
+            start_response('304 Not Modified', not_modified_headers)
+            return []
+
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return []
+        return wrap_file(environ, open(path, 'rb'))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    default_source = os.path.join(os.path.dirname(__file__), '..', 'frontend')
+    parser = argparse.ArgumentParser(description='Fingerprint and precompress the frontend for StaticAssets')
+    parser.add_argument('--source', default=default_source)
+    parser.add_argument('--output', default=os.environ.get('FRONTEND_DIST') or os.path.join(default_source, 'dist'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = build(args.source, args.output)
+    files = result['files'].values()
+    original = sum(info['size'] for info in files)
+    for encoding in ('gzip', 'br'):
+        compressed = sum(info['encodings'].get(encoding, info['size']) for info in files)
+        if any(encoding in info['encodings'] for info in files):
+            print(f"{encoding:>5}: {compressed / 1024:8.1f} KiB")
+    print(f"{len(result['assets'])} assets, {original / 1024:.1f} KiB -> {args.output}")
+    if not any('br' in info['encodings'] for info in files):
+        print('Brotli is not installed: only gzip variants were written (pip install Brotli)')
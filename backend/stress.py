@@ -0,0 +1,247 @@
+# Hedera AgriFund Backend - Monte Carlo collateral stress testing
+#
+# Funded loans are reduced to arrays: lender, collateral commodity, amount
+# owed at the horizon (principal plus the contract's interest) and collateral
+# value today. Correlated daily commodity price paths are drawn from a
+# lognormal model fitted to daily closes (price_candles), optionally after an
+# instantaneous shock such as cocoa -30%.
+#
+# Loans are checked daily like the contract's liquidateLoan: a loan is
+# liquidated the first day its LTV reaches liquidationThreshold, the lender
+# receives the collateral at that day's price and realizes RECOVERY_RATE of
+# it when selling the crop tokens; the loss is whatever that does not cover.
+# Per path and commodity only the record lows of the path matter, so with
+# loans sorted by trigger level the liquidated loans and their liquidation
+# prices come from one searchsorted, and the work per path is proportional
+# to the loans actually liquidated. Path blocks run in a process pool.
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LIQUIDATION_THRESHOLD = 0.90  # AgriFundLoanContract.liquidationThreshold (9000 bps)
+RECOVERY_RATE = 0.85  # share of the oracle value realized when selling seized collateral
+DEFAULT_VOLATILITY = 0.30  # annualized, for commodities with too little history
+MIN_RETURNS = 20  # daily returns needed to estimate a commodity's volatility
+DAYS_PER_YEAR = 365
+BLOCK_SIZE = 250  # paths per task
+CONFIDENCE_LEVELS = (0.95, 0.99)
+LOSS_PERCENTILES = (50, 75, 90, 95, 99, 99.9)
+
+
+class Book:
+    """Funded loans as aligned arrays, grouped by commodity and sorted by trigger level"""
+
+    def __init__(self, lender_ids, commodities, owed, collateral_value, threshold=LIQUIDATION_THRESHOLD,
+                 recovery=RECOVERY_RATE):
+        lender_ids = np.asarray(lender_ids)
+        commodities = np.asarray(commodities)
+        owed = np.asarray(owed, dtype=np.float64)
+        collateral_value = np.asarray(collateral_value, dtype=np.float64)
+
+        self.lenders, lender_index = np.unique(lender_ids, return_inverse=True)
+        commodities, commodity_index = np.unique(commodities, return_inverse=True)
+        self.commodities = [str(commodity) for commodity in commodities]
+        self.exposure = owed.sum()
+        self.lender_exposure = np.bincount(lender_index, weights=owed, minlength=len(self.lenders))
+        self.loan_count = len(owed)
+
+        # Price relative to today at which the loan reaches the liquidation LTV
+        trigger = owed / (threshold * collateral_value)
+        recoverable = recovery * collateral_value
+        self.groups = []  # per commodity: (trigger ascending, owed, recoverable value, lender index)
+        for c in range(len(self.commodities)):
+            members = np.flatnonzero(commodity_index == c)
+            order = members[np.argsort(trigger[members], kind='stable')]
+            self.groups.append((trigger[order], owed[order], recoverable[order], lender_index[order].astype(np.int32)))
+
+
+class PriceModel:
+    """Daily log-return drift and Cholesky factor of the covariance, per commodity"""
+
+    def __init__(self, commodities, drift, cholesky):
+        self.commodities = list(commodities)
+        self.drift = np.asarray(drift, dtype=np.float64)
+        self.cholesky = np.asarray(cholesky, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, commodities, closes, use_drift=False):
+        """Fit from {commodity: [(day, close), ...]}; correlations use the days every commodity has"""
+        returns = {}
+        for commodity in commodities:
+            series = dict(closes.get(commodity, []))
+            days = sorted(series)
+            prices = np.array([float(series[day]) for day in days])
+            consecutive = np.array([(b - a).days == 1 for a, b in zip(days, days[1:])], dtype=bool)
+            log_returns = np.diff(np.log(prices)) if len(prices) > 1 else np.array([])
+            returns[commodity] = dict(zip([day for day, ok in zip(days[1:], consecutive) if ok], log_returns[consecutive]))
+
+        default = DEFAULT_VOLATILITY / np.sqrt(DAYS_PER_YEAR)
+        volatility = np.array([np.std(list(returns[c].values()), ddof=1) if len(returns[c]) >= MIN_RETURNS else default
+                               for c in commodities])
+        drift = np.array([np.mean(list(returns[c].values())) if use_drift and len(returns[c]) >= MIN_RETURNS else 0.0
+                          for c in commodities])
+
+        correlation = np.eye(len(commodities))
+        common = sorted(set.intersection(*(set(returns[c]) for c in commodities))) if commodities else []
+        if len(common) >= MIN_RETURNS and len(commodities) > 1:
+            matrix = np.array([[returns[c][day] for c in commodities] for day in common])
+            correlation = np.nan_to_num(np.corrcoef(matrix, rowvar=False))
+            np.fill_diagonal(correlation, 1.0)
+        covariance = correlation * np.outer(volatility, volatility)
+        return cls(commodities, drift, nearest_cholesky(covariance))
+
+    def summary(self):
+        volatility = np.sqrt((self.cholesky ** 2).sum(axis=1) * DAYS_PER_YEAR)
+        return {commodity: {'annual_volatility': round(float(v), 4)} for commodity, v in zip(self.commodities, volatility)}
+
+
+def nearest_cholesky(covariance):
+    """Cholesky factor, clipping negative eigenvalues when the estimate is not positive definite"""
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(covariance)
+        repaired = (vectors * np.maximum(values, 1e-12)) @ vectors.T
+        return np.linalg.cholesky(repaired)
+
+
+def simulate_paths(rng, model, n_paths, horizon_days, shocks):
+    """Relative prices (n_paths, horizon_days + 1, commodities); day 0 is today after the shock"""
+    steps = rng.standard_normal((n_paths, horizon_days, len(model.commodities))) @ model.cholesky.T + model.drift
+    log_paths = np.concatenate([np.zeros((n_paths, 1, len(model.commodities))), np.cumsum(steps, axis=1)], axis=1)
+    return np.exp(log_paths) * shocks
+
+
+def path_losses(book, relative):
+    """Loss per lender and commodity and liquidation count for one path (relative prices per commodity)"""
+    lender_loss = np.zeros(len(book.lenders))
+    commodity_loss = np.zeros(len(book.commodities))
+    liquidations = np.zeros(len(book.lenders))
+    for c, (trigger, owed, value, lender) in enumerate(book.groups):
+        path = relative[:, c]
+        running_min = np.minimum.accumulate(path)
+        # Record lows, oldest (highest) last after reversing: a loan is liquidated on the
+        # first record at or below its trigger, i.e. at the largest record <= trigger
+        records = running_min[np.r_[True, running_min[1:] < running_min[:-1]]][::-1]
+        positions = np.searchsorted(trigger, records, side='left')
+        first = positions[0]
+        if first == len(trigger):
+            continue
+        prices = np.repeat(records, np.diff(np.r_[positions, len(trigger)]))
+        loss = np.maximum(owed[first:] - value[first:] * prices, 0.0)
+        lender_loss += np.bincount(lender[first:], weights=loss, minlength=len(book.lenders))
+        liquidations += np.bincount(lender[first:], minlength=len(book.lenders))
+        commodity_loss[c] = loss.sum()
+    return lender_loss, commodity_loss, liquidations
+
+
+def simulate_block(book, model, seed, n_paths, horizon_days, shocks):
+    """Losses for a block of paths: per path and lender, per path and commodity, liquidations"""
+    rng = np.random.default_rng(seed)
+    paths = simulate_paths(rng, model, n_paths, horizon_days, shocks)
+    lender_loss = np.zeros((n_paths, len(book.lenders)), dtype=np.float32)
+    commodity_loss = np.zeros((n_paths, len(book.commodities)))
+    liquidation_count = np.zeros(n_paths, dtype=np.int64)
+    lender_liquidations = np.zeros(len(book.lenders))
+    for p in range(n_paths):
+        lenders, commodities, liquidations = path_losses(book, paths[p])
+        lender_loss[p] = lenders
+        commodity_loss[p] = commodities
+        liquidation_count[p] = int(liquidations.sum())
+        lender_liquidations += liquidations
+    return lender_loss, commodity_loss, liquidation_count, lender_liquidations
+
+
+_worker_state = {}
+
+
+def _init_worker(book, model, horizon_days, shocks):
+    _worker_state.update(book=book, model=model, horizon_days=horizon_days, shocks=shocks)
+
+
+def _run_block(task):
+    seed, n_paths = task
+    state = _worker_state
+    return simulate_block(state['book'], state['model'], seed, n_paths, state['horizon_days'], state['shocks'])
+
+
+def value_at_risk(losses, confidence):
+    """VaR and expected shortfall (mean loss beyond VaR) along the first axis"""
+    var = np.quantile(losses, confidence, axis=0)
+    tail = losses >= var
+    shortfall = (losses * tail).sum(axis=0) / np.maximum(tail.sum(axis=0), 1)
+    return var, shortfall
+
+
+def run(book, model, n_paths=10000, horizon_days=30, shocks=None, confidence=CONFIDENCE_LEVELS,
+        seed=None, workers=None, block_size=BLOCK_SIZE, top_lenders=100):
+    """Simulate and summarize platform, per-commodity and per-lender losses
+
+    Results depend on the seed and block size but not on the number of workers.
+    Per-lender losses are kept for every path (paths x lenders float32).
+    """
+    if list(model.commodities) != list(book.commodities):
+        raise ValueError('The price model must cover the book\'s commodities in the same order')
+    shock_vector = np.array([1.0 + (shocks or {}).get(c, 0.0) for c in model.commodities])
+    sizes = [min(block_size, n_paths - start) for start in range(0, n_paths, block_size)]
+    tasks = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+    workers = workers or os.cpu_count() or 1
+    if multiprocessing.current_process().daemon:
+        workers = 1  # e.g. inside a prefork Celery worker, which may not start child processes
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(book, model, horizon_days, shock_vector)) as pool:
+            blocks = list(pool.map(_run_block, tasks))
+    else:
+        blocks = [simulate_block(book, model, seed, size, horizon_days, shock_vector) for seed, size in tasks]
+
+    lender_loss = np.concatenate([block[0] for block in blocks])
+    commodity_loss = np.concatenate([block[1] for block in blocks])
+    liquidation_count = np.concatenate([block[2] for block in blocks])
+    lender_liquidations = sum(block[3] for block in blocks)
+    platform_loss = commodity_loss.sum(axis=1)
+
+    platform = {
+        'loans': book.loan_count,
+        'exposure': round(float(book.exposure), 2),
+        'expected_loss': round(float(platform_loss.mean()), 2),
+        'expected_liquidations': round(float(liquidation_count.mean()), 2),
+        'liquidation_probability': round(float((liquidation_count > 0).mean()), 4),
+        'loss_percentiles': {str(q): round(float(v), 2) for q, v in zip(LOSS_PERCENTILES, np.percentile(platform_loss, LOSS_PERCENTILES))},
+    }
+    for level in confidence:
+        var, shortfall = value_at_risk(platform_loss, level)
+        platform[f'var_{level:g}'] = round(float(var), 2)
+        platform[f'expected_shortfall_{level:g}'] = round(float(shortfall), 2)
+
+    commodities = {
+        str(commodity): {
+            'loans': len(book.groups[c][0]),
+            'exposure': round(float(book.groups[c][1].sum()), 2),
+            'shock': (shocks or {}).get(commodity, 0.0),
+            'expected_loss': round(float(commodity_loss[:, c].mean()), 2),
+            f'var_{max(confidence):g}': round(float(np.quantile(commodity_loss[:, c], max(confidence))), 2),
+        }
+        for c, commodity in enumerate(book.commodities)
+    }
+
+    level = max(confidence)
+    lender_var, lender_shortfall = value_at_risk(lender_loss, level) if len(book.lenders) else (np.array([]), np.array([]))
+    lender_expected = lender_loss.mean(axis=0, dtype=np.float64)
+    ranked = np.argsort(-lender_var, kind='stable')[:top_lenders]
+    lenders = [{
+        'lender_id': int(book.lenders[i]),
+        'exposure': round(float(book.lender_exposure[i]), 2),
+        'expected_loss': round(float(lender_expected[i]), 2),
+        f'var_{level:g}': round(float(lender_var[i]), 2),
+        f'expected_shortfall_{level:g}': round(float(lender_shortfall[i]), 2),
+        'expected_liquidations': round(float(lender_liquidations[i] / n_paths), 3),
+    } for i in ranked]
+
+    return {'platform': platform, 'commodities': commodities, 'lenders': lenders, 'model': model.summary()}
@@ -0,0 +1,75 @@
+# Shared fixtures: an app on a fresh SQLite database, with jobs run inline
+# (CELERY_TASK_ALWAYS_EAGER) and no Redis, plus a farmer, a lender and a
+# token the farmer can pledge.
+#
+# Run from backend/: python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')  # the default app built on import; the tests make their own
+
+FARMER = '0.0.1001'
+LENDER = '0.0.2002'
+MAIZE_TOKEN = '0x' + '11' * 20  # the approved collateral ERC-20 for maize
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app, ensure_schema
+    from extensions import db
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'agrifund.db'}",
+        'CELERY_BROKER_URL': None,
+        'CELERY_TASK_ALWAYS_EAGER': True,
+        'CACHE_REDIS_URL': None,
+        'RATE_LIMIT_REDIS_URL': None,
+        'SHARD_DATABASE_URLS': [],
+        'PRICE_SOURCES': None,
+        'TRACE_LOG': None,
+        'STATEMENT_COUNT_HEADER': False,
+        'COLLATERAL_TOKENS': {'maize': MAIZE_TOKEN},
+        'ARCHIVE_DIR': str(tmp_path / 'archive'),
+    })
+    with app.app_context():
+        ensure_schema()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def accounts(client):
+    """Register a farmer and a lender; returns the farmer's maize token id"""
+    for account, user_type in ((FARMER, 'farmer'), (LENDER, 'lender')):
+        response = client.post('/api/users/register', json={
+            'hedera_account_id': account, 'user_type': user_type,
+            'name': f'{user_type.title()} {account}', 'email': f'{account}@example.com'
+        })
+        assert response.status_code == 201, response.get_json()
+    return mint(client)
+
+
+def mint(client, crop_type='maize', quantity=100):
+    response = client.post('/api/tokens/mint', json={
+        'owner_hedera_id': FARMER, 'crop_type': crop_type, 'quantity': quantity, 'warehouse_location': 'Bamenda'
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['token_id']
+
+
+def create_loan(client, token_id, **fields):
+    return client.post('/api/loans/create', json=dict({
+        'borrower_hedera_id': FARMER, 'amount': 1000, 'interest_rate': 8.5,
+        'duration_months': 6, 'collateral_token_id': token_id
+    }, **fields))
@@ -0,0 +1,38 @@
+# Admission control: token buckets per account and route, plus one per client
+# address that a client cannot escape by naming a new account each time.
+import threading
+
+import app as app_module
+from ratelimit import MemoryBucketStore, RateLimiter
+
+
+def test_each_account_has_its_own_bucket(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'ACCOUNT_RATE_LIMIT', (0.001, 2))
+    statuses = [client.get('/api/jobs/missing', headers={'X-Hedera-Account-Id': '0.0.7'}).status_code
+                for _ in range(3)]
+    assert statuses == [404, 404, 429]
+    assert client.get('/api/jobs/missing', headers={'X-Hedera-Account-Id': '0.0.8'}).status_code == 404
+
+
+def test_new_account_ids_share_the_address_bucket(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'ADDRESS_RATE_LIMIT', (0.001, 3))
+    statuses = [client.get('/api/jobs/missing', headers={'X-Hedera-Account-Id': f'0.0.{n}'}).status_code
+                for n in range(4)]
+    assert statuses == [404, 404, 404, 429]
+    response = client.get('/api/jobs/missing', environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert response.status_code == 404
+
+
+def test_leased_tokens_are_spent_under_the_lock():
+    limiter = RateLimiter(MemoryBucketStore(), lease_size=5)
+    assert limiter.allow('account:0.0.7', 0.001, 100) == (True, 0.0)  # leases 4 more
+    results = []
+
+    with limiter._lock:
+        spender = threading.Thread(target=lambda: results.append(limiter.allow('account:0.0.7', 0.001, 100)))
+        spender.start()
+        spender.join(0.2)
+        # Another thread holding the lock (checking or refilling the lease) keeps the token unspent
+        assert spender.is_alive() and limiter._leases['account:0.0.7'][0] == 4
+    spender.join()
+    assert results == [(True, 0.0)] and limiter._leases['account:0.0.7'][0] == 3
@@ -0,0 +1,28 @@
+# Location search: the limit query parameter is a whole number from 1 to 5000.
+import pytest
+
+from conftest import FARMER
+
+
+@pytest.mark.parametrize('path', ['/api/geo/tokens', '/api/geo/farmers'])
+@pytest.mark.parametrize('limit, error', [
+    ('abc', 'limit must be a whole number'),
+    ('1.5', 'limit must be a whole number'),
+    ('0', 'limit must be between 1 and 5000'),
+    ('-1', 'limit must be between 1 and 5000'),
+    ('5001', 'limit must be between 1 and 5000'),
+])
+def test_invalid_limits_are_refused(client, path, limit, error):
+    response = client.get(path, query_string={'near': 'Bamenda', 'limit': limit})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+def test_limit_keeps_the_nearest_matches(client, accounts):
+    client.post('/api/tokens/mint', json={
+        'owner_hedera_id': FARMER, 'crop_type': 'cocoa', 'quantity': 5, 'warehouse_location': 'Bamenda'
+    })
+    everything = client.get('/api/geo/tokens', query_string={'near': 'Bamenda', 'limit': 5000}).get_json()['tokens']
+    assert len(everything) == 2
+    one = client.get('/api/geo/tokens', query_string={'near': 'Bamenda', 'limit': 1}).get_json()['tokens']
+    assert one == everything[:1]
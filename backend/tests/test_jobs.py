@@ -0,0 +1,173 @@
+# Background jobs: accepted with 202, run by Celery (inline here), polled at
+# /api/jobs/<id>; transient errors retried, others failed at once.
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from conftest import FARMER
+
+import jobs
+from api import jobs as job_api
+from api.common import RequestError
+from extensions import db
+from models import Job, Loan
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    """Register a 'test' job kind running the given function"""
+    def register(function):
+        monkeypatch.setitem(job_api.JOB_HANDLERS, 'test', function)
+    return register
+
+
+def enqueue(app, payload=None):
+    with app.test_request_context():
+        response, status = job_api.enqueue_job('test', payload or {})
+    return status, response.get_json()
+
+
+def job_status(client, job_id):
+    response = client.get(f'/api/jobs/{job_id}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def operational_error():
+    return OperationalError('SELECT 1', {}, Exception('server closed the connection unexpectedly'))
+
+
+def test_async_mint_is_accepted_then_succeeds(client, accounts):
+    response = client.post('/api/tokens/mint?async=true', json={
+        'owner_hedera_id': FARMER, 'crop_type': 'cocoa', 'quantity': 50, 'warehouse_location': 'Kumba'
+    })
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['status'] == 'queued' and body['status_url'] == f"/api/jobs/{body['job_id']}"
+
+    job = job_status(client, body['job_id'])
+    assert job['status'] == 'succeeded' and job['attempts'] == 1
+    assert job['result']['quantity'] == 50
+
+
+def test_async_loan_is_validated_before_it_is_accepted(client, accounts):
+    response = client.post('/api/loans/create?async=true', json={
+        'borrower_hedera_id': FARMER, 'amount': 1000, 'interest_rate': 60,
+        'duration_months': 6, 'collateral_token_id': accounts
+    })
+    assert response.status_code == 400
+
+
+def test_async_loan_job_is_idempotent(app, client, accounts):
+    response = client.post('/api/loans/create?async=true', json={
+        'borrower_hedera_id': FARMER, 'amount': 1000, 'interest_rate': 8.5,
+        'duration_months': 6, 'collateral_token_id': accounts
+    })
+    job_id = response.get_json()['job_id']
+    first = job_status(client, job_id)
+    assert first['status'] == 'succeeded'
+
+    # A redelivery finds the committed loan instead of failing on the now pledged collateral
+    with app.app_context():
+        db.session.get(Job, job_id).status = 'queued'
+        db.session.commit()
+        job_api.run_job.delay(job_id)
+    again = job_status(client, job_id)
+    assert again['status'] == 'succeeded' and again['result'] == first['result']
+    with app.app_context():
+        assert Loan.query.count() == 1
+
+
+def test_transient_errors_are_retried(app, client, handler):
+    calls = []
+
+    def flaky(payload, job_id):
+        calls.append(job_id)
+        if len(calls) < 3:
+            raise operational_error()
+        return {'done': True}
+
+    handler(flaky)
+    status, body = enqueue(app)
+    assert status == 202
+
+    job = job_status(client, body['job_id'])
+    assert job['status'] == 'succeeded'
+    assert job['attempts'] == 3 and job['result'] == {'done': True} and job['error'] is None
+
+
+def test_transient_errors_fail_after_the_last_retry(app, client, handler):
+    def down(payload, job_id):
+        raise operational_error()
+
+    handler(down)
+    status, body = enqueue(app)
+
+    job = job_status(client, body['job_id'])
+    assert job['status'] == 'failed'
+    assert job['attempts'] == job_api.run_job.task.max_retries + 1
+    assert 'server closed the connection' in job['error']
+
+
+@pytest.mark.parametrize('error, message', [
+    (RequestError('Token already pledged as collateral'), 'Token already pledged as collateral'),
+    (ValueError('bad payload'), 'bad payload'),
+])
+def test_permanent_errors_fail_at_once(app, client, handler, error, message):
+    def broken(payload, job_id):
+        raise error
+
+    handler(broken)
+    status, body = enqueue(app)
+
+    job = job_status(client, body['job_id'])
+    assert job['status'] == 'failed' and job['attempts'] == 1 and job['error'] == message
+
+
+def test_refused_job_is_failed_with_503(app, client, handler, monkeypatch):
+    handler(lambda payload, job_id: {})
+
+    def refuse(job_id):
+        raise ConnectionError('broker unreachable')
+
+    monkeypatch.setattr(job_api.run_job, 'delay', refuse)
+    status, body = enqueue(app)
+    assert status == 503
+
+    job = job_status(client, body['job_id'])
+    assert job['status'] == 'failed' and job['error'] == 'Job queue unavailable'
+
+
+def test_stale_jobs_are_requeued(app, client, handler):
+    handler(lambda payload, job_id: {'ran': job_id})
+    old = datetime.utcnow() - timedelta(seconds=job_api.STALE_JOB_SECONDS + 60)
+    with app.app_context():
+        db.session.add_all([
+            Job(id='a' * 32, kind='test', payload={}, status='queued', created_at=old, updated_at=old),
+            Job(id='b' * 32, kind='test', payload={}, status='retrying', created_at=old, updated_at=old),
+            Job(id='c' * 32, kind='test', payload={}, status='queued'),  # recent: its message may still be queued
+            Job(id='d' * 32, kind='test', payload={}, status='failed', created_at=old, updated_at=old),
+        ])
+        db.session.commit()
+
+    assert job_api.requeue_stale_jobs.function() == 2
+    assert job_status(client, 'a' * 32)['status'] == 'succeeded'
+    assert job_status(client, 'b' * 32)['status'] == 'succeeded'
+    assert job_status(client, 'c' * 32)['status'] == 'queued'
+    assert job_status(client, 'd' * 32)['status'] == 'failed'
+
+
+def test_no_memory_broker_outside_tests_or_eager_mode(app):
+    app.config.update(TESTING=False, CELERY_TASK_ALWAYS_EAGER=False, CELERY_BROKER_URL=None)
+    with pytest.raises(RuntimeError, match='No Celery broker'):
+        jobs.resolve_broker_url(app)
+
+    app.config['CELERY_BROKER_URL'] = 'redis://localhost:6379/0'
+    assert jobs.resolve_broker_url(app) == 'redis://localhost:6379/0'
+    app.config.update(CELERY_BROKER_URL=None, CELERY_TASK_ALWAYS_EAGER=True)
+    assert jobs.resolve_broker_url(app) == 'memory://'
+
+
+def test_job_not_found(client):
+    assert client.get('/api/jobs/missing').status_code == 404
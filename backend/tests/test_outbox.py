@@ -0,0 +1,224 @@
+# Chain outbox: loans queue createLoan/fundLoan with their transaction and the
+# dispatcher submits them to StubChain, which applies the contract's checks.
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import FARMER, LENDER, MAIZE_TOKEN, create_loan, mint
+
+from extensions import db
+from models import OutboxMessage
+from outbox import Dispatcher, NonceError, StubChain, backoff_delay
+
+
+def make_dispatcher(chain, **options):
+    return Dispatcher([db.engine], chain, **dict({'backoff_base': 0}, **options))
+
+
+def outbox_rows():
+    return OutboxMessage.query.order_by(OutboxMessage.id).all()
+
+
+def funded_loan(client, token_id):
+    response = create_loan(client, token_id)
+    assert response.status_code == 201, response.get_json()
+    contract_id = response.get_json()['contract_id']
+    response = client.post('/api/loans/fund', json={'contract_id': contract_id, 'lender_hedera_id': LENDER})
+    assert response.status_code == 200, response.get_json()
+    return contract_id
+
+
+def test_loan_calls_are_queued_for_their_signers(app, client, accounts):
+    contract_id = funded_loan(client, accounts)
+
+    with app.app_context():
+        create, fund = outbox_rows()
+        assert (create.method, create.aggregate_id, create.status) == ('createLoan', contract_id, 'pending')
+        assert create.args['sender'] == FARMER
+        assert create.args['collateral_token'] == MAIZE_TOKEN and create.args['collateral_amount'] == 100
+        assert create.args['interest_rate'] == 850
+        assert (fund.method, fund.args) == ('fundLoan', {'sender': LENDER})
+
+
+def test_fund_loan_is_sent_after_create_loan(app, client, accounts):
+    funded_loan(client, accounts)
+    chain = StubChain(confirm_latency=0, approved_collateral=[MAIZE_TOKEN])
+
+    with app.app_context():
+        dispatcher = make_dispatcher(chain)
+        # One call per loan per cycle: fundLoan waits for its createLoan
+        assert dispatcher.dispatch_once() == 1
+        create, fund = outbox_rows()
+        assert create.status == 'sent' and create.result == {'loan_id': 1}
+        assert fund.status == 'pending' and fund.attempts == 0
+
+        assert dispatcher.dispatch_once() == 1
+        db.session.expire_all()
+        create, fund = outbox_rows()
+        assert fund.status == 'sent' and fund.nonce == 0
+        assert dispatcher.dispatch_once() == 0
+
+    assert chain.loans == {1: {'borrower': FARMER, 'lender': LENDER, 'status': 'funded'}}
+    assert chain.nonces == {FARMER: 1, LENDER: 1}
+
+
+def test_fund_loan_waits_while_create_loan_is_retried(app, client, accounts):
+    funded_loan(client, accounts)
+    chain = StubChain(confirm_latency=0, approved_collateral=[MAIZE_TOKEN], failure_rate=1.0)
+
+    with app.app_context():
+        dispatcher = make_dispatcher(chain)
+        dispatcher.dispatch_once()
+        create, fund = outbox_rows()
+        assert create.status == 'pending' and create.attempts == 1 and create.error == 'RPC unavailable'
+        assert fund.attempts == 0
+
+        chain.failure_rate = 0.0
+        while dispatcher.dispatch_once():
+            pass
+        db.session.expire_all()
+        assert [row.status for row in outbox_rows()] == ['sent', 'sent']
+    assert chain.loans[1]['status'] == 'funded'
+
+
+def test_rejected_nonce_resynchronizes_from_the_chain(app, client, accounts):
+    create_loan(client, accounts)
+    create_loan(client, mint(client))
+    chain = StubChain(confirm_latency=0, approved_collateral=[MAIZE_TOKEN])
+
+    with app.app_context():
+        dispatcher = make_dispatcher(chain)
+        dispatcher.nonces.take(FARMER)  # a nonce handed out locally but never used: the counter is ahead
+        dispatcher.dispatch_once()
+        first, second = outbox_rows()
+        assert dispatcher.stats['nonce_resyncs'] == 1
+        assert first.status == 'pending' and 'nonce 1' in first.error
+        # The resync left no gap: the next call of the same account in the batch got the chain's nonce
+        assert second.status == 'sent' and second.nonce == 0
+
+        dispatcher.dispatch_once()
+        db.session.expire_all()
+        first, second = outbox_rows()
+        assert first.status == 'sent' and first.nonce == 1
+    assert chain.nonces == {FARMER: 2}
+
+
+def test_nonce_error_in_submit_resets_only_that_account(app):
+    class RejectingChain(StubChain):
+        def submit(self, sender, method, args, nonce):
+            if sender == FARMER:
+                raise NonceError('nonce too low')
+            return super().submit(sender, method, args, nonce)
+
+    with app.app_context():
+        dispatcher = make_dispatcher(RejectingChain())
+        dispatcher.nonces.take(FARMER)
+        dispatcher.nonces.take(LENDER)
+        assert dispatcher._submit(SimpleNamespace(method='createLoan'), FARMER, {})[2] == 'nonce too low'
+        assert FARMER not in dispatcher.nonces._next and dispatcher.nonces._next[LENDER] == 1
+
+
+def test_failures_are_retried_with_backoff(app, client, accounts):
+    create_loan(client, accounts)
+    chain = StubChain(confirm_latency=0, approved_collateral=[MAIZE_TOKEN], failure_rate=1.0)
+
+    with app.app_context():
+        dispatcher = make_dispatcher(chain, backoff_base=2.0)
+        before = datetime.utcnow()
+        dispatcher.dispatch_once()
+        row, = outbox_rows()
+        # First retry after 2 s, jittered down to half
+        assert before + timedelta(seconds=1) <= row.next_attempt_at <= datetime.utcnow() + timedelta(seconds=2)
+        assert row.status == 'pending' and row.attempts == 1
+        assert dispatcher.dispatch_once() == 0  # not due yet
+
+
+def test_backoff_doubles_up_to_the_cap():
+    for attempts, low, high in ((1, 1, 2), (2, 2, 4), (4, 8, 16)):
+        assert all(low <= backoff_delay(attempts, base=2) <= high for _ in range(50))
+    assert backoff_delay(30, base=2, maximum=300) <= 300
+
+
+def test_reverted_call_fails_after_the_last_attempt(app, client, accounts):
+    funded_loan(client, accounts)
+    chain = StubChain(confirm_latency=0)  # the maize token is not approved on this contract
+
+    with app.app_context():
+        dispatcher = make_dispatcher(chain, max_attempts=2)
+        dispatcher.dispatch_once()
+        create, fund = outbox_rows()
+        assert create.status == 'pending' and create.error == 'Collateral token not approved'
+
+        while dispatcher.dispatch_once():
+            pass
+        db.session.expire_all()
+        create, fund = outbox_rows()
+        assert create.status == 'failed' and create.attempts == 2
+        # fundLoan never went out without a confirmed createLoan
+        assert fund.status == 'failed' and fund.error == 'createLoan not confirmed yet'
+    assert chain.loans == {} and dispatcher.stats['failed'] == 2
+
+
+def test_call_without_a_signing_key_fails_at_once(app, client, accounts):
+    class KeylessChain(StubChain):
+        def signs_for(self, sender):
+            return sender != FARMER
+
+    create_loan(client, accounts)
+    with app.app_context():
+        make_dispatcher(KeylessChain(confirm_latency=0, approved_collateral=[MAIZE_TOKEN])).dispatch_once()
+        row, = outbox_rows()
+        assert row.status == 'failed' and row.attempts == 1 and row.error == f'No signing key for {FARMER}'
+
+
+def test_stub_chain_enforces_the_contract_requires():
+    chain = StubChain(confirm_latency=0, approved_collateral=[MAIZE_TOKEN])
+    loan = {'principal': 1000, 'interest_rate': 850, 'duration': 86400 * 30,
+            'collateral_token': MAIZE_TOKEN, 'collateral_amount': 10, 'auto_liquidation': True}
+
+    def call(sender, method, args):
+        return chain.wait(chain.submit(sender, method, args, chain.pending_nonce(sender)))
+
+    for field, value, error in (
+        ('principal', 0, 'Principal must be greater than 0'),
+        ('interest_rate', 0, 'Interest rate must be between 0.01% and 50%'),
+        ('interest_rate', 5001, 'Interest rate must be between 0.01% and 50%'),
+        ('duration', 3600, 'Duration must be at least 1 day'),
+        ('collateral_token', '0x' + '22' * 20, 'Collateral token not approved'),
+        ('collateral_amount', 0, 'Collateral amount must be greater than 0'),
+    ):
+        assert call(FARMER, 'createLoan', dict(loan, **{field: value})) == {'status': 0, 'error': error}
+
+    assert call(FARMER, 'createLoan', loan) == {'status': 1, 'loan_id': 1}
+    assert call(FARMER, 'fundLoan', {'loan_id': 1})['error'] == 'Borrower cannot fund their own loan'
+    assert call(LENDER, 'fundLoan', {'loan_id': 2})['error'] == 'Loan does not exist'
+    assert call(LENDER, 'fundLoan', {'loan_id': 1}) == {'status': 1, 'loan_id': 1}
+    assert call(LENDER, 'fundLoan', {'loan_id': 1})['error'] == 'Invalid loan status for this operation'
+
+
+@pytest.mark.parametrize('rate', [0, 0.001, 50.5, 60, 100])
+def test_rates_the_contract_rejects_are_refused(app, client, accounts, rate):
+    response = create_loan(client, accounts, interest_rate=rate)
+    assert response.status_code == 400
+    with app.app_context():
+        assert outbox_rows() == []
+
+
+@pytest.mark.parametrize('rate', [0.01, 50])
+def test_rates_at_the_contract_bounds_are_accepted(client, accounts, rate):
+    assert create_loan(client, accounts, interest_rate=rate).status_code == 201
+
+
+def test_unapproved_collateral_is_refused(client, accounts):
+    response = create_loan(client, mint(client, crop_type='cocoa'))
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'cocoa tokens are not approved as loan collateral'
+
+
+def test_borrower_cannot_fund_their_own_loan(app, client, accounts):
+    contract_id = create_loan(client, accounts).get_json()['contract_id']
+    response = client.post('/api/loans/fund', json={'contract_id': contract_id, 'lender_hedera_id': FARMER})
+    assert response.status_code == 400
+    with app.app_context():
+        assert [row.method for row in outbox_rows()] == ['createLoan']
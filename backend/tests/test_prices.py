@@ -0,0 +1,41 @@
+# Batch price updates: every entry is checked against the price_oracles
+# columns before anything is written; invalid entries are skipped.
+import pytest
+
+from extensions import db
+from models import PriceCandle, PriceOracle
+
+
+def batch(client, commodities, prices, confidences=None):
+    return client.post('/api/prices/batch', json={
+        'commodities': commodities, 'prices': prices, 'confidences': confidences or [9500] * len(commodities)
+    })
+
+
+def test_batch_records_prices_and_candles(app, client):
+    response = batch(client, ['maize', 'cocoa'], [0.29, 2450])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [entry['commodity'] for entry in body['updated']] == ['maize', 'cocoa'] and body['skipped'] == []
+    with app.app_context():
+        assert PriceOracle.query.count() == 2 and PriceCandle.query.count() > 0
+
+
+@pytest.mark.parametrize('commodity', [5, {'a': 1}, ['maize'], None, '', 'x' * 51])
+def test_invalid_commodities_are_skipped_before_any_write(app, client, commodity):
+    response = batch(client, [commodity], [1.5])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['updated'] == []
+    assert body['skipped'] == [{'commodity': commodity, 'reason': 'Commodity must be a name of 1 to 50 characters'}]
+    with app.app_context():
+        assert PriceOracle.query.count() == 0 and PriceCandle.query.count() == 0
+
+
+def test_prices_beyond_the_column_are_skipped(app, client):
+    response = batch(client, ['maize', 'cocoa'], [10 ** 8, 99999999.99])
+    body = response.get_json()
+    assert body['skipped'] == [{'commodity': 'maize', 'reason': 'Price must be below 100000000'}]
+    assert body['updated'][0]['commodity'] == 'cocoa' and body['updated'][0]['price'] == 99999999.99
+    with app.app_context():
+        assert db.session.query(PriceOracle.commodity).all() == [('cocoa',)]
@@ -0,0 +1,20 @@
+# Request traces: coordinates are coarsened to about 11 km but stay numbers a
+# replayed request still passes check_coordinates with.
+from api.common import check_coordinates
+from traces import shape
+
+
+def test_body_coordinates_are_rounded():
+    assert shape({'latitude': 5.96321, 'longitude': 10.15911}) == {'latitude': 6.0, 'longitude': 10.2}
+    assert shape({'latitude': '-3.3861', 'longitude': 36.6833}) == {'latitude': '-3.4', 'longitude': 36.7}
+    check_coordinates(shape({'latitude': 89.99, 'longitude': -179.99}))
+
+
+def test_query_coordinates_are_rounded():
+    query = shape({'lat': '5.96321', 'lon': '10.15911', 'bbox': '9.91,5.87,10.32,6.05', 'limit': '50'}, query=True)
+    assert query == {'lat': '6.0', 'lon': '10.2', 'bbox': '9.9,5.9,10.3,6.0', 'limit': '50'}
+
+
+def test_malformed_coordinates_are_redacted():
+    assert shape({'latitude': 'Bamenda'}) == {'latitude': {'~': 'str', 'n': 7}}
+    assert shape({'bbox': '9.9,north'}, query=True) == {'bbox': {'~': 'str', 'n': 9}}
@@ -0,0 +1,473 @@
+# Hedera AgriFund Backend - Request traces and replay
+#
+# With TRACE_LOG set, every request appends one compact JSON line: the time,
+# method, URL rule, path parameters, query and JSON body, the status, the
+# duration and the number of SQL statements the request ran. The values are
+# sanitized:
+# - kept as they are: ledger identifiers (0.0.x accounts and tokens,
+#   contract ids), job ids, JSON numbers, booleans, dates, numeric query
+#   parameters and enum-like fields (crop_type, user_type, format, ...), so a
+#   replayed request takes the same code path;
+# - rounded to one decimal place (about 11 km): coordinates (latitude and
+#   longitude in bodies, lat, lon and bbox in queries), which stay valid
+#   numbers but no longer locate a farm;
+# - replaced by their kind and length: personal fields (name, email, phone,
+#   location, address) whatever their value, and any other string, digit
+#   strings in bodies and paths included (names, phone numbers, free text).
+# Uploads are recorded by size only. For writes, the ids the response
+# returns (token_id, contract_id, job_id, ...) are recorded too.
+#
+# `python traces.py replay` reads a trace and sends it to a running instance
+# at 1-50x the recorded pace, with a bounded number of concurrent clients.
+# Sanitized strings are filled with fresh random text of the same length.
+# Ids returned by a replayed request replace the recorded ones in every later
+# request, which waits for the request that created them. Requests naming
+# the same ledger account also run in their recorded order (a mint never
+# overtakes the owner's registration); the others run concurrently.
+# It reports per-route latency percentiles and the mean number of SQL
+# statements. The instance must run with STATEMENT_COUNT_HEADER=true for the
+# statement counts. Reports saved with --output can be compared with
+# --baseline to see what a build changed.
+import atexit
+import contextvars
+import gzip
+import json
+import logging
+import os
+import random
+import re
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import quote, unquote
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_HEADER = 'X-DB-Statements'
+FLUSH_BYTES = 64 * 1024
+FLUSH_SECONDS = 1.0
+MAX_SPEED = 50
+
+# String values kept verbatim: identifiers on the public ledger, job ids and dates
+KEPT_PATTERN = re.compile(r'^(\d+\.\d+\.\d+|[0-9a-f]{32}|\d{4}-\d{2}-\d{2}([T ][\d:.]+Z?)?)$')
+# Numbers written as text; kept in query strings (where every value is text) only
+NUMBER_PATTERN = re.compile(r'^-?\d+(\.\d+)?$')
+# Fields whose values select code paths and carry no personal data
+KEPT_FIELDS = {'user_type', 'crop_type', 'commodity', 'commodities', 'quality_grade', 'status', 'format',
+               'fields', 'interval', 'report', 'event_type', 'source', 'risk_tolerance', 'preferred_sectors',
+               'primary_crops', 'async', 'schedule', 'is_pledged', 'auto_liquidation'}
+# Fields always replaced, even when the value looks like a number or an identifier
+PERSONAL_FIELDS = {'name', 'email', 'phone', 'location', 'address'}
+# Coordinate fields, and the decimal places they keep
+COORDINATE_FIELDS = {'latitude', 'longitude', 'lat', 'lon', 'bbox'}
+COORDINATE_DECIMALS = 1
+
+LEDGER_ID = re.compile(r'^\d+\.\d+\.\d+$')
+
+_statements = contextvars.ContextVar('statements', default=None)
+
+
+class StatementCount:
+    """SQL statements run on behalf of one request (shard threads included)"""
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def add(self):
+        with self.lock:
+            self.value += 1
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    count = _statements.get()
+    if count is not None:
+        count.add()
+
+
+def shape(value, key=None, query=False):
+    """Sanitized copy of a JSON value (see the module comment); query=True for query string values"""
+    if value is None or isinstance(value, bool):
+        return value
+    if key in PERSONAL_FIELDS and not isinstance(value, (dict, list)):
+        return redact(str(value))
+    if key in COORDINATE_FIELDS and not isinstance(value, (dict, list)):
+        return coarsen(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        if key in KEPT_FIELDS or KEPT_PATTERN.match(value) or (query and NUMBER_PATTERN.match(value)):
+            return value
+        return redact(value)
+    if isinstance(value, dict):
+        return {k: shape(v, k, query) for k, v in value.items()}
+    if isinstance(value, list):
+        return [shape(v, key, query) for v in value]
+    return redact(str(value))
+
+
+def coarsen(value):
+    """A coordinate (or comma-separated bbox) rounded to COORDINATE_DECIMALS, in the type it came in"""
+    if isinstance(value, (int, float)):
+        return round(value, COORDINATE_DECIMALS)
+    parts = str(value).split(',')
+    if not all(NUMBER_PATTERN.match(part.strip()) for part in parts):
+        return redact(str(value))
+    return ','.join(str(round(float(part), COORDINATE_DECIMALS)) for part in parts)
+
+
+def redact(text):
+    """The kind and length of a string, without its content"""
+    if '@' in text:
+        return {'~': 'email', 'n': len(text)}
+    if text.isdigit():
+        return {'~': 'digits', 'n': len(text)}
+    return {'~': 'str', 'n': len(text)}
+
+
+def returned_ids(response):
+    """Ids a write hands back ({field: id} for top-level *_id fields), to be remapped on replay"""
+    if request.method == 'GET' or response.is_streamed or not response.is_json:
+        return None
+    body = response.get_json(silent=True)
+    if not isinstance(body, dict):
+        return None
+    ids = {key: value for key, value in body.items()
+           if key.endswith('_id') and isinstance(value, str) and KEPT_PATTERN.match(value)}
+    return ids or None
+
+
+def materialize(value, rng):
+    """A concrete value for a sanitized one: fresh random text of the recorded length"""
+    if isinstance(value, list):
+        return [materialize(v, rng) for v in value]
+    if not isinstance(value, dict):
+        return value
+    kind = value.get('~')
+    if kind == 'str':
+        return ''.join(rng.choices(string.ascii_lowercase, k=value['n']))
+    if kind == 'digits':
+        return ''.join(rng.choices(string.digits, k=value['n']))
+    if kind == 'email':
+        local = ''.join(rng.choices(string.ascii_lowercase + string.digits, k=max(value['n'] - 12, 8)))
+        return f'{local}@example.org'
+    return {k: materialize(v, rng) for k, v in value.items()}
+
+
+class TraceRecorder:
+    """Appends trace lines to a file shared by every worker (O_APPEND, one write per flush)"""
+
+    def __init__(self, path, sample_rate=1.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.buffered = 0
+        self.flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def record(self, entry):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        line = (json.dumps(entry, separators=(',', ':'), default=str) + '\n').encode()
+        with self.lock:
+            self.buffer.append(line)
+            self.buffered += len(line)
+            if self.buffered >= FLUSH_BYTES or time.monotonic() - self.flushed_at >= FLUSH_SECONDS:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            os.write(self.fd, b''.join(self.buffer))
+            self.buffer, self.buffered = [], 0
+        self.flushed_at = time.monotonic()
+
+
+def request_entry(response, duration, statements):
+    entry = {'t': round(time.time(), 3), 'm': request.method, 'r': request.url_rule.rule,
+             's': response.status_code, 'd': round(duration * 1000, 2), 'n': statements}
+    if request.view_args:
+        entry['v'] = shape(request.view_args)
+    if request.args:
+        entry['q'] = {k: shape(v if len(v) > 1 else v[0], k, query=True) for k, v in request.args.lists()}
+    if request.is_json:
+        body = request.get_json(silent=True)
+        if body is not None:
+            entry['b'] = shape(body)
+    elif request.content_length:
+        entry['b'] = {'~': 'bytes', 'n': request.content_length, 'ct': request.mimetype}
+    account = request.headers.get('X-Hedera-Account-Id')
+    if account:
+        entry['a'] = shape(account)
+    ids = returned_ids(response)
+    if ids:
+        entry['o'] = ids
+    return entry
+
+
+def install(app, recorder=None, expose_counts=False, skip=()):
+    """Count SQL statements per request; record traces and/or expose the count as a response header"""
+    if recorder is None and not expose_counts:
+        return
+
+    @app.before_request
+    def start_trace():
+        g.trace_started = time.perf_counter()
+        g.trace_token = _statements.set(StatementCount())
+
+    @app.after_request
+    def finish_trace(response):
+        count = _statements.get()
+        if count is None or 'trace_started' not in g:
+            return response
+        if expose_counts:
+            response.headers[STATEMENT_HEADER] = str(count.value)
+        if recorder is not None and request.url_rule is not None and request.endpoint not in skip:
+            try:
+                recorder.record(request_entry(response, time.perf_counter() - g.trace_started, count.value))
+            except Exception as e:
+                logger.error(f"Trace recording failed: {e}")
+        return response
+
+    @app.teardown_request
+    def end_trace(error=None):
+        token = g.pop('trace_token', None)
+        if token is not None:
+            _statements.reset(token)
+
+
+def load_trace(path):
+    """Trace entries in time order (plain or gzipped JSON lines)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return sorted(entries, key=lambda entry: entry['t'])
+
+
+def build_request(entry, rng):
+    """(method, path, query, json body, headers), or None when the request cannot be replayed"""
+    body = entry.get('b')
+    if isinstance(body, dict) and body.get('~') == 'bytes':
+        return None
+    path_args = materialize(entry.get('v', {}), rng)
+    path = re.sub(r'<(?:[^:<>]+:)?([^<>]+)>', lambda m: quote(str(path_args.get(m.group(1), '')), safe=''),
+                  entry['r'])
+    headers = {}
+    if 'a' in entry:
+        headers['X-Hedera-Account-Id'] = materialize(entry['a'], rng)
+    return entry['m'], path, materialize(entry.get('q'), rng), materialize(body, rng), headers
+
+
+def referenced_ids(value, known):
+    """Recorded ids from `known` that a (recorded) request value mentions"""
+    if isinstance(value, str):
+        return [value] if value in known else []
+    if isinstance(value, dict):
+        return [found for v in value.values() for found in referenced_ids(v, known)]
+    if isinstance(value, list):
+        return [found for v in value for found in referenced_ids(v, known)]
+    return []
+
+
+def substitute(value, ids):
+    """Replace recorded ids with the ones the replayed instance returned"""
+    if isinstance(value, str):
+        return ids.get(value, value)
+    if isinstance(value, dict):
+        return {k: substitute(v, ids) for k, v in value.items()}
+    if isinstance(value, list):
+        return [substitute(v, ids) for v in value]
+    return value
+
+
+def ordering_key(entry):
+    """The first ledger account the request names (header, path, then body), or None"""
+    candidates = [entry.get('a')]
+    for part in (entry.get('v'), entry.get('b')):
+        if isinstance(part, dict) and '~' not in part:
+            candidates.extend(part.values())
+    return next((value for value in candidates if isinstance(value, str) and LEDGER_ID.match(value)), None)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def replay(entries, base_url, speed=1.0, concurrency=8, timeout=30.0, seed=0):
+    """Send the trace at `speed` times the recorded pace; returns one result dict per request"""
+    import requests
+
+    if not 1 <= speed <= MAX_SPEED:
+        raise ValueError(f'speed must be between 1 and {MAX_SPEED}')
+    rng = random.Random(seed)
+    local = threading.local()
+    slots = threading.Semaphore(concurrency)
+    results = []
+    replayed_ids = {}  # recorded id -> id the replayed instance returned for it
+
+    def remember_ids(returns, response):
+        try:
+            returned = response.json()
+        except ValueError:
+            return
+        if isinstance(returned, dict):
+            replayed_ids.update((recorded, returned[key]) for key, recorded in returns.items()
+                                if isinstance(returned.get(key), str))
+
+    def send(route, prepared, due, waits_for, returns):
+        method, path, query, body, headers = prepared
+        # Submitted earlier, so each already holds a client or is ahead in the queue
+        wait(waits_for)
+        if replayed_ids:
+            path = '/'.join(quote(replayed_ids.get(unquote(part), unquote(part)), safe='')
+                            for part in path.split('/'))
+            query, body, headers = (substitute(part, replayed_ids) for part in (query, body, headers))
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        result = {'route': route, 'lag': max(0.0, started - due)}
+        try:
+            response = local.session.request(method, base_url.rstrip('/') + path, params=query, json=body,
+                                             headers=headers, timeout=timeout)
+            result['status'] = response.status_code
+            statements = response.headers.get(STATEMENT_HEADER)
+            result['statements'] = int(statements) if statements is not None else None
+            if returns and response.ok:
+                remember_ids(returns, response)
+        except requests.RequestException as e:
+            result['status'] = None
+            result['error'] = str(e)
+        finally:
+            result['latency'] = time.perf_counter() - started
+            results.append(result)
+            slots.release()
+
+    if not entries:
+        return results
+    first = entries[0]['t']
+    start = time.perf_counter()
+    last_for_key = {}
+    producers = {}  # recorded id -> the request that returned it
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            route = f"{entry['m']} {entry['r']}"
+            prepared = build_request(entry, rng)
+            if prepared is None:
+                results.append({'route': route, 'skipped': True})
+                continue
+            due = start + (entry['t'] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            slots.acquire()  # with every client busy the schedule slips; the slip is reported as lag
+            key = ordering_key(entry)
+            waits_for = {producers[found] for part in ('v', 'q', 'b', 'a')
+                         for found in referenced_ids(entry.get(part), producers)}
+            if key in last_for_key:
+                waits_for.add(last_for_key[key])
+            returns = entry.get('o')
+            future = pool.submit(send, route, prepared, due, list(waits_for), returns)
+            if key is not None:
+                last_for_key[key] = future
+            for recorded in (returns or {}).values():
+                producers[recorded] = future
+    return results
+
+
+def summarize(results):
+    """Per-route request counts, error counts, latency percentiles (ms) and mean statement counts"""
+    routes = {}
+    for result in results:
+        routes.setdefault(result['route'], []).append(result)
+    report = {}
+    for route, items in sorted(routes.items()):
+        sent = [item for item in items if not item.get('skipped')]
+        latencies = [item['latency'] * 1000 for item in sent]
+        statements = [item['statements'] for item in sent if item.get('statements') is not None]
+        report[route] = {
+            'count': len(sent),
+            'skipped': len(items) - len(sent),
+            'errors': sum(1 for item in sent if item['status'] is None or item['status'] >= 500),
+            'client_errors': sum(1 for item in sent if item['status'] is not None and 400 <= item['status'] < 500),
+            'p50': percentile(latencies, 0.5),
+            'p90': percentile(latencies, 0.9),
+            'p99': percentile(latencies, 0.99),
+            'max': max(latencies, default=None),
+            'statements': sum(statements) / len(statements) if statements else None,
+            'lag_p99': percentile([item['lag'] * 1000 for item in sent], 0.99),
+        }
+    return report
+
+
+def format_report(report, baseline=None):
+    def number(value, digits=1):
+        return '-' if value is None else f'{value:.{digits}f}'
+
+    def delta(route, key):
+        before = (baseline or {}).get(route, {}).get(key)
+        after = report[route].get(key)
+        if before is None or after is None or before == 0:
+            return ''
+        return f' ({(after - before) / before * 100:+.0f}%)'
+
+    lines = [f"{'route':<52} {'count':>6} {'5xx':>4} {'4xx':>4} {'p50 ms':>14} {'p90 ms':>8} "
+             f"{'p99 ms':>14} {'max ms':>8} {'SQL/req':>14}"]
+    for route, stats in report.items():
+        lines.append(f"{route:<52} {stats['count']:>6} {stats['errors']:>4} {stats['client_errors']:>4} "
+                     f"{number(stats['p50']) + delta(route, 'p50'):>14} {number(stats['p90']):>8} "
+                     f"{number(stats['p99']) + delta(route, 'p99'):>14} {number(stats['max']):>8} "
+                     f"{number(stats['statements']) + delta(route, 'statements'):>14}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay a recorded request trace against a running instance')
+    parser.add_argument('command', choices=['replay', 'summary'])
+    parser.add_argument('trace', help='trace file written with TRACE_LOG (.gz accepted)')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--speed', type=float, default=1.0, help=f'multiple of the recorded pace (1-{MAX_SPEED})')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--limit', type=int, help='replay only the first N requests')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the generated text values')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--baseline', help='report JSON of another build to compare with')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    entries = load_trace(args.trace)[:args.limit]
+    if args.command == 'summary':
+        # The recorded latencies, as the production instance served them
+        report = summarize([{'route': f"{e['m']} {e['r']}", 'status': e['s'], 'latency': e['d'] / 1000,
+                             'statements': e.get('n'), 'lag': 0.0} for e in entries])
+    else:
+        started = time.perf_counter()
+        results = replay(entries, args.base_url, args.speed, args.concurrency, args.timeout, args.seed)
+        elapsed = time.perf_counter() - started
+        print(f"replayed {len(results)} requests in {elapsed:.1f} s at {args.speed:g}x "
+              f"({len(results) / elapsed:.0f} req/s, concurrency {args.concurrency})")
+        report = summarize(results)
+        if all(stats['statements'] is None for stats in report.values()):
+            print(f"no {STATEMENT_HEADER} header: start the instance with STATEMENT_COUNT_HEADER=true")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
@@ -0,0 +1,149 @@
+# Benchmark: shared NumPy raster pipeline against the original drawing code
+#
+# Renders the two case studies and the two demo screenshots at --scale times
+# their design size (3 gives a 3840x2160 desktop screenshot and 2400x1800
+# case studies) with raster.render_all. Then it renders them the way the
+# original scripts did:
+# - the case study gradient is one draw.line per pixel row, with a full-frame
+#   RGBA overlay composited on top;
+# - the screenshots use a fresh PIL image with every rectangle drawn by
+#   ImageDraw;
+# - fonts are reloaded for every image;
+# - images are rendered one after the other.
+# Each pair of outputs must match to within antialiasing noise. A second pass
+# with saving disabled times the drawing without the (identical) encoding.
+#
+# Usage: python frontend/benchmarks/bench_raster.py [--scale 3] [--workers N] [--repeat 3]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import create_screenshots  # noqa: E402
+import generate_carousel_images  # noqa: E402
+import raster  # noqa: E402
+
+
+class LegacyDraw:
+    """ImageDraw on a plain PIL image, exposing the Canvas interface the layouts use"""
+
+    def __init__(self, width, height, color):
+        self.image = Image.new('RGB', (width, height), color)
+        self.draw = ImageDraw.Draw(self.image)
+        self.width, self.height = width, height
+
+    def __getattr__(self, name):
+        return getattr(self.draw, name)
+
+
+def legacy_screenshot(width, height, output_path, content_type):
+    canvas = LegacyDraw(width, height, (248, 249, 250))
+    scale = width / create_screenshots.BASE_WIDTHS[content_type]
+    layout = (create_screenshots.create_desktop_dashboard if content_type == "desktop"
+              else create_screenshots.create_mobile_onboarding)
+    layout(canvas, scale, (76, 175, 80), (255, 255, 255), (33, 37, 41), (224, 224, 224))
+    canvas.image.save(output_path, 'PNG', optimize=True)
+    return output_path
+
+
+def legacy_case_study(title, subtitle, color_scheme, filename, scale):
+    width, height = round(800 * scale), round(600 * scale)
+    colors = generate_carousel_images.COLOR_SCHEMES[color_scheme]
+    accent_color, text_color = colors["accent_color"], colors["text_color"]
+    img = Image.new('RGB', (width, height), colors["bg_color"])
+    draw = ImageDraw.Draw(img)
+    title_font, subtitle_font, detail_font = (raster.font(round(size * scale)) for size in (60, 40, 30))
+
+    for y in range(height):
+        alpha = y / height
+        draw.line([(0, y), (width, y)], fill=tuple(int(c * (1 - alpha * 0.3)) for c in colors["gradient"]))
+
+    def px(value):
+        return round(value * scale)
+
+    if color_scheme == "coffee":
+        for i in range(8):
+            x, y = px(50 + i * 90), px(50)
+            draw.ellipse([x, y, x + px(40), y + px(60)], fill=accent_color, outline=text_color, width=px(2))
+            draw.ellipse([x + px(10), y + px(15), x + px(30), y + px(45)], fill=colors["bg_color"])
+    else:
+        for i in range(6):
+            x = 80 + i * 120
+            draw.rectangle([px(x - 4), px(50), px(x + 4) - 1, px(150)], fill=accent_color)
+            for j in range(5):
+                y = 60 + j * 20
+                draw.ellipse([px(x - 15), px(y), px(x + 15), px(y + 10)], fill=accent_color)
+
+    overlay = Image.new('RGBA', (width, height), (0, 0, 0, generate_carousel_images.OVERLAY_OPACITY))
+    img = Image.alpha_composite(img.convert('RGBA'), overlay).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    for text, y, text_font, color in [(title, 250, title_font, text_color),
+                                      (subtitle, 330, subtitle_font, accent_color),
+                                      ("Powered by Hedera AgriFund", 520, detail_font, accent_color)]:
+        text_width = draw.textlength(text, font=text_font)
+        draw.text(((width - text_width) // 2, px(y)), text, fill=color, font=text_font)
+    img.save(filename, 'JPEG', quality=90)
+    return filename
+
+
+def legacy_render_all(output_dir, scale):
+    cached_font = raster.font
+    raster.font = cached_font.__wrapped__  # the original scripts loaded fonts for every image
+    try:
+        paths = [legacy_case_study(*args) for _, args in generate_carousel_images.case_study_tasks(output_dir, scale)]
+        paths += [legacy_screenshot(*args) for _, args in create_screenshots.screenshot_tasks(output_dir, scale)]
+    finally:
+        raster.font = cached_font
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', type=float, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    new_dir, old_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+
+    def timed(render, output_dir):
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            paths = render(output_dir)
+            best = min(best, time.perf_counter() - started)
+        return best, paths
+
+    old_time, old_paths = timed(lambda d: legacy_render_all(d, args.scale), old_dir)
+    new_time, new_paths = timed(lambda d: raster.render_all(d, args.scale, args.workers), new_dir)
+
+    for old_path, new_path in zip(old_paths, new_paths):
+        old = np.asarray(Image.open(old_path).convert('RGB'), dtype=np.int16)
+        new = np.asarray(Image.open(new_path).convert('RGB'), dtype=np.int16)
+        assert old.shape == new.shape, (old_path, old.shape, new.shape)
+        difference = np.abs(old - new).mean()
+        assert difference < 1.0, (new_path, difference)
+        print(f"{os.path.basename(new_path):<24} {new.shape[1]}x{new.shape[0]}  mean |diff| {difference:.3f}")
+
+    # Encoding (zlib level 9 for the PNGs) is the same work in both versions: time the drawing on its own
+    save = Image.Image.save
+    Image.Image.save = lambda self, *args, **kwargs: None
+    try:
+        old_drawing, _ = timed(lambda d: legacy_render_all(d, args.scale), old_dir)
+        new_drawing, _ = timed(lambda d: raster.render_all(d, args.scale, 1), new_dir)
+    finally:
+        Image.Image.save = save
+
+    print(f"original scripts: {old_time * 1000:8.1f} ms   drawing only {old_drawing * 1000:7.1f} ms")
+    print(f"raster pipeline:  {new_time * 1000:8.1f} ms   drawing only {new_drawing * 1000:7.1f} ms   "
+          f"({old_time / new_time:.1f}x faster overall with {args.workers or os.cpu_count()} worker(s), "
+          f"{old_drawing / new_drawing:.1f}x on drawing)")
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,19 @@
 Script pour créer des captures d'écran de démonstration pour le PWA Hedera AgriFund
 """
 
-from PIL import Image, ImageDraw, ImageFont
 import os
 
+import raster
+
+# Largeur pour laquelle chaque maquette a été dessinée (les coordonnées sont mises à l'échelle)
+BASE_WIDTHS = {"desktop": 1280, "mobile": 390}
+
 def create_demo_screenshot(width, height, output_path, content_type="desktop"):
     """Crée une capture d'écran de démonstration"""
 
-    # Créer l'image
-    img = Image.new('RGB', (width, height), (248, 249, 250))  # Fond gris clair
-    draw = ImageDraw.Draw(img)
+    # Créer l'image (fond gris clair)
+    canvas = raster.Canvas(raster.background(width, height, (248, 249, 250)))
+    scale = width / BASE_WIDTHS.get(content_type, width)
 
     # Couleurs
     primary_green = (76, 175, 80)
@@ -21,57 +25,53 @@ def create_demo_screenshot(width, height, output_path, content_type="desktop"):
     border_color = (224, 224, 224)
 
     if content_type == "desktop":
-        create_desktop_dashboard(img, draw, primary_green, white, text_color, border_color)
+        create_desktop_dashboard(canvas, scale, primary_green, white, text_color, border_color)
     elif content_type == "mobile":
-        create_mobile_onboarding(img, draw, primary_green, white, text_color, border_color)
+        create_mobile_onboarding(canvas, scale, primary_green, white, text_color, border_color)
 
     # Sauvegarder
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    img.save(output_path, 'PNG', optimize=True)
+    raster.save(canvas.render('RGB'), output_path, 'PNG', optimize=True)
     print(f"✓ Capture d'écran créée: {output_path}")
+    return output_path
 
-def create_desktop_dashboard(img, draw, primary_green, white, text_color, border_color):
+def create_desktop_dashboard(draw, scale, primary_green, white, text_color, border_color):
     """Crée une maquette du dashboard desktop"""
-    width, height = img.size
+    width = draw.width
+
+    def px(value):
+        return round(value * scale)
+
+    font_title = raster.font(px(24))
+    font_nav = raster.font(px(16))
+    font_card = raster.font(px(14))
 
     # Header/Navigation
-    draw.rectangle([0, 0, width, 80], fill=white, outline=border_color)
+    draw.rectangle([0, 0, width, px(80)], fill=white, outline=border_color)
 
     # Logo et titre
-    draw.ellipse([20, 20, 60, 60], fill=primary_green)
-    try:
-        font_title = ImageFont.truetype("arial.ttf", 24)
-        font_nav = ImageFont.truetype("arial.ttf", 16)
-        font_card = ImageFont.truetype("arial.ttf", 14)
-        font_small = ImageFont.truetype("arial.ttf", 12)
-    except:
-        font_title = ImageFont.load_default()
-        font_nav = ImageFont.load_default()
-        font_card = ImageFont.load_default()
-        font_small = ImageFont.load_default()
-
-    draw.text((80, 35), "Hedera AgriFund", fill=text_color, font=font_title)
+    draw.ellipse([px(20), px(20), px(60), px(60)], fill=primary_green)
+    draw.text((px(80), px(35)), "Hedera AgriFund", fill=text_color, font=font_title)
 
     # Navigation items
     nav_items = ["Dashboard", "Prêts", "Reçus Numériques", "Analytics"]
     nav_x = 300
     for item in nav_items:
-        draw.text((nav_x, 35), item, fill=text_color, font=font_nav)
+        draw.text((px(nav_x), px(35)), item, fill=text_color, font=font_nav)
         nav_x += 150
 
     # Connect Wallet button
-    btn_width, btn_height = 160, 40
-    btn_x = width - btn_width - 20
-    btn_y = 20
+    btn_width, btn_height = px(160), px(40)
+    btn_x = width - btn_width - px(20)
+    btn_y = px(20)
     draw.rectangle([btn_x, btn_y, btn_x + btn_width, btn_y + btn_height],
                    fill=primary_green, outline=primary_green)
-    draw.text((btn_x + 25, btn_y + 12), "Connecter Wallet", fill=white, font=font_nav)
+    draw.text((btn_x + px(25), btn_y + px(12)), "Connecter Wallet", fill=white, font=font_nav)
 
     # Main content area
     content_y = 100
 
     # Welcome message
-    draw.text((40, content_y), "Bonjour, Jean Agriculteur !", fill=text_color, font=font_title)
+    draw.text((px(40), px(content_y)), "Bonjour, Jean Agriculteur !", fill=text_color, font=font_title)
     content_y += 60
 
     # Stats cards
@@ -87,19 +87,19 @@ def create_desktop_dashboard(img, draw, primary_green, white, text_color, border
     card_x = 40
     for title, value, color in cards_data:
         # Card background
-        draw.rectangle([card_x, content_y, card_x + card_width, content_y + card_height],
-                       fill=white, outline=border_color, width=2)
+        draw.rectangle([px(card_x), px(content_y), px(card_x + card_width), px(content_y + card_height)],
+                       fill=white, outline=border_color, width=px(2))
 
         # Card content
-        draw.text((card_x + 20, content_y + 20), title, fill=text_color, font=font_card)
-        draw.text((card_x + 20, content_y + 50), value, fill=color, font=font_title)
+        draw.text((px(card_x + 20), px(content_y + 20)), title, fill=text_color, font=font_card)
+        draw.text((px(card_x + 20), px(content_y + 50)), value, fill=color, font=font_title)
 
         card_x += card_width + card_spacing
 
     content_y += card_height + 40
 
     # Quick actions section
-    draw.text((40, content_y), "Actions rapides", fill=text_color, font=font_title)
+    draw.text((px(40), px(content_y)), "Actions rapides", fill=text_color, font=font_title)
     content_y += 40
 
     # Action buttons
@@ -109,15 +109,15 @@ def create_desktop_dashboard(img, draw, primary_green, white, text_color, border
     btn_x = 40
 
     for action in actions:
-        draw.rectangle([btn_x, content_y, btn_x + btn_width, content_y + btn_height],
+        draw.rectangle([px(btn_x), px(content_y), px(btn_x + btn_width), px(content_y + btn_height)],
                        fill=primary_green, outline=primary_green)
-        draw.text((btn_x + 20, content_y + 18), action, fill=white, font=font_nav)
+        draw.text((px(btn_x + 20), px(content_y + 18)), action, fill=white, font=font_nav)
         btn_x += btn_width + 20
 
     content_y += btn_height + 40
 
     # Recent activity section
-    draw.text((40, content_y), "Activité récente", fill=text_color, font=font_title)
+    draw.text((px(40), px(content_y)), "Activité récente", fill=text_color, font=font_title)
     content_y += 40
 
     # Activity items
@@ -128,95 +128,105 @@ def create_desktop_dashboard(img, draw, primary_green, white, text_color, border
     ]
 
     for activity in activities:
-        draw.rectangle([40, content_y, width - 40, content_y + 40],
+        draw.rectangle([px(40), px(content_y), width - px(40), px(content_y + 40)],
                        fill=white, outline=border_color)
-        draw.text((60, content_y + 12), activity, fill=text_color, font=font_card)
+        draw.text((px(60), px(content_y + 12)), activity, fill=text_color, font=font_card)
         content_y += 50
 
-def create_mobile_onboarding(img, draw, primary_green, white, text_color, border_color):
+def create_mobile_onboarding(draw, scale, primary_green, white, text_color, border_color):
     """Crée une maquette de l'onboarding mobile"""
-    width, height = img.size
+    width = draw.width
 
-    # Header
-    draw.rectangle([0, 0, width, 100], fill=primary_green)
+    def px(value):
+        return round(value * scale)
 
-    try:
-        font_title = ImageFont.truetype("arial.ttf", 20)
-        font_subtitle = ImageFont.truetype("arial.ttf", 16)
-        font_text = ImageFont.truetype("arial.ttf", 14)
-    except:
-        font_title = ImageFont.load_default()
-        font_subtitle = ImageFont.load_default()
-        font_text = ImageFont.load_default()
+    font_title = raster.font(px(20))
+    font_subtitle = raster.font(px(16))
+    font_text = raster.font(px(14))
+
+    # Header
+    draw.rectangle([0, 0, width, px(100)], fill=primary_green)
 
     # Progress bar
-    progress_width = width - 80
-    progress_x = 40
-    progress_y = 30
-    draw.rectangle([progress_x, progress_y, progress_x + progress_width, progress_y + 8],
+    progress_width = width - px(80)
+    progress_x = px(40)
+    progress_y = px(30)
+    draw.rectangle([progress_x, progress_y, progress_x + progress_width, progress_y + px(8)],
                    fill=(255, 255, 255, 100), outline=None)
-    draw.rectangle([progress_x, progress_y, progress_x + progress_width * 0.66, progress_y + 8],
+    draw.rectangle([progress_x, progress_y, progress_x + progress_width * 0.66, progress_y + px(8)],
                    fill=white, outline=None)
 
-    draw.text((progress_x, progress_y + 20), "Étape 2 sur 3", fill=white, font=font_subtitle)
+    draw.text((progress_x, progress_y + px(20)), "Étape 2 sur 3", fill=white, font=font_subtitle)
 
     # Main content
     content_y = 130
 
     # Centered icon (simplified)
-    icon_size = 80
+    icon_size = px(80)
     icon_x = (width - icon_size) // 2
-    draw.ellipse([icon_x, content_y, icon_x + icon_size, content_y + icon_size],
+    draw.ellipse([icon_x, px(content_y), icon_x + icon_size, px(content_y) + icon_size],
                  fill=primary_green)
-    draw.text((icon_x + 35, content_y + 35), "🚜", fill=white, font=font_title)
+    draw.text((icon_x + px(35), px(content_y + 35)), "🚜", fill=white, font=font_title)
 
-    content_y += icon_size + 40
+    content_y += 80 + 40
 
     # Title
     title = "Qui êtes-vous ?"
     title_width = draw.textlength(title, font=font_title)
-    draw.text(((width - title_width) // 2, content_y), title, fill=text_color, font=font_title)
+    draw.text(((width - title_width) // 2, px(content_y)), title, fill=text_color, font=font_title)
     content_y += 60
 
     # Role options
     option_height = 100
-    option_margin = 30
+    option_margin = px(30)
 
     # Farmer option (selected)
-    draw.rectangle([option_margin, content_y, width - option_margin, content_y + option_height],
-                   fill=white, outline=primary_green, width=3)
-    draw.text((option_margin + 20, content_y + 20), "🚜 Agriculteur", fill=text_color, font=font_subtitle)
-    draw.text((option_margin + 20, content_y + 45), "Je cultive et cherche du financement",
+    draw.rectangle([option_margin, px(content_y), width - option_margin, px(content_y + option_height)],
+                   fill=white, outline=primary_green, width=px(3))
+    draw.text((option_margin + px(20), px(content_y + 20)), "🚜 Agriculteur", fill=text_color, font=font_subtitle)
+    draw.text((option_margin + px(20), px(content_y + 45)), "Je cultive et cherche du financement",
               fill=text_color, font=font_text)
 
     # Check mark for selected option
-    draw.ellipse([width - 60, content_y + 10, width - 40, content_y + 30], fill=primary_green)
-    draw.text((width - 55, content_y + 15), "✓", fill=white, font=font_text)
+    draw.ellipse([width - px(60), px(content_y + 10), width - px(40), px(content_y + 30)], fill=primary_green)
+    draw.text((width - px(55), px(content_y + 15)), "✓", fill=white, font=font_text)
 
     content_y += option_height + 20
 
     # Lender option
-    draw.rectangle([option_margin, content_y, width - option_margin, content_y + option_height],
-                   fill=white, outline=border_color, width=2)
-    draw.text((option_margin + 20, content_y + 20), "💰 Investisseur", fill=text_color, font=font_subtitle)
-    draw.text((option_margin + 20, content_y + 45), "Je veux investir dans l'agriculture",
+    draw.rectangle([option_margin, px(content_y), width - option_margin, px(content_y + option_height)],
+                   fill=white, outline=border_color, width=px(2))
+    draw.text((option_margin + px(20), px(content_y + 20)), "💰 Investisseur", fill=text_color, font=font_subtitle)
+    draw.text((option_margin + px(20), px(content_y + 45)), "Je veux investir dans l'agriculture",
               fill=text_color, font=font_text)
 
     content_y += option_height + 60
 
     # Bottom buttons
-    btn_height = 50
-    btn_margin = 30
+    btn_height = px(50)
+    btn_margin = px(30)
+    btn_y = px(content_y)
 
     # Previous button
-    draw.rectangle([btn_margin, content_y, (width // 2) - 10, content_y + btn_height],
-                   fill=white, outline=border_color, width=2)
-    draw.text((btn_margin + 40, content_y + 18), "Précédent", fill=text_color, font=font_subtitle)
+    draw.rectangle([btn_margin, btn_y, (width // 2) - px(10), btn_y + btn_height],
+                   fill=white, outline=border_color, width=px(2))
+    draw.text((btn_margin + px(40), btn_y + px(18)), "Précédent", fill=text_color, font=font_subtitle)
 
     # Next button
-    draw.rectangle([(width // 2) + 10, content_y, width - btn_margin, content_y + btn_height],
+    draw.rectangle([(width // 2) + px(10), btn_y, width - btn_margin, btn_y + btn_height],
                    fill=primary_green, outline=primary_green)
-    draw.text(((width // 2) + 50, content_y + 18), "Suivant", fill=white, font=font_subtitle)
+    draw.text(((width // 2) + px(50), btn_y + px(18)), "Suivant", fill=white, font=font_subtitle)
+
+def screenshot_tasks(output_dir, scale=1):
+    """Tâches de rendu des captures d'écran pour raster.render_batch"""
+    return [
+        # Desktop dashboard
+        (create_demo_screenshot, (round(1280 * scale), round(720 * scale),
+                                  os.path.join(output_dir, "desktop-dashboard.png"), "desktop")),
+        # Mobile onboarding
+        (create_demo_screenshot, (round(390 * scale), round(844 * scale),
+                                  os.path.join(output_dir, "mobile-onboarding.png"), "mobile"))
+    ]
 
 def create_demo_screenshots():
     """Crée toutes les captures d'écran de démonstration"""
@@ -224,11 +234,7 @@ def create_demo_screenshots():
     print("📸 Génération des captures d'écran de démonstration...")
     print("=" * 50)
 
-    # Desktop dashboard
-    create_demo_screenshot(1280, 720, "assets/screenshots/desktop-dashboard.png", "desktop")
-
-    # Mobile onboarding
-    create_demo_screenshot(390, 844, "assets/screenshots/mobile-onboarding.png", "mobile")
+    raster.render_batch(screenshot_tasks("assets/screenshots"))
 
     print(f"\n✅ Captures d'écran créées dans assets/screenshots/")
     print("🎨 Ces maquettes donnent un aperçu de votre app dans les stores!")
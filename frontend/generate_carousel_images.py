@@ -4,104 +4,82 @@ Générateur d'images pour le carousel Success Stories
 Crée des images de placeholder pour les case studies
 """
 
-from PIL import Image, ImageDraw, ImageFont
 import os
 
-def create_case_study_image(title, subtitle, color_scheme, filename):
-    """Crée une image pour une case study"""
-    width, height = 800, 600
-
-    # Couleurs selon le schéma
-    if color_scheme == "coffee":
-        bg_color = "#8B4513"  # Marron café
-        accent_color = "#00D4AA"  # Vert Hedera
-        text_color = "#FFFFFF"
-    elif color_scheme == "rice":
-        bg_color = "#228B22"  # Vert forêt
-        accent_color = "#FFD700"  # Or
-        text_color = "#FFFFFF"
-
-    # Créer l'image
-    img = Image.new('RGB', (width, height), bg_color)
-    draw = ImageDraw.Draw(img)
-
-    # Essayer d'utiliser une police plus jolie
-    try:
-        title_font = ImageFont.truetype("arial.ttf", 60)
-        subtitle_font = ImageFont.truetype("arial.ttf", 40)
-        detail_font = ImageFont.truetype("arial.ttf", 30)
-    except:
-        title_font = ImageFont.load_default()
-        subtitle_font = ImageFont.load_default()
-        detail_font = ImageFont.load_default()
-
-    # Dessiner le fond avec gradient simulé
-    for y in range(height):
-        alpha = y / height
-        if color_scheme == "coffee":
-            r = int(139 * (1 - alpha * 0.3))
-            g = int(69 * (1 - alpha * 0.3))
-            b = int(19 * (1 - alpha * 0.3))
-        else:
-            r = int(34 * (1 - alpha * 0.3))
-            g = int(139 * (1 - alpha * 0.3))
-            b = int(34 * (1 - alpha * 0.3))
-
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
+import raster
+
+# Voile noir posé sur le fond pour faire ressortir le texte
+OVERLAY_OPACITY = 120
+
+COLOR_SCHEMES = {
+    "coffee": {
+        "bg_color": "#8B4513",  # Marron café
+        "gradient": (139, 69, 19),
+        "accent_color": "#00D4AA",  # Vert Hedera
+        "text_color": "#FFFFFF"
+    },
+    "rice": {
+        "bg_color": "#228B22",  # Vert forêt
+        "gradient": (34, 139, 34),
+        "accent_color": "#FFD700",  # Or
+        "text_color": "#FFFFFF"
+    }
+}
+
+def create_case_study_image(title, subtitle, color_scheme, filename, scale=1):
+    """Crée une image pour une case study (800x600, multiplié par `scale`)"""
+    width, height = round(800 * scale), round(600 * scale)
+
+    def px(value):
+        return round(value * scale)
+
+    colors = COLOR_SCHEMES[color_scheme]
+    accent_color = colors["accent_color"]
+    text_color = colors["text_color"]
+
+    # Le voile est appliqué directement aux couleurs du fond et des décorations
+    def shade(color):
+        return raster.darken(color, OVERLAY_OPACITY)
+
+    # Fond en dégradé (assombri de 30% vers le bas)
+    top = colors["gradient"]
+    canvas = raster.Canvas(raster.vertical_gradient(width, height, shade(top), shade([c * 0.7 for c in top])))
 
     # Dessiner des éléments décoratifs
     if color_scheme == "coffee":
         # Dessiner des grains de café stylisés
         for i in range(8):
-            x = 50 + i * 90
-            y = 50
-            draw.ellipse([x, y, x+40, y+60], fill=accent_color, outline=text_color, width=2)
-            draw.ellipse([x+10, y+15, x+30, y+45], fill=bg_color)
+            x = px(50 + i * 90)
+            y = px(50)
+            canvas.ellipse([x, y, x + px(40), y + px(60)], fill=shade(accent_color),
+                           outline=shade(text_color), width=px(2))
+            canvas.ellipse([x + px(10), y + px(15), x + px(30), y + px(45)], fill=shade(colors["bg_color"]))
     else:
         # Dessiner des tiges de riz stylisées
         for i in range(6):
             x = 80 + i * 120
-            draw.line([(x, 50), (x, 150)], fill=accent_color, width=8)
+            canvas.rectangle((px(x - 4), px(50), px(x + 4) - 1, px(150)), fill=shade(accent_color))
             for j in range(5):
                 y = 60 + j * 20
-                draw.ellipse([x-15, y, x+15, y+10], fill=accent_color)
-
-    # Ajouter un overlay semi-transparent pour le texte
-    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 120))
-    img = Image.alpha_composite(img.convert('RGBA'), overlay).convert('RGB')
-    draw = ImageDraw.Draw(img)
-
-    # Dessiner le titre
-    title_bbox = draw.textbbox((0, 0), title, font=title_font)
-    title_width = title_bbox[2] - title_bbox[0]
-    title_x = (width - title_width) // 2
-    draw.text((title_x, 250), title, fill=text_color, font=title_font)
-
-    # Dessiner le sous-titre
-    subtitle_bbox = draw.textbbox((0, 0), subtitle, font=subtitle_font)
-    subtitle_width = subtitle_bbox[2] - subtitle_bbox[0]
-    subtitle_x = (width - subtitle_width) // 2
-    draw.text((subtitle_x, 330), subtitle, fill=accent_color, font=subtitle_font)
-
-    # Ajouter "Hedera AgriFund" en bas
-    footer_text = "Powered by Hedera AgriFund"
-    footer_bbox = draw.textbbox((0, 0), footer_text, font=detail_font)
-    footer_width = footer_bbox[2] - footer_bbox[0]
-    footer_x = (width - footer_width) // 2
-    draw.text((footer_x, 520), footer_text, fill=accent_color, font=detail_font)
+                canvas.ellipse([px(x - 15), px(y), px(x + 15), px(y + 10)], fill=shade(accent_color))
 
-    # Sauvegarder l'image
-    img.save(filename, 'JPEG', quality=90)
-    print(f"Image créée: {filename}")
+    # Textes centrés : titre, sous-titre et "Hedera AgriFund" en bas
+    for text, y, size, color in [(title, 250, 60, text_color),
+                                 (subtitle, 330, 40, accent_color),
+                                 ("Powered by Hedera AgriFund", 520, 30, accent_color)]:
+        text_font = raster.font(px(size))
+        text_width = canvas.textlength(text, font=text_font)
+        canvas.text(((width - text_width) // 2, px(y)), text, fill=color, font=text_font)
 
-def main():
-    """Générer toutes les images du carousel"""
-    output_dir = "I:/hedera_kackav2/frontend/assets/screenshots"
+    img = canvas.render()
 
-    # S'assurer que le dossier existe
-    os.makedirs(output_dir, exist_ok=True)
+    # Sauvegarder l'image
+    raster.save(img, filename, 'JPEG', quality=90)
+    print(f"Image créée: {filename}")
+    return filename
 
-    # Créer les images
+def case_study_tasks(output_dir, scale=1):
+    """Tâches de rendu des images du carousel pour raster.render_batch"""
     case_studies = [
         {
             "title": "Coffee Cooperative",
@@ -116,14 +94,13 @@ def main():
             "filename": os.path.join(output_dir, "case-study-2.jpg")
         }
     ]
+    return [(create_case_study_image, (study["title"], study["subtitle"], study["color_scheme"],
+                                       study["filename"], scale))
+            for study in case_studies]
 
-    for study in case_studies:
-        create_case_study_image(
-            study["title"],
-            study["subtitle"],
-            study["color_scheme"],
-            study["filename"]
-        )
+def main():
+    """Générer toutes les images du carousel"""
+    raster.render_batch(case_study_tasks("assets/screenshots"))
 
     print("✅ Toutes les images du carousel ont été générées!")
 
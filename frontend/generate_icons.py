@@ -2,15 +2,65 @@
 """
 Script pour générer les icônes PWA de différentes tailles pour Hedera AgriFund
 Utilise PIL (Pillow) pour redimensionner les icônes
+
+L'icône est dessinée une seule fois en haute résolution (MASTER_SIZE) puis
+réduite avec un filtre Lanczos pour chaque taille. L'encodage PNG est réparti
+sur un pool de processus et un manifeste (assets/icons/.manifest.json) garde
+l'empreinte des entrées de chaque fichier : une relance sans changement ne
+réécrit rien.
 """
 
+import argparse
+import hashlib
+import json
 import os
-from PIL import Image, ImageDraw, ImageFont
-import base64
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 
-def create_icon_png(size, output_path):
-    """Crée une icône PNG de la taille spécifiée"""
+import PIL
+from PIL import Image, ImageDraw, ImageFont
+
+# Tailles d'icônes requises pour PWA
+ICON_SIZES = [16, 32, 72, 96, 128, 144, 152, 192, 384, 512]
+
+# Résolution du dessin maître, réduit ensuite vers chaque taille
+MASTER_SIZE = 1024
+
+# Le texte "AF" n'est lisible qu'à partir de cette taille
+LABEL_MIN_SIZE = 128
+
+SHORTCUT_SIZE = 96
+SHORTCUT_ICONS = {
+    "shortcut-tokenize.png": "🌾",
+    "shortcut-loan.png": "💰",
+    "shortcut-dashboard.png": "📊"
+}
+
+LABEL_FONTS = ["arial.ttf", "C:/Windows/Fonts/arial.ttf"]
+EMOJI_FONTS = ["seguiemj.ttf", "C:/Windows/Fonts/seguiemj.ttf"]  # Emoji font on Windows
+
+BASE_DIR = "assets/icons"
+MANIFEST_NAME = ".manifest.json"
+
+
+def load_font(candidates, font_size):
+    """Charge la première police disponible, renvoie (police, chemin)"""
+    for path in candidates:
+        try:
+            return ImageFont.truetype(path, font_size), path
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(font_size), "default"
+    except TypeError:  # Pillow < 10.1 : police bitmap de taille fixe
+        return ImageFont.load_default(), "default"
+
+
+def draw_icon(size, label=True):
+    """Dessine l'icône principale à la taille spécifiée"""
 
     # Créer une nouvelle image avec fond transparent
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
@@ -68,17 +118,9 @@ def create_icon_png(size, output_path):
                     fill=(255, 143, 0, 255))
 
     # Texte "AF" pour les grandes tailles
-    if size >= 128:
+    if label:
         try:
-            # Essayer de charger une police système
-            font_size = max(12, size // 12)
-            try:
-                font = ImageFont.truetype("arial.ttf", font_size)
-            except:
-                try:
-                    font = ImageFont.truetype("C:/Windows/Fonts/arial.ttf", font_size)
-                except:
-                    font = ImageFont.load_default()
+            font, _ = load_font(LABEL_FONTS, max(12, size // 12))
 
             # Calculer la position du texte
             text = "AF"
@@ -93,42 +135,11 @@ def create_icon_png(size, output_path):
         except Exception as e:
             print(f"Impossible de charger la police pour la taille {size}: {e}")
 
-    # Sauvegarder l'image
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    img.save(output_path, 'PNG', optimize=True)
-    print(f"✓ Icône {size}x{size} créée: {output_path}")
-
-def create_all_icons():
-    """Crée toutes les icônes PWA nécessaires"""
-
-    # Tailles d'icônes requises pour PWA
-    sizes = [16, 32, 72, 96, 128, 144, 152, 192, 384, 512]
-
-    base_dir = "assets/icons"
-
-    print("🎨 Génération des icônes PWA pour Hedera AgriFund...")
-    print("=" * 50)
-
-    for size in sizes:
-        output_path = os.path.join(base_dir, f"icon-{size}x{size}.png")
-        create_icon_png(size, output_path)
-
-    # Créer aussi des icônes pour les raccourcis
-    shortcut_icons = {
-        "shortcut-tokenize.png": "🌾",
-        "shortcut-loan.png": "💰",
-        "shortcut-dashboard.png": "📊"
-    }
+    return img
 
-    print("\n🔗 Génération des icônes de raccourcis...")
-    for filename, emoji in shortcut_icons.items():
-        create_shortcut_icon(96, os.path.join(base_dir, filename), emoji)
 
-    print(f"\n✅ Toutes les icônes ont été générées dans {base_dir}/")
-    print(f"📱 Votre PWA est maintenant prête avec {len(sizes) + len(shortcut_icons)} icônes!")
-
-def create_shortcut_icon(size, output_path, emoji_text):
-    """Crée une icône de raccourci avec emoji"""
+def draw_shortcut_icon(size, emoji_text):
+    """Dessine une icône de raccourci avec emoji"""
 
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
@@ -143,14 +154,7 @@ def create_shortcut_icon(size, output_path, emoji_text):
 
     # Texte emoji/symbole
     try:
-        font_size = size // 2
-        try:
-            font = ImageFont.truetype("seguiemj.ttf", font_size)  # Emoji font on Windows
-        except:
-            try:
-                font = ImageFont.truetype("C:/Windows/Fonts/seguiemj.ttf", font_size)
-            except:
-                font = ImageFont.load_default()
+        font, _ = load_font(EMOJI_FONTS, size // 2)
 
         # Centrer le texte
         bbox = draw.textbbox((0, 0), emoji_text, font=font)
@@ -162,17 +166,180 @@ def create_shortcut_icon(size, output_path, emoji_text):
 
         draw.text((text_x, text_y), emoji_text, fill=(255, 255, 255, 255), font=font)
     except Exception as e:
-        print(f"Impossible de charger l'emoji pour {output_path}: {e}")
+        print(f"Impossible de charger l'emoji ({emoji_text}): {e}")
         # Fallback: dessiner un cercle simple
         draw.ellipse([center - size//6, center - size//6, center + size//6, center + size//6],
                      fill=(255, 255, 255, 255))
 
-    img.save(output_path, 'PNG', optimize=True)
-    print(f"✓ Icône raccourci créée: {output_path}")
+    return img
+
+
+def icon_jobs():
+    """Liste des fichiers à produire avec les paramètres qui les déterminent"""
+    label_font = load_font(LABEL_FONTS, MASTER_SIZE // 12)[1]
+    emoji_font = load_font(EMOJI_FONTS, SHORTCUT_SIZE // 2)[1]
+    jobs = []
+    for size in ICON_SIZES:
+        label = size >= LABEL_MIN_SIZE
+        jobs.append({
+            "file": f"icon-{size}x{size}.png", "kind": "icon", "size": size, "label": label,
+            "master": MASTER_SIZE, "font": label_font if label else None
+        })
+    for filename, emoji in SHORTCUT_ICONS.items():
+        jobs.append({
+            "file": filename, "kind": "shortcut", "size": SHORTCUT_SIZE, "emoji": emoji,
+            "font": emoji_font
+        })
+    return jobs
+
+
+def inputs_digest(job, source_digest):
+    """Empreinte des entrées d'un fichier : code du script, version de Pillow et paramètres"""
+    payload = json.dumps({"source": source_digest, "pillow": PIL.__version__, **job}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_atomic(path, data):
+    """Écrit via un fichier temporaire pour ne jamais laisser de PNG tronqué"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+_masters = {}
+
+
+def _init_worker(masters):
+    _masters.update(masters)
+
+
+def _render(job, output_path):
+    """Réduit le maître (ou dessine le raccourci), encode et écrit le PNG"""
+    if job["kind"] == "icon":
+        # reducing_gap : réduction entière d'abord, puis Lanczos sur les 3 derniers facteurs
+        img = _masters[job["label"]].resize((job["size"], job["size"]), Image.LANCZOS, reducing_gap=3.0)
+        img = img.convert('RGBA')
+    else:
+        img = draw_shortcut_icon(job["size"], job["emoji"])
+    buffer = BytesIO()
+    img.save(buffer, 'PNG', optimize=True)
+    data = buffer.getvalue()
+    write_atomic(output_path, data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def create_all_icons(base_dir=BASE_DIR, workers=None, force=False, verbose=True):
+    """Crée toutes les icônes PWA nécessaires, en sautant celles qui sont à jour"""
+    started = time.perf_counter()
+    log = print if verbose else (lambda *args, **kwargs: None)
+
+    log("🎨 Génération des icônes PWA pour Hedera AgriFund...")
+    log("=" * 50)
+
+    os.makedirs(base_dir, exist_ok=True)
+    manifest_path = os.path.join(base_dir, MANIFEST_NAME)
+    manifest = {} if force else load_manifest(manifest_path)
+    with open(__file__, "rb") as f:
+        source_digest = hashlib.sha256(f.read()).hexdigest()
+
+    # Un fichier est à jour si ses entrées n'ont pas changé et s'il n'a pas été modifié depuis
+    stale = []
+    for job in icon_jobs():
+        digest = inputs_digest(job, source_digest)
+        entry = manifest.get(job["file"], {})
+        path = os.path.join(base_dir, job["file"])
+        if entry.get("inputs") == digest and entry.get("output") == file_digest(path):
+            log(f"· {job['file']} à jour")
+        else:
+            stale.append((job, digest, path))
+
+    # Dessiner chaque maître une seule fois, seulement s'il sert. Il est gardé en
+    # alpha prémultiplié (RGBa) : Pillow n'applique reducing_gap qu'à ce mode et
+    # les bords transparents ne bavent pas lors de la réduction
+    masters = {label: draw_icon(MASTER_SIZE, label).convert('RGBa')
+               for label in {job["label"] for job, _, _ in stale if job["kind"] == "icon"}}
+
+    workers = min(workers or os.cpu_count() or 1, len(stale))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(masters,)) as pool:
+            outputs = list(pool.map(_render, [job for job, _, _ in stale], [path for _, _, path in stale]))
+    else:
+        _init_worker(masters)
+        outputs = [_render(job, path) for job, _, path in stale]
+
+    for (job, digest, path), output in zip(stale, outputs):
+        manifest[job["file"]] = {"inputs": digest, "output": output}
+        log(f"✓ Icône {job['size']}x{job['size']} créée: {path}")
+
+    if stale:
+        write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode())
+
+    elapsed = time.perf_counter() - started
+    total = len(ICON_SIZES) + len(SHORTCUT_ICONS)
+    log(f"\n✅ {len(stale)} icône(s) générée(s), {total - len(stale)} à jour, dans {base_dir}/ ({elapsed:.2f} s)")
+    log(f"📱 Votre PWA est maintenant prête avec {total} icônes!")
+    return {"generated": len(stale), "skipped": total - len(stale), "elapsed": elapsed}
+
+
+def redraw_sequentially(base_dir):
+    """Ancienne méthode : redessine et réencode chaque taille, l'une après l'autre"""
+    started = time.perf_counter()
+    for size in ICON_SIZES:
+        draw_icon(size, size >= LABEL_MIN_SIZE).save(os.path.join(base_dir, f"icon-{size}x{size}.png"), 'PNG', optimize=True)
+    for filename, emoji in SHORTCUT_ICONS.items():
+        draw_shortcut_icon(SHORTCUT_SIZE, emoji).save(os.path.join(base_dir, filename), 'PNG', optimize=True)
+    return time.perf_counter() - started
+
+
+def compare_timings(workers=None):
+    """Compare un premier passage à froid avec une relance sans changement"""
+    base_dir = tempfile.mkdtemp(prefix="agrifund-icons-")
+    try:
+        sequential = redraw_sequentially(base_dir)
+        shutil.rmtree(base_dir)
+        cold = create_all_icons(base_dir, workers=workers, verbose=False)
+        rerun = create_all_icons(base_dir, workers=workers, verbose=False)
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    print("⏱️  Comparaison des temps de génération")
+    print("=" * 50)
+    print(f"Redessin séquentiel (ancienne méthode) : {sequential * 1000:8.1f} ms")
+    print(f"Passage à froid ({cold['generated']} fichiers)        : {cold['elapsed'] * 1000:8.1f} ms")
+    print(f"Relance sans changement ({rerun['generated']} écrit)    : {rerun['elapsed'] * 1000:8.1f} ms "
+          f"({cold['elapsed'] / rerun['elapsed']:.0f}x plus rapide)")
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère les icônes PWA de Hedera AgriFund")
+    parser.add_argument("--output-dir", default=BASE_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="processus d'encodage (défaut : un par CPU)")
+    parser.add_argument("--force", action="store_true", help="ignore le manifeste et régénère tout")
+    parser.add_argument("--compare", action="store_true", help="compare un passage à froid avec une relance")
+    args = parser.parse_args()
+
     try:
-        create_all_icons()
+        if args.compare:
+            compare_timings(args.workers)
+        else:
+            create_all_icons(args.output_dir, workers=args.workers, force=args.force)
     except ImportError:
         print("❌ PIL (Pillow) n'est pas installé.")
         print("📦 Installez-le avec: pip install Pillow")
@@ -922,6 +922,7 @@ class HederaAgriFundApp {
             }
 
             this.updateUserInfo();
+            this.startLiveUpdates();
             this.showLoadingOverlay(false);
             this.showNotification('Portefeuille connecté avec succès!', 'success');
 
@@ -932,6 +933,37 @@ class HederaAgriFundApp {
         }
     }
 
+    // Live prices and loan status pushed by the backend instead of polling
+    startLiveUpdates() {
+        if (this.stopLiveUpdates) this.stopLiveUpdates();
+        this.stopLiveUpdates = this.hedera.subscribeToUpdates({
+            commodities: Object.keys(this.mockData.cropPrices),
+            account: this.currentUser.id
+        }, {
+            onPrice: (update) => this.applyPriceUpdate(update),
+            onLoanStatus: (update) => this.applyLoanStatus(update)
+        });
+    }
+
+    applyPriceUpdate({ commodity, price }) {
+        const priceData = this.mockData.cropPrices[commodity.toLowerCase()];
+        if (!priceData) return;
+
+        priceData.change = priceData.current ? ((price - priceData.current) / priceData.current) * 100 : 0;
+        priceData.current = price;
+        this.updateTokenizationEstimate();
+        this.updateDashboard();
+    }
+
+    applyLoanStatus({ contract_id, status }) {
+        const loan = this.mockData.loans.find(loan => loan.id === contract_id);
+        if (loan) loan.status = status;
+
+        this.updateDashboard();
+        this.renderLoans();
+        this.showNotification(`Prêt ${contract_id}: ${status}`, 'info');
+    }
+
     // Render Functions
     renderLoans() {
         const loansGrid = document.getElementById('loansGrid');
@@ -243,6 +243,45 @@ class HederaIntegration {
         }
     }
 
+    // Get OHLC candles (interval: '1h', '1d' or '1w') for price charts
+    async getPriceCandles(commodity, interval = '1d', limit = 200) {
+        try {
+            const params = new URLSearchParams({ interval, limit: String(limit) });
+            const response = await fetch(`/api/prices/${encodeURIComponent(commodity)}/candles?${params.toString()}`);
+            if (!response.ok) {
+                throw new Error(`Candle request failed with status ${response.status}`);
+            }
+
+            const data = await response.json();
+            return { success: true, ...data };
+
+        } catch (error) {
+            console.error('Price candle fetch failed:', error);
+            return { success: false, error: error.message };
+        }
+    }
+
+    // Get profile, tokens, loans and totals for an account's dashboard in one request
+    async getDashboard(accountId, sections = null) {
+        try {
+            const params = new URLSearchParams();
+            if (sections) {
+                params.set('fields', sections.join(','));
+            }
+            const response = await fetch(`/api/dashboard/${encodeURIComponent(accountId)}?${params.toString()}`);
+            if (!response.ok) {
+                throw new Error(`Dashboard request failed with status ${response.status}`);
+            }
+
+            const data = await response.json();
+            return { success: true, ...data };
+
+        } catch (error) {
+            console.error('Dashboard fetch failed:', error);
+            return { success: false, error: error.message };
+        }
+    }
+
     // Calculate LTV ratio
     calculateLTV(loanAmount, collateralValue) {
         return (loanAmount / collateralValue) * 100;
@@ -400,6 +439,29 @@ class HederaIntegration {
             return { success: false, error: error.message };
         }
     }
+
+    // Subscribe to pushed price and loan status updates instead of polling
+    subscribeToUpdates({ commodities = [], account = null, loans = false } = {}, handlers = {}) {
+        const params = new URLSearchParams();
+        if (commodities.length) params.set('commodity', commodities.join(','));
+        if (account) params.set('account', account);
+        if (loans) params.set('loans', 'true');
+
+        const source = new EventSource(`/api/events/stream?${params.toString()}`);
+
+        source.addEventListener('price', (event) => {
+            handlers.onPrice?.(JSON.parse(event.data));
+        });
+        source.addEventListener('loan_status', (event) => {
+            handlers.onLoanStatus?.(JSON.parse(event.data));
+        });
+        source.onerror = (error) => {
+            // EventSource reconnects on its own using the server's retry hint
+            console.warn('Live update stream interrupted:', error);
+        };
+
+        return () => source.close();
+    }
 }
 
 // Export for use in other modules
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Rendu raster partagé pour les images générées du frontend
+(images du carousel Success Stories et captures d'écran de démonstration)
+
+Les fonds (dégradés, aplats, panneaux rectangulaires) sont construits dans un
+tableau NumPy d'un uint32 par pixel puis exposés à PIL sans copie en mode
+RGBX ; ImageDraw ne sert plus qu'au texte et aux formes arrondies. Les polices
+chargées sont mises en cache et toutes les images sont rendues en parallèle.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+FONT_CANDIDATES = ["arial.ttf", "C:/Windows/Fonts/arial.ttf"]
+
+
+@lru_cache(maxsize=None)
+def font(size):
+    """Police système à la taille demandée, chargée une seule fois par processus"""
+    for path in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow < 10.1 : police bitmap de taille fixe
+        return ImageFont.load_default()
+
+
+def rgb(color):
+    """(r, g, b) d'une couleur PIL ('#8B4513', nom ou tuple, l'alpha est ignoré)"""
+    if isinstance(color, str):
+        color = ImageColor.getrgb(color)
+    return tuple(int(c) for c in color[:3])
+
+
+def darken(color, opacity):
+    """Couleur vue sous un voile noir d'opacité donnée (0-255)"""
+    return tuple(round(c * (255 - opacity) / 255) for c in rgb(color))
+
+
+def _pack(colors):
+    """Couleurs (n, 3) -> pixels RGBX packés en uint32"""
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    pixels = np.full((len(colors), 4), 255, dtype=np.uint8)
+    pixels[:, :3] = np.clip(np.rint(colors), 0, 255)
+    return pixels.view(np.uint32).ravel()
+
+
+def background(width, height, color):
+    """Fond uni sous forme de tableau (hauteur, largeur) de pixels uint32"""
+    return np.full((height, width), _pack(rgb(color))[0], dtype=np.uint32)
+
+
+def vertical_gradient(width, height, top, bottom):
+    """Dégradé vertical linéaire de `top` (première ligne) à `bottom` (dernière ligne exclue)"""
+    alpha = np.arange(height, dtype=np.float64)[:, None] / height
+    rows = _pack(np.asarray(rgb(top)) * (1 - alpha) + np.asarray(rgb(bottom)) * alpha)
+    pixels = np.empty((height, width), dtype=np.uint32)
+    pixels[:] = rows[:, None]
+    return pixels
+
+
+def rectangle(pixels, box, fill=None, outline=None, width=1):
+    """Rectangle plein et/ou bordé, bornes incluses comme ImageDraw.rectangle"""
+    height, full_width = pixels.shape
+    x0, y0, x1, y1 = (int(v) for v in box)
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, full_width - 1), min(y1, height - 1)
+    if x1 < x0 or y1 < y0:
+        return
+    if fill is not None:
+        pixels[y0:y1 + 1, x0:x1 + 1] = _pack(rgb(fill))[0]
+    if outline is not None and width > 0:
+        color = _pack(rgb(outline))[0]
+        pixels[y0:y0 + width, x0:x1 + 1] = color
+        pixels[max(y1 - width + 1, y0):y1 + 1, x0:x1 + 1] = color
+        pixels[y0:y1 + 1, x0:x0 + width] = color
+        pixels[y0:y1 + 1, max(x1 - width + 1, x0):x1 + 1] = color
+
+
+def to_image(pixels):
+    """Image PIL RGBX partageant la mémoire du tableau (aucune copie)"""
+    height, width = pixels.shape
+    return Image.frombuffer('RGBX', (width, height), np.ascontiguousarray(pixels), 'raw', 'RGBX', 0, 1)
+
+
+class Canvas:
+    """Rectangles tracés directement dans le tableau NumPy ; texte et formes
+    arrondies mémorisés puis dessinés par ImageDraw lors de render().
+    Les rectangles se retrouvent donc toujours sous le texte et les ellipses."""
+
+    def __init__(self, pixels):
+        self.pixels = pixels
+        self.height, self.width = pixels.shape
+        self.operations = []
+
+    def rectangle(self, box, fill=None, outline=None, width=1):
+        rectangle(self.pixels, box, fill, outline, width)
+
+    def ellipse(self, *args, **kwargs):
+        self.operations.append(('ellipse', args, kwargs))
+
+    def text(self, *args, **kwargs):
+        self.operations.append(('text', args, kwargs))
+
+    def textlength(self, text, font):
+        return font.getlength(text)
+
+    def render(self, mode='RGBX'):
+        """Image finale ; mode='RGB' convertit avant de dessiner pour n'avoir qu'une copie"""
+        img = to_image(self.pixels)
+        if mode != img.mode:
+            img = img.convert(mode)
+        if self.operations:
+            draw = ImageDraw.Draw(img)  # copie l'image partagée avec le tableau si elle ne l'est pas déjà
+            for name, args, kwargs in self.operations:
+                getattr(draw, name)(*args, **kwargs)
+        return img
+
+
+def save(img, path, format, **options):
+    """Enregistre l'image ; seul JPEG accepte RGBX, les autres formats reçoivent du RGB"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if img.mode == 'RGBX' and format != 'JPEG':
+        img = img.convert('RGB')
+    img.save(path, format, **options)
+    return path
+
+
+def _run(task):
+    function, args = task
+    return function(*args)
+
+
+def render_batch(tasks, workers=None):
+    """Exécute les tâches (fonction, arguments) sur un pool de processus, renvoie leurs résultats"""
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [_run(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run, tasks))
+
+
+def render_all(output_dir="assets/screenshots", scale=1, workers=None):
+    """Rend toutes les case studies et captures d'écran en un seul lot"""
+    import create_screenshots
+    import generate_carousel_images
+
+    tasks = (generate_carousel_images.case_study_tasks(output_dir, scale)
+             + create_screenshots.screenshot_tasks(output_dir, scale))
+    return render_batch(tasks, workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère les images du carousel et les captures d'écran")
+    parser.add_argument("--output-dir", default="assets/screenshots")
+    parser.add_argument("--scale", type=float, default=1, help="facteur de taille (3 : sorties en 4K)")
+    parser.add_argument("--workers", type=int, default=None, help="processus de rendu (défaut : un par CPU)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    paths = render_all(args.output_dir, args.scale, args.workers)
+    print(f"\n✅ {len(paths)} images générées dans {args.output_dir}/ en {time.perf_counter() - started:.2f} s")